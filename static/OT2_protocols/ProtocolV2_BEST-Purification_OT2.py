@@ -8,9 +8,1496 @@
 ############################
 
 #### Package loading ####
-from opentrons import protocol_api # type: ignore
+from opentrons import protocol_api, types # type: ignore
 from math import *
 
+
+#### Shared: liquid_classes ####
+## Copied from static/OT2_shared/liquid_classes.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+############################
+### Liquid class library ###
+############################
+
+## Shared pipetting profiles for the EHI protocols. Each liquid class holds the tuned rates, delays, speeds and air gap
+## for one liquid, so the protocols refer to a class by name instead of carrying their own magic numbers.
+## Rates are fractions of the pipette's default flow rate. Flow rates (µL/s) are absolute and overrule the default flow rate.
+## Speeds are gantry speeds in mm/s. Delays are in seconds. None means "use the pipette default" / "skip this step".
+##
+## Submerge speed: speed from the top of the source well down to the aspiration height.
+## Withdraw speed: speed from the aspiration height back to the top of the source well.
+## Withdraw height: mm above the top of the source well the tip withdraws to (None is the top itself).
+## Exit speed: speed from the dispense location back to the top of the destination well.
+
+Liquid_Classes = {
+    ## Aqueous, non-viscous liquids.
+    "Water": {
+        "aspirate_rate": 1.0, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    "DNA_Sample": {
+        "aspirate_rate": 0.8, "dispense_rate": 0.8, "mix_rate": 0.8,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    ## Small (2-10 µL) transfers of libraries and primers into PCR plates.
+    "Low_Volume": {
+        "aspirate_rate": 0.6, "dispense_rate": 0.6, "mix_rate": 0.6,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    "Master_Mix": {
+        "aspirate_rate": 0.6, "dispense_rate": 0.6, "mix_rate": 0.6,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+
+    ## PEG4000 ligation mix is viscous - slow flow, slow movements and delays to limit adhesion on the outside of the tips.
+    "Ligation_Mix": {
+        "aspirate_rate": 1.0, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": 3, "dispense_flow_rate": 3,
+        "submerge_speed": 3, "withdraw_speed": 3, "withdraw_height": None, "exit_speed": 3,
+        "aspirate_delay": 10, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+
+    ## Magnetic beads for library clean-ups (BEST and Index PCR purification).
+    "Beads": {
+        "aspirate_rate": 0.5, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": 40, "withdraw_speed": 10, "withdraw_height": None, "exit_speed": 40,
+        "aspirate_delay": 5, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+    ## Magnetic beads mixed into sample lysate (DREX) - larger volumes in deepwell plates.
+    "Lysate_Beads": {
+        "aspirate_rate": 0.5, "dispense_rate": 0.8, "mix_rate": 1.2,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": 50, "withdraw_speed": 40, "withdraw_height": None, "exit_speed": 50,
+        "aspirate_delay": 5, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+
+    ## Bead supernatant removal. Slow aspiration to leave the bead pellet; air gap to keep droplets in the tip.
+    "Supernatant": {
+        "aspirate_rate": 0.5, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 40, "air_gap_height": 20},
+    "Lysate_Supernatant": {
+        "aspirate_rate": 0.5, "dispense_rate": 0.6, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 5, "air_gap": 20, "air_gap_height": None},
+
+    ## 80% ethanol. Volatile, so it is aspirated slowly from the reservoir and resuspension mixes are fast.
+    "Ethanol": {
+        "aspirate_rate": 0.7, "dispense_rate": 1.0, "mix_rate": 1.3,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    ## Ethanol removal from the bead pellet - fast withdrawal clear of the well, large air gap against dripping ethanol.
+    "Ethanol_Supernatant": {
+        "aspirate_rate": 0.5, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": 100, "withdraw_height": 2, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 70, "air_gap_height": 20},
+
+    ## Elution buffer and the final eluate.
+    "EBT": {
+        "aspirate_rate": 1.0, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": 100,
+        "aspirate_delay": 0, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+    "Eluate": {
+        "aspirate_rate": 0.7, "dispense_rate": 0.7, "mix_rate": 0.7,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    "Deepwell_Eluate": {
+        "aspirate_rate": 0.3, "dispense_rate": 0.3, "mix_rate": 0.3,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+}
+
+
+#### Liquid class lookup ####
+def Liquid_Class(Name, **Overrides):
+    ## Returns a copy of the named liquid class. Overrides are for documented, protocol-specific exceptions only.
+    if Name not in Liquid_Classes:
+        raise KeyError("Unknown liquid class '" + str(Name) + "'. Known classes: " + ", ".join(sorted(Liquid_Classes)))
+    Profile = dict(Liquid_Classes[Name])
+    for Key in Overrides:
+        if Key not in Profile:
+            raise KeyError("Unknown liquid class setting '" + str(Key) + "' for liquid class '" + str(Name) + "'")
+    Profile.update(Overrides)
+    Profile["name"] = Name
+    return Profile
+
+
+#### Applying liquid classes ####
+def _Well_Top(Location, Z = 0):
+    ## Top of the well (Z mm above it) for either a well or a location within a well.
+    if hasattr(Location, "top"):
+        return Location.top(z = Z)
+    return Location.labware.as_well().top(z = Z)
+
+def Set_Flow_Rates(Pipette, Profile):
+    ## Sets the absolute flow rates of a liquid class (if any). Returns the previous flow rates for Restore_Flow_Rates.
+    Previous = (Pipette.flow_rate.aspirate, Pipette.flow_rate.dispense)
+    if Profile["aspirate_flow_rate"] is not None:
+        Pipette.flow_rate.aspirate = Profile["aspirate_flow_rate"]
+    if Profile["dispense_flow_rate"] is not None:
+        Pipette.flow_rate.dispense = Profile["dispense_flow_rate"]
+    return Previous
+
+def Restore_Flow_Rates(Pipette, Previous):
+    Pipette.flow_rate.aspirate = Previous[0]
+    Pipette.flow_rate.dispense = Previous[1]
+
+def Aspirate_Liquid(Protocol, Pipette, Volume, Location, Profile, Mix = None):
+    ## Submerge (slowly if set), optional pre-mix, aspirate, delay and withdraw (slowly if set) to the top of the source.
+    if Profile["submerge_speed"] is not None:
+        Pipette.move_to(location = _Well_Top(Location))
+        Pipette.move_to(location = Location, speed = Profile["submerge_speed"])
+    if Mix is not None:
+        Pipette.mix(repetitions = Mix[0], volume = Mix[1], location = Location, rate = Profile["mix_rate"])
+    Pipette.aspirate(volume = Volume, location = Location, rate = Profile["aspirate_rate"])
+    if Profile["aspirate_delay"]:
+        Protocol.delay(seconds = Profile["aspirate_delay"])
+    if Profile["withdraw_speed"] is not None:
+        Pipette.move_to(location = _Well_Top(Location, Profile["withdraw_height"] or 0), speed = Profile["withdraw_speed"])
+
+def Dispense_Liquid(Protocol, Pipette, Volume, Location, Profile, Mix = None, Mix_Location = None):
+    ## Dispense, optional post-mix (at the dispense location unless Mix_Location is given), delay and leave the destination (slowly if set).
+    Pipette.dispense(volume = Volume, location = Location, rate = Profile["dispense_rate"])
+    if Mix is not None:
+        if Mix_Location is None:
+            Mix_Location = Location
+        Pipette.mix(repetitions = Mix[0], volume = Mix[1], location = Mix_Location, rate = Profile["mix_rate"])
+    if Profile["dispense_delay"]:
+        Protocol.delay(seconds = Profile["dispense_delay"])
+    if Profile["exit_speed"] is not None:
+        Pipette.move_to(location = _Well_Top(Location), speed = Profile["exit_speed"])
+
+def Air_Gap(Pipette, Profile):
+    ## Takes in the air gap of the liquid class (if any) to keep droplets inside the tip.
+    if Profile["air_gap"]:
+        if Profile["air_gap_height"] is None:
+            Pipette.air_gap(volume = Profile["air_gap"])
+        else:
+            Pipette.air_gap(volume = Profile["air_gap"], height = Profile["air_gap_height"])
+#### End shared: liquid_classes ####
+
+
+#### Shared: magnet_calibration ####
+## Copied from static/OT2_shared/magnet_calibration.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+##########################
+### Magnet calibration ###
+##########################
+
+## Engage height and settle time of the magnetic module per workflow, labware, liquid and volume in the well. The table is
+## keyed by workflow (the clean-up profile, static/OT2_shared/bead_cleanup.py) first, as the same labware is engaged at
+## different heights in different clean-ups (the Bio-Rad PCR plate: 10 mm in BEST, 14 mm in Index PCR purification).
+## Engage heights are in mm from the labware base (height_from_base). Settle times are the shortest wait (seconds) after
+## which the supernatant was clear, for wells holding up to the given volume (µL) of the liquid:
+##   "beads": sample + bead buffer (binding), "ethanol": ethanol wash, "eluate": beads in elution buffer.
+## A point measured for a larger volume is also safe for smaller volumes, so the smallest point at or above the volume in
+## the well is used. The table is written by tools/fit_magnet_calibration.py from bench measurements.
+## The first entries are the heights and waits the protocols were validated with.
+
+#### Calibration table ####
+Magnet_Calibration = {
+    "BEST": {
+        "96afatubetpxplate_96_wellplate_200ul": {"height": 10, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}},
+        "biorad_96_wellplate_200ul_pcr": {"height": 10, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}}},
+    "DREX": {
+        "thermoscientificnunc_96_wellplate_1300ul": {"height": 12, "settle": {
+            "beads": [(400, 180)],
+            "ethanol": [(180, 120)],
+            "eluate": [(100, 180)]}}},
+    "IndexPCR": {
+        "biorad_96_wellplate_200ul_pcr": {"height": 14, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}},
+        "opentrons_96_aluminumblock_generic_pcr_strip_200ul": {"height": 14, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}}},
+}
+#### End calibration table ####
+
+
+def Magnet_Settings(Workflow, Labware_Name, Liquid, Volume, Default):
+    ## (engage height, settle seconds) for a plate holding Volume µL of Liquid in a workflow. Default (height, seconds) is used
+    ## for workflows, labware or liquids without calibration; above the calibrated volumes the wait is the longest of the
+    ## calibrated and default wait.
+    Entry = Magnet_Calibration.get(Workflow, {}).get(Labware_Name)
+    if Entry is None or Liquid not in Entry["settle"]:
+        return Default
+    Points = sorted(Entry["settle"][Liquid])
+    for Point_Volume, Seconds in Points:
+        if Volume <= Point_Volume:
+            return Entry["height"], Seconds
+    return Entry["height"], max(Default[1], Points[-1][1])
+
+
+def Engage_Magnet(Protocol, Magnet, Labware, Workflow, Liquid, Volume, Default):
+    ## Engages the magnet at the calibrated height for the plate in the workflow and waits the calibrated settle time.
+    Height, Seconds = Magnet_Settings(Workflow, Labware.load_name, Liquid, Volume, Default)
+    Magnet.engage(height_from_base = Height)
+    Protocol.delay(seconds = Seconds, msg = "Magnet engaged at " + str(Height) + " mm - " + str(Seconds) + " s for the beads to settle")
+#### End shared: magnet_calibration ####
+
+
+#### Shared: multi_dispense ####
+## Copied from static/OT2_shared/multi_dispense.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+######################
+### Multi-dispense ###
+######################
+
+## One aspiration serving several columns, e.g. ethanol added from the top of the wells without contact. The columns are
+## grouped up front from the tip capacity: each aspiration takes the volume for its group plus a disposal volume that
+## stays in the tip (the last dispense of a group is as accurate as the first) and is blown out when the step is done.
+## When only one column fits, the transfers are the same single aspirate-dispense cycles as without multi-dispense.
+## Uses Aspirate_Liquid and Dispense_Liquid, so the protocol needs the liquid_classes block as well.
+
+def Dispense_Groups(Count, Volume, Capacity, Disposal_Volume = 20):
+    ## Splits Count destinations (in run order) into lists of indices that share one aspiration.
+    Per_Aspiration = max(1, int((Capacity - Disposal_Volume) // Volume))
+    return [list(range(Start, min(Count, Start + Per_Aspiration))) for Start in range(0, Count, Per_Aspiration)]
+
+
+def Tip_Capacity(Pipette, Tip_Rack):
+    ## Largest volume the pipette can hold with tips from the rack (µL).
+    return min(Pipette.max_volume, Tip_Rack.wells()[0].max_volume)
+
+
+def Multi_Dispense(Protocol, Pipette, Volume, Sources, Destinations, Profile, Capacity, Disposal_Volume = 20, Mix = None):
+    ## Dispenses Volume µL to every destination with the tip already on the pipette. Sources holds the aspiration location
+    ## for each destination (e.g. following the reservoir level); a group aspirates at the source of its last destination.
+    ## The disposal volume is left in the tip - blow it out (e.g. into the waste) before returning the tip.
+    ## Returns the number of aspirations.
+    Groups = Dispense_Groups(len(Destinations), Volume, Capacity, Disposal_Volume)
+    Disposal = Disposal_Volume if max(len(Group) for Group in Groups) > 1 else 0
+    for Group in Groups:
+        Aspirate_Volume = len(Group) * Volume + Disposal - Pipette.current_volume
+        Aspirate_Liquid(Protocol, Pipette, Aspirate_Volume, Sources[Group[-1]], Profile, Mix = Mix)
+        for Index in Group:
+            Dispense_Liquid(Protocol, Pipette, Volume, Destinations[Index], Profile)
+    return len(Groups)
+#### End shared: multi_dispense ####
+
+
+#### Shared: plate_scheduler ####
+## Copied from static/OT2_shared/plate_scheduler.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#######################
+### Plate scheduler ###
+#######################
+
+## Interleaves the stages of several plates on one robot with one magnetic module. The stages of a plate run in their own
+## order; a stage takes the robot for its estimated time and may be followed by a wait (bead incubation, off-deck elution
+## incubation) in which the robot works on the other plates. The next stage is picked when the previous one is done, on
+## the run clock: the stage that can start first, and of stages that can start now the one of the plate that has been
+## ready longest (then the plate listed first). So a plate whose wait is over goes next, and the robot only waits for the
+## time left of a wait. With one plate the stages run in their own order.
+## The magnet is never booked for two plates. A plate on the magnet keeps it until it leaves the deck after a stage with
+## Release, or gives it up after a stage with Park (the plate is moved off the deck, and back for its next stage).
+## Reservoir wells are not scheduled: the pipette is used by one stage at a time, so plates that share a reservoir only
+## need their own wells for liquids whose height is followed from column to column (e.g. ethanol) and for waste.
+
+def Plate_Stage(Plate, Name, Seconds, Wait = 0, Magnet = False, Park = False, Release = False):
+    ## Plate: index of the plate. Seconds: estimated robot time. Wait: seconds the plate waits after the stage.
+    ## Magnet: the plate is on the magnet for the stage. Park: after the stage the plate can be moved off the magnet for
+    ## another plate. Release: the plate leaves the magnet (and the deck) after the stage.
+    return {"plate": Plate, "name": Name, "seconds": Seconds, "wait": Wait, "magnet": Magnet, "park": Park, "release": Release}
+
+
+def New_Plate_Schedule(Protocol, Stages):
+    ## Stages of all plates, each plate's stages in run order. Ready: run clock at which each plate can go on, Holder: the
+    ## plate on the magnet. A simulation takes no time, so it runs on the modelled
+    ## clock of the stage estimates.
+    Plates = []
+    for Stage in Stages:
+        if Stage["plate"] not in Plates:
+            Plates.append(Stage["plate"])
+    return {"protocol": Protocol, "plates": Plates, "queues": {Plate: [Stage for Stage in Stages if Stage["plate"] == Plate] for Plate in Plates},
+            "ready": {Plate: 0.0 for Plate in Plates}, "holder": None, "parkable": False, "model": 0.0, "start": None}
+
+
+def Run_Clock(Schedule):
+    ## Seconds on the run clock: the modelled clock of a run time estimate or of the stages in a simulation, otherwise the
+    ## robot's own clock.
+    import time
+    Protocol = Schedule["protocol"]
+    if hasattr(Protocol, "Estimate"):
+        return Protocol.Estimate["clock"]
+    if Protocol.is_simulating():
+        return Schedule["model"]
+    if Schedule["start"] is None:
+        Schedule["start"] = time.monotonic()
+    return time.monotonic() - Schedule["start"]
+
+
+def _Pick_Stage(Schedule, Clock):
+    Holder = Schedule["holder"]
+    Candidates = []
+    for Index, Plate in enumerate(Schedule["plates"]):
+        Queue = Schedule["queues"][Plate]
+        if not Queue:
+            continue
+        Stage = Queue[0]
+        Start = max(Clock, Schedule["ready"][Plate])
+        if Stage["magnet"] and Holder not in (None, Plate) and not Schedule["parkable"]:
+            continue
+        Candidates.append((Start, Schedule["ready"][Plate], Index, Plate))
+    if not Candidates:
+        raise ValueError("The plate stages cannot be scheduled: plate " + str(Holder) + " keeps the magnet, as none of its stages releases it")
+    Start, Ready, Index, Plate = min(Candidates)
+    return dict(Schedule["queues"][Plate].pop(0), start = Start)
+
+
+def Next_Plate_Stage(Schedule):
+    ## The next stage to run, or None when all stages are done. Waits for the time left of the plate's wait. The stage's
+    ## "move_off" is the plate to move off the magnet first (the plate on it, at a Park), or None.
+    if not any(Schedule["queues"].values()):
+        return None
+    Clock = Run_Clock(Schedule)
+    Stage = _Pick_Stage(Schedule, Clock)
+    Remaining = Stage["start"] - Clock
+    if Remaining >= 1:
+        Schedule["protocol"].delay(seconds = round(Remaining), msg = "Waiting for the incubation of the plate to finish")
+    Schedule["model"] = Stage["start"]
+    Stage["move_off"] = None
+    if Stage["magnet"] and Schedule["holder"] not in (None, Stage["plate"]):
+        Stage["move_off"] = Schedule["holder"]
+    if Stage["magnet"]:
+        Schedule["holder"] = Stage["plate"]
+    return Stage
+
+
+def Finish_Plate_Stage(Schedule, Stage):
+    ## Starts the wait after a stage and frees the magnet at a Park or Release.
+    Schedule["model"] = Stage["start"] + Stage["seconds"]
+    Schedule["ready"][Stage["plate"]] = Run_Clock(Schedule) + Stage["wait"]
+    if Schedule["holder"] == Stage["plate"]:
+        Schedule["parkable"] = Stage["park"]
+    if Stage["release"]:
+        Schedule["holder"] = None
+#### End shared: plate_scheduler ####
+
+
+#### Shared: heater_shaker ####
+## Copied from static/OT2_shared/heater_shaker.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Heater-Shaker ###
+#####################
+
+## Mixing and incubating a whole plate on a Heater-Shaker instead of mixing column by column with the pipette. The plate
+## sits on the Heater-Shaker (on the adapter for its plate type) for mixing and incubations, and on the magnet for the bead
+## separations. The OT-2 has no gripper: plate moves are manual, and the run pauses for the operator to move the plate.
+## On the OT-2 an 8-channel pipette cannot go to the slots left and right of the Heater-Shaker, and only to tip racks in the
+## slots in front of and behind it. The Heater-Shaker heats (37-95 °C) but cannot cool.
+
+## Only plates seated in an adapter are shaken. Other plate types are refused: the Covaris AFA-TUBE plate, PCR strips in the
+## aluminium block and the Nunc 1.3 mL deepwell plate, which no Opentrons adapter definition can stack.
+Heater_Shaker_Adapters = {
+    "biorad_96_wellplate_200ul_pcr": "opentrons_96_pcr_adapter",
+}
+
+
+def Load_Heater_Shaker(Protocol, Slot, Plate_Type):
+    ## Returns (Heater-Shaker, plate location) - the adapter for the plate type. Load the plate on, and move it back to, the
+    ## plate location. The latch is closed, so the pipettes can reach the plate.
+    if Plate_Type not in Heater_Shaker_Adapters:
+        raise ValueError("The Heater-Shaker has no adapter for " + str(Plate_Type) + " - use one of: " + ", ".join(sorted(Heater_Shaker_Adapters))
+                         + ", or run without the Heater-Shaker")
+    Heater_Shaker = Protocol.load_module("heaterShakerModuleV1", Slot)
+    Location = Heater_Shaker.load_adapter(Heater_Shaker_Adapters[Plate_Type])
+    Heater_Shaker.close_labware_latch()
+    return Heater_Shaker, Location
+
+
+def Shake_Plate(Protocol, Heater_Shaker, Speed, Minutes, Temperature = None):
+    ## Shakes the plate at Speed rpm for Minutes, at Temperature °C (reached before shaking starts) if given.
+    Heater_Shaker.close_labware_latch()
+    if Temperature is not None:
+        Heater_Shaker.set_and_wait_for_temperature(Temperature)
+    Heater_Shaker.set_and_wait_for_shake_speed(Speed)
+    Protocol.delay(minutes = Minutes, msg = "Shaking at " + str(Speed) + " rpm for " + str(Minutes) + " min" + (" at " + str(Temperature) + " °C" if Temperature is not None else ""))
+    Heater_Shaker.deactivate_shaker()
+    if Temperature is not None:
+        Heater_Shaker.deactivate_heater()
+
+
+def Move_Plate(Protocol, Heater_Shaker, Plate, Location):
+    ## Manual plate move (e.g. to the magnet module or to the Heater-Shaker adapter): the run pauses until the operator has
+    ## moved the plate. The latch is open during the move and closed again afterwards.
+    Heater_Shaker.open_labware_latch()
+    Protocol.move_labware(Plate, Location, use_gripper = False)
+    Heater_Shaker.close_labware_latch()
+#### End shared: heater_shaker ####
+
+
+#### Shared: bead_cleanup ####
+## Copied from static/OT2_shared/bead_cleanup.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Bead clean-up ###
+#####################
+
+## The magnetic bead clean-up of the DREX extraction and the BEST and Index PCR purifications: bead addition, binding,
+## supernatant removal, two ethanol washes, drying, elution and the eluate transfer, written once and configured per
+## workflow by a clean-up profile (Cleanup_Profiles). The protocols keep their deck layout, tip racks and runtime
+## parameters: they describe the deck with New_Cleanup and call the steps in order. Needs the liquid_classes,
+## magnet_calibration and heater_shaker blocks, and multi_dispense for the ethanol multi-dispense.
+##
+## Places in a well are (reference, z): ("bottom", z) and ("top", z) are mm above the well bottom or top; None is the
+## well itself (the pipette's default clearance).
+## Supernatant passes: (µL, z above the waste top, flick) per aspiration; the passes go to the first wastes in order and
+## the two ethanol washes to the next two. A flick moves the tip sideways over the waste to shed the last drop.
+## Wash mix: (repetitions, µL, aspiration z, dispense z) - the beads are resuspended in the ethanol by pipetting, each
+## column with its own tips; without it the ethanol goes onto the beads on the magnet, all columns from one set of tips.
+## Liquids: the liquid class per step; "ebt" adds the elution buffer from above the wells (Heater-Shaker mode), "ebt_mix"
+## mixes it into the beads by pipetting.
+## Liquid overrides: the validated rates and motions of each workflow where they differ from the shared liquid classes.
+## Drying: seconds after the last ethanol removal, less the credit per column (the first columns dry while the others
+## are emptied).
+
+Cleanup_Profiles = {
+    ## DREX nucleic acid extraction: lysate and 200 µL beads in a 1.3 mL deepwell plate, resuspension washes. The EBT that
+    ## is mixed into the beads by pipetting goes in without the dispense delay and slow exit of the EBT liquid class.
+    "DREX": {
+        "liquids": {"beads": "Lysate_Beads", "supernatant": "Lysate_Supernatant", "ethanol": "Ethanol", "ethanol_removal": "Ethanol_Supernatant",
+                    "ethanol_residual": "Ethanol_Supernatant", "ebt": "EBT", "ebt_mix": "EBT", "eluate": "Deepwell_Eluate"},
+        "liquid_overrides": {"ethanol_removal": {"aspirate_rate": 0.4, "dispense_rate": 0.7, "withdraw_speed": None, "air_gap_height": None},
+                             "ebt_mix": {"dispense_delay": 0, "exit_speed": None}},
+        "bead_volume": 200, "beads_follow_level": True, "bead_mix": (5, 125), "bead_dispense": ("bottom", 4.0),
+        "bead_dispense_mix": (5, 180), "bead_dispense_mix_at": ("bottom", 6.0), "binding_volume": 400,
+        "incubation_conditions": "10 C, 1500 rpm",
+        "magnet_height": 12, "settle": {"beads": 180, "ethanol": 120, "eluate": 180},
+        "supernatant_passes": [(200, 1, True), (200, 0, False)], "supernatant_z": 3.4,
+        "wash_mix": (5, 180, 4.0, 6.0), "wash_shake_minutes": 1, "ethanol_dispense": ("bottom", 5.5),
+        "ethanol_premix": None, "ethanol_aspirate_mix": None, "ethanol_removal_extra": 10, "ethanol_removal_z": 3.4,
+        "residual_removal": None, "dry_seconds": 300, "dry_column_credit": 0,
+        "ebt_dispense": ("bottom", 3.4), "ebt_mix": (5, 35), "elution_minutes": 5, "elution_temperature": None,
+        "elution_conditions": "25*C, 1500 rpm", "eluate_extra": 5, "eluate_z": 3.4, "shake_speed": 1500,
+        "plate_name": "Extraction plate", "eluate_name": "Eluted Extracted Samples"},
+    ## BEST library purification: library and 75 µL beads in the Covaris tubes or a PCR plate, washes on the magnet.
+    "BEST": {
+        "liquids": {"beads": "Beads", "supernatant": "Supernatant", "ethanol": "Ethanol", "ethanol_removal": "Ethanol_Supernatant",
+                    "ethanol_residual": "Ethanol_Supernatant", "ebt": "EBT", "ebt_mix": "EBT", "eluate": "Eluate"},
+        "liquid_overrides": {"ethanol": {"mix_rate": 1.0}, "ethanol_residual": {"aspirate_rate": 0.6, "withdraw_speed": None}},
+        "bead_volume": 75, "beads_follow_level": False, "bead_mix": (5, 75), "bead_dispense": None,
+        "bead_dispense_mix": (6, 90), "bead_dispense_mix_at": None, "binding_volume": 125,
+        "incubation_conditions": None,
+        "magnet_height": 10, "settle": {"beads": 300, "ethanol": 300, "eluate": 300},
+        "supernatant_passes": [(150, 0, False)], "supernatant_z": 1.2,
+        "wash_mix": None, "wash_shake_minutes": 1, "ethanol_dispense": ("top", 1.2),
+        "ethanol_premix": (3, 200), "ethanol_aspirate_mix": None, "ethanol_removal_extra": 0, "ethanol_removal_z": 1.2,
+        "residual_removal": (10, 0.8), "dry_seconds": 295, "dry_column_credit": 23,
+        "ebt_dispense": None, "ebt_mix": (5, 20), "elution_minutes": 10, "elution_temperature": 37,
+        "elution_conditions": "37*C", "eluate_extra": 0, "eluate_z": 1.0, "shake_speed": 1000,
+        "plate_name": "Library plate", "eluate_name": "Purified Library"},
+    ## Index PCR purification: 50 µL PCR and 60 µL beads in a PCR plate or strips; lower and slower removals (not verified yet).
+    "IndexPCR": {
+        "liquids": {"beads": "Beads", "supernatant": "Supernatant", "ethanol": "Ethanol", "ethanol_removal": "Ethanol_Supernatant",
+                    "ethanol_residual": "Ethanol_Supernatant", "ebt": "EBT", "ebt_mix": "EBT", "eluate": "Eluate"},
+        "liquid_overrides": {"ethanol": {"mix_rate": 1.0}, "ethanol_removal": {"aspirate_rate": 0.2}, "ethanol_residual": {"aspirate_rate": 0.6, "withdraw_speed": None},
+                             "eluate": {"aspirate_rate": 0.4, "dispense_rate": 0.4}},
+        "bead_volume": 60, "beads_follow_level": False, "bead_mix": (5, 75), "bead_dispense": None,
+        "bead_dispense_mix": (6, 90), "bead_dispense_mix_at": None, "binding_volume": 110,
+        "incubation_conditions": None,
+        "magnet_height": 14, "settle": {"beads": 300, "ethanol": 300, "eluate": 300},
+        "supernatant_passes": [(150, 0, False)], "supernatant_z": 0.3,
+        "wash_mix": None, "wash_shake_minutes": 1, "ethanol_dispense": ("top", 1.2),
+        "ethanol_premix": None, "ethanol_aspirate_mix": (2, 200), "ethanol_removal_extra": 0, "ethanol_removal_z": 0.35,
+        "residual_removal": (10, 0.1), "dry_seconds": 295, "dry_column_credit": 23,
+        "ebt_dispense": None, "ebt_mix": (5, 20), "elution_minutes": 10, "elution_temperature": 37,
+        "elution_conditions": "37*C", "eluate_extra": 0, "eluate_z": 0.2, "shake_speed": 1000,
+        "plate_name": "Index PCR plate", "eluate_name": "Index PCR product"},
+}
+
+
+#### Profile lookup ####
+def Cleanup_Profile(Name, **Overrides):
+    ## Returns a copy of the named clean-up profile, with its liquid classes. Overrides are for documented exceptions only.
+    if Name not in Cleanup_Profiles:
+        raise KeyError("Unknown clean-up profile '" + str(Name) + "'. Known profiles: " + ", ".join(sorted(Cleanup_Profiles)))
+    Profile = dict(Cleanup_Profiles[Name])
+    for Key in Overrides:
+        if Key not in Profile:
+            raise KeyError("Unknown clean-up setting '" + str(Key) + "' for clean-up profile '" + str(Name) + "'")
+    Profile.update(Overrides)
+    Profile["name"] = Name
+    Profile["classes"] = {Step: Liquid_Class(Liquid, **Profile["liquid_overrides"].get(Step, {})) for Step, Liquid in Profile["liquids"].items()}
+    return Profile
+
+
+def New_Cleanup(Profile, Pipette, Plate, Magnet, Columns, Beads, Ethanol, EBT, Wastes, Output, Reservoir_Heights, **Deck):
+    ## The deck of one clean-up. Ethanol: the two wash wells. Wastes: the supernatant wastes, then the two wash wastes.
+    ## Reservoir_Heights: aspiration height per column for reservoir wells drawn down column by column.
+    ## Deck (optional): heater_shaker and hs_location (Heater-Shaker mode), bead_tips (a rack whose tips add the beads to
+    ## the column of the well and remove its supernatant), ethanol_tips (a rack per wash whose tips add the ethanol from
+    ## column 1 and remove it from the column of the well), multi_dispense_tips (300 µL rack, column 1 and 2 for the
+    ## washes), ebt_tips (the tip that adds the elution buffer in Heater-Shaker mode), residual_pipette (the last ethanol
+    ## removal), name (prefix of the status messages) and offset (columns of the tip racks and output plate used by the
+    ## plate).
+    Cleanup = {"profile": Profile, "pipette": Pipette, "plate": Plate, "magnet": Magnet, "columns": Columns, "beads": Beads,
+               "ethanol": Ethanol, "ebt": EBT, "wastes": Wastes, "output": Output, "heights": Reservoir_Heights,
+               "heater_shaker": None, "hs_location": None, "bead_tips": None, "ethanol_tips": None, "multi_dispense_tips": None, "ebt_tips": None,
+               "residual_pipette": Pipette, "name": "", "offset": 0}
+    for Key in Deck:
+        if Key not in Cleanup:
+            raise KeyError("Unknown clean-up deck setting '" + str(Key) + "'")
+    Cleanup.update(Deck)
+    return Cleanup
+
+
+def _Place(Well, Place):
+    if Place is None:
+        return Well
+    if Place[0] == "top":
+        return Well.top(z = Place[1])
+    return Well.bottom(z = Place[1])
+
+
+def _Engage(Protocol, Cleanup, Liquid, Volume):
+    Profile = Cleanup["profile"]
+    Engage_Magnet(Protocol, Cleanup["magnet"], Cleanup["plate"], Profile["name"], Liquid, Volume, Default = (Profile["magnet_height"], Profile["settle"][Liquid]))
+
+
+def _To_Heater_Shaker(Protocol, Cleanup):
+    Move_Plate(Protocol, Cleanup["heater_shaker"], Cleanup["plate"], Cleanup["hs_location"])
+
+
+def _To_Magnet(Protocol, Cleanup):
+    Move_Plate(Protocol, Cleanup["heater_shaker"], Cleanup["plate"], Cleanup["magnet"])
+
+
+#### Clean-up steps ####
+def Add_Beads(Protocol, Cleanup):
+    ## Beads into every column, mixed in by pipetting (or on the Heater-Shaker, in Incubate_Beads).
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Class = Profile["classes"]["beads"]
+    Bead_Tips = Cleanup["bead_tips"]
+    Tip_Offset = Cleanup["offset"]*8
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Beads Transfer Begun")
+    for i in range(Cleanup["columns"]):
+        Well = Cleanup["plate"].wells()[i*8]
+        Pipette.pick_up_tip(Bead_Tips.wells()[Tip_Offset + i*8] if Bead_Tips is not None else None)
+        Source = Cleanup["beads"].bottom(z = Cleanup["heights"][i]) if Profile["beads_follow_level"] == True else Cleanup["beads"].bottom()
+        Aspirate_Liquid(Protocol, Pipette, Profile["bead_volume"], Source, Class, Mix = Profile["bead_mix"])
+        if Cleanup["heater_shaker"] is not None:
+            Dispense_Liquid(Protocol, Pipette, Profile["bead_volume"], _Place(Well, Profile["bead_dispense"]), Class)
+        else:
+            Dispense_Liquid(Protocol, Pipette, Profile["bead_volume"], _Place(Well, Profile["bead_dispense"]), Class,
+                            Mix = Profile["bead_dispense_mix"], Mix_Location = None if Profile["bead_dispense_mix_at"] is None else _Place(Well, Profile["bead_dispense_mix_at"]))
+        Pipette.return_tip()
+
+
+def Incubate_Beads(Protocol, Cleanup, Minutes, On_Deck = True):
+    ## Binding: shaking on the Heater-Shaker (at least a minute) and back to the magnet, waiting on deck, or off deck.
+    Profile = Cleanup["profile"]
+    if Cleanup["heater_shaker"] is not None:
+        Protocol.comment("STATUS: Heater-Shaker Beads Incubation begun. Plate is shaking for " + str(max(1, Minutes)) + " mins.")
+        Shake_Plate(Protocol, Cleanup["heater_shaker"], Profile["shake_speed"], max(1, Minutes))
+        _To_Magnet(Protocol, Cleanup)
+    elif On_Deck == True:
+        Protocol.comment("STATUS: " + Cleanup["name"] + "On-Deck Beads Incubation begun. Plate is incubating for " + str(Minutes) + " mins.")
+        Protocol.delay(minutes = Minutes)
+    else:
+        Protocol.pause("ACTION: Seal the " + Profile["plate_name"] + ". Spin it down. Incubate it for " + str(Minutes) + " mins"
+                       + (", " + Profile["incubation_conditions"] if Profile["incubation_conditions"] is not None else "")
+                       + ". Spin it down. Press RESUME, when the " + Profile["plate_name"] + " has been returned (without seal) to the magnet module.")
+
+
+def Remove_Supernatant(Protocol, Cleanup):
+    ## Engages the magnet for the binding volume and discards the supernatant of every column in one or more passes, with
+    ## the tips that added the beads when they come from a bead rack.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Class = Profile["classes"]["supernatant"]
+    Bead_Tips = Cleanup["bead_tips"]
+    Tip_Offset = Cleanup["offset"]*8
+    _Engage(Protocol, Cleanup, "beads", Profile["binding_volume"])
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Discarding Supernatant")
+    for i in range(Cleanup["columns"]):
+        Well = Cleanup["plate"].wells()[i*8]
+        Pipette.pick_up_tip(Bead_Tips.wells()[Tip_Offset + i*8] if Bead_Tips is not None else None)
+        for Waste, (Volume, Waste_Z, Flick) in zip(Cleanup["wastes"], Profile["supernatant_passes"]):
+            Aspirate_Liquid(Protocol, Pipette, Volume, Well.bottom(z = Profile["supernatant_z"]), Class)
+            Dispense_Liquid(Protocol, Pipette, Volume, Waste.top(z = Waste_Z), Class)
+            if Flick == True:
+                Pipette.move_to(location = Waste.top().move(types.Point(x = 0, y = -5, z = 2)))
+        Air_Gap(Pipette, Class)
+        Pipette.return_tip()
+
+
+def Wash_Beads(Protocol, Cleanup, Volume):
+    ## Two ethanol washes, the last ethanol removal and the drying of the beads.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Plate = Cleanup["plate"]
+    Columns = Cleanup["columns"]
+    Heights = Cleanup["heights"]
+    Ethanol_Class = Profile["classes"]["ethanol"]
+    Removal_Class = Profile["classes"]["ethanol_removal"]
+    Shaken = Cleanup["heater_shaker"] is not None and Profile["wash_mix"] is not None ## Resuspended on the Heater-Shaker
+    Tip_Offset = Cleanup["offset"]*8
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Ethanol Wash Begun")
+    for k in range(2):
+        Protocol.comment("STATUS: " + Cleanup["name"] + ("First" if k == 0 else "Second") + " Wash Begun")
+        Ethanol = Cleanup["ethanol"][k]
+        Waste = Cleanup["wastes"][len(Profile["supernatant_passes"]) + k]
+        Ethanol_Tips = Cleanup["ethanol_tips"][k] if Cleanup["ethanol_tips"] is not None else None
+        Dispense_Place = ("top", -2) if Shaken else Profile["ethanol_dispense"]
+
+        ## Adding ethanol - resuspended by pipetting with tips per column, or from one set of tips
+        if Profile["wash_mix"] is not None:
+            Cleanup["magnet"].disengage()
+        if Profile["wash_mix"] is not None and not Shaken:
+            Reps, Mix_Volume, Mix_Aspirate, Mix_Dispense = Profile["wash_mix"]
+            for i in range(Columns):
+                Well = Plate.wells()[i*8]
+                Pipette.pick_up_tip()
+                Aspirate_Liquid(Protocol, Pipette, Volume, Ethanol.bottom(z = Heights[i]), Ethanol_Class, Mix = Profile["ethanol_aspirate_mix"])
+                Dispense_Liquid(Protocol, Pipette, Volume, _Place(Well, Dispense_Place), Ethanol_Class)
+                for Rep in range(Reps):
+                    Pipette.aspirate(volume = Mix_Volume, location = Well.bottom(z = Mix_Aspirate), rate = Ethanol_Class["mix_rate"])
+                    Pipette.dispense(volume = Mix_Volume, location = Well.bottom(z = Mix_Dispense), rate = Ethanol_Class["mix_rate"])
+                Pipette.return_tip()
+        else:
+            if Shaken:
+                _To_Heater_Shaker(Protocol, Cleanup)
+            if Cleanup["multi_dispense_tips"] is not None:
+                Pipette.pick_up_tip(Cleanup["multi_dispense_tips"].columns()[k][0])
+            else:
+                Pipette.pick_up_tip(Ethanol_Tips.wells()[Tip_Offset] if Ethanol_Tips is not None else None)
+            if Profile["ethanol_premix"] is not None:
+                Pipette.mix(repetitions = Profile["ethanol_premix"][0], volume = Profile["ethanol_premix"][1], location = Ethanol.bottom(z = Heights[len(Heights)-2]), rate = Ethanol_Class["mix_rate"])
+            if Cleanup["multi_dispense_tips"] is not None:
+                ## Several columns per aspiration from 300 µL tips; the disposal volume is blown out into the waste below.
+                Sources = [Ethanol.bottom(z = Heights[i]) for i in range(Columns)]
+                Destinations = [_Place(Plate.wells()[i*8], Dispense_Place) for i in range(Columns)]
+                Aspirations = Multi_Dispense(Protocol, Pipette, Volume, Sources, Destinations, Ethanol_Class, Capacity = Tip_Capacity(Pipette, Cleanup["multi_dispense_tips"]), Mix = Profile["ethanol_aspirate_mix"])
+                Protocol.comment("Ethanol added to " + str(Columns) + " columns with " + str(Aspirations) + " aspirations")
+            else:
+                for i in range(Columns):
+                    Aspirate_Liquid(Protocol, Pipette, Volume, Ethanol.bottom(z = Heights[i]), Ethanol_Class, Mix = Profile["ethanol_aspirate_mix"])
+                    Dispense_Liquid(Protocol, Pipette, Volume, _Place(Plate.wells()[i*8], Dispense_Place), Ethanol_Class)
+            Pipette.blow_out(location = Waste) ## Blow out to remove potential droplets before returning.
+            Pipette.return_tip()
+            if Shaken:
+                Shake_Plate(Protocol, Cleanup["heater_shaker"], Profile["shake_speed"], Profile["wash_shake_minutes"])
+                _To_Magnet(Protocol, Cleanup)
+        if Profile["wash_mix"] is not None:
+            _Engage(Protocol, Cleanup, "ethanol", Volume)
+
+        ## Removing ethanol - with the tips that added it when they come from a wash rack
+        for i in range(Columns):
+            Well = Plate.wells()[i*8]
+            Pipette.pick_up_tip(Ethanol_Tips.wells()[Tip_Offset + i*8] if Ethanol_Tips is not None else None)
+            Aspirate_Liquid(Protocol, Pipette, Volume + Profile["ethanol_removal_extra"], Well.bottom(z = Profile["ethanol_removal_z"]), Removal_Class)
+            Dispense_Liquid(Protocol, Pipette, Volume + Profile["ethanol_removal_extra"], Waste.top(), Removal_Class)
+            Air_Gap(Pipette, Removal_Class) ## Takes in excess, outside droplets to limit cross-contamination.
+            Pipette.return_tip()
+
+    ## Extra ethanol removal step to remove leftover ethanol before drying beads.
+    if Profile["residual_removal"] is not None:
+        for i in range(Columns):
+            Cleanup["residual_pipette"].pick_up_tip()
+            Aspirate_Liquid(Protocol, Cleanup["residual_pipette"], Profile["residual_removal"][0], Plate.wells()[i*8].bottom(z = Profile["residual_removal"][1]), Profile["classes"]["ethanol_residual"])
+            Cleanup["residual_pipette"].return_tip()
+
+    ## Drying beads
+    Seconds = Profile["dry_seconds"] - Profile["dry_column_credit"]*(Columns - 1)
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Drying Beads - " + str(Seconds) + " s")
+    Protocol.delay(seconds = Seconds)
+
+
+def Add_Elution_Buffer(Protocol, Cleanup, Volume, Pause = True):
+    ## Elution buffer onto the beads, off the magnet. Heater-Shaker mode: from above the wells with one set of tips, then
+    ## the incubation on the Heater-Shaker and back to the magnet. Otherwise mixed in per column and incubated off deck:
+    ## the run pauses for it, or with Pause False (the plate scheduler) only says so.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Plate = Cleanup["plate"]
+    Cleanup["magnet"].disengage()
+    Protocol.comment("STATUS: " + Cleanup["name"] + "EBT Buffer Transfer begun")
+    if Cleanup["heater_shaker"] is not None:
+        _To_Heater_Shaker(Protocol, Cleanup)
+        Class = Profile["classes"]["ebt"]
+        Pipette.pick_up_tip(Cleanup["ebt_tips"])
+        for i in range(Cleanup["columns"]):
+            Aspirate_Liquid(Protocol, Pipette, Volume, Cleanup["ebt"].bottom(z = 1), Class)
+            Dispense_Liquid(Protocol, Pipette, Volume, Plate.wells()[i*8].top(z = -2), Class)
+        Pipette.return_tip()
+        Shake_Plate(Protocol, Cleanup["heater_shaker"], Profile["shake_speed"], Profile["elution_minutes"], Temperature = Profile["elution_temperature"])
+        _To_Magnet(Protocol, Cleanup)
+        return
+    Class = Profile["classes"]["ebt_mix"]
+    for i in range(Cleanup["columns"]):
+        Pipette.pick_up_tip()
+        Aspirate_Liquid(Protocol, Pipette, Volume, Cleanup["ebt"].bottom(z = 1), Class)
+        Dispense_Liquid(Protocol, Pipette, Volume, _Place(Plate.wells()[i*8], Profile["ebt_dispense"]), Class, Mix = Profile["ebt_mix"])
+        Pipette.return_tip()
+    Incubation = "Incubate it for " + str(Profile["elution_minutes"]) + " min at " + Profile["elution_conditions"]
+    if Pause == True:
+        Protocol.pause("ACTION: Seal the " + Profile["plate_name"] + " and spin it down shortly. " + Incubation + ". Press RESUME, when the "
+                       + Profile["plate_name"] + " has been returned (without seal) to the magnet module.")
+    else:
+        Protocol.comment("ACTION: " + Cleanup["name"] + "Seal the plate and spin it down shortly. " + Incubation + ", and return it (without seal) to the magnet module when asked.")
+
+
+def Transfer_Eluate(Protocol, Cleanup, Volume):
+    ## Engages the magnet and transfers the eluate of every column to the output plate, each with a fresh tip. Disengages
+    ## the magnet.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Plate = Cleanup["plate"]
+    _Engage(Protocol, Cleanup, "eluate", Volume)
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Transfer of " + Profile["eluate_name"])
+    for i in range(Cleanup["columns"]):
+        Source = Plate.wells()[i*8].bottom(z = Profile["eluate_z"])
+        Destination = Cleanup["output"].wells()[Cleanup["offset"]*8 + i*8]
+        Pipette.transfer(volume = Volume + Profile["eluate_extra"], source = Source, dest = Destination, new_tip = 'always', trash = False, rate = Profile["classes"]["eluate"]["aspirate_rate"])
+    Cleanup["magnet"].disengage()
+#### End shared: bead_cleanup ####
+
+
+#### Shared: tip_inventory ####
+## Copied from static/OT2_shared/tip_inventory.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Tip inventory ###
+#####################
+
+## Tips left in the racks on the deck, kept across runs in the robot's user storage, so partly used racks are finished by
+## the next run instead of being replaced. Racks are keyed by deck slot (with the tip rack type, so a rack of another type
+## in the slot counts as fresh). At the start the partly used rack of a pipette goes first and starting_tip is set to its
+## first tip left; at the end the tips left in every rack are written back. While a run is going its racks are recorded
+## as unknown, so an aborted run leaves them to be replaced rather than reused.
+## starting_tip cannot be used with partial nozzle layouts: racks of pipettes that use them (Fresh_Pipettes) are always
+## fresh, and are only recorded at the end. Tips are counted up to the last tip used, so tips skipped by partial pick-ups
+## are not reused. Nothing is written when the protocol is simulated, analysed or estimated. Needs the run_estimator block.
+## The inventory only holds for the protocols that keep it (BEST-Library, CovarisSetup, IndexPCR, PoolCombiner and qPCR).
+## DREX and the bead purifications take their tips from fixed rack positions instead: they record every rack they load
+## as unknown (Mark_Tip_Racks_Unknown), so the next run that continues partly used racks asks for those slots to be
+## replaced. Racks used by hand or by other protocols are not seen: load fresh racks there, or run with fresh racks.
+
+Inventory_File = "/data/user_storage/tip_inventory.json" ## Persistent storage on the OT-2
+
+
+def Read_Tip_Inventory(Path = Inventory_File):
+    ## {slot: {"load_name", "next" (first tip left, None for an empty or unknown rack), "tips_left", "protocol", "updated"}}
+    import json
+    import os
+    if not os.path.exists(Path):
+        return {}
+    with open(Path, encoding = "utf-8") as Handle:
+        return json.load(Handle)["racks"]
+
+
+def _Write_Tip_Inventory(Racks, Path):
+    ## Written to a temporary file first, so a power cut never leaves half a file.
+    import json
+    import os
+    os.makedirs(os.path.dirname(Path), exist_ok = True)
+    with open(Path + ".tmp", "w", encoding = "utf-8") as Handle:
+        json.dump({"racks": Racks}, Handle, indent = 1, sort_keys = True)
+    os.replace(Path + ".tmp", Path)
+
+
+def _Start_Index(Pipette, Rack):
+    ## Index (column-wise) of the pipette's starting tip in the rack, 0 when it starts elsewhere.
+    if Pipette.starting_tip is not None and Pipette.starting_tip.parent == Rack:
+        return Rack.wells().index(Pipette.starting_tip)
+    return 0
+
+
+def Start_Tip_Inventory(Protocol, Protocol_Name, Pipettes, Fresh_Pipettes = (), Mode = "inventory", Tips_Needed = None, Path = Inventory_File):
+    ## Mode "inventory" continues partly used racks, "fresh" takes all racks as fresh and "manual" keeps the starting tips
+    ## set by the protocol. Racks recorded as empty, unknown or beyond the one partly used rack a pipette can continue are to
+    ## be replaced: the run pauses at the start to ask for it. Tips_Needed ({pipette: tips}) is for protocols that load just
+    ## the racks they need - a partly used rack is then only continued when the racks still hold enough tips.
+    ## Returns the state to pass to Finish_Tip_Inventory.
+    from datetime import datetime
+    Racks = Read_Tip_Inventory(Path) if Mode == "inventory" else {}
+    Replace = []
+    for Pipette in list(Pipettes) + list(Fresh_Pipettes):
+        Partial = []
+        Fresh = []
+        for Rack in Pipette.tip_racks:
+            Entry = Racks.get(str(Rack.parent))
+            if Entry is None or Entry["load_name"] != Rack.load_name:
+                Fresh.append(Rack)
+                continue
+            Next = None if Entry["next"] is None else Rack.wells().index(Rack.wells_by_name()[Entry["next"]])
+            if Next is not None and Pipette.channels == 8:
+                Next = -(-Next // 8) * 8 ## Multichannels start at the top of the next full column
+            if Next is None or Next >= len(Rack.wells()) or Pipette in Fresh_Pipettes:
+                Replace.append(str(Rack.parent))
+                Fresh.append(Rack)
+            elif Next == 0:
+                Fresh.append(Rack)
+            else:
+                Partial.append((Next, Rack))
+        if not Partial:
+            continue
+        Partial.sort(key = lambda Item: -Item[0]) ## The rack with the fewest tips left is finished first
+        Next, Rack = Partial[0]
+        if Tips_Needed is not None and Pipette in Tips_Needed and len(Rack.wells()) - Next + sum(len(Other.wells()) for Other in Fresh) < Tips_Needed[Pipette]:
+            Replace.extend(str(Other.parent) for Index, Other in Partial)
+            continue
+        Replace.extend(str(Other.parent) for Index, Other in Partial[1:])
+        Pipette.tip_racks = [Rack] + Fresh + [Other for Index, Other in Partial[1:]]
+        Pipette.starting_tip = Rack.wells()[Next]
+        Protocol.comment("Tip inventory: " + str(Pipette) + " continues the rack in slot " + str(Rack.parent) + " from "
+                         + Rack.wells()[Next].well_name + " (" + str(len(Rack.wells()) - Next) + " tips left)")
+    if Replace:
+        Protocol.pause("Tip inventory: replace the tip racks in slot " + ", ".join(sorted(set(Replace), key = int)) + " with fresh racks, then resume")
+
+    State = {"protocol": Protocol_Name, "pipettes": list(Pipettes) + list(Fresh_Pipettes), "racks": Read_Tip_Inventory(Path), "path": Path}
+    if not Protocol.is_simulating():
+        Started = datetime.now().isoformat(timespec = "seconds")
+        Running = dict(State["racks"])
+        for Pipette in State["pipettes"]:
+            for Rack in Pipette.tip_racks:
+                Running[str(Rack.parent)] = {"load_name": Rack.load_name, "next": None, "tips_left": None, "protocol": Protocol_Name + " (running)", "updated": Started}
+        _Write_Tip_Inventory(Running, Path)
+    return State
+
+
+def Mark_Tip_Racks_Unknown(Protocol, Protocol_Name, Path = Inventory_File):
+    ## For protocols that do not keep the inventory: records every tip rack loaded so far as unknown (to be replaced).
+    ## Written at the start of the run, as an aborted run has used tips too.
+    from datetime import datetime
+    if Protocol.is_simulating():
+        return
+    Racks = Read_Tip_Inventory(Path)
+    Updated = datetime.now().isoformat(timespec = "seconds")
+    for Labware in Protocol.loaded_labwares.values():
+        if Labware.is_tiprack:
+            Racks[str(Labware.parent)] = {"load_name": Labware.load_name, "next": None, "tips_left": None, "protocol": Protocol_Name, "updated": Updated}
+    _Write_Tip_Inventory(Racks, Path)
+
+
+def Finish_Tip_Inventory(Protocol, State):
+    ## Records the tips left in the racks of the pipettes and reports the racks to replace before the next run.
+    from datetime import datetime
+    Racks = dict(State["racks"])
+    Empty = []
+    Updated = datetime.now().isoformat(timespec = "seconds")
+    for Pipette in State["pipettes"]:
+        for Rack in Pipette.tip_racks:
+            Used = [Index for Index, Well in enumerate(Rack.wells()) if not Has_Tip(Pipette, Well)]
+            Next = max([_Start_Index(Pipette, Rack)] + [Index + 1 for Index in Used])
+            Left = len(Rack.wells()) - Next
+            Racks[str(Rack.parent)] = {"load_name": Rack.load_name, "next": Rack.wells()[Next].well_name if Left > 0 else None,
+                                       "tips_left": Left, "protocol": State["protocol"], "updated": Updated}
+            if Left == 0:
+                Empty.append(str(Rack.parent))
+    Summary = ", ".join("slot " + Slot + ": " + str(Racks[Slot]["tips_left"]) for Slot in sorted(Racks, key = int) if Racks[Slot]["tips_left"] is not None)
+    Protocol.comment("Tip inventory - tips left per rack: " + Summary)
+    Protocol.comment("Tip inventory: " + str(len(Empty)) + " fresh rack(s) needed for the next run"
+                     + (" (slot " + ", ".join(sorted(Empty, key = int)) + ")" if Empty else ""))
+    if not Protocol.is_simulating():
+        _Write_Tip_Inventory(Racks, State["path"])
+#### End shared: tip_inventory ####
+
+
+#### Shared: plate_state ####
+## Copied from static/OT2_shared/plate_state.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+###################
+### Plate state ###
+###################
+
+## What the wells of a plate hold when it goes from one run to the next: sample ID, whether the well holds sample, volume
+## (µL) and concentration (ng/µL, 0 when not known). A protocol reads the state of its input plate at the start, so it can
+## skip empty columns and check the volumes it takes without a CSV input, and writes the states of the plates it changed
+## at the end. States are kept in the robot's user storage, one file per plate name (e.g. "Purified library").
+## A state is one fixed record per well of a 96 well plate, in the order of plate.wells() (A1, B1, ... H12), held column
+## by column in arrays (one 96 item list per field in the file), so loading is a single pass over the wells. Nothing is
+## written when the protocol is simulated, analysed or estimated.
+
+State_Directory = "/data/user_storage/plate_state" ## Persistent storage on the OT-2
+State_Format = 1
+Plate_Wells = 96
+
+
+def Well_Index(Well_Name):
+    ## "B3" -> 17, the index of the well in plate.wells()
+    return (int(Well_Name[1:]) - 1) * 8 + "ABCDEFGH".index(Well_Name[0])
+
+
+def Well_Name_At(Index):
+    return "ABCDEFGH"[Index % 8] + str(Index // 8 + 1)
+
+
+class Plate_State:
+    def __init__(self, Name, Plate_Type = "", Project = ""):
+        from array import array
+        self.Name = Name
+        self.Plate_Type = Plate_Type
+        self.Project = Project
+        self.Sample = [""] * Plate_Wells
+        self.Occupied = bytearray(Plate_Wells)
+        self.Volume = array("d", [0.0]) * Plate_Wells
+        self.Concentration = array("d", [0.0]) * Plate_Wells
+
+    def Set(self, Well_Name, Sample, Volume, Concentration = 0):
+        Index = Well_Index(Well_Name)
+        self.Sample[Index] = Sample
+        self.Occupied[Index] = 1
+        self.Volume[Index] = round(Volume, 2)
+        self.Concentration[Index] = round(Concentration, 3)
+
+    def Take(self, Well_Name, Volume):
+        ## Takes Volume from a well with sample (empty wells are skipped); fails when the well holds less.
+        Index = Well_Index(Well_Name)
+        if not self.Occupied[Index]:
+            return
+        if Volume > self.Volume[Index] + 1e-6:
+            raise ValueError(self.Name + " well " + Well_Name + " (" + (self.Sample[Index] or "no sample ID") + ") holds "
+                             + str(self.Volume[Index]) + " µL, " + str(round(Volume, 2)) + " µL is needed")
+        self.Volume[Index] = round(self.Volume[Index] - Volume, 2)
+
+    def Wells(self):
+        ## Names of the wells with sample, in plate order.
+        return [Well_Name_At(Index) for Index in range(Plate_Wells) if self.Occupied[Index]]
+
+    def Columns(self):
+        ## Columns (1-12) with at least one well with sample.
+        return [Column for Column in range(1, 13) if any(self.Occupied[(Column - 1) * 8:Column * 8])]
+
+    def Data(self):
+        return {"format": State_Format, "name": self.Name, "plate_type": self.Plate_Type, "project": self.Project,
+                "sample": list(self.Sample), "occupied": list(self.Occupied), "volume": list(self.Volume), "concentration": list(self.Concentration)}
+
+
+def Plate_State_From(Data):
+    from array import array
+    if Data.get("format") != State_Format:
+        raise ValueError("Plate state " + str(Data.get("name")) + " has format " + str(Data.get("format")) + ", expected " + str(State_Format))
+    State = Plate_State(Data["name"], Data["plate_type"], Data["project"])
+    if not len(Data["sample"]) == len(Data["occupied"]) == len(Data["volume"]) == len(Data["concentration"]) == Plate_Wells:
+        raise ValueError("Plate state " + State.Name + " does not have " + str(Plate_Wells) + " wells")
+    State.Sample = [str(Sample) for Sample in Data["sample"]]
+    State.Occupied = bytearray(Data["occupied"])
+    State.Volume = array("d", Data["volume"])
+    State.Concentration = array("d", Data["concentration"])
+    return State
+
+
+def Plate_State_File(Name, Directory = State_Directory):
+    import os
+    return os.path.join(Directory, Name.replace(" ", "_") + ".json")
+
+
+def Read_Plate_State(Name, Directory = State_Directory):
+    ## The state of the plate, or None when there is none.
+    import json
+    import os
+    Path = Plate_State_File(Name, Directory)
+    if not os.path.exists(Path):
+        return None
+    with open(Path, encoding = "utf-8") as Handle:
+        return Plate_State_From(json.load(Handle))
+
+
+def Input_Plate_State(Protocol, Name, Columns, Directory = State_Directory):
+    ## The state of an input plate for a run over sample columns 1-Columns; fails when there is none or when it has
+    ## samples beyond the columns.
+    State = Read_Plate_State(Name, Directory)
+    if State is None:
+        raise ValueError("There is no plate state for " + Name + " on the robot - run the protocol that makes the plate with plate states on, or turn plate states off")
+    Outside = [Well_Name for Well_Name in State.Wells() if int(Well_Name[1:]) > Columns]
+    if Outside:
+        raise ValueError("The plate state of " + Name + " has samples outside the " + str(Columns) + " sample column(s): " + ", ".join(Outside))
+    Protocol.comment("Plate state: " + Name + (" (" + State.Project + ")" if State.Project else "") + ", " + str(len(State.Wells()))
+                     + " samples in column(s) " + ", ".join(str(Column) for Column in State.Columns()))
+    return State
+
+
+def Write_Plate_State(Protocol, State, Directory = State_Directory):
+    ## Written to a temporary file first, so a power cut never leaves half a file.
+    import json
+    import os
+    if Protocol.is_simulating():
+        Protocol.comment("Plate state: " + State.Name + ", " + str(len(State.Wells())) + " samples (not written in simulation)")
+        return
+    os.makedirs(Directory, exist_ok = True)
+    Path = Plate_State_File(State.Name, Directory)
+    with open(Path + ".tmp", "w", encoding = "utf-8") as Handle:
+        json.dump(State.Data(), Handle, separators = (",", ":"))
+    os.replace(Path + ".tmp", Path)
+    Protocol.comment("Plate state: " + State.Name + ", " + str(len(State.Wells())) + " samples written to " + Path)
+#### End shared: plate_state ####
+
+#### Shared: run_estimator ####
+## Copied from static/OT2_shared/run_estimator.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Run estimator ###
+#####################
+
+## Dry run of a protocol that estimates its run time instead of moving: Start_Run_Estimate wraps the protocol context, so
+## pipettes and modules are loaded as usual but their actions only advance a modelled clock (pipetting at the flow rates,
+## gantry moves, tip handling, delays, magnet, temperature module and thermocycler ramps and profiles). Pauses are
+## recorded rather than waited for, and every "STATUS:" comment starts a new stage. Finish_Run_Estimate prints the time
+## per stage and when the operator pauses come, in robot time (the time spent paused is not counted). A "STATUS:" pause
+## at the very end of the run only closes it and is not listed as an operator pause.
+## The wrapped context reports is_simulating(), so no files are written and no hardware is polled. The tips are tracked by
+## the estimate: shared code reads the tips left in a rack with Has_Tip instead of Well.has_tip.
+## Thermocycler protocols need the thermal_model block.
+
+Timing = {
+    "arc": 1.0,             ## s to lift to a safe height and lower again for a move between wells
+    "gantry_speed": 200,    ## Effective mm/s of a move between wells (acceleration included)
+    "z_speed": 60,          ## Effective mm/s of a move within a well
+    "move": 2.0,            ## s for a move from an unknown position (e.g. after dropping a tip)
+    "pick_up_tip": 4.0,     ## s for the tip pick-up itself (presses)
+    "drop_tip": 5.0,        ## s to move to the trash and eject
+    "eject": 2.0,           ## s to eject tips into their rack (after the move)
+    "blow_out": 1.5,
+    "touch_tip": 2.0,
+    "air_gap": 1.0,         ## s to lift before the air gap is aspirated
+    "home": 10.0,
+    "magnet": 5.0,          ## s to engage or disengage the magnet
+    "lid": 20.0,            ## s to open or close the thermocycler lid
+    "latch": 2.0,           ## s to open or close the heater-shaker labware latch
+    "shake_ramp": 5.0,      ## s for the heater-shaker to reach its speed
+}
+
+Temperature_Module_Rates = {"heating": 0.12, "cooling": 0.035} ## °C/s, from ambient (25 °C)
+
+
+def _Clock(Seconds):
+    Seconds = int(round(Seconds))
+    return str(Seconds // 3600) + ":" + str(Seconds // 60 % 60).zfill(2) + ":" + str(Seconds % 60).zfill(2)
+
+
+def _Point(Location):
+    ## Deck coordinates of a well or location, None when unknown (e.g. a trash bin).
+    if hasattr(Location, "point"):
+        return Location.point
+    if hasattr(Location, "top"):
+        return Location.top().point
+    return None
+
+
+def _As_List(Value):
+    return list(Value) if isinstance(Value, (list, tuple)) else [Value]
+
+
+def Has_Tip(Pipette, Well):
+    ## Whether a tip rack well still holds a tip. A run time estimate picks up no tips, so its pipettes keep track of them.
+    if isinstance(Pipette, Estimating_Pipette):
+        return str(Well) not in Pipette._Protocol.Estimate["used_tips"]
+    return Well.has_tip
+
+
+class Estimating_Protocol:
+    def __init__(self, Protocol):
+        self._Protocol = Protocol
+        self.Estimate = {"clock": 0.0, "stages": [["Setup", 0.0]], "pauses": [], "used_tips": set()}
+
+    def __getattr__(self, Name):
+        ## Loading labware, liquids and parameters goes to the protocol context.
+        return getattr(self._Protocol, Name)
+
+    def Add(self, Seconds):
+        self.Estimate["clock"] += Seconds
+
+    def is_simulating(self):
+        return True
+
+    def load_instrument(self, *args, **kwargs):
+        return Estimating_Pipette(self, self._Protocol.load_instrument(*args, **kwargs))
+
+    def load_module(self, *args, **kwargs):
+        return Estimating_Module(self, self._Protocol.load_module(*args, **kwargs))
+
+    def comment(self, msg):
+        if str(msg).startswith("STATUS:"):
+            self.Estimate["stages"].append([str(msg)[7:].strip(), self.Estimate["clock"]])
+        self._Protocol.comment(msg)
+
+    def delay(self, seconds = 0, minutes = 0, msg = None):
+        self.Add(seconds + 60 * minutes)
+
+    def pause(self, msg = None):
+        self.Estimate["pauses"].append((self.Estimate["clock"], str(msg or "Pause")))
+
+    def move_labware(self, labware, new_location, use_gripper = False, **kwargs):
+        ## The OT-2 has no gripper: the operator moves the labware during a pause.
+        Location = "off the deck" if getattr(new_location, "value", None) == "off-deck" else "to " + str(new_location)
+        self.pause("Move " + str(labware) + " " + Location)
+
+    def wait_for_tasks(self, tasks):
+        self.Estimate["clock"] = max([self.Estimate["clock"]] + [Task["end"] for Task in tasks])
+
+    def set_rail_lights(self, on):
+        pass
+
+    def home(self):
+        self.Add(Timing["home"])
+
+
+class Estimating_Pipette:
+    def __init__(self, Protocol, Pipette):
+        self._Protocol = Protocol
+        self._Pipette = Pipette
+        self._Position = None
+        self._Tip_Location = None
+        self.current_volume = 0
+        self.has_tip = False
+
+    def __getattr__(self, Name):
+        ## Settings (flow rates, tip racks, nozzle layouts) and properties come from the loaded pipette.
+        return getattr(self._Pipette, Name)
+
+    def __setattr__(self, Name, Value):
+        ## The tip racks and starting tip are set on the loaded pipette, where the tip tracking reads them.
+        if Name in ("tip_racks", "starting_tip"):
+            setattr(self._Pipette, Name, Value)
+        else:
+            object.__setattr__(self, Name, Value)
+
+    def __str__(self):
+        return str(self._Pipette)
+
+    def _Move(self, Location, Speed = None):
+        Point = _Point(Location)
+        if Location is None:
+            return
+        if Point is None or self._Position is None:
+            self._Protocol.Add(Timing["move"])
+        else:
+            Across = ((Point.x - self._Position.x) ** 2 + (Point.y - self._Position.y) ** 2) ** 0.5
+            Down = abs(Point.z - self._Position.z)
+            if Speed is not None:
+                self._Protocol.Add((Across + Down) / Speed)
+            elif Across < 1:
+                self._Protocol.Add(Down / Timing["z_speed"])
+            else:
+                self._Protocol.Add(Timing["arc"] + Across / Timing["gantry_speed"])
+        self._Position = Point
+
+    def _Tip_Capacity(self):
+        if self._Pipette.tip_racks:
+            return min(self._Pipette.max_volume, self._Pipette.tip_racks[0].wells()[0].max_volume)
+        return self._Pipette.max_volume
+
+    def aspirate(self, volume = None, location = None, rate = 1.0):
+        if volume is None:
+            volume = self._Tip_Capacity() - self.current_volume
+        self._Move(location)
+        self._Protocol.Add(volume / (self._Pipette.flow_rate.aspirate * rate))
+        self.current_volume += volume
+        return self
+
+    def dispense(self, volume = None, location = None, rate = 1.0, push_out = None):
+        if volume is None:
+            volume = self.current_volume
+        self._Move(location)
+        self._Protocol.Add(volume / (self._Pipette.flow_rate.dispense * rate))
+        self.current_volume = max(0, self.current_volume - volume)
+        return self
+
+    def mix(self, repetitions = 1, volume = None, location = None, rate = 1.0):
+        if volume is None:
+            volume = self._Tip_Capacity()
+        self._Move(location)
+        for Repetition in range(repetitions):
+            self.aspirate(volume, None, rate)
+            self.dispense(volume, None, rate)
+        return self
+
+    def blow_out(self, location = None):
+        self._Move(location)
+        self._Protocol.Add(Timing["blow_out"])
+        self.current_volume = 0
+        return self
+
+    def touch_tip(self, location = None, radius = 1.0, v_offset = -1.0, speed = 60.0):
+        self._Move(location)
+        self._Protocol.Add(Timing["touch_tip"])
+        return self
+
+    def air_gap(self, volume = None, height = None):
+        self._Protocol.Add(Timing["air_gap"])
+        return self.aspirate(volume, None)
+
+    def move_to(self, location, force_direct = False, minimum_z_height = None, speed = None, publish = True):
+        self._Move(location, speed)
+        return self
+
+    def configure_nozzle_layout(self, style, start = None, end = None, front_right = None, back_left = None, tip_racks = None):
+        ## The layout is kept by the estimate (the engine would log the change): the active nozzles and the tip racks.
+        from opentrons.protocol_api import ALL, SINGLE
+        if style == ALL:
+            self.active_channels = self._Pipette.channels
+        elif style == SINGLE:
+            self.active_channels = 1
+        else: ## A partial column from the start nozzle to the end nozzle
+            self.active_channels = abs(ord(start[0]) - ord(end[0])) + 1
+        if tip_racks is not None:
+            self._Pipette.tip_racks = tip_racks
+
+    def _Next_Tip(self):
+        ## First rack location with tips for all active nozzles, from the starting tip on (as the OT-2 tip tracking does).
+        Racks = self._Pipette.tip_racks
+        Start = self._Pipette.starting_tip
+        if Start is not None and Start.parent in Racks:
+            Racks = Racks[Racks.index(Start.parent):]
+        for Rack in Racks:
+            for Column in Rack.columns():
+                if self.active_channels == 8:
+                    if all(Has_Tip(self, Well) for Well in Column):
+                        return Column[0]
+                    continue
+                for Well in Column:
+                    if Has_Tip(self, Well) and (Start is None or Start.parent != Rack or Rack.wells().index(Well) >= Rack.wells().index(Start)):
+                        return Well
+        raise RuntimeError(str(self) + " has run out of tips")
+
+    def pick_up_tip(self, location = None, presses = None, increment = None, prep_after = None):
+        ## The tips of the active nozzles: the column below a full 8-channel, otherwise the rows from the target well up.
+        if location is None:
+            location = self._Next_Tip()
+        Well = location if hasattr(location, "well_name") else location.labware.as_well()
+        Column = Well.parent.columns_by_name()[Well.well_name[1:]]
+        Row = Column.index(Well)
+        Channels = self.active_channels
+        Tips = Column if Channels == 8 else Column[max(0, Row - Channels + 1):Row + 1]
+        self._Protocol.Estimate["used_tips"].update(str(Tip) for Tip in Tips)
+        self._Tip_Location = Well
+        self._Move(Well)
+        self._Protocol.Add(Timing["pick_up_tip"])
+        self.has_tip = True
+        return self
+
+    def drop_tip(self, location = None, home_after = None):
+        self._Protocol.Add(Timing["drop_tip"])
+        self._Position = None
+        self.has_tip = False
+        self.current_volume = 0
+        return self
+
+    def return_tip(self, home_after = None):
+        ## Returned tips are not picked up again, as on the robot.
+        self._Move(self._Tip_Location)
+        self._Protocol.Add(Timing["eject"])
+        self.has_tip = False
+        self.current_volume = 0
+        return self
+
+    def _Liquid_Handling(self, Steps, kwargs):
+        ## Steps: [(source locations, destination locations, [volume per destination])], with the tip handling and the
+        ## options of transfer, distribute and consolidate.
+        New_Tip = str(kwargs.get("new_tip", "once")).lower()
+        Trash = kwargs.get("trash", True)
+        Rate = kwargs.get("rate", 1.0)
+        Finish_Tip = self.drop_tip if Trash else self.return_tip
+        if New_Tip == "once":
+            self.pick_up_tip()
+        for Sources, Destinations, Volumes in Steps:
+            if New_Tip == "always":
+                self.pick_up_tip()
+            for Source in Sources:
+                if kwargs.get("mix_before"):
+                    self.mix(kwargs["mix_before"][0], kwargs["mix_before"][1], Source, Rate)
+                self.aspirate(sum(Volumes) / len(Sources) + kwargs.get("disposal_volume", 0), Source, Rate)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip()
+                if kwargs.get("air_gap"):
+                    self.air_gap(kwargs["air_gap"])
+            for Destination, Volume in zip(Destinations, Volumes):
+                self.dispense(Volume, Destination, Rate)
+                if kwargs.get("mix_after"):
+                    self.mix(kwargs["mix_after"][0], kwargs["mix_after"][1], Destination, Rate)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip()
+            if kwargs.get("blow_out") or kwargs.get("disposal_volume"):
+                self.blow_out()
+            if New_Tip == "always":
+                Finish_Tip()
+        if New_Tip == "once":
+            Finish_Tip()
+        return self
+
+    def transfer(self, volume, source, dest, **kwargs):
+        Sources = _As_List(source)
+        Destinations = _As_List(dest)
+        Count = max(len(Sources), len(Destinations))
+        Sources = Sources * Count if len(Sources) == 1 else Sources
+        Destinations = Destinations * Count if len(Destinations) == 1 else Destinations
+        Volumes = _As_List(volume) * Count if not isinstance(volume, (list, tuple)) else list(volume)
+        Capacity = self._Tip_Capacity() - (kwargs["air_gap"] if kwargs.get("air_gap") else 0)
+        Steps = []
+        for Source, Destination, Volume in zip(Sources, Destinations, Volumes):
+            Parts = max(1, -(-Volume // Capacity))
+            Steps += [([Source], [Destination], [Volume / Parts])] * int(Parts)
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = 0))
+
+    def distribute(self, volume, source, dest, **kwargs):
+        Destinations = _As_List(dest)
+        Volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(Destinations)
+        Disposal = kwargs.get("disposal_volume", self._Pipette.min_volume)
+        Steps = []
+        for Destination, Volume in zip(Destinations, Volumes):
+            if not Steps or sum(Steps[-1][2]) + Volume + Disposal > self._Tip_Capacity():
+                Steps.append(([source], [], []))
+            Steps[-1][1].append(Destination)
+            Steps[-1][2].append(Volume)
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = Disposal))
+
+    def consolidate(self, volume, source, dest, **kwargs):
+        Sources = _As_List(source)
+        Volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(Sources)
+        Steps = []
+        for Source, Volume in zip(Sources, Volumes):
+            if not Steps or sum(Steps[-1][2]) + Volume > self._Tip_Capacity():
+                Steps.append(([], [dest], [0]))
+            Steps[-1][0].append(Source)
+            Steps[-1][2][0] += Volume
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = 0))
+
+
+class Estimating_Module:
+    def __init__(self, Protocol, Module):
+        self._Protocol = Protocol
+        self._Module = Module
+        self.Block = 25     ## Modelled temperatures (°C)
+        self.Lid = 25
+        self.Heater_Task = None
+
+    def __getattr__(self, Name):
+        ## Loading labware and the module's properties come from the loaded module.
+        return getattr(self._Module, Name)
+
+    def __str__(self):
+        ## For the move_labware pauses, e.g. "magneticModuleV1 in slot 4".
+        return self._Module.model + " in slot " + str(self._Module.parent)
+
+    def _Task(self, Seconds):
+        return {"end": self._Protocol.Estimate["clock"] + Seconds}
+
+    ## Magnetic module
+    def engage(self, height = None, offset = None, height_from_base = None):
+        self._Protocol.Add(Timing["magnet"])
+
+    def disengage(self):
+        self._Protocol.Add(Timing["magnet"])
+
+    ## Temperature module and heater-shaker heating
+    def _Temperature_Seconds(self, Celsius):
+        Rate = Temperature_Module_Rates["heating" if Celsius >= self.Block else "cooling"]
+        Seconds = abs(Celsius - self.Block) / Rate
+        self.Block = Celsius
+        return Seconds
+
+    def set_temperature(self, celsius):
+        self._Protocol.Add(self._Temperature_Seconds(celsius))
+
+    def start_set_temperature(self, celsius):
+        return self._Task(self._Temperature_Seconds(celsius))
+
+    def set_and_wait_for_temperature(self, celsius):
+        self.set_temperature(celsius)
+
+    def set_target_temperature(self, celsius):
+        self.Heater_Task = self._Task(self._Temperature_Seconds(celsius))
+
+    def wait_for_temperature(self):
+        if self.Heater_Task is not None:
+            self._Protocol.wait_for_tasks([self.Heater_Task])
+
+    def set_and_wait_for_shake_speed(self, rpm):
+        self._Protocol.Add(Timing["shake_ramp"])
+
+    def open_labware_latch(self):
+        self._Protocol.Add(Timing["latch"])
+
+    def close_labware_latch(self):
+        self._Protocol.Add(Timing["latch"])
+
+    def deactivate_heater(self):
+        self.Block = 25
+
+    def deactivate_shaker(self):
+        self._Protocol.Add(Timing["shake_ramp"])
+
+    ## Thermocycler
+    def open_lid(self):
+        self._Protocol.Add(Timing["lid"])
+
+    def close_lid(self):
+        self._Protocol.Add(Timing["lid"])
+
+    def _Block_Seconds(self, Temperature, Hold_Seconds):
+        Seconds = Block_Ramp_Seconds(self._Module.model, self.Block, Temperature) + Hold_Seconds
+        self.Block = Temperature
+        return Seconds
+
+    def set_block_temperature(self, temperature, hold_time_seconds = None, hold_time_minutes = None, ramp_rate = None, block_max_volume = None):
+        self._Protocol.Add(self._Block_Seconds(temperature, (hold_time_seconds or 0) + 60 * (hold_time_minutes or 0)))
+
+    def start_set_block_temperature(self, temperature, ramp_rate = None, block_max_volume = None):
+        return self._Task(self._Block_Seconds(temperature, 0))
+
+    def _Lid_Seconds(self, Temperature):
+        Seconds = Lid_Ramp_Seconds(self._Module.model, self.Lid, Temperature)
+        self.Lid = Temperature
+        return Seconds
+
+    def set_lid_temperature(self, temperature):
+        self._Protocol.Add(self._Lid_Seconds(temperature))
+
+    def start_set_lid_temperature(self, temperature):
+        return self._Task(self._Lid_Seconds(temperature))
+
+    def execute_profile(self, steps, repetitions, block_max_volume = None):
+        for Repetition in range(repetitions):
+            for Step in steps:
+                self._Protocol.Add(self._Block_Seconds(Step["temperature"], Step.get("hold_time_seconds", 0) + 60 * Step.get("hold_time_minutes", 0)))
+
+    def deactivate_lid(self):
+        self.Lid = 25
+
+    def deactivate_block(self):
+        self.Block = 25
+
+    def deactivate(self):
+        self.Block = 25
+        self.Lid = 25
+
+    @property
+    def block_temperature(self):
+        return self.Block
+
+
+def Start_Run_Estimate(Protocol):
+    ## Returns the wrapped protocol context to run the protocol on. Load the pipettes and modules after this.
+    Protocol.comment("Run time estimate: nothing is moved in this run")
+    return Estimating_Protocol(Protocol)
+
+
+def Finish_Run_Estimate(Protocol):
+    ## Prints the estimated time per stage, the operator pauses and the total through the protocol context.
+    Estimate = Protocol.Estimate
+    Stages = Estimate["stages"] + [[None, Estimate["clock"]]]
+    Real = Protocol._Protocol
+    Pauses = Estimate["pauses"]
+    if Pauses and Pauses[-1][0] == Estimate["clock"] and Pauses[-1][1].startswith("STATUS:"):
+        Pauses = Pauses[:-1] ## The closing pause ("STATUS: Protocol Completed.") waits for no operator action
+    Real.comment("Run time estimate: " + _Clock(Estimate["clock"]) + " (h:mm:ss) of robot time, " + str(len(Pauses)) + " operator pause(s)")
+    for Stage, Next in zip(Stages[:-1], Stages[1:]):
+        if Next[1] > Stage[1]: ## Stages without robot time (e.g. the last status) are left out
+            Real.comment("Run time estimate: " + Stage[0] + " - starts at " + _Clock(Stage[1]) + ", takes " + _Clock(Next[1] - Stage[1]))
+    for Clock, Message in Pauses:
+        Real.comment("Run time estimate: pause at " + _Clock(Clock) + " - " + Message)
+#### End shared: run_estimator ####
+
+
 #### User Input Parameters ###
 def add_parameters(parameters):
 
@@ -81,6 +1568,46 @@ def add_parameters(parameters):
         maximum = 100
     )
 
+    ## Ethanol multi-dispense
+    parameters.add_bool(
+        variable_name = "ethanol_multi_dispense",
+        display_name = "Ethanol Multi-Dispense",
+        description = "If true, ethanol goes to 2 columns per aspiration (300 µL tips in slot 11) for washes up to 140 µL.",
+        default = False
+    )
+
+    ## Two plates
+    parameters.add_bool(
+        variable_name = "two_plates",
+        display_name = "Two Plates (Interleaved)",
+        description = "If true, two plates of up to 48 samples each (sample count per plate); the 2nd in slot 11.",
+        default = False
+    )
+
+    ## Heater-Shaker
+    parameters.add_bool(
+        variable_name = "heater_shaker",
+        display_name = "Heater-Shaker Mixing",
+        description = "If true, beads and elution buffer are mixed on a Heater-Shaker in slot 10 (manual plate moves).",
+        default = False
+    )
+
+    ## Plate states - sample wells and volumes kept on the robot from run to run
+    parameters.add_bool(
+        variable_name = "plate_state",
+        display_name = "Plate states",
+        description = "If true, the Purified library plate state is written from the Covaris plate state(s).",
+        default = False
+    )
+
+    ## Run time estimate
+    parameters.add_bool(
+        variable_name = "estimate_run_time",
+        display_name = "Estimate run time only",
+        description = "If true, nothing is moved: the run prints the estimated time per stage and of each pause.",
+        default = False
+    )
+
     # ## Elution On-Deck Incubation
     # parameters.add_bool(
     #     variable_name = "elution_incubation",
@@ -117,16 +1644,54 @@ def run(protocol: protocol_api.ProtocolContext):
     Incubation_Time = protocol.params.incubation_time
     Ethanol_Volume = protocol.params.ethanol_volume
     Elution_Volume = protocol.params.elution_volume
+    Ethanol_Multi_Dispense = protocol.params.ethanol_multi_dispense
+    Heater_Shaker_Mode = protocol.params.heater_shaker
+    Two_Plates = protocol.params.two_plates
+
+    ## The 300 µL tips for the ethanol multi-dispense are in slot 11, which the 8-channel cannot reach next to the Heater-Shaker.
+    if Heater_Shaker_Mode == True and Ethanol_Multi_Dispense == True:
+        raise ValueError("Ethanol multi-dispense cannot be combined with the Heater-Shaker: its 300 µL tips in slot 11 are next to the Heater-Shaker. Turn one of them off.")
+
+    ## Two plates share the tips of one plate (the wash racks column by column) and the output plate, and the 2nd plate takes slot 11.
+    if Two_Plates == True and protocol.params.sample_count > 48:
+        raise ValueError("Two-plate runs take up to 48 samples per plate (sample count per plate), not " + str(protocol.params.sample_count) + ".")
+    if Two_Plates == True and (Heater_Shaker_Mode == True or Ethanol_Multi_Dispense == True or On_Deck_Incubation == False):
+        raise ValueError("Two-plate runs incubate the beads on deck and use slot 11 for the 2nd plate: turn off the Heater-Shaker and ethanol multi-dispense, and turn on the on-deck incubation.")
    
+    #### Run time estimate ####
+    ## Dry run: nothing is moved, the run prints its estimated time per stage and when the operator pauses come.
+    if protocol.params.estimate_run_time == True:
+        protocol = Start_Run_Estimate(protocol)
+
+
     #### LABWARE SETUP ####
     ## Smart labware
     magnet_module = protocol.load_module('magnetic module',4)
 
-    ## Work plates
-    Library_plate = magnet_module.load_labware(protocol.params.input_plate_type) ## Input plate
-    
-    ## Output plate decide from user input. Standard format is PCR plate
-    Purified_plate = protocol.load_labware(protocol.params.output_plate_type,10) # Output plate
+    ## Work plates. Heater-Shaker mode: the input plate starts on the Heater-Shaker in slot 10 and is moved by hand between
+    ## it and the magnet; the output plate goes to slot 9 and slot 11 (next to the Heater-Shaker) stays empty.
+    if Heater_Shaker_Mode == True:
+        heater_shaker, hs_location = Load_Heater_Shaker(protocol, 10, protocol.params.input_plate_type)
+        Library_plate = hs_location.load_labware(protocol.params.input_plate_type) ## Input plate
+        Purified_plate = protocol.load_labware(protocol.params.output_plate_type,9) # Output plate
+    else:
+        Library_plate = magnet_module.load_labware(protocol.params.input_plate_type) ## Input plate
+
+        ## Output plate decide from user input. Standard format is PCR plate
+        Purified_plate = protocol.load_labware(protocol.params.output_plate_type,10) # Output plate
+    if Two_Plates == True:
+        Library_plate_2 = protocol.load_labware(protocol.params.input_plate_type,11) ## 2nd input plate; moved to the magnet when the 1st plate is off
+
+    ## Plate states - the samples of the Covaris plate go to the same wells of the purified plate; those of the 2nd plate
+    ## ("Covaris plate 2") to its columns 7-12.
+    if protocol.params.plate_state == True:
+        Sample_States = [Input_Plate_State(protocol, "Covaris plate", Col_Number)]
+        if Two_Plates == True:
+            Sample_States.append(Input_Plate_State(protocol, "Covaris plate 2", Col_Number))
+        Purified_State = Plate_State("Purified library", protocol.params.output_plate_type, Sample_States[0].Project)
+        for Offset, Sample_State in zip([0, 6], Sample_States):
+            for Well_Name in Sample_State.Wells():
+                Purified_State.Set(Well_Name[0] + str(int(Well_Name[1:]) + Offset), Sample_State.Sample[Well_Index(Well_Name)], Elution_Volume)
 
     ## Purification reservoir and its content.
     Reservoir = protocol.load_labware('deepwellreservoir_12channel_21000ul',1) # Custom labware definition for the 22 mL reservoir
@@ -144,7 +1709,6 @@ def run(protocol: protocol_api.ProtocolContext):
     Waste2 = Reservoir['A11'] # 1st ethanol wash waste
     Waste3 = Reservoir['A10'] # 2nd ethanol wash waste
 
-
     ## Tip racks
     tiprack_10_1 = protocol.load_labware('opentrons_96_filtertiprack_10ul',6)
     tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',7)
@@ -152,19 +1716,23 @@ def run(protocol: protocol_api.ProtocolContext):
     tiprack_200_3 = protocol.load_labware('opentrons_96_filtertiprack_200ul',2)
     tiprack_200_4 = protocol.load_labware('opentrons_96_filtertiprack_200ul',3)
     tiprack_200_5 = protocol.load_labware('opentrons_96_filtertiprack_200ul',8)
-    tiprack_200_6 = protocol.load_labware('opentrons_96_filtertiprack_200ul',9)
+    tipracks_200 = [tiprack_200_1,tiprack_200_2,tiprack_200_3,tiprack_200_4,tiprack_200_5]
+    if Heater_Shaker_Mode == False: # Slot 9 holds the output plate in Heater-Shaker mode, where the EBT buffer is added with one set of tips
+        tiprack_200_6 = protocol.load_labware('opentrons_96_filtertiprack_200ul',9)
+        tipracks_200.append(tiprack_200_6)
+    if Two_Plates == True: # The wash racks are picked from column by column for each plate
+        tipracks_200 = [tiprack_200_1,tiprack_200_2,tiprack_200_5,tiprack_200_6]
+    if Ethanol_Multi_Dispense == True:
+        tiprack_300_1 = protocol.load_labware('opentrons_96_tiprack_300ul',11) # Ethanol addition only (column 1 for the 1st wash, column 2 for the 2nd)
 
 
     #### PIPETTE SETUP ####
     ## Loading pipettes
-    m200 = protocol.load_instrument('p300_multi_gen2', mount='left', tip_racks=([tiprack_200_1,tiprack_200_2,tiprack_200_3,tiprack_200_4,tiprack_200_5,tiprack_200_6]))
+    m200 = protocol.load_instrument('p300_multi_gen2', mount='left', tip_racks=tipracks_200)
     m20 = protocol.load_instrument('p20_multi_gen2', mount='right', tip_racks=([tiprack_10_1]))
 
-
-    #### Beads drying time (seconds) ####
-    ## Different drying times - Sat from the last removal of the first column. Total drying time is estimated to 4 mins 55 seconds (23s per pipetting cycle)
-    BeadsTime = (295, 272, 249, 226, 203, 180, 157, 134, 111, 88, 65, 42)
-    BeadsTime = BeadsTime[(Col_Number-1)] # Selecting the relevant drying time
+    ## Tips are taken from fixed rack positions: the racks are recorded as unknown in the tip inventory of the other protocols
+    Mark_Tip_Racks_Unknown(protocol, "BEST-Purification")
 
 
     #### Selecting Reservoir Ethanol height ####
@@ -173,6 +1741,45 @@ def run(protocol: protocol_api.ProtocolContext):
     Ethanol_Height = Ethanol_Height[pos:] # Removes highest, unused heights.
 
 
+    #### Bead clean-ups ####
+    ## The BEST clean-up profile: 75 µL beads, washes on the magnet from one set of tips per wash (the wash racks in slot 2
+    ## and 3, which remove the ethanol again), and the last ethanol removal with the p20. In Heater-Shaker mode, with slot 9
+    ## holding the output plate, the tips that add the beads (slot 7) also remove the supernatant of their column.
+    ## The 2nd plate has its own ethanol (A2, A5) and waste (A9, A8, A7) wells and shares the beads and EBT buffer; its wash
+    ## tips and eluates take columns 7-12 of the wash tip racks and the output plate.
+    Profile = Cleanup_Profile("BEST")
+    Deck = {"ethanol_tips": (tiprack_200_3, tiprack_200_4), "residual_pipette": m20}
+    if Heater_Shaker_Mode == True:
+        Deck.update(heater_shaker = heater_shaker, hs_location = hs_location, bead_tips = tiprack_200_1, ebt_tips = tiprack_200_5.wells()[0])
+    if Ethanol_Multi_Dispense == True:
+        Deck["multi_dispense_tips"] = tiprack_300_1
+    Plates = [New_Cleanup(Profile, m200, Library_plate, magnet_module, Col_Number, Beads, (Ethanol1, Ethanol2), Ebt, (Waste1, Waste2, Waste3), Purified_plate, Ethanol_Height, **Deck)]
+    Plates[0]["on_magnet"] = True
+    if Two_Plates == True:
+        Plates[0]["name"] = "Plate 1 - "
+        Plates.append(New_Cleanup(Profile, m200, Library_plate_2, magnet_module, Col_Number, Beads, (Reservoir['A2'], Reservoir['A5']), Ebt,
+                                  (Reservoir['A9'], Reservoir['A8'], Reservoir['A7']), Purified_plate, Ethanol_Height, name = "Plate 2 - ", offset = 6, **Deck))
+        Plates[1]["on_magnet"] = False
+
+
+    #### Plate stages ####
+    ## Bead binding, washes, elution buffer and eluate transfer per plate. With two plates the waits (bead incubation, the
+    ## off-deck elution incubation) are scheduled, and the robot works on the other plate meanwhile; the plates take turns
+    ## on the magnet and are moved by hand. A plate whose wait is over goes next: the other plate makes way after its bead
+    ## binding, but not from its supernatant removal to its elution buffer (the pellet would sit uncovered off the deck), so
+    ## one plate's washes run while the other plate's elution incubates. Robot time is estimated at 23 s per pipetting
+    ## cycle, as for the drying times.
+    Cycle = 23
+    Drying = Profile["dry_seconds"] - Profile["dry_column_credit"]*(Col_Number - 1)
+    Stages = []
+    for Index in range(len(Plates)):
+        Stages += [Plate_Stage(Index, "beads", Col_Number*Cycle, Wait = 60*Incubation_Time if Two_Plates == True else 0, Magnet = Index == 0, Park = True),
+                   Plate_Stage(Index, "supernatant", 300 + Col_Number*Cycle, Magnet = True),
+                   Plate_Stage(Index, "wash", 5*Col_Number*Cycle + Drying, Magnet = True),
+                   Plate_Stage(Index, "ebt", Col_Number*Cycle, Wait = 600 if Two_Plates == True else 0, Magnet = True, Release = Two_Plates),
+                   Plate_Stage(Index, "eluate", 300 + Col_Number*Cycle, Magnet = True, Release = Two_Plates)]
+    Schedule = New_Plate_Schedule(protocol, Stages)
+
 
     ############################### Lab Work Protocol ###############################
     ## The instructions for the robot to execute.
@@ -180,127 +1787,52 @@ def run(protocol: protocol_api.ProtocolContext):
     protocol.set_rail_lights(True)
     magnet_module.disengage()
 
+    while True:
+        Stage = Next_Plate_Stage(Schedule) ## Waits for the time left of the plate's incubation
+        if Stage is None:
+            break
+        Plate = Plates[Stage["plate"]] ## The clean-up of the plate of this stage
+        if Stage["move_off"] is not None: ## The plate on the magnet makes way, and comes back for its next stage
+            protocol.move_labware(Plates[Stage["move_off"]]["plate"], protocol_api.OFF_DECK, use_gripper = False)
+            Plates[Stage["move_off"]]["on_magnet"] = False
+        if Two_Plates == True and Stage["magnet"] == True and Plate["on_magnet"] == False:
+            protocol.move_labware(Plate["plate"], magnet_module, use_gripper = False)
+            Plate["on_magnet"] = True
 
-    ## Addition of Magnetic beads - slowed pipette included.
-    protocol.comment("STATUS: Beads Transfer Begun")
-    for i in range(Col_Number):
-        Column = i*8 #Gives the index of the first well in the column
-        m200.pick_up_tip()
-        m200.move_to(location = Beads.top())
-        m200.move_to(location = Beads.bottom(), speed = 40)
-        m200.mix(repetitions = 5, volume = 75, location = Beads.bottom())
-        m200.aspirate(volume = 75, location = Beads.bottom(), rate = 0.5)
-        protocol.delay(5)
-
-        m200.move_to(location = Beads.top(), speed = 10)
-        m200.dispense(volume = 75, location = Library_plate.wells()[Column])
-        m200.mix(repetitions = 6, volume = 90, location = Library_plate.wells()[Column])
-        protocol.delay(5)
-        m200.move_to(location = Library_plate.wells()[Column].top(), speed = 40)
-        m200.return_tip()
-
-    ## Incubation at room temperature with set temperature
-    
-    if On_Deck_Incubation == True:
-        protocol.comment("STATUS: On-Deck Beads Incubation begun. Plate is incubating for "+ str(Incubation_Time) +"mins")
-        protocol.delay(minutes = Incubation_Time)
-    elif On_Deck_Incubation == False:
-        protocol.pause("ACTION: Seal the Library plate. Spin it down. Run the incunation as intended. You noted "+ str(Incubation_Time) +"mins as you incubation time")
-
-
-    ## Engaging magnetic module. 5 mins wait for beads attraction
-    magnet_module.engage(height_from_base = 10)
-    protocol.delay(minutes = 5)
-
-    ## Discarding supernatant.
-    protocol.comment("STATUS: Discarding Supernatant")
-    for i in range(Col_Number):
-        Column = i*8 #Gives the index of the first well in the column
-        m200.pick_up_tip()
-        m200.transfer(volume = 150, source = Library_plate.wells()[Column].bottom(z = 1.2), dest = Waste1.top(), new_tip = 'never', rate=0.5) #
-        m200.air_gap(40,20)
-        m200.return_tip()
-
-    ## Double ethanol washing
-    protocol.comment("STATUS: Ethanol Wash Begun")
-    for k in range(2): # Double wash
-        ## Setting up the wash variables
-        if k == 0:
-            Ethanol_Tips = tiprack_200_3
-            Ethanol = Ethanol1
-            Waste = Waste2
-            protocol.comment("STATUS: First Wash Begun")
-        if k == 1:
-            Ethanol_Tips = tiprack_200_4
-            Ethanol = Ethanol2
-            Waste = Waste3
-            protocol.comment("STATUS: Second Wash Begun")
-
-        ## Adding Ethanol.
-        m200.pick_up_tip(Ethanol_Tips.wells_by_name()['A1']) # Using 1 set of tips for all rows
-        m200.mix(repetitions = 3, volume = 200, location = Ethanol.bottom(z = Ethanol_Height[(len(Ethanol_Height)-2)])) # One round of mixing
-
-        for i in range(Col_Number):
-            Column = i*8 # Gives the index for the first well in the column
-            m200.aspirate(volume = Ethanol_Volume, location = Ethanol.bottom(z = Ethanol_Height[i]), rate = 0.7) 
-            m200.dispense(volume = Ethanol_Volume, location = Library_plate.wells()[Column].top(z = 1.2), rate = 1) # Dispenses ethanol from 1.2 mm above the top of the well.
-        m200.blow_out(location = Waste) # Blow out to remove potential droplets before returning.
-        m200.return_tip()
-
-        ## Removing Ethanol - reusing the tips from above
-        for i in range(Col_Number):
-            Column = i*8 # Gives the index for the first well in the column
-            m200.pick_up_tip(Ethanol_Tips.wells()[Column])
-            m200.aspirate(volume = Ethanol_Volume, location = Library_plate.wells()[Column].bottom(z = 1.2), rate = 0.5)
-            m200.move_to(location = Library_plate.wells()[Column].top(z=2), speed =100)
-            m200.dispense(volume = Ethanol_Volume, location = Waste.top(), rate = 1)
-            m200.air_gap(70, 20) #Take in excess/outside droplets to limit cross-contamination.
-            m200.return_tip()
-
-    ## Extra ethanol removal step to remove leftover ethanol before drying beads.
-    for i in range(Col_Number):
-        Column = i*8
-        m20.pick_up_tip()
-        m20.aspirate(volume = 10, location = Library_plate.wells()[Column].bottom(z = 0.8), rate = 0.6)
-        m20.return_tip()
-
-
-    ## Drying beads (5 mins)
-    protocol.comment("STATUS: Drying Beads - time autoadjusted based on number of columns")
-    protocol.delay(seconds = BeadsTime) #Times to be verified given m20 step.
-
-    ## Disengaging magnet
-    magnet_module.disengage()
-
-    ## Adding EBT buffer.
-    protocol.comment("STATUS: EBT Buffer Transfer begun")
-    for i in range(Col_Number):
-        Column = i*8 #Gives the index for the first well in the column
-        m200.pick_up_tip()
-        m200.transfer(volume = Elution_Volume, source = Ebt, dest = Library_plate.wells()[Column], rate = 1, trash = False , new_tip = 'never', mix_after = (5,20))
-        protocol.delay(5)
-        m200.move_to(location = Library_plate.wells()[Column].top(), speed = 100)
-        m200.return_tip()
-
-
-    ## Incubation of library plate
-    protocol.pause('ACTION: Seal library plate and spin it down shortly. Incubate the library plate for 10 min at 37*C. Press RESUME, when library plate has been returned (without seal) to the magnet module.')
+        if Stage["name"] == "beads":
+            ## Addition of Magnetic beads - slowed pipette included. Incubation at room temperature.
+            Add_Beads(protocol, Plate)
+            if Two_Plates == True:
+                protocol.comment("STATUS: " + Plate["name"] + "On-Deck Beads Incubation begun. Plate is incubating for "+ str(Incubation_Time) +"mins, while the robot works on the other plate")
+            else:
+                Incubate_Beads(protocol, Plate, Incubation_Time, On_Deck = On_Deck_Incubation)
 
-    ## Engaging Magnet. 5 mins wait for beads withdrawal
-    magnet_module.engage(height_from_base = 10)
-    protocol.delay(minutes = 5)
+        elif Stage["name"] == "supernatant":
+            ## Calibrated wait for beads attraction (library + 75 µL beads, about 125 µL).
+            Remove_Supernatant(protocol, Plate)
 
-    ## Transferring purified library to a new plate (purified plate). Transfer is sat higher to remove all.
-    protocol.comment("STATUS: Transfer of Purified Library")
-    for i in range(Col_Number):
-        Column = i*8 #Gives the index for the first well in the column
-        m200.transfer(volume = Elution_Volume, source = Library_plate.wells()[Column].bottom(z = 1.0), dest = Purified_plate.wells()[Column], new_tip = 'always', trash = False, rate = 0.7)
+        elif Stage["name"] == "wash":
+            ## Double ethanol washing, the extra ethanol removal and drying - time autoadjusted based on number of columns.
+            Wash_Beads(protocol, Plate, Ethanol_Volume)
 
+        elif Stage["name"] == "ebt":
+            ## Incubation for 10 min at 37*C. With two plates it is taken off the deck, and returned to the magnet when asked.
+            Add_Elution_Buffer(protocol, Plate, Elution_Volume, Pause = Two_Plates == False)
 
-    ## Deactivating magnet module
-    magnet_module.disengage()
+        elif Stage["name"] == "eluate":
+            ## Purified library to the plate's own columns of the output plate. Transfer is sat higher to remove all.
+            Transfer_Eluate(protocol, Plate, Elution_Volume)
 
+        Finish_Plate_Stage(Schedule, Stage)
+        if Stage["release"] == True and any(Schedule["queues"].values()):
+            protocol.move_labware(Plate["plate"], protocol_api.OFF_DECK, use_gripper = False)
+            Plate["on_magnet"] = False
 
     ## Protocol finished
+    if protocol.params.plate_state == True:
+        Write_Plate_State(protocol, Purified_State)
     protocol.set_rail_lights(False)
     protocol.comment("STATUS: Protocol Completed.")
+
+    if protocol.params.estimate_run_time == True:
+        Finish_Run_Estimate(protocol)
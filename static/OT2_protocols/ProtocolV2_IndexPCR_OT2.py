@@ -8,9 +8,1135 @@
 
 #### Package loading ####
 from opentrons import protocol_api
+from opentrons.protocol_api import ALL
 from math import *
 
 
+#### Shared: liquid_classes ####
+## Copied from static/OT2_shared/liquid_classes.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+############################
+### Liquid class library ###
+############################
+
+## Shared pipetting profiles for the EHI protocols. Each liquid class holds the tuned rates, delays, speeds and air gap
+## for one liquid, so the protocols refer to a class by name instead of carrying their own magic numbers.
+## Rates are fractions of the pipette's default flow rate. Flow rates (µL/s) are absolute and overrule the default flow rate.
+## Speeds are gantry speeds in mm/s. Delays are in seconds. None means "use the pipette default" / "skip this step".
+##
+## Submerge speed: speed from the top of the source well down to the aspiration height.
+## Withdraw speed: speed from the aspiration height back to the top of the source well.
+## Withdraw height: mm above the top of the source well the tip withdraws to (None is the top itself).
+## Exit speed: speed from the dispense location back to the top of the destination well.
+
+Liquid_Classes = {
+    ## Aqueous, non-viscous liquids.
+    "Water": {
+        "aspirate_rate": 1.0, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    "DNA_Sample": {
+        "aspirate_rate": 0.8, "dispense_rate": 0.8, "mix_rate": 0.8,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    ## Small (2-10 µL) transfers of libraries and primers into PCR plates.
+    "Low_Volume": {
+        "aspirate_rate": 0.6, "dispense_rate": 0.6, "mix_rate": 0.6,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    "Master_Mix": {
+        "aspirate_rate": 0.6, "dispense_rate": 0.6, "mix_rate": 0.6,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+
+    ## PEG4000 ligation mix is viscous - slow flow, slow movements and delays to limit adhesion on the outside of the tips.
+    "Ligation_Mix": {
+        "aspirate_rate": 1.0, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": 3, "dispense_flow_rate": 3,
+        "submerge_speed": 3, "withdraw_speed": 3, "withdraw_height": None, "exit_speed": 3,
+        "aspirate_delay": 10, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+
+    ## Magnetic beads for library clean-ups (BEST and Index PCR purification).
+    "Beads": {
+        "aspirate_rate": 0.5, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": 40, "withdraw_speed": 10, "withdraw_height": None, "exit_speed": 40,
+        "aspirate_delay": 5, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+    ## Magnetic beads mixed into sample lysate (DREX) - larger volumes in deepwell plates.
+    "Lysate_Beads": {
+        "aspirate_rate": 0.5, "dispense_rate": 0.8, "mix_rate": 1.2,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": 50, "withdraw_speed": 40, "withdraw_height": None, "exit_speed": 50,
+        "aspirate_delay": 5, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+
+    ## Bead supernatant removal. Slow aspiration to leave the bead pellet; air gap to keep droplets in the tip.
+    "Supernatant": {
+        "aspirate_rate": 0.5, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 40, "air_gap_height": 20},
+    "Lysate_Supernatant": {
+        "aspirate_rate": 0.5, "dispense_rate": 0.6, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 5, "air_gap": 20, "air_gap_height": None},
+
+    ## 80% ethanol. Volatile, so it is aspirated slowly from the reservoir and resuspension mixes are fast.
+    "Ethanol": {
+        "aspirate_rate": 0.7, "dispense_rate": 1.0, "mix_rate": 1.3,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    ## Ethanol removal from the bead pellet - fast withdrawal clear of the well, large air gap against dripping ethanol.
+    "Ethanol_Supernatant": {
+        "aspirate_rate": 0.5, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": 100, "withdraw_height": 2, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 70, "air_gap_height": 20},
+
+    ## Elution buffer and the final eluate.
+    "EBT": {
+        "aspirate_rate": 1.0, "dispense_rate": 1.0, "mix_rate": 1.0,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": 100,
+        "aspirate_delay": 0, "dispense_delay": 5, "air_gap": 0, "air_gap_height": None},
+    "Eluate": {
+        "aspirate_rate": 0.7, "dispense_rate": 0.7, "mix_rate": 0.7,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+    "Deepwell_Eluate": {
+        "aspirate_rate": 0.3, "dispense_rate": 0.3, "mix_rate": 0.3,
+        "aspirate_flow_rate": None, "dispense_flow_rate": None,
+        "submerge_speed": None, "withdraw_speed": None, "withdraw_height": None, "exit_speed": None,
+        "aspirate_delay": 0, "dispense_delay": 0, "air_gap": 0, "air_gap_height": None},
+}
+
+
+#### Liquid class lookup ####
+def Liquid_Class(Name, **Overrides):
+    ## Returns a copy of the named liquid class. Overrides are for documented, protocol-specific exceptions only.
+    if Name not in Liquid_Classes:
+        raise KeyError("Unknown liquid class '" + str(Name) + "'. Known classes: " + ", ".join(sorted(Liquid_Classes)))
+    Profile = dict(Liquid_Classes[Name])
+    for Key in Overrides:
+        if Key not in Profile:
+            raise KeyError("Unknown liquid class setting '" + str(Key) + "' for liquid class '" + str(Name) + "'")
+    Profile.update(Overrides)
+    Profile["name"] = Name
+    return Profile
+
+
+#### Applying liquid classes ####
+def _Well_Top(Location, Z = 0):
+    ## Top of the well (Z mm above it) for either a well or a location within a well.
+    if hasattr(Location, "top"):
+        return Location.top(z = Z)
+    return Location.labware.as_well().top(z = Z)
+
+def Set_Flow_Rates(Pipette, Profile):
+    ## Sets the absolute flow rates of a liquid class (if any). Returns the previous flow rates for Restore_Flow_Rates.
+    Previous = (Pipette.flow_rate.aspirate, Pipette.flow_rate.dispense)
+    if Profile["aspirate_flow_rate"] is not None:
+        Pipette.flow_rate.aspirate = Profile["aspirate_flow_rate"]
+    if Profile["dispense_flow_rate"] is not None:
+        Pipette.flow_rate.dispense = Profile["dispense_flow_rate"]
+    return Previous
+
+def Restore_Flow_Rates(Pipette, Previous):
+    Pipette.flow_rate.aspirate = Previous[0]
+    Pipette.flow_rate.dispense = Previous[1]
+
+def Aspirate_Liquid(Protocol, Pipette, Volume, Location, Profile, Mix = None):
+    ## Submerge (slowly if set), optional pre-mix, aspirate, delay and withdraw (slowly if set) to the top of the source.
+    if Profile["submerge_speed"] is not None:
+        Pipette.move_to(location = _Well_Top(Location))
+        Pipette.move_to(location = Location, speed = Profile["submerge_speed"])
+    if Mix is not None:
+        Pipette.mix(repetitions = Mix[0], volume = Mix[1], location = Location, rate = Profile["mix_rate"])
+    Pipette.aspirate(volume = Volume, location = Location, rate = Profile["aspirate_rate"])
+    if Profile["aspirate_delay"]:
+        Protocol.delay(seconds = Profile["aspirate_delay"])
+    if Profile["withdraw_speed"] is not None:
+        Pipette.move_to(location = _Well_Top(Location, Profile["withdraw_height"] or 0), speed = Profile["withdraw_speed"])
+
+def Dispense_Liquid(Protocol, Pipette, Volume, Location, Profile, Mix = None, Mix_Location = None):
+    ## Dispense, optional post-mix (at the dispense location unless Mix_Location is given), delay and leave the destination (slowly if set).
+    Pipette.dispense(volume = Volume, location = Location, rate = Profile["dispense_rate"])
+    if Mix is not None:
+        if Mix_Location is None:
+            Mix_Location = Location
+        Pipette.mix(repetitions = Mix[0], volume = Mix[1], location = Mix_Location, rate = Profile["mix_rate"])
+    if Profile["dispense_delay"]:
+        Protocol.delay(seconds = Profile["dispense_delay"])
+    if Profile["exit_speed"] is not None:
+        Pipette.move_to(location = _Well_Top(Location), speed = Profile["exit_speed"])
+
+def Air_Gap(Pipette, Profile):
+    ## Takes in the air gap of the liquid class (if any) to keep droplets inside the tip.
+    if Profile["air_gap"]:
+        if Profile["air_gap_height"] is None:
+            Pipette.air_gap(volume = Profile["air_gap"])
+        else:
+            Pipette.air_gap(volume = Profile["air_gap"], height = Profile["air_gap_height"])
+#### End shared: liquid_classes ####
+
+
+#### Shared: column_planner ####
+## Copied from static/OT2_shared/column_planner.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+######################
+### Column planner ###
+######################
+
+## Groups per-well work into column transfers for an 8-channel pipette. A column is done with the multichannel when all
+## its wells share the same key (e.g. adaptor concentration) and sit in consecutive rows from row A - a full column, or a
+## partial column picked up with the front nozzles. The remaining wells (mixed columns) are left for single-channel transfers.
+
+Plate_Rows = "ABCDEFGH"
+
+
+def Split_Well_Name(Well_Name):
+    ## "B12" -> ("B", 12)
+    return Well_Name[0].upper(), int(Well_Name[1:])
+
+
+def Plan_Column_Transfers(Well_Keys):
+    ## Well_Keys: {well name: key}. Returns (Column_Transfers, Single_Transfers), both sorted by key and then plate position,
+    ## so the source only changes once per key.
+    ## Column_Transfers: [{"key": key, "column": 1-12, "rows": number of rows from row A, "wells": [well names]}]
+    ## Single_Transfers: [(key, well name)]
+    Columns = {}
+    for Well_Name, Key in Well_Keys.items():
+        Row, Column = Split_Well_Name(Well_Name)
+        Columns.setdefault(Column, {})[Row] = Key
+
+    Column_Transfers = []
+    Single_Transfers = []
+    for Column in sorted(Columns):
+        Rows = Columns[Column]
+        Row_Count = len(Rows)
+        From_Row_A = all(Plate_Rows[i] in Rows for i in range(Row_Count))
+        if Row_Count > 1 and len(set(Rows.values())) == 1 and From_Row_A:
+            Column_Transfers.append({"key": Rows["A"], "column": Column, "rows": Row_Count,
+                                     "wells": [Plate_Rows[i] + str(Column) for i in range(Row_Count)]})
+        else:
+            for Row in sorted(Rows, key = Plate_Rows.index):
+                Single_Transfers.append((Rows[Row], Row + str(Column)))
+
+    Column_Transfers.sort(key = lambda Transfer: (Transfer["key"], Transfer["column"]))
+    Single_Transfers.sort(key = lambda Transfer: (Transfer[0], Split_Well_Name(Transfer[1])[1], Plate_Rows.index(Transfer[1][0])))
+    return Column_Transfers, Single_Transfers
+
+
+def Column_Target(Labware, Column, Rows):
+    ## Well to target with the primary nozzle: A1 for a full column, otherwise the front nozzle (H1) goes to the last row,
+    ## so that the used nozzles cover row A to the last row.
+    if Rows == 8:
+        return Labware.wells_by_name()["A" + str(Column)]
+    return Labware.wells_by_name()[Plate_Rows[Rows-1] + str(Column)]
+
+
+def Configure_Column_Nozzles(Pipette, Rows):
+    ## Full column: all nozzles. Partial column: the front nozzles H1 and up (OT-2 8-channels support 2-7 nozzles from H1).
+    ## One row: the front nozzle H1 alone, for single-well transfers with the multichannel.
+    ## configure_nozzle_layout replaces the pipette's tip racks, so they are passed on again.
+    from opentrons.protocol_api import ALL, PARTIAL_COLUMN, SINGLE
+    if Rows == 8:
+        Pipette.configure_nozzle_layout(style = ALL, tip_racks = Pipette.tip_racks)
+    elif Rows == 1:
+        Pipette.configure_nozzle_layout(style = SINGLE, start = "H1", tip_racks = Pipette.tip_racks)
+    else:
+        Pipette.configure_nozzle_layout(style = PARTIAL_COLUMN, start = "H1", end = Plate_Rows[8-Rows] + "1", tip_racks = Pipette.tip_racks)
+
+
+def Pick_Up_Column_Tips(Pipette, Rows):
+    ## The OT-2 has no automatic tip tracking for partial column layouts, so the tips are chosen here. The front nozzles take
+    ## tips from the bottom of a tip column, leaving the top rows for the next partial pick-up. Columns that are already
+    ## started are used first, so full columns stay available for the full-column steps. Has_Tip comes from the
+    ## run_estimator block.
+    if Rows == 8:
+        Pipette.pick_up_tip()
+        return
+    Started = []
+    Full = []
+    for Rack in Pipette.tip_racks:
+        for Column in Rack.columns():
+            Available = 0
+            while Available < 8 and Has_Tip(Pipette, Column[Available]):
+                Available += 1
+            if Available < Rows or any(Has_Tip(Pipette, Well) for Well in Column[Available:]):
+                continue
+            if Available == 8:
+                Full.append(Column[7])
+            else:
+                Started.append(Column[Available-1])
+    if not Started and not Full:
+        raise RuntimeError("No tip column with " + str(Rows) + " tips left for " + str(Pipette))
+    Pipette.pick_up_tip((Started + Full)[0])
+#### End shared: column_planner ####
+
+
+#### Shared: csv_records ####
+## Copied from static/OT2_shared/csv_records.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+###################
+### CSV records ###
+###################
+
+## Column access to the CSV input of a protocol without pandas, so the robot does not import pandas and numpy to run a
+## protocol (several seconds and most of the memory of a protocol run on the OT-2). Built from the rows of
+## parse_as_csv(): the first row is the header (without the byte order mark of Excel exports), fully blank rows are
+## dropped. Columns are lists of strings in CSV order: Records['WellPosition'][i], len(Records) rows, 'SampleID' in Records.
+## Float and Integer return typed arrays of a column, with Default for empty cells.
+
+class CSV_Records:
+    def __init__(self, Rows):
+        Rows = [Row for Row in Rows if any(str(Value).strip() for Value in Row)]
+        if not Rows:
+            raise ValueError("The CSV file is empty")
+        self.Columns = [str(Name).lstrip("\ufeff").strip() for Name in Rows[0]]
+        self.Data = {Name: [Row[Index] if Index < len(Row) else "" for Row in Rows[1:]] for Index, Name in enumerate(self.Columns)}
+        self.Rows = len(Rows) - 1
+
+    def __len__(self):
+        return self.Rows
+
+    def __contains__(self, Name):
+        return Name in self.Data
+
+    def __getitem__(self, Name):
+        if Name not in self.Data:
+            raise KeyError("The CSV file has no column " + str(Name) + " (columns: " + ", ".join(self.Columns) + ")")
+        return self.Data[Name]
+
+    def __setitem__(self, Name, Values):
+        Values = list(Values)
+        if len(Values) != self.Rows:
+            raise ValueError("Column " + str(Name) + " has " + str(len(Values)) + " values for " + str(self.Rows) + " rows")
+        if Name not in self.Data:
+            self.Columns.append(Name)
+        self.Data[Name] = Values
+
+    def Typed(self, Name, Type, Code, Default = None):
+        ## Column as an array of Code ("d" float, "q" integer). Empty cells become Default; without a Default they are an error.
+        from array import array
+        Values = array(Code)
+        for Row, Value in enumerate(self[Name]):
+            Value = str(Value).strip()
+            if Value == "" and Default is not None:
+                Values.append(Default)
+                continue
+            try:
+                Values.append(Type(Value))
+            except ValueError:
+                raise ValueError("Column " + str(Name) + " has " + repr(Value) + " in data row " + str(Row + 1) + " of the CSV file (header not counted) - expected a number")
+        return Values
+
+    def Float(self, Name, Default = None):
+        return self.Typed(Name, float, "d", Default)
+
+    def Integer(self, Name, Default = None):
+        return self.Typed(Name, lambda Value: int(float(Value)), "q", Default)
+#### End shared: csv_records ####
+
+
+#### Shared: index_mapping ####
+## Copied from static/OT2_shared/index_mapping.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Index mapping ###
+#####################
+
+## Primer transfers from a sample -> index well sheet, so the index set of several index plates can be used in any order
+## without re-racking primers. Each index well holds a unique dual-index primer pair. Sample columns whose wells all take
+## their primers from the same rows of one index column are done as (partial) column transfers with the 8-channel; the
+## remapped wells are done one by one. Needs the column_planner block.
+## Sheet columns: WellPosition (sample well), IndexPlate (1, 2, ...), IndexWell, and optionally i7 and i5 (index names
+## or sequences), which are checked for combinations that occur twice in the pool.
+
+def Index_Map(Records, Index_Plates):
+    ## {sample well: (index plate, index well)} from the CSV records. Fails for repeated sample wells, index wells used for
+    ## two samples, index plates that are not loaded and i7 + i5 combinations that are not unique in the pool.
+    Map = {}
+    Used = {}
+    Combinations = {}
+    for i in range(len(Records)):
+        Sample_Well = str(Records['WellPosition'][i]).strip().upper()
+        Plate = int(Records['IndexPlate'][i] or 1)
+        Index_Well = str(Records['IndexWell'][i]).strip().upper()
+        for Well_Name in (Sample_Well, Index_Well):
+            if len(Well_Name) < 2 or Well_Name[0] not in Plate_Rows or not Well_Name[1:].isdigit() or not 1 <= int(Well_Name[1:]) <= 12:
+                raise ValueError("Well " + repr(Well_Name) + " in the index sheet is not a 96 well plate position")
+        if Sample_Well in Map:
+            raise ValueError("Sample well " + Sample_Well + " is in the index sheet twice")
+        if not 1 <= Plate <= Index_Plates:
+            raise ValueError("Index plate " + str(Plate) + " for " + Sample_Well + " is not loaded (" + str(Index_Plates) + " index plate(s))")
+        if (Plate, Index_Well) in Used:
+            raise ValueError("Index plate " + str(Plate) + " well " + Index_Well + " is used for both " + Used[(Plate, Index_Well)] + " and " + Sample_Well)
+        if 'i7' in Records and 'i5' in Records and (Records['i7'][i] or Records['i5'][i]):
+            Combination = (str(Records['i7'][i]).strip().upper(), str(Records['i5'][i]).strip().upper())
+            if Combination in Combinations:
+                raise ValueError("The index combination " + "+".join(Combination) + " of " + Sample_Well + " is also used for " + Combinations[Combination])
+            Combinations[Combination] = Sample_Well
+        Map[Sample_Well] = (Plate, Index_Well)
+        Used[(Plate, Index_Well)] = Sample_Well
+    return Map
+
+
+def Plan_Primer_Transfers(Map):
+    ## (Column_Transfers, Single_Transfers):
+    ## Column_Transfers: [{"plate", "index_column", "column", "rows"}] - rows A and down of the index column to the same rows.
+    ## Single_Transfers: [{"plate", "index_well", "well"}]
+    Keys = {}
+    for Sample_Well, (Plate, Index_Well) in Map.items():
+        Index_Row, Index_Column = Split_Well_Name(Index_Well)
+        Aligned = Index_Row == Split_Well_Name(Sample_Well)[0]
+        Keys[Sample_Well] = (Plate, Index_Column) if Aligned else (Plate, Index_Column, Index_Row, Sample_Well) ## Remapped wells never share a key
+    Columns, Singles = Plan_Column_Transfers(Keys)
+    ## Full columns first, so they still find full tip columns after the partial pick-ups.
+    Column_Transfers = [{"plate": Transfer["key"][0], "index_column": Transfer["key"][1], "column": Transfer["column"], "rows": Transfer["rows"]}
+                        for Transfer in sorted(Columns, key = lambda Transfer: (-Transfer["rows"], Transfer["key"], Transfer["column"]))]
+    Single_Transfers = sorted(({"plate": Map[Well][0], "index_well": Map[Well][1], "well": Well} for Key, Well in Singles),
+                              key = lambda Transfer: Transfer["plate"])
+    return Column_Transfers, Single_Transfers
+#### End shared: index_mapping ####
+
+
+#### Shared: tip_inventory ####
+## Copied from static/OT2_shared/tip_inventory.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Tip inventory ###
+#####################
+
+## Tips left in the racks on the deck, kept across runs in the robot's user storage, so partly used racks are finished by
+## the next run instead of being replaced. Racks are keyed by deck slot (with the tip rack type, so a rack of another type
+## in the slot counts as fresh). At the start the partly used rack of a pipette goes first and starting_tip is set to its
+## first tip left; at the end the tips left in every rack are written back. While a run is going its racks are recorded
+## as unknown, so an aborted run leaves them to be replaced rather than reused.
+## starting_tip cannot be used with partial nozzle layouts: racks of pipettes that use them (Fresh_Pipettes) are always
+## fresh, and are only recorded at the end. Tips are counted up to the last tip used, so tips skipped by partial pick-ups
+## are not reused. Nothing is written when the protocol is simulated, analysed or estimated. Needs the run_estimator block.
+## The inventory only holds for the protocols that keep it (BEST-Library, CovarisSetup, IndexPCR, PoolCombiner and qPCR).
+## DREX and the bead purifications take their tips from fixed rack positions instead: they record every rack they load
+## as unknown (Mark_Tip_Racks_Unknown), so the next run that continues partly used racks asks for those slots to be
+## replaced. Racks used by hand or by other protocols are not seen: load fresh racks there, or run with fresh racks.
+
+Inventory_File = "/data/user_storage/tip_inventory.json" ## Persistent storage on the OT-2
+
+
+def Read_Tip_Inventory(Path = Inventory_File):
+    ## {slot: {"load_name", "next" (first tip left, None for an empty or unknown rack), "tips_left", "protocol", "updated"}}
+    import json
+    import os
+    if not os.path.exists(Path):
+        return {}
+    with open(Path, encoding = "utf-8") as Handle:
+        return json.load(Handle)["racks"]
+
+
+def _Write_Tip_Inventory(Racks, Path):
+    ## Written to a temporary file first, so a power cut never leaves half a file.
+    import json
+    import os
+    os.makedirs(os.path.dirname(Path), exist_ok = True)
+    with open(Path + ".tmp", "w", encoding = "utf-8") as Handle:
+        json.dump({"racks": Racks}, Handle, indent = 1, sort_keys = True)
+    os.replace(Path + ".tmp", Path)
+
+
+def _Start_Index(Pipette, Rack):
+    ## Index (column-wise) of the pipette's starting tip in the rack, 0 when it starts elsewhere.
+    if Pipette.starting_tip is not None and Pipette.starting_tip.parent == Rack:
+        return Rack.wells().index(Pipette.starting_tip)
+    return 0
+
+
+def Start_Tip_Inventory(Protocol, Protocol_Name, Pipettes, Fresh_Pipettes = (), Mode = "inventory", Tips_Needed = None, Path = Inventory_File):
+    ## Mode "inventory" continues partly used racks, "fresh" takes all racks as fresh and "manual" keeps the starting tips
+    ## set by the protocol. Racks recorded as empty, unknown or beyond the one partly used rack a pipette can continue are to
+    ## be replaced: the run pauses at the start to ask for it. Tips_Needed ({pipette: tips}) is for protocols that load just
+    ## the racks they need - a partly used rack is then only continued when the racks still hold enough tips.
+    ## Returns the state to pass to Finish_Tip_Inventory.
+    from datetime import datetime
+    Racks = Read_Tip_Inventory(Path) if Mode == "inventory" else {}
+    Replace = []
+    for Pipette in list(Pipettes) + list(Fresh_Pipettes):
+        Partial = []
+        Fresh = []
+        for Rack in Pipette.tip_racks:
+            Entry = Racks.get(str(Rack.parent))
+            if Entry is None or Entry["load_name"] != Rack.load_name:
+                Fresh.append(Rack)
+                continue
+            Next = None if Entry["next"] is None else Rack.wells().index(Rack.wells_by_name()[Entry["next"]])
+            if Next is not None and Pipette.channels == 8:
+                Next = -(-Next // 8) * 8 ## Multichannels start at the top of the next full column
+            if Next is None or Next >= len(Rack.wells()) or Pipette in Fresh_Pipettes:
+                Replace.append(str(Rack.parent))
+                Fresh.append(Rack)
+            elif Next == 0:
+                Fresh.append(Rack)
+            else:
+                Partial.append((Next, Rack))
+        if not Partial:
+            continue
+        Partial.sort(key = lambda Item: -Item[0]) ## The rack with the fewest tips left is finished first
+        Next, Rack = Partial[0]
+        if Tips_Needed is not None and Pipette in Tips_Needed and len(Rack.wells()) - Next + sum(len(Other.wells()) for Other in Fresh) < Tips_Needed[Pipette]:
+            Replace.extend(str(Other.parent) for Index, Other in Partial)
+            continue
+        Replace.extend(str(Other.parent) for Index, Other in Partial[1:])
+        Pipette.tip_racks = [Rack] + Fresh + [Other for Index, Other in Partial[1:]]
+        Pipette.starting_tip = Rack.wells()[Next]
+        Protocol.comment("Tip inventory: " + str(Pipette) + " continues the rack in slot " + str(Rack.parent) + " from "
+                         + Rack.wells()[Next].well_name + " (" + str(len(Rack.wells()) - Next) + " tips left)")
+    if Replace:
+        Protocol.pause("Tip inventory: replace the tip racks in slot " + ", ".join(sorted(set(Replace), key = int)) + " with fresh racks, then resume")
+
+    State = {"protocol": Protocol_Name, "pipettes": list(Pipettes) + list(Fresh_Pipettes), "racks": Read_Tip_Inventory(Path), "path": Path}
+    if not Protocol.is_simulating():
+        Started = datetime.now().isoformat(timespec = "seconds")
+        Running = dict(State["racks"])
+        for Pipette in State["pipettes"]:
+            for Rack in Pipette.tip_racks:
+                Running[str(Rack.parent)] = {"load_name": Rack.load_name, "next": None, "tips_left": None, "protocol": Protocol_Name + " (running)", "updated": Started}
+        _Write_Tip_Inventory(Running, Path)
+    return State
+
+
+def Mark_Tip_Racks_Unknown(Protocol, Protocol_Name, Path = Inventory_File):
+    ## For protocols that do not keep the inventory: records every tip rack loaded so far as unknown (to be replaced).
+    ## Written at the start of the run, as an aborted run has used tips too.
+    from datetime import datetime
+    if Protocol.is_simulating():
+        return
+    Racks = Read_Tip_Inventory(Path)
+    Updated = datetime.now().isoformat(timespec = "seconds")
+    for Labware in Protocol.loaded_labwares.values():
+        if Labware.is_tiprack:
+            Racks[str(Labware.parent)] = {"load_name": Labware.load_name, "next": None, "tips_left": None, "protocol": Protocol_Name, "updated": Updated}
+    _Write_Tip_Inventory(Racks, Path)
+
+
+def Finish_Tip_Inventory(Protocol, State):
+    ## Records the tips left in the racks of the pipettes and reports the racks to replace before the next run.
+    from datetime import datetime
+    Racks = dict(State["racks"])
+    Empty = []
+    Updated = datetime.now().isoformat(timespec = "seconds")
+    for Pipette in State["pipettes"]:
+        for Rack in Pipette.tip_racks:
+            Used = [Index for Index, Well in enumerate(Rack.wells()) if not Has_Tip(Pipette, Well)]
+            Next = max([_Start_Index(Pipette, Rack)] + [Index + 1 for Index in Used])
+            Left = len(Rack.wells()) - Next
+            Racks[str(Rack.parent)] = {"load_name": Rack.load_name, "next": Rack.wells()[Next].well_name if Left > 0 else None,
+                                       "tips_left": Left, "protocol": State["protocol"], "updated": Updated}
+            if Left == 0:
+                Empty.append(str(Rack.parent))
+    Summary = ", ".join("slot " + Slot + ": " + str(Racks[Slot]["tips_left"]) for Slot in sorted(Racks, key = int) if Racks[Slot]["tips_left"] is not None)
+    Protocol.comment("Tip inventory - tips left per rack: " + Summary)
+    Protocol.comment("Tip inventory: " + str(len(Empty)) + " fresh rack(s) needed for the next run"
+                     + (" (slot " + ", ".join(sorted(Empty, key = int)) + ")" if Empty else ""))
+    if not Protocol.is_simulating():
+        _Write_Tip_Inventory(Racks, State["path"])
+#### End shared: tip_inventory ####
+
+
+#### Shared: plate_state ####
+## Copied from static/OT2_shared/plate_state.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+###################
+### Plate state ###
+###################
+
+## What the wells of a plate hold when it goes from one run to the next: sample ID, whether the well holds sample, volume
+## (µL) and concentration (ng/µL, 0 when not known). A protocol reads the state of its input plate at the start, so it can
+## skip empty columns and check the volumes it takes without a CSV input, and writes the states of the plates it changed
+## at the end. States are kept in the robot's user storage, one file per plate name (e.g. "Purified library").
+## A state is one fixed record per well of a 96 well plate, in the order of plate.wells() (A1, B1, ... H12), held column
+## by column in arrays (one 96 item list per field in the file), so loading is a single pass over the wells. Nothing is
+## written when the protocol is simulated, analysed or estimated.
+
+State_Directory = "/data/user_storage/plate_state" ## Persistent storage on the OT-2
+State_Format = 1
+Plate_Wells = 96
+
+
+def Well_Index(Well_Name):
+    ## "B3" -> 17, the index of the well in plate.wells()
+    return (int(Well_Name[1:]) - 1) * 8 + "ABCDEFGH".index(Well_Name[0])
+
+
+def Well_Name_At(Index):
+    return "ABCDEFGH"[Index % 8] + str(Index // 8 + 1)
+
+
+class Plate_State:
+    def __init__(self, Name, Plate_Type = "", Project = ""):
+        from array import array
+        self.Name = Name
+        self.Plate_Type = Plate_Type
+        self.Project = Project
+        self.Sample = [""] * Plate_Wells
+        self.Occupied = bytearray(Plate_Wells)
+        self.Volume = array("d", [0.0]) * Plate_Wells
+        self.Concentration = array("d", [0.0]) * Plate_Wells
+
+    def Set(self, Well_Name, Sample, Volume, Concentration = 0):
+        Index = Well_Index(Well_Name)
+        self.Sample[Index] = Sample
+        self.Occupied[Index] = 1
+        self.Volume[Index] = round(Volume, 2)
+        self.Concentration[Index] = round(Concentration, 3)
+
+    def Take(self, Well_Name, Volume):
+        ## Takes Volume from a well with sample (empty wells are skipped); fails when the well holds less.
+        Index = Well_Index(Well_Name)
+        if not self.Occupied[Index]:
+            return
+        if Volume > self.Volume[Index] + 1e-6:
+            raise ValueError(self.Name + " well " + Well_Name + " (" + (self.Sample[Index] or "no sample ID") + ") holds "
+                             + str(self.Volume[Index]) + " µL, " + str(round(Volume, 2)) + " µL is needed")
+        self.Volume[Index] = round(self.Volume[Index] - Volume, 2)
+
+    def Wells(self):
+        ## Names of the wells with sample, in plate order.
+        return [Well_Name_At(Index) for Index in range(Plate_Wells) if self.Occupied[Index]]
+
+    def Columns(self):
+        ## Columns (1-12) with at least one well with sample.
+        return [Column for Column in range(1, 13) if any(self.Occupied[(Column - 1) * 8:Column * 8])]
+
+    def Data(self):
+        return {"format": State_Format, "name": self.Name, "plate_type": self.Plate_Type, "project": self.Project,
+                "sample": list(self.Sample), "occupied": list(self.Occupied), "volume": list(self.Volume), "concentration": list(self.Concentration)}
+
+
+def Plate_State_From(Data):
+    from array import array
+    if Data.get("format") != State_Format:
+        raise ValueError("Plate state " + str(Data.get("name")) + " has format " + str(Data.get("format")) + ", expected " + str(State_Format))
+    State = Plate_State(Data["name"], Data["plate_type"], Data["project"])
+    if not len(Data["sample"]) == len(Data["occupied"]) == len(Data["volume"]) == len(Data["concentration"]) == Plate_Wells:
+        raise ValueError("Plate state " + State.Name + " does not have " + str(Plate_Wells) + " wells")
+    State.Sample = [str(Sample) for Sample in Data["sample"]]
+    State.Occupied = bytearray(Data["occupied"])
+    State.Volume = array("d", Data["volume"])
+    State.Concentration = array("d", Data["concentration"])
+    return State
+
+
+def Plate_State_File(Name, Directory = State_Directory):
+    import os
+    return os.path.join(Directory, Name.replace(" ", "_") + ".json")
+
+
+def Read_Plate_State(Name, Directory = State_Directory):
+    ## The state of the plate, or None when there is none.
+    import json
+    import os
+    Path = Plate_State_File(Name, Directory)
+    if not os.path.exists(Path):
+        return None
+    with open(Path, encoding = "utf-8") as Handle:
+        return Plate_State_From(json.load(Handle))
+
+
+def Input_Plate_State(Protocol, Name, Columns, Directory = State_Directory):
+    ## The state of an input plate for a run over sample columns 1-Columns; fails when there is none or when it has
+    ## samples beyond the columns.
+    State = Read_Plate_State(Name, Directory)
+    if State is None:
+        raise ValueError("There is no plate state for " + Name + " on the robot - run the protocol that makes the plate with plate states on, or turn plate states off")
+    Outside = [Well_Name for Well_Name in State.Wells() if int(Well_Name[1:]) > Columns]
+    if Outside:
+        raise ValueError("The plate state of " + Name + " has samples outside the " + str(Columns) + " sample column(s): " + ", ".join(Outside))
+    Protocol.comment("Plate state: " + Name + (" (" + State.Project + ")" if State.Project else "") + ", " + str(len(State.Wells()))
+                     + " samples in column(s) " + ", ".join(str(Column) for Column in State.Columns()))
+    return State
+
+
+def Write_Plate_State(Protocol, State, Directory = State_Directory):
+    ## Written to a temporary file first, so a power cut never leaves half a file.
+    import json
+    import os
+    if Protocol.is_simulating():
+        Protocol.comment("Plate state: " + State.Name + ", " + str(len(State.Wells())) + " samples (not written in simulation)")
+        return
+    os.makedirs(Directory, exist_ok = True)
+    Path = Plate_State_File(State.Name, Directory)
+    with open(Path + ".tmp", "w", encoding = "utf-8") as Handle:
+        json.dump(State.Data(), Handle, separators = (",", ":"))
+    os.replace(Path + ".tmp", Path)
+    Protocol.comment("Plate state: " + State.Name + ", " + str(len(State.Wells())) + " samples written to " + Path)
+#### End shared: plate_state ####
+
+#### Shared: run_estimator ####
+## Copied from static/OT2_shared/run_estimator.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Run estimator ###
+#####################
+
+## Dry run of a protocol that estimates its run time instead of moving: Start_Run_Estimate wraps the protocol context, so
+## pipettes and modules are loaded as usual but their actions only advance a modelled clock (pipetting at the flow rates,
+## gantry moves, tip handling, delays, magnet, temperature module and thermocycler ramps and profiles). Pauses are
+## recorded rather than waited for, and every "STATUS:" comment starts a new stage. Finish_Run_Estimate prints the time
+## per stage and when the operator pauses come, in robot time (the time spent paused is not counted). A "STATUS:" pause
+## at the very end of the run only closes it and is not listed as an operator pause.
+## The wrapped context reports is_simulating(), so no files are written and no hardware is polled. The tips are tracked by
+## the estimate: shared code reads the tips left in a rack with Has_Tip instead of Well.has_tip.
+## Thermocycler protocols need the thermal_model block.
+
+Timing = {
+    "arc": 1.0,             ## s to lift to a safe height and lower again for a move between wells
+    "gantry_speed": 200,    ## Effective mm/s of a move between wells (acceleration included)
+    "z_speed": 60,          ## Effective mm/s of a move within a well
+    "move": 2.0,            ## s for a move from an unknown position (e.g. after dropping a tip)
+    "pick_up_tip": 4.0,     ## s for the tip pick-up itself (presses)
+    "drop_tip": 5.0,        ## s to move to the trash and eject
+    "eject": 2.0,           ## s to eject tips into their rack (after the move)
+    "blow_out": 1.5,
+    "touch_tip": 2.0,
+    "air_gap": 1.0,         ## s to lift before the air gap is aspirated
+    "home": 10.0,
+    "magnet": 5.0,          ## s to engage or disengage the magnet
+    "lid": 20.0,            ## s to open or close the thermocycler lid
+    "latch": 2.0,           ## s to open or close the heater-shaker labware latch
+    "shake_ramp": 5.0,      ## s for the heater-shaker to reach its speed
+}
+
+Temperature_Module_Rates = {"heating": 0.12, "cooling": 0.035} ## °C/s, from ambient (25 °C)
+
+
+def _Clock(Seconds):
+    Seconds = int(round(Seconds))
+    return str(Seconds // 3600) + ":" + str(Seconds // 60 % 60).zfill(2) + ":" + str(Seconds % 60).zfill(2)
+
+
+def _Point(Location):
+    ## Deck coordinates of a well or location, None when unknown (e.g. a trash bin).
+    if hasattr(Location, "point"):
+        return Location.point
+    if hasattr(Location, "top"):
+        return Location.top().point
+    return None
+
+
+def _As_List(Value):
+    return list(Value) if isinstance(Value, (list, tuple)) else [Value]
+
+
+def Has_Tip(Pipette, Well):
+    ## Whether a tip rack well still holds a tip. A run time estimate picks up no tips, so its pipettes keep track of them.
+    if isinstance(Pipette, Estimating_Pipette):
+        return str(Well) not in Pipette._Protocol.Estimate["used_tips"]
+    return Well.has_tip
+
+
+class Estimating_Protocol:
+    def __init__(self, Protocol):
+        self._Protocol = Protocol
+        self.Estimate = {"clock": 0.0, "stages": [["Setup", 0.0]], "pauses": [], "used_tips": set()}
+
+    def __getattr__(self, Name):
+        ## Loading labware, liquids and parameters goes to the protocol context.
+        return getattr(self._Protocol, Name)
+
+    def Add(self, Seconds):
+        self.Estimate["clock"] += Seconds
+
+    def is_simulating(self):
+        return True
+
+    def load_instrument(self, *args, **kwargs):
+        return Estimating_Pipette(self, self._Protocol.load_instrument(*args, **kwargs))
+
+    def load_module(self, *args, **kwargs):
+        return Estimating_Module(self, self._Protocol.load_module(*args, **kwargs))
+
+    def comment(self, msg):
+        if str(msg).startswith("STATUS:"):
+            self.Estimate["stages"].append([str(msg)[7:].strip(), self.Estimate["clock"]])
+        self._Protocol.comment(msg)
+
+    def delay(self, seconds = 0, minutes = 0, msg = None):
+        self.Add(seconds + 60 * minutes)
+
+    def pause(self, msg = None):
+        self.Estimate["pauses"].append((self.Estimate["clock"], str(msg or "Pause")))
+
+    def move_labware(self, labware, new_location, use_gripper = False, **kwargs):
+        ## The OT-2 has no gripper: the operator moves the labware during a pause.
+        Location = "off the deck" if getattr(new_location, "value", None) == "off-deck" else "to " + str(new_location)
+        self.pause("Move " + str(labware) + " " + Location)
+
+    def wait_for_tasks(self, tasks):
+        self.Estimate["clock"] = max([self.Estimate["clock"]] + [Task["end"] for Task in tasks])
+
+    def set_rail_lights(self, on):
+        pass
+
+    def home(self):
+        self.Add(Timing["home"])
+
+
+class Estimating_Pipette:
+    def __init__(self, Protocol, Pipette):
+        self._Protocol = Protocol
+        self._Pipette = Pipette
+        self._Position = None
+        self._Tip_Location = None
+        self.current_volume = 0
+        self.has_tip = False
+
+    def __getattr__(self, Name):
+        ## Settings (flow rates, tip racks, nozzle layouts) and properties come from the loaded pipette.
+        return getattr(self._Pipette, Name)
+
+    def __setattr__(self, Name, Value):
+        ## The tip racks and starting tip are set on the loaded pipette, where the tip tracking reads them.
+        if Name in ("tip_racks", "starting_tip"):
+            setattr(self._Pipette, Name, Value)
+        else:
+            object.__setattr__(self, Name, Value)
+
+    def __str__(self):
+        return str(self._Pipette)
+
+    def _Move(self, Location, Speed = None):
+        Point = _Point(Location)
+        if Location is None:
+            return
+        if Point is None or self._Position is None:
+            self._Protocol.Add(Timing["move"])
+        else:
+            Across = ((Point.x - self._Position.x) ** 2 + (Point.y - self._Position.y) ** 2) ** 0.5
+            Down = abs(Point.z - self._Position.z)
+            if Speed is not None:
+                self._Protocol.Add((Across + Down) / Speed)
+            elif Across < 1:
+                self._Protocol.Add(Down / Timing["z_speed"])
+            else:
+                self._Protocol.Add(Timing["arc"] + Across / Timing["gantry_speed"])
+        self._Position = Point
+
+    def _Tip_Capacity(self):
+        if self._Pipette.tip_racks:
+            return min(self._Pipette.max_volume, self._Pipette.tip_racks[0].wells()[0].max_volume)
+        return self._Pipette.max_volume
+
+    def aspirate(self, volume = None, location = None, rate = 1.0):
+        if volume is None:
+            volume = self._Tip_Capacity() - self.current_volume
+        self._Move(location)
+        self._Protocol.Add(volume / (self._Pipette.flow_rate.aspirate * rate))
+        self.current_volume += volume
+        return self
+
+    def dispense(self, volume = None, location = None, rate = 1.0, push_out = None):
+        if volume is None:
+            volume = self.current_volume
+        self._Move(location)
+        self._Protocol.Add(volume / (self._Pipette.flow_rate.dispense * rate))
+        self.current_volume = max(0, self.current_volume - volume)
+        return self
+
+    def mix(self, repetitions = 1, volume = None, location = None, rate = 1.0):
+        if volume is None:
+            volume = self._Tip_Capacity()
+        self._Move(location)
+        for Repetition in range(repetitions):
+            self.aspirate(volume, None, rate)
+            self.dispense(volume, None, rate)
+        return self
+
+    def blow_out(self, location = None):
+        self._Move(location)
+        self._Protocol.Add(Timing["blow_out"])
+        self.current_volume = 0
+        return self
+
+    def touch_tip(self, location = None, radius = 1.0, v_offset = -1.0, speed = 60.0):
+        self._Move(location)
+        self._Protocol.Add(Timing["touch_tip"])
+        return self
+
+    def air_gap(self, volume = None, height = None):
+        self._Protocol.Add(Timing["air_gap"])
+        return self.aspirate(volume, None)
+
+    def move_to(self, location, force_direct = False, minimum_z_height = None, speed = None, publish = True):
+        self._Move(location, speed)
+        return self
+
+    def configure_nozzle_layout(self, style, start = None, end = None, front_right = None, back_left = None, tip_racks = None):
+        ## The layout is kept by the estimate (the engine would log the change): the active nozzles and the tip racks.
+        from opentrons.protocol_api import ALL, SINGLE
+        if style == ALL:
+            self.active_channels = self._Pipette.channels
+        elif style == SINGLE:
+            self.active_channels = 1
+        else: ## A partial column from the start nozzle to the end nozzle
+            self.active_channels = abs(ord(start[0]) - ord(end[0])) + 1
+        if tip_racks is not None:
+            self._Pipette.tip_racks = tip_racks
+
+    def _Next_Tip(self):
+        ## First rack location with tips for all active nozzles, from the starting tip on (as the OT-2 tip tracking does).
+        Racks = self._Pipette.tip_racks
+        Start = self._Pipette.starting_tip
+        if Start is not None and Start.parent in Racks:
+            Racks = Racks[Racks.index(Start.parent):]
+        for Rack in Racks:
+            for Column in Rack.columns():
+                if self.active_channels == 8:
+                    if all(Has_Tip(self, Well) for Well in Column):
+                        return Column[0]
+                    continue
+                for Well in Column:
+                    if Has_Tip(self, Well) and (Start is None or Start.parent != Rack or Rack.wells().index(Well) >= Rack.wells().index(Start)):
+                        return Well
+        raise RuntimeError(str(self) + " has run out of tips")
+
+    def pick_up_tip(self, location = None, presses = None, increment = None, prep_after = None):
+        ## The tips of the active nozzles: the column below a full 8-channel, otherwise the rows from the target well up.
+        if location is None:
+            location = self._Next_Tip()
+        Well = location if hasattr(location, "well_name") else location.labware.as_well()
+        Column = Well.parent.columns_by_name()[Well.well_name[1:]]
+        Row = Column.index(Well)
+        Channels = self.active_channels
+        Tips = Column if Channels == 8 else Column[max(0, Row - Channels + 1):Row + 1]
+        self._Protocol.Estimate["used_tips"].update(str(Tip) for Tip in Tips)
+        self._Tip_Location = Well
+        self._Move(Well)
+        self._Protocol.Add(Timing["pick_up_tip"])
+        self.has_tip = True
+        return self
+
+    def drop_tip(self, location = None, home_after = None):
+        self._Protocol.Add(Timing["drop_tip"])
+        self._Position = None
+        self.has_tip = False
+        self.current_volume = 0
+        return self
+
+    def return_tip(self, home_after = None):
+        ## Returned tips are not picked up again, as on the robot.
+        self._Move(self._Tip_Location)
+        self._Protocol.Add(Timing["eject"])
+        self.has_tip = False
+        self.current_volume = 0
+        return self
+
+    def _Liquid_Handling(self, Steps, kwargs):
+        ## Steps: [(source locations, destination locations, [volume per destination])], with the tip handling and the
+        ## options of transfer, distribute and consolidate.
+        New_Tip = str(kwargs.get("new_tip", "once")).lower()
+        Trash = kwargs.get("trash", True)
+        Rate = kwargs.get("rate", 1.0)
+        Finish_Tip = self.drop_tip if Trash else self.return_tip
+        if New_Tip == "once":
+            self.pick_up_tip()
+        for Sources, Destinations, Volumes in Steps:
+            if New_Tip == "always":
+                self.pick_up_tip()
+            for Source in Sources:
+                if kwargs.get("mix_before"):
+                    self.mix(kwargs["mix_before"][0], kwargs["mix_before"][1], Source, Rate)
+                self.aspirate(sum(Volumes) / len(Sources) + kwargs.get("disposal_volume", 0), Source, Rate)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip()
+                if kwargs.get("air_gap"):
+                    self.air_gap(kwargs["air_gap"])
+            for Destination, Volume in zip(Destinations, Volumes):
+                self.dispense(Volume, Destination, Rate)
+                if kwargs.get("mix_after"):
+                    self.mix(kwargs["mix_after"][0], kwargs["mix_after"][1], Destination, Rate)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip()
+            if kwargs.get("blow_out") or kwargs.get("disposal_volume"):
+                self.blow_out()
+            if New_Tip == "always":
+                Finish_Tip()
+        if New_Tip == "once":
+            Finish_Tip()
+        return self
+
+    def transfer(self, volume, source, dest, **kwargs):
+        Sources = _As_List(source)
+        Destinations = _As_List(dest)
+        Count = max(len(Sources), len(Destinations))
+        Sources = Sources * Count if len(Sources) == 1 else Sources
+        Destinations = Destinations * Count if len(Destinations) == 1 else Destinations
+        Volumes = _As_List(volume) * Count if not isinstance(volume, (list, tuple)) else list(volume)
+        Capacity = self._Tip_Capacity() - (kwargs["air_gap"] if kwargs.get("air_gap") else 0)
+        Steps = []
+        for Source, Destination, Volume in zip(Sources, Destinations, Volumes):
+            Parts = max(1, -(-Volume // Capacity))
+            Steps += [([Source], [Destination], [Volume / Parts])] * int(Parts)
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = 0))
+
+    def distribute(self, volume, source, dest, **kwargs):
+        Destinations = _As_List(dest)
+        Volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(Destinations)
+        Disposal = kwargs.get("disposal_volume", self._Pipette.min_volume)
+        Steps = []
+        for Destination, Volume in zip(Destinations, Volumes):
+            if not Steps or sum(Steps[-1][2]) + Volume + Disposal > self._Tip_Capacity():
+                Steps.append(([source], [], []))
+            Steps[-1][1].append(Destination)
+            Steps[-1][2].append(Volume)
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = Disposal))
+
+    def consolidate(self, volume, source, dest, **kwargs):
+        Sources = _As_List(source)
+        Volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(Sources)
+        Steps = []
+        for Source, Volume in zip(Sources, Volumes):
+            if not Steps or sum(Steps[-1][2]) + Volume > self._Tip_Capacity():
+                Steps.append(([], [dest], [0]))
+            Steps[-1][0].append(Source)
+            Steps[-1][2][0] += Volume
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = 0))
+
+
+class Estimating_Module:
+    def __init__(self, Protocol, Module):
+        self._Protocol = Protocol
+        self._Module = Module
+        self.Block = 25     ## Modelled temperatures (°C)
+        self.Lid = 25
+        self.Heater_Task = None
+
+    def __getattr__(self, Name):
+        ## Loading labware and the module's properties come from the loaded module.
+        return getattr(self._Module, Name)
+
+    def __str__(self):
+        ## For the move_labware pauses, e.g. "magneticModuleV1 in slot 4".
+        return self._Module.model + " in slot " + str(self._Module.parent)
+
+    def _Task(self, Seconds):
+        return {"end": self._Protocol.Estimate["clock"] + Seconds}
+
+    ## Magnetic module
+    def engage(self, height = None, offset = None, height_from_base = None):
+        self._Protocol.Add(Timing["magnet"])
+
+    def disengage(self):
+        self._Protocol.Add(Timing["magnet"])
+
+    ## Temperature module and heater-shaker heating
+    def _Temperature_Seconds(self, Celsius):
+        Rate = Temperature_Module_Rates["heating" if Celsius >= self.Block else "cooling"]
+        Seconds = abs(Celsius - self.Block) / Rate
+        self.Block = Celsius
+        return Seconds
+
+    def set_temperature(self, celsius):
+        self._Protocol.Add(self._Temperature_Seconds(celsius))
+
+    def start_set_temperature(self, celsius):
+        return self._Task(self._Temperature_Seconds(celsius))
+
+    def set_and_wait_for_temperature(self, celsius):
+        self.set_temperature(celsius)
+
+    def set_target_temperature(self, celsius):
+        self.Heater_Task = self._Task(self._Temperature_Seconds(celsius))
+
+    def wait_for_temperature(self):
+        if self.Heater_Task is not None:
+            self._Protocol.wait_for_tasks([self.Heater_Task])
+
+    def set_and_wait_for_shake_speed(self, rpm):
+        self._Protocol.Add(Timing["shake_ramp"])
+
+    def open_labware_latch(self):
+        self._Protocol.Add(Timing["latch"])
+
+    def close_labware_latch(self):
+        self._Protocol.Add(Timing["latch"])
+
+    def deactivate_heater(self):
+        self.Block = 25
+
+    def deactivate_shaker(self):
+        self._Protocol.Add(Timing["shake_ramp"])
+
+    ## Thermocycler
+    def open_lid(self):
+        self._Protocol.Add(Timing["lid"])
+
+    def close_lid(self):
+        self._Protocol.Add(Timing["lid"])
+
+    def _Block_Seconds(self, Temperature, Hold_Seconds):
+        Seconds = Block_Ramp_Seconds(self._Module.model, self.Block, Temperature) + Hold_Seconds
+        self.Block = Temperature
+        return Seconds
+
+    def set_block_temperature(self, temperature, hold_time_seconds = None, hold_time_minutes = None, ramp_rate = None, block_max_volume = None):
+        self._Protocol.Add(self._Block_Seconds(temperature, (hold_time_seconds or 0) + 60 * (hold_time_minutes or 0)))
+
+    def start_set_block_temperature(self, temperature, ramp_rate = None, block_max_volume = None):
+        return self._Task(self._Block_Seconds(temperature, 0))
+
+    def _Lid_Seconds(self, Temperature):
+        Seconds = Lid_Ramp_Seconds(self._Module.model, self.Lid, Temperature)
+        self.Lid = Temperature
+        return Seconds
+
+    def set_lid_temperature(self, temperature):
+        self._Protocol.Add(self._Lid_Seconds(temperature))
+
+    def start_set_lid_temperature(self, temperature):
+        return self._Task(self._Lid_Seconds(temperature))
+
+    def execute_profile(self, steps, repetitions, block_max_volume = None):
+        for Repetition in range(repetitions):
+            for Step in steps:
+                self._Protocol.Add(self._Block_Seconds(Step["temperature"], Step.get("hold_time_seconds", 0) + 60 * Step.get("hold_time_minutes", 0)))
+
+    def deactivate_lid(self):
+        self.Lid = 25
+
+    def deactivate_block(self):
+        self.Block = 25
+
+    def deactivate(self):
+        self.Block = 25
+        self.Lid = 25
+
+    @property
+    def block_temperature(self):
+        return self.Block
+
+
+def Start_Run_Estimate(Protocol):
+    ## Returns the wrapped protocol context to run the protocol on. Load the pipettes and modules after this.
+    Protocol.comment("Run time estimate: nothing is moved in this run")
+    return Estimating_Protocol(Protocol)
+
+
+def Finish_Run_Estimate(Protocol):
+    ## Prints the estimated time per stage, the operator pauses and the total through the protocol context.
+    Estimate = Protocol.Estimate
+    Stages = Estimate["stages"] + [[None, Estimate["clock"]]]
+    Real = Protocol._Protocol
+    Pauses = Estimate["pauses"]
+    if Pauses and Pauses[-1][0] == Estimate["clock"] and Pauses[-1][1].startswith("STATUS:"):
+        Pauses = Pauses[:-1] ## The closing pause ("STATUS: Protocol Completed.") waits for no operator action
+    Real.comment("Run time estimate: " + _Clock(Estimate["clock"]) + " (h:mm:ss) of robot time, " + str(len(Pauses)) + " operator pause(s)")
+    for Stage, Next in zip(Stages[:-1], Stages[1:]):
+        if Next[1] > Stage[1]: ## Stages without robot time (e.g. the last status) are left out
+            Real.comment("Run time estimate: " + Stage[0] + " - starts at " + _Clock(Stage[1]) + ", takes " + _Clock(Next[1] - Stage[1]))
+    for Clock, Message in Pauses:
+        Real.comment("Run time estimate: pause at " + _Clock(Clock) + " - " + Message)
+#### End shared: run_estimator ####
+
+
 
 
 
@@ -46,6 +1172,58 @@ def add_parameters(parameters):
     default="opentrons_96_aluminumblock_generic_pcr_strip_200ul",
     )
 
+    ## Primer mapping from an index sheet
+    parameters.add_bool(
+        variable_name = "index_mapping",
+        display_name = "Index sheet mapping",
+        description = "Primers from the index wells in the index sheet. Off: primers from the sample's own well.",
+        default = False
+    )
+
+    ## Number of index plates
+    parameters.add_int(
+        variable_name = "index_plates",
+        display_name = "Index plates",
+        description = "Index plates used by the index sheet: plate 1 on the cooled module, plates 2-3 in slot 5 and 9.",
+        default = 1,
+        minimum = 1,
+        maximum = 3
+    )
+
+    ## Index sheet
+    parameters.add_csv_file(
+        variable_name = "IndexSheet",
+        display_name = "Index Sheet",
+        description = "csv file with WellPosition, IndexPlate, IndexWell (and i7, i5) per sample - read with mapping on"
+    )
+
+    ## Tip racks - tip inventory kept across runs
+    parameters.add_str(
+        variable_name = "tip_racks",
+        display_name = "Tip racks",
+        description = "Continue partly used racks from the tip inventory, or fresh racks (resets the inventory).",
+        choices = [{"display_name": "Continue partly used racks", "value": "inventory"},
+                   {"display_name": "All racks fresh", "value": "fresh"}],
+        default = "inventory"
+    )
+
+    ## Plate states - sample wells and volumes kept on the robot from run to run
+    parameters.add_bool(
+        variable_name = "plate_state",
+        display_name = "Plate states",
+        description = "If true, the sample columns come from the Purified library plate state, and the volumes are checked.",
+        default = False
+    )
+
+    ## Run time estimate
+    parameters.add_bool(
+        variable_name = "estimate_run_time",
+        display_name = "Estimate run time only",
+        description = "If true, nothing is moved: the run prints the estimated time per stage and of each pause.",
+        default = False
+    )
+
+
 
 #### Meta Data ####
 metadata = {
@@ -61,6 +1239,14 @@ def run(protocol: protocol_api.ProtocolContext):
 
     #### Loading Protocol Runtime Parameters ####
     Col_Number = ceil(protocol.params.sample_count/8)
+    Index_Mapping = protocol.params.index_mapping
+    Sample_Columns = list(range(1, Col_Number + 1))
+
+
+    #### Run time estimate ####
+    ## Dry run: nothing is moved, the run prints its estimated time per stage and when the operator pauses come.
+    if protocol.params.estimate_run_time == True:
+        protocol = Start_Run_Estimate(protocol)
 
 
     #### LABWARE SETUP ####
@@ -74,6 +1260,16 @@ def run(protocol: protocol_api.ProtocolContext):
     iPCR_plate = Temp_Module_PCR.load_labware(protocol.params.output_plate_type) ## OBS Generic plate here no PCR strip is uesd here
 
 
+    ## Plate states - only the columns with samples are done; the library volume is checked before any pipetting
+    if protocol.params.plate_state == True:
+        Sample_State = Input_Plate_State(protocol, "Purified library", Col_Number)
+        Sample_Columns = Sample_State.Columns()
+        iPCR_State = Plate_State("Index PCR plate", protocol.params.output_plate_type, Sample_State.Project)
+        for Well_Name in Sample_State.Wells():
+            Sample_State.Take(Well_Name, 10)
+            iPCR_State.Set(Well_Name, Sample_State.Sample[Well_Index(Well_Name)], 38 + 2 + 10)
+
+
     ## Primer plate (each well contain both forward and reverse primers)
     Temp_Module_Primer = protocol.load_module('temperature module',7)
     Primer_plate = Temp_Module_Primer.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul')
@@ -83,10 +1279,26 @@ def run(protocol: protocol_api.ProtocolContext):
     MasterMix = protocol.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul', 4) ## MasterMix to be prepared in advance
 
 
+    ## Primer mapping - planned before any pipetting, so an invalid index sheet stops the run at the start
+    if Index_Mapping == True:
+        Index_Plates = {1: Primer_plate}
+        for Plate, Slot in zip(range(2, protocol.params.index_plates + 1), [5, 9]):
+            Index_Plates[Plate] = protocol.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul', Slot)
+        Index_Records = CSV_Records(protocol.params.IndexSheet.parse_as_csv())
+        Index_Wells = Index_Map(Index_Records, len(Index_Plates))
+        Outside = [Well for Well in Index_Wells if Split_Well_Name(Well)[1] not in Sample_Columns]
+        if Outside:
+            raise ValueError("The index sheet has samples outside the sample column(s) " + ", ".join(str(Column) for Column in Sample_Columns) + ": " + ", ".join(Outside))
+        Primer_Columns, Primer_Singles = Plan_Primer_Transfers(Index_Wells)
+
+
     ## Tip racks
     tiprack_10_1 = protocol.load_labware('opentrons_96_filtertiprack_10ul',3) ## Sample Transfer
     tiprack_10_2 = protocol.load_labware('opentrons_96_filtertiprack_10ul',2) ## Primer transfer
-    tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',5) ## MasterMix
+    if Index_Mapping == True:
+        tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',11) ## MasterMix - partial and single nozzle moves need low labware behind the primer rack and plates
+    else:
+        tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',5) ## MasterMix
 
 
     #### PIPETTE SETUP ####
@@ -94,6 +1306,12 @@ def run(protocol: protocol_api.ProtocolContext):
     m20 = protocol.load_instrument('p20_multi_gen2', mount = 'right', tip_racks = [tiprack_10_1,tiprack_10_2])
     m200 = protocol.load_instrument('p300_multi_gen2', mount = 'left',tip_racks = [tiprack_200_1])
 
+    ## Tip inventory - with the index sheet the m20 uses partial nozzle layouts, so its racks start fresh
+    if Index_Mapping == True:
+        Tip_Inventory = Start_Tip_Inventory(protocol, "IndexPCR", [m200], Fresh_Pipettes = [m20], Mode = protocol.params.tip_racks, Tips_Needed = {m200: 8})
+    else:
+        Tip_Inventory = Start_Tip_Inventory(protocol, "IndexPCR", [m20, m200], Mode = protocol.params.tip_racks, Tips_Needed = {m20: 16*len(Sample_Columns), m200: 8})
+
 
 
     ############################### Lab Work Protocol ###############################
@@ -106,44 +1324,73 @@ def run(protocol: protocol_api.ProtocolContext):
     Temp_Module_Primer.set_temperature(celsius = 10)
 
 
+    #### Liquid classes ####
+    Master_Mix_Class = Liquid_Class("Master_Mix")
+    Low_Volume_Class = Liquid_Class("Low_Volume")
+
+
     #### Transfer MasterMix to the PCR plate ####
     protocol.comment("STATUS: Transfer MasterMix to PCR plate.")
 
     m200.pick_up_tip()
-    for i in range(Col_Number):
-        Col = i*8
+    for i, Column in enumerate(Sample_Columns):
+        Col = (Column-1)*8
         
         ## Sets the mastermix column (assuming 200 µL maximum), and transfers the remaning over to next column.
         if i == 0: 
             MMpos = "A1"
         if i == 5: 
             MMpos = "A2"
-            m200.transfer(volume = 30, source = MasterMix.wells_by_name()["A1"], dest =MasterMix.wells_by_name()[MMpos], rate = 0.8, new_tip = 'never') ## Transfer leftover- mastermix
+            m200.transfer(volume = 30, source = MasterMix.wells_by_name()["A1"], dest =MasterMix.wells_by_name()[MMpos], rate = Master_Mix_Class["aspirate_rate"], new_tip = 'never') ## Transfer leftover- mastermix
         if i == 10: 
             MMpos = "A3"
-            m200.transfer(volume = 30, source = MasterMix.wells_by_name()["A2"], dest =MasterMix.wells_by_name()[MMpos], rate = 0.8, new_tip = 'never') ## Transfer leftover- mastermix
+            m200.transfer(volume = 30, source = MasterMix.wells_by_name()["A2"], dest =MasterMix.wells_by_name()[MMpos], rate = Master_Mix_Class["aspirate_rate"], new_tip = 'never') ## Transfer leftover- mastermix
         
-        m200.transfer(volume = 38, source = MasterMix.wells_by_name()[MMpos], dest = iPCR_plate.wells()[Col].bottom(z = 1.2), mix_before = (2,30), rate = 0.6, blow_out = False, blowout_location = 'source well', new_tip = 'never')
+        m200.transfer(volume = 38, source = MasterMix.wells_by_name()[MMpos], dest = iPCR_plate.wells()[Col].bottom(z = 1.2), mix_before = (2,30), rate = Master_Mix_Class["aspirate_rate"], blow_out = False, blowout_location = 'source well', new_tip = 'never')
         ## Deep well plates we have less deep bottoms.
     m200.drop_tip()
 
 
     #### Primer Transfer ####
     protocol.comment("STATUS: Transfering Index PCR primer.")
-    for i in range(Col_Number):
-        Col = i*8
-        m20.transfer(volume = 2, source = Primer_plate.wells()[Col], dest = iPCR_plate.wells()[Col].bottom(z = 1.2), mix_after = (2,5), rate = 0.6, new_tip = 'Always', trash = False)
+    if Index_Mapping == True:
+        ## Column-aligned columns with the (partial) column of nozzles, remapped wells with a single nozzle. The primer tips
+        ## come from the primer rack; the sample transfers use full tip columns again.
+        m20.configure_nozzle_layout(style = ALL, tip_racks = [tiprack_10_2])
+        for Transfer in Primer_Columns:
+            Configure_Column_Nozzles(m20, Transfer["rows"])
+            Pick_Up_Column_Tips(m20, Transfer["rows"])
+            m20.transfer(volume = 2, source = Column_Target(Index_Plates[Transfer["plate"]], Transfer["index_column"], Transfer["rows"]), dest = Column_Target(iPCR_plate, Transfer["column"], Transfer["rows"]).bottom(z = 1.2), mix_after = (2,5), rate = Low_Volume_Class["aspirate_rate"], new_tip = 'never')
+            m20.drop_tip()
+        Configure_Column_Nozzles(m20, 1)
+        for Transfer in Primer_Singles:
+            Pick_Up_Column_Tips(m20, 1)
+            m20.transfer(volume = 2, source = Index_Plates[Transfer["plate"]].wells_by_name()[Transfer["index_well"]], dest = iPCR_plate.wells_by_name()[Transfer["well"]].bottom(z = 1.2), mix_after = (2,5), rate = Low_Volume_Class["aspirate_rate"], new_tip = 'never')
+            m20.drop_tip()
+        m20.configure_nozzle_layout(style = ALL, tip_racks = [tiprack_10_1, tiprack_10_2])
+        protocol.comment("Primers: " + str(len(Primer_Columns)) + " column transfer(s) and " + str(len(Primer_Singles)) + " remapped well(s) from " + str(len(Index_Plates)) + " index plate(s)")
+    else:
+        for Column in Sample_Columns:
+            Col = (Column-1)*8
+            m20.transfer(volume = 2, source = Primer_plate.wells()[Col], dest = iPCR_plate.wells()[Col].bottom(z = 1.2), mix_after = (2,5), rate = Low_Volume_Class["aspirate_rate"], new_tip = 'Always', trash = False)
 
 
     #### Transfer diluted sample-library to index PCR strips - obs for
     protocol.comment("STATUS: Transfering Diluted Samples to Index PCR strips")
-    for i in range (Col_Number):
-        Col = i*8
-        m20.transfer(volume = 10, source = Sample_Plate.wells()[Col].bottom(z = 1.2), dest = iPCR_plate.wells()[Col].bottom(z = 1.2), mix_before = (2,5), mix_after = (2,10), rate = 0.6, new_tip = 'Always', trash = False)
+    for Column in Sample_Columns:
+        Col = (Column-1)*8
+        m20.transfer(volume = 10, source = Sample_Plate.wells()[Col].bottom(z = 1.2), dest = iPCR_plate.wells()[Col].bottom(z = 1.2), mix_before = (2,5), mix_after = (2,10), rate = Low_Volume_Class["aspirate_rate"], new_tip = 'Always', trash = False)
 
 
     ## Protocol complete
+    Finish_Tip_Inventory(protocol, Tip_Inventory)
+    if protocol.params.plate_state == True:
+        Write_Plate_State(protocol, Sample_State)
+        Write_Plate_State(protocol, iPCR_State)
     protocol.pause("STATUS: Index PCR Setup Finished")
     Temp_Module_PCR.deactivate()
     Temp_Module_Primer.deactivate()
     protocol.set_rail_lights(False)
+
+    if protocol.params.estimate_run_time == True:
+        Finish_Run_Estimate(protocol)
@@ -9,9 +9,911 @@
 
 #### Package loading ####
 from opentrons import protocol_api
-import pandas as pd
 from math import *
 
+
+#### Shared: run_report ####
+## Copied from static/OT2_shared/run_report.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+##################
+### Run report ###
+##################
+
+## Per-sample provenance for LIMS import. The protocol adds one record per sample while it runs (kept in memory) and writes
+## the whole report once at the end, as a CSV and a JSON file in the robot's user storage - no file I/O per step.
+## Records hold the source and destination, the volumes pipetted, the tips used and the time.
+
+Report_Directory = "/data/user_storage/run_reports" ## Persistent storage on the OT-2
+
+
+def New_Run_Report(Protocol_Name):
+    from datetime import datetime
+    return {"protocol": Protocol_Name, "started": datetime.now().isoformat(timespec = "seconds"), "records": []}
+
+
+def _Slot(Labware):
+    ## Deck slot of labware, also when it sits on a module or an adapter.
+    Parent = Labware.parent
+    while Parent is not None and not isinstance(Parent, str):
+        Parent = Parent.parent
+    return Parent or "off-deck"
+
+
+def _Tip_Order(Tip):
+    Slot, Well_Name = Tip.split(":")
+    return Slot, int(Well_Name[1:]), Well_Name[0]
+
+
+def New_Tip_Tracker(Pipettes):
+    ## The tips left in the racks of the pipettes, collected once at the start. Used_Tips then finds the tips each step
+    ## used. Has_Tip comes from the run_estimator block.
+    return {"left": {_Slot(Rack) + ":" + Well.well_name: (Pipette, Well) for Pipette in Pipettes for Rack in Pipette.tip_racks
+                     for Well in Rack.wells() if Has_Tip(Pipette, Well)}}
+
+
+def Used_Tips(Tracker):
+    ## "slot:well" of the tips picked up since the last call, e.g. "4:A1 4:B1". Only the tips still left are checked, and
+    ## the used ones are dropped from the tracker.
+    Used = [Tip for Tip, (Pipette, Well) in Tracker["left"].items() if not Has_Tip(Pipette, Well)]
+    for Tip in Used:
+        del Tracker["left"][Tip]
+    return " ".join(sorted(Used, key = _Tip_Order))
+
+
+def Record_Sample(Report, **Fields):
+    ## Adds a record with the given fields (e.g. Sample_ID, Source_Well, Destination_Well, DNA_ul, Tips) and the time.
+    from datetime import datetime
+    Record = dict(Fields)
+    Record["Time"] = datetime.now().isoformat(timespec = "seconds")
+    Report["records"].append(Record)
+
+
+def Well_Label(Well):
+    ## Slot and well of a well, e.g. "3:B5".
+    return _Slot(Well.parent) + ":" + Well.well_name
+
+
+def Write_Run_Report(Protocol, Report, Directory = Report_Directory):
+    ## Writes <protocol>_<start time>.csv and .json. Nothing is written when the protocol is simulated or analysed.
+    import csv
+    import json
+    import os
+    if Protocol.is_simulating():
+        Protocol.comment("Run report: " + str(len(Report["records"])) + " sample records (not written in simulation)")
+        return None
+    os.makedirs(Directory, exist_ok = True)
+    Base = os.path.join(Directory, Report["protocol"] + "_" + Report["started"].replace(":", "").replace("-", ""))
+    Columns = []
+    for Record in Report["records"]:
+        for Key in Record:
+            if Key not in Columns:
+                Columns.append(Key)
+    with open(Base + ".csv", "w", newline = "", encoding = "utf-8") as Handle:
+        Writer = csv.DictWriter(Handle, fieldnames = Columns, delimiter = ";")
+        Writer.writeheader()
+        Writer.writerows(Report["records"])
+    with open(Base + ".json", "w", encoding = "utf-8") as Handle:
+        json.dump(Report, Handle, indent = 1)
+    Protocol.comment("Run report: " + str(len(Report["records"])) + " sample records written to " + Base + ".csv/.json")
+    return Base
+#### End shared: run_report ####
+
+
+#### Shared: column_planner ####
+## Copied from static/OT2_shared/column_planner.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+######################
+### Column planner ###
+######################
+
+## Groups per-well work into column transfers for an 8-channel pipette. A column is done with the multichannel when all
+## its wells share the same key (e.g. adaptor concentration) and sit in consecutive rows from row A - a full column, or a
+## partial column picked up with the front nozzles. The remaining wells (mixed columns) are left for single-channel transfers.
+
+Plate_Rows = "ABCDEFGH"
+
+
+def Split_Well_Name(Well_Name):
+    ## "B12" -> ("B", 12)
+    return Well_Name[0].upper(), int(Well_Name[1:])
+
+
+def Plan_Column_Transfers(Well_Keys):
+    ## Well_Keys: {well name: key}. Returns (Column_Transfers, Single_Transfers), both sorted by key and then plate position,
+    ## so the source only changes once per key.
+    ## Column_Transfers: [{"key": key, "column": 1-12, "rows": number of rows from row A, "wells": [well names]}]
+    ## Single_Transfers: [(key, well name)]
+    Columns = {}
+    for Well_Name, Key in Well_Keys.items():
+        Row, Column = Split_Well_Name(Well_Name)
+        Columns.setdefault(Column, {})[Row] = Key
+
+    Column_Transfers = []
+    Single_Transfers = []
+    for Column in sorted(Columns):
+        Rows = Columns[Column]
+        Row_Count = len(Rows)
+        From_Row_A = all(Plate_Rows[i] in Rows for i in range(Row_Count))
+        if Row_Count > 1 and len(set(Rows.values())) == 1 and From_Row_A:
+            Column_Transfers.append({"key": Rows["A"], "column": Column, "rows": Row_Count,
+                                     "wells": [Plate_Rows[i] + str(Column) for i in range(Row_Count)]})
+        else:
+            for Row in sorted(Rows, key = Plate_Rows.index):
+                Single_Transfers.append((Rows[Row], Row + str(Column)))
+
+    Column_Transfers.sort(key = lambda Transfer: (Transfer["key"], Transfer["column"]))
+    Single_Transfers.sort(key = lambda Transfer: (Transfer[0], Split_Well_Name(Transfer[1])[1], Plate_Rows.index(Transfer[1][0])))
+    return Column_Transfers, Single_Transfers
+
+
+def Column_Target(Labware, Column, Rows):
+    ## Well to target with the primary nozzle: A1 for a full column, otherwise the front nozzle (H1) goes to the last row,
+    ## so that the used nozzles cover row A to the last row.
+    if Rows == 8:
+        return Labware.wells_by_name()["A" + str(Column)]
+    return Labware.wells_by_name()[Plate_Rows[Rows-1] + str(Column)]
+
+
+def Configure_Column_Nozzles(Pipette, Rows):
+    ## Full column: all nozzles. Partial column: the front nozzles H1 and up (OT-2 8-channels support 2-7 nozzles from H1).
+    ## One row: the front nozzle H1 alone, for single-well transfers with the multichannel.
+    ## configure_nozzle_layout replaces the pipette's tip racks, so they are passed on again.
+    from opentrons.protocol_api import ALL, PARTIAL_COLUMN, SINGLE
+    if Rows == 8:
+        Pipette.configure_nozzle_layout(style = ALL, tip_racks = Pipette.tip_racks)
+    elif Rows == 1:
+        Pipette.configure_nozzle_layout(style = SINGLE, start = "H1", tip_racks = Pipette.tip_racks)
+    else:
+        Pipette.configure_nozzle_layout(style = PARTIAL_COLUMN, start = "H1", end = Plate_Rows[8-Rows] + "1", tip_racks = Pipette.tip_racks)
+
+
+def Pick_Up_Column_Tips(Pipette, Rows):
+    ## The OT-2 has no automatic tip tracking for partial column layouts, so the tips are chosen here. The front nozzles take
+    ## tips from the bottom of a tip column, leaving the top rows for the next partial pick-up. Columns that are already
+    ## started are used first, so full columns stay available for the full-column steps. Has_Tip comes from the
+    ## run_estimator block.
+    if Rows == 8:
+        Pipette.pick_up_tip()
+        return
+    Started = []
+    Full = []
+    for Rack in Pipette.tip_racks:
+        for Column in Rack.columns():
+            Available = 0
+            while Available < 8 and Has_Tip(Pipette, Column[Available]):
+                Available += 1
+            if Available < Rows or any(Has_Tip(Pipette, Well) for Well in Column[Available:]):
+                continue
+            if Available == 8:
+                Full.append(Column[7])
+            else:
+                Started.append(Column[Available-1])
+    if not Started and not Full:
+        raise RuntimeError("No tip column with " + str(Rows) + " tips left for " + str(Pipette))
+    Pipette.pick_up_tip((Started + Full)[0])
+#### End shared: column_planner ####
+
+
+#### Shared: dilution_planner ####
+## Copied from static/OT2_shared/dilution_planner.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+########################
+### Dilution planner ###
+########################
+
+## Plans all dilutions of a run up front, so the water can go into every dilution well in one distribute pass and the
+## sample can be added per column with a multichannel where the wells of a column share a dilution. A dilution is made in
+## the dilution plate well with the same position as the sample: Sample µL of sample + (Factor - 1) x Sample µL of water.
+## The sample volume is the smallest that gives enough diluted volume to pool from (plus a residual left in the well),
+## keeps the water pipettable, and is shared by the wells with the same factor in a column.
+
+def Dilution_Factor(Value):
+    ## Dilution column of the CSV input: "", 0 and 1 mean undiluted. Returns the factor as a float (0 for undiluted).
+    Factor = float(Value or 0)
+    if Factor in (0, 1):
+        return 0
+    if Factor < 1:
+        raise ValueError("Dilution factor " + str(Value) + " is not valid - use 0 (undiluted) or a factor above 1, e.g. 10 for 1:10")
+    return Factor
+
+
+def Plan_Dilutions(Samples, Minimum_Sample = 1, Minimum_Water = 5, Residual = 5, Well_Volume = 200, Step = 0.5):
+    ## Samples: [(well name, dilution factor, µL to pool from the dilution)] for the diluted samples.
+    ## Returns {well name: {"factor", "sample_ul", "water_ul", "pool_ul"}}. Sample volumes are rounded up to Step µL.
+    from math import ceil
+    Plan = {}
+    for Well_Name, Factor, Pool_Volume in Samples:
+        Sample = max(Minimum_Sample, (Pool_Volume + Residual) / Factor, Minimum_Water / (Factor - 1))
+        Plan[Well_Name] = {"factor": Factor, "sample_ul": ceil(Sample / Step) * Step, "pool_ul": Pool_Volume}
+
+    ## Wells with the same factor in a column share the largest sample volume, so they can be done as one column transfer.
+    Groups = {}
+    for Well_Name, Dilution in Plan.items():
+        Groups.setdefault((Well_Name[1:], Dilution["factor"]), []).append(Dilution)
+    for Group in Groups.values():
+        Sample = max(Dilution["sample_ul"] for Dilution in Group)
+        for Dilution in Group:
+            Dilution["sample_ul"] = Sample
+
+    for Well_Name, Dilution in Plan.items():
+        Dilution["water_ul"] = round(Dilution["sample_ul"] * (Dilution["factor"] - 1), 2)
+        if Dilution["sample_ul"] + Dilution["water_ul"] > Well_Volume:
+            raise ValueError("The 1:" + str(Dilution["factor"]) + " dilution for " + Well_Name + " needs "
+                             + str(Dilution["sample_ul"] + Dilution["water_ul"]) + " µL, more than the dilution wells hold (" + str(Well_Volume) + " µL)")
+    return Plan
+
+
+def Dilution_Keys(Plan):
+    ## {well name: (factor, sample µL)} for Plan_Column_Transfers - wells with the same key can share a column transfer.
+    return {Well_Name: (Dilution["factor"], Dilution["sample_ul"]) for Well_Name, Dilution in Plan.items()}
+#### End shared: dilution_planner ####
+
+
+#### Shared: csv_records ####
+## Copied from static/OT2_shared/csv_records.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+###################
+### CSV records ###
+###################
+
+## Column access to the CSV input of a protocol without pandas, so the robot does not import pandas and numpy to run a
+## protocol (several seconds and most of the memory of a protocol run on the OT-2). Built from the rows of
+## parse_as_csv(): the first row is the header (without the byte order mark of Excel exports), fully blank rows are
+## dropped. Columns are lists of strings in CSV order: Records['WellPosition'][i], len(Records) rows, 'SampleID' in Records.
+## Float and Integer return typed arrays of a column, with Default for empty cells.
+
+class CSV_Records:
+    def __init__(self, Rows):
+        Rows = [Row for Row in Rows if any(str(Value).strip() for Value in Row)]
+        if not Rows:
+            raise ValueError("The CSV file is empty")
+        self.Columns = [str(Name).lstrip("\ufeff").strip() for Name in Rows[0]]
+        self.Data = {Name: [Row[Index] if Index < len(Row) else "" for Row in Rows[1:]] for Index, Name in enumerate(self.Columns)}
+        self.Rows = len(Rows) - 1
+
+    def __len__(self):
+        return self.Rows
+
+    def __contains__(self, Name):
+        return Name in self.Data
+
+    def __getitem__(self, Name):
+        if Name not in self.Data:
+            raise KeyError("The CSV file has no column " + str(Name) + " (columns: " + ", ".join(self.Columns) + ")")
+        return self.Data[Name]
+
+    def __setitem__(self, Name, Values):
+        Values = list(Values)
+        if len(Values) != self.Rows:
+            raise ValueError("Column " + str(Name) + " has " + str(len(Values)) + " values for " + str(self.Rows) + " rows")
+        if Name not in self.Data:
+            self.Columns.append(Name)
+        self.Data[Name] = Values
+
+    def Typed(self, Name, Type, Code, Default = None):
+        ## Column as an array of Code ("d" float, "q" integer). Empty cells become Default; without a Default they are an error.
+        from array import array
+        Values = array(Code)
+        for Row, Value in enumerate(self[Name]):
+            Value = str(Value).strip()
+            if Value == "" and Default is not None:
+                Values.append(Default)
+                continue
+            try:
+                Values.append(Type(Value))
+            except ValueError:
+                raise ValueError("Column " + str(Name) + " has " + repr(Value) + " in data row " + str(Row + 1) + " of the CSV file (header not counted) - expected a number")
+        return Values
+
+    def Float(self, Name, Default = None):
+        return self.Typed(Name, float, "d", Default)
+
+    def Integer(self, Name, Default = None):
+        return self.Typed(Name, lambda Value: int(float(Value)), "q", Default)
+#### End shared: csv_records ####
+
+
+#### Shared: tip_inventory ####
+## Copied from static/OT2_shared/tip_inventory.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Tip inventory ###
+#####################
+
+## Tips left in the racks on the deck, kept across runs in the robot's user storage, so partly used racks are finished by
+## the next run instead of being replaced. Racks are keyed by deck slot (with the tip rack type, so a rack of another type
+## in the slot counts as fresh). At the start the partly used rack of a pipette goes first and starting_tip is set to its
+## first tip left; at the end the tips left in every rack are written back. While a run is going its racks are recorded
+## as unknown, so an aborted run leaves them to be replaced rather than reused.
+## starting_tip cannot be used with partial nozzle layouts: racks of pipettes that use them (Fresh_Pipettes) are always
+## fresh, and are only recorded at the end. Tips are counted up to the last tip used, so tips skipped by partial pick-ups
+## are not reused. Nothing is written when the protocol is simulated, analysed or estimated. Needs the run_estimator block.
+## The inventory only holds for the protocols that keep it (BEST-Library, CovarisSetup, IndexPCR, PoolCombiner and qPCR).
+## DREX and the bead purifications take their tips from fixed rack positions instead: they record every rack they load
+## as unknown (Mark_Tip_Racks_Unknown), so the next run that continues partly used racks asks for those slots to be
+## replaced. Racks used by hand or by other protocols are not seen: load fresh racks there, or run with fresh racks.
+
+Inventory_File = "/data/user_storage/tip_inventory.json" ## Persistent storage on the OT-2
+
+
+def Read_Tip_Inventory(Path = Inventory_File):
+    ## {slot: {"load_name", "next" (first tip left, None for an empty or unknown rack), "tips_left", "protocol", "updated"}}
+    import json
+    import os
+    if not os.path.exists(Path):
+        return {}
+    with open(Path, encoding = "utf-8") as Handle:
+        return json.load(Handle)["racks"]
+
+
+def _Write_Tip_Inventory(Racks, Path):
+    ## Written to a temporary file first, so a power cut never leaves half a file.
+    import json
+    import os
+    os.makedirs(os.path.dirname(Path), exist_ok = True)
+    with open(Path + ".tmp", "w", encoding = "utf-8") as Handle:
+        json.dump({"racks": Racks}, Handle, indent = 1, sort_keys = True)
+    os.replace(Path + ".tmp", Path)
+
+
+def _Start_Index(Pipette, Rack):
+    ## Index (column-wise) of the pipette's starting tip in the rack, 0 when it starts elsewhere.
+    if Pipette.starting_tip is not None and Pipette.starting_tip.parent == Rack:
+        return Rack.wells().index(Pipette.starting_tip)
+    return 0
+
+
+def Start_Tip_Inventory(Protocol, Protocol_Name, Pipettes, Fresh_Pipettes = (), Mode = "inventory", Tips_Needed = None, Path = Inventory_File):
+    ## Mode "inventory" continues partly used racks, "fresh" takes all racks as fresh and "manual" keeps the starting tips
+    ## set by the protocol. Racks recorded as empty, unknown or beyond the one partly used rack a pipette can continue are to
+    ## be replaced: the run pauses at the start to ask for it. Tips_Needed ({pipette: tips}) is for protocols that load just
+    ## the racks they need - a partly used rack is then only continued when the racks still hold enough tips.
+    ## Returns the state to pass to Finish_Tip_Inventory.
+    from datetime import datetime
+    Racks = Read_Tip_Inventory(Path) if Mode == "inventory" else {}
+    Replace = []
+    for Pipette in list(Pipettes) + list(Fresh_Pipettes):
+        Partial = []
+        Fresh = []
+        for Rack in Pipette.tip_racks:
+            Entry = Racks.get(str(Rack.parent))
+            if Entry is None or Entry["load_name"] != Rack.load_name:
+                Fresh.append(Rack)
+                continue
+            Next = None if Entry["next"] is None else Rack.wells().index(Rack.wells_by_name()[Entry["next"]])
+            if Next is not None and Pipette.channels == 8:
+                Next = -(-Next // 8) * 8 ## Multichannels start at the top of the next full column
+            if Next is None or Next >= len(Rack.wells()) or Pipette in Fresh_Pipettes:
+                Replace.append(str(Rack.parent))
+                Fresh.append(Rack)
+            elif Next == 0:
+                Fresh.append(Rack)
+            else:
+                Partial.append((Next, Rack))
+        if not Partial:
+            continue
+        Partial.sort(key = lambda Item: -Item[0]) ## The rack with the fewest tips left is finished first
+        Next, Rack = Partial[0]
+        if Tips_Needed is not None and Pipette in Tips_Needed and len(Rack.wells()) - Next + sum(len(Other.wells()) for Other in Fresh) < Tips_Needed[Pipette]:
+            Replace.extend(str(Other.parent) for Index, Other in Partial)
+            continue
+        Replace.extend(str(Other.parent) for Index, Other in Partial[1:])
+        Pipette.tip_racks = [Rack] + Fresh + [Other for Index, Other in Partial[1:]]
+        Pipette.starting_tip = Rack.wells()[Next]
+        Protocol.comment("Tip inventory: " + str(Pipette) + " continues the rack in slot " + str(Rack.parent) + " from "
+                         + Rack.wells()[Next].well_name + " (" + str(len(Rack.wells()) - Next) + " tips left)")
+    if Replace:
+        Protocol.pause("Tip inventory: replace the tip racks in slot " + ", ".join(sorted(set(Replace), key = int)) + " with fresh racks, then resume")
+
+    State = {"protocol": Protocol_Name, "pipettes": list(Pipettes) + list(Fresh_Pipettes), "racks": Read_Tip_Inventory(Path), "path": Path}
+    if not Protocol.is_simulating():
+        Started = datetime.now().isoformat(timespec = "seconds")
+        Running = dict(State["racks"])
+        for Pipette in State["pipettes"]:
+            for Rack in Pipette.tip_racks:
+                Running[str(Rack.parent)] = {"load_name": Rack.load_name, "next": None, "tips_left": None, "protocol": Protocol_Name + " (running)", "updated": Started}
+        _Write_Tip_Inventory(Running, Path)
+    return State
+
+
+def Mark_Tip_Racks_Unknown(Protocol, Protocol_Name, Path = Inventory_File):
+    ## For protocols that do not keep the inventory: records every tip rack loaded so far as unknown (to be replaced).
+    ## Written at the start of the run, as an aborted run has used tips too.
+    from datetime import datetime
+    if Protocol.is_simulating():
+        return
+    Racks = Read_Tip_Inventory(Path)
+    Updated = datetime.now().isoformat(timespec = "seconds")
+    for Labware in Protocol.loaded_labwares.values():
+        if Labware.is_tiprack:
+            Racks[str(Labware.parent)] = {"load_name": Labware.load_name, "next": None, "tips_left": None, "protocol": Protocol_Name, "updated": Updated}
+    _Write_Tip_Inventory(Racks, Path)
+
+
+def Finish_Tip_Inventory(Protocol, State):
+    ## Records the tips left in the racks of the pipettes and reports the racks to replace before the next run.
+    from datetime import datetime
+    Racks = dict(State["racks"])
+    Empty = []
+    Updated = datetime.now().isoformat(timespec = "seconds")
+    for Pipette in State["pipettes"]:
+        for Rack in Pipette.tip_racks:
+            Used = [Index for Index, Well in enumerate(Rack.wells()) if not Has_Tip(Pipette, Well)]
+            Next = max([_Start_Index(Pipette, Rack)] + [Index + 1 for Index in Used])
+            Left = len(Rack.wells()) - Next
+            Racks[str(Rack.parent)] = {"load_name": Rack.load_name, "next": Rack.wells()[Next].well_name if Left > 0 else None,
+                                       "tips_left": Left, "protocol": State["protocol"], "updated": Updated}
+            if Left == 0:
+                Empty.append(str(Rack.parent))
+    Summary = ", ".join("slot " + Slot + ": " + str(Racks[Slot]["tips_left"]) for Slot in sorted(Racks, key = int) if Racks[Slot]["tips_left"] is not None)
+    Protocol.comment("Tip inventory - tips left per rack: " + Summary)
+    Protocol.comment("Tip inventory: " + str(len(Empty)) + " fresh rack(s) needed for the next run"
+                     + (" (slot " + ", ".join(sorted(Empty, key = int)) + ")" if Empty else ""))
+    if not Protocol.is_simulating():
+        _Write_Tip_Inventory(Racks, State["path"])
+#### End shared: tip_inventory ####
+
+
+#### Shared: run_estimator ####
+## Copied from static/OT2_shared/run_estimator.py by tools/sync_shared_blocks.py - edit the shared file, not this block.
+#####################
+### Run estimator ###
+#####################
+
+## Dry run of a protocol that estimates its run time instead of moving: Start_Run_Estimate wraps the protocol context, so
+## pipettes and modules are loaded as usual but their actions only advance a modelled clock (pipetting at the flow rates,
+## gantry moves, tip handling, delays, magnet, temperature module and thermocycler ramps and profiles). Pauses are
+## recorded rather than waited for, and every "STATUS:" comment starts a new stage. Finish_Run_Estimate prints the time
+## per stage and when the operator pauses come, in robot time (the time spent paused is not counted). A "STATUS:" pause
+## at the very end of the run only closes it and is not listed as an operator pause.
+## The wrapped context reports is_simulating(), so no files are written and no hardware is polled. The tips are tracked by
+## the estimate: shared code reads the tips left in a rack with Has_Tip instead of Well.has_tip.
+## Thermocycler protocols need the thermal_model block.
+
+Timing = {
+    "arc": 1.0,             ## s to lift to a safe height and lower again for a move between wells
+    "gantry_speed": 200,    ## Effective mm/s of a move between wells (acceleration included)
+    "z_speed": 60,          ## Effective mm/s of a move within a well
+    "move": 2.0,            ## s for a move from an unknown position (e.g. after dropping a tip)
+    "pick_up_tip": 4.0,     ## s for the tip pick-up itself (presses)
+    "drop_tip": 5.0,        ## s to move to the trash and eject
+    "eject": 2.0,           ## s to eject tips into their rack (after the move)
+    "blow_out": 1.5,
+    "touch_tip": 2.0,
+    "air_gap": 1.0,         ## s to lift before the air gap is aspirated
+    "home": 10.0,
+    "magnet": 5.0,          ## s to engage or disengage the magnet
+    "lid": 20.0,            ## s to open or close the thermocycler lid
+    "latch": 2.0,           ## s to open or close the heater-shaker labware latch
+    "shake_ramp": 5.0,      ## s for the heater-shaker to reach its speed
+}
+
+Temperature_Module_Rates = {"heating": 0.12, "cooling": 0.035} ## °C/s, from ambient (25 °C)
+
+
+def _Clock(Seconds):
+    Seconds = int(round(Seconds))
+    return str(Seconds // 3600) + ":" + str(Seconds // 60 % 60).zfill(2) + ":" + str(Seconds % 60).zfill(2)
+
+
+def _Point(Location):
+    ## Deck coordinates of a well or location, None when unknown (e.g. a trash bin).
+    if hasattr(Location, "point"):
+        return Location.point
+    if hasattr(Location, "top"):
+        return Location.top().point
+    return None
+
+
+def _As_List(Value):
+    return list(Value) if isinstance(Value, (list, tuple)) else [Value]
+
+
+def Has_Tip(Pipette, Well):
+    ## Whether a tip rack well still holds a tip. A run time estimate picks up no tips, so its pipettes keep track of them.
+    if isinstance(Pipette, Estimating_Pipette):
+        return str(Well) not in Pipette._Protocol.Estimate["used_tips"]
+    return Well.has_tip
+
+
+class Estimating_Protocol:
+    def __init__(self, Protocol):
+        self._Protocol = Protocol
+        self.Estimate = {"clock": 0.0, "stages": [["Setup", 0.0]], "pauses": [], "used_tips": set()}
+
+    def __getattr__(self, Name):
+        ## Loading labware, liquids and parameters goes to the protocol context.
+        return getattr(self._Protocol, Name)
+
+    def Add(self, Seconds):
+        self.Estimate["clock"] += Seconds
+
+    def is_simulating(self):
+        return True
+
+    def load_instrument(self, *args, **kwargs):
+        return Estimating_Pipette(self, self._Protocol.load_instrument(*args, **kwargs))
+
+    def load_module(self, *args, **kwargs):
+        return Estimating_Module(self, self._Protocol.load_module(*args, **kwargs))
+
+    def comment(self, msg):
+        if str(msg).startswith("STATUS:"):
+            self.Estimate["stages"].append([str(msg)[7:].strip(), self.Estimate["clock"]])
+        self._Protocol.comment(msg)
+
+    def delay(self, seconds = 0, minutes = 0, msg = None):
+        self.Add(seconds + 60 * minutes)
+
+    def pause(self, msg = None):
+        self.Estimate["pauses"].append((self.Estimate["clock"], str(msg or "Pause")))
+
+    def move_labware(self, labware, new_location, use_gripper = False, **kwargs):
+        ## The OT-2 has no gripper: the operator moves the labware during a pause.
+        Location = "off the deck" if getattr(new_location, "value", None) == "off-deck" else "to " + str(new_location)
+        self.pause("Move " + str(labware) + " " + Location)
+
+    def wait_for_tasks(self, tasks):
+        self.Estimate["clock"] = max([self.Estimate["clock"]] + [Task["end"] for Task in tasks])
+
+    def set_rail_lights(self, on):
+        pass
+
+    def home(self):
+        self.Add(Timing["home"])
+
+
+class Estimating_Pipette:
+    def __init__(self, Protocol, Pipette):
+        self._Protocol = Protocol
+        self._Pipette = Pipette
+        self._Position = None
+        self._Tip_Location = None
+        self.current_volume = 0
+        self.has_tip = False
+
+    def __getattr__(self, Name):
+        ## Settings (flow rates, tip racks, nozzle layouts) and properties come from the loaded pipette.
+        return getattr(self._Pipette, Name)
+
+    def __setattr__(self, Name, Value):
+        ## The tip racks and starting tip are set on the loaded pipette, where the tip tracking reads them.
+        if Name in ("tip_racks", "starting_tip"):
+            setattr(self._Pipette, Name, Value)
+        else:
+            object.__setattr__(self, Name, Value)
+
+    def __str__(self):
+        return str(self._Pipette)
+
+    def _Move(self, Location, Speed = None):
+        Point = _Point(Location)
+        if Location is None:
+            return
+        if Point is None or self._Position is None:
+            self._Protocol.Add(Timing["move"])
+        else:
+            Across = ((Point.x - self._Position.x) ** 2 + (Point.y - self._Position.y) ** 2) ** 0.5
+            Down = abs(Point.z - self._Position.z)
+            if Speed is not None:
+                self._Protocol.Add((Across + Down) / Speed)
+            elif Across < 1:
+                self._Protocol.Add(Down / Timing["z_speed"])
+            else:
+                self._Protocol.Add(Timing["arc"] + Across / Timing["gantry_speed"])
+        self._Position = Point
+
+    def _Tip_Capacity(self):
+        if self._Pipette.tip_racks:
+            return min(self._Pipette.max_volume, self._Pipette.tip_racks[0].wells()[0].max_volume)
+        return self._Pipette.max_volume
+
+    def aspirate(self, volume = None, location = None, rate = 1.0):
+        if volume is None:
+            volume = self._Tip_Capacity() - self.current_volume
+        self._Move(location)
+        self._Protocol.Add(volume / (self._Pipette.flow_rate.aspirate * rate))
+        self.current_volume += volume
+        return self
+
+    def dispense(self, volume = None, location = None, rate = 1.0, push_out = None):
+        if volume is None:
+            volume = self.current_volume
+        self._Move(location)
+        self._Protocol.Add(volume / (self._Pipette.flow_rate.dispense * rate))
+        self.current_volume = max(0, self.current_volume - volume)
+        return self
+
+    def mix(self, repetitions = 1, volume = None, location = None, rate = 1.0):
+        if volume is None:
+            volume = self._Tip_Capacity()
+        self._Move(location)
+        for Repetition in range(repetitions):
+            self.aspirate(volume, None, rate)
+            self.dispense(volume, None, rate)
+        return self
+
+    def blow_out(self, location = None):
+        self._Move(location)
+        self._Protocol.Add(Timing["blow_out"])
+        self.current_volume = 0
+        return self
+
+    def touch_tip(self, location = None, radius = 1.0, v_offset = -1.0, speed = 60.0):
+        self._Move(location)
+        self._Protocol.Add(Timing["touch_tip"])
+        return self
+
+    def air_gap(self, volume = None, height = None):
+        self._Protocol.Add(Timing["air_gap"])
+        return self.aspirate(volume, None)
+
+    def move_to(self, location, force_direct = False, minimum_z_height = None, speed = None, publish = True):
+        self._Move(location, speed)
+        return self
+
+    def configure_nozzle_layout(self, style, start = None, end = None, front_right = None, back_left = None, tip_racks = None):
+        ## The layout is kept by the estimate (the engine would log the change): the active nozzles and the tip racks.
+        from opentrons.protocol_api import ALL, SINGLE
+        if style == ALL:
+            self.active_channels = self._Pipette.channels
+        elif style == SINGLE:
+            self.active_channels = 1
+        else: ## A partial column from the start nozzle to the end nozzle
+            self.active_channels = abs(ord(start[0]) - ord(end[0])) + 1
+        if tip_racks is not None:
+            self._Pipette.tip_racks = tip_racks
+
+    def _Next_Tip(self):
+        ## First rack location with tips for all active nozzles, from the starting tip on (as the OT-2 tip tracking does).
+        Racks = self._Pipette.tip_racks
+        Start = self._Pipette.starting_tip
+        if Start is not None and Start.parent in Racks:
+            Racks = Racks[Racks.index(Start.parent):]
+        for Rack in Racks:
+            for Column in Rack.columns():
+                if self.active_channels == 8:
+                    if all(Has_Tip(self, Well) for Well in Column):
+                        return Column[0]
+                    continue
+                for Well in Column:
+                    if Has_Tip(self, Well) and (Start is None or Start.parent != Rack or Rack.wells().index(Well) >= Rack.wells().index(Start)):
+                        return Well
+        raise RuntimeError(str(self) + " has run out of tips")
+
+    def pick_up_tip(self, location = None, presses = None, increment = None, prep_after = None):
+        ## The tips of the active nozzles: the column below a full 8-channel, otherwise the rows from the target well up.
+        if location is None:
+            location = self._Next_Tip()
+        Well = location if hasattr(location, "well_name") else location.labware.as_well()
+        Column = Well.parent.columns_by_name()[Well.well_name[1:]]
+        Row = Column.index(Well)
+        Channels = self.active_channels
+        Tips = Column if Channels == 8 else Column[max(0, Row - Channels + 1):Row + 1]
+        self._Protocol.Estimate["used_tips"].update(str(Tip) for Tip in Tips)
+        self._Tip_Location = Well
+        self._Move(Well)
+        self._Protocol.Add(Timing["pick_up_tip"])
+        self.has_tip = True
+        return self
+
+    def drop_tip(self, location = None, home_after = None):
+        self._Protocol.Add(Timing["drop_tip"])
+        self._Position = None
+        self.has_tip = False
+        self.current_volume = 0
+        return self
+
+    def return_tip(self, home_after = None):
+        ## Returned tips are not picked up again, as on the robot.
+        self._Move(self._Tip_Location)
+        self._Protocol.Add(Timing["eject"])
+        self.has_tip = False
+        self.current_volume = 0
+        return self
+
+    def _Liquid_Handling(self, Steps, kwargs):
+        ## Steps: [(source locations, destination locations, [volume per destination])], with the tip handling and the
+        ## options of transfer, distribute and consolidate.
+        New_Tip = str(kwargs.get("new_tip", "once")).lower()
+        Trash = kwargs.get("trash", True)
+        Rate = kwargs.get("rate", 1.0)
+        Finish_Tip = self.drop_tip if Trash else self.return_tip
+        if New_Tip == "once":
+            self.pick_up_tip()
+        for Sources, Destinations, Volumes in Steps:
+            if New_Tip == "always":
+                self.pick_up_tip()
+            for Source in Sources:
+                if kwargs.get("mix_before"):
+                    self.mix(kwargs["mix_before"][0], kwargs["mix_before"][1], Source, Rate)
+                self.aspirate(sum(Volumes) / len(Sources) + kwargs.get("disposal_volume", 0), Source, Rate)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip()
+                if kwargs.get("air_gap"):
+                    self.air_gap(kwargs["air_gap"])
+            for Destination, Volume in zip(Destinations, Volumes):
+                self.dispense(Volume, Destination, Rate)
+                if kwargs.get("mix_after"):
+                    self.mix(kwargs["mix_after"][0], kwargs["mix_after"][1], Destination, Rate)
+                if kwargs.get("touch_tip"):
+                    self.touch_tip()
+            if kwargs.get("blow_out") or kwargs.get("disposal_volume"):
+                self.blow_out()
+            if New_Tip == "always":
+                Finish_Tip()
+        if New_Tip == "once":
+            Finish_Tip()
+        return self
+
+    def transfer(self, volume, source, dest, **kwargs):
+        Sources = _As_List(source)
+        Destinations = _As_List(dest)
+        Count = max(len(Sources), len(Destinations))
+        Sources = Sources * Count if len(Sources) == 1 else Sources
+        Destinations = Destinations * Count if len(Destinations) == 1 else Destinations
+        Volumes = _As_List(volume) * Count if not isinstance(volume, (list, tuple)) else list(volume)
+        Capacity = self._Tip_Capacity() - (kwargs["air_gap"] if kwargs.get("air_gap") else 0)
+        Steps = []
+        for Source, Destination, Volume in zip(Sources, Destinations, Volumes):
+            Parts = max(1, -(-Volume // Capacity))
+            Steps += [([Source], [Destination], [Volume / Parts])] * int(Parts)
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = 0))
+
+    def distribute(self, volume, source, dest, **kwargs):
+        Destinations = _As_List(dest)
+        Volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(Destinations)
+        Disposal = kwargs.get("disposal_volume", self._Pipette.min_volume)
+        Steps = []
+        for Destination, Volume in zip(Destinations, Volumes):
+            if not Steps or sum(Steps[-1][2]) + Volume + Disposal > self._Tip_Capacity():
+                Steps.append(([source], [], []))
+            Steps[-1][1].append(Destination)
+            Steps[-1][2].append(Volume)
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = Disposal))
+
+    def consolidate(self, volume, source, dest, **kwargs):
+        Sources = _As_List(source)
+        Volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(Sources)
+        Steps = []
+        for Source, Volume in zip(Sources, Volumes):
+            if not Steps or sum(Steps[-1][2]) + Volume > self._Tip_Capacity():
+                Steps.append(([], [dest], [0]))
+            Steps[-1][0].append(Source)
+            Steps[-1][2][0] += Volume
+        return self._Liquid_Handling(Steps, dict(kwargs, disposal_volume = 0))
+
+
+class Estimating_Module:
+    def __init__(self, Protocol, Module):
+        self._Protocol = Protocol
+        self._Module = Module
+        self.Block = 25     ## Modelled temperatures (°C)
+        self.Lid = 25
+        self.Heater_Task = None
+
+    def __getattr__(self, Name):
+        ## Loading labware and the module's properties come from the loaded module.
+        return getattr(self._Module, Name)
+
+    def __str__(self):
+        ## For the move_labware pauses, e.g. "magneticModuleV1 in slot 4".
+        return self._Module.model + " in slot " + str(self._Module.parent)
+
+    def _Task(self, Seconds):
+        return {"end": self._Protocol.Estimate["clock"] + Seconds}
+
+    ## Magnetic module
+    def engage(self, height = None, offset = None, height_from_base = None):
+        self._Protocol.Add(Timing["magnet"])
+
+    def disengage(self):
+        self._Protocol.Add(Timing["magnet"])
+
+    ## Temperature module and heater-shaker heating
+    def _Temperature_Seconds(self, Celsius):
+        Rate = Temperature_Module_Rates["heating" if Celsius >= self.Block else "cooling"]
+        Seconds = abs(Celsius - self.Block) / Rate
+        self.Block = Celsius
+        return Seconds
+
+    def set_temperature(self, celsius):
+        self._Protocol.Add(self._Temperature_Seconds(celsius))
+
+    def start_set_temperature(self, celsius):
+        return self._Task(self._Temperature_Seconds(celsius))
+
+    def set_and_wait_for_temperature(self, celsius):
+        self.set_temperature(celsius)
+
+    def set_target_temperature(self, celsius):
+        self.Heater_Task = self._Task(self._Temperature_Seconds(celsius))
+
+    def wait_for_temperature(self):
+        if self.Heater_Task is not None:
+            self._Protocol.wait_for_tasks([self.Heater_Task])
+
+    def set_and_wait_for_shake_speed(self, rpm):
+        self._Protocol.Add(Timing["shake_ramp"])
+
+    def open_labware_latch(self):
+        self._Protocol.Add(Timing["latch"])
+
+    def close_labware_latch(self):
+        self._Protocol.Add(Timing["latch"])
+
+    def deactivate_heater(self):
+        self.Block = 25
+
+    def deactivate_shaker(self):
+        self._Protocol.Add(Timing["shake_ramp"])
+
+    ## Thermocycler
+    def open_lid(self):
+        self._Protocol.Add(Timing["lid"])
+
+    def close_lid(self):
+        self._Protocol.Add(Timing["lid"])
+
+    def _Block_Seconds(self, Temperature, Hold_Seconds):
+        Seconds = Block_Ramp_Seconds(self._Module.model, self.Block, Temperature) + Hold_Seconds
+        self.Block = Temperature
+        return Seconds
+
+    def set_block_temperature(self, temperature, hold_time_seconds = None, hold_time_minutes = None, ramp_rate = None, block_max_volume = None):
+        self._Protocol.Add(self._Block_Seconds(temperature, (hold_time_seconds or 0) + 60 * (hold_time_minutes or 0)))
+
+    def start_set_block_temperature(self, temperature, ramp_rate = None, block_max_volume = None):
+        return self._Task(self._Block_Seconds(temperature, 0))
+
+    def _Lid_Seconds(self, Temperature):
+        Seconds = Lid_Ramp_Seconds(self._Module.model, self.Lid, Temperature)
+        self.Lid = Temperature
+        return Seconds
+
+    def set_lid_temperature(self, temperature):
+        self._Protocol.Add(self._Lid_Seconds(temperature))
+
+    def start_set_lid_temperature(self, temperature):
+        return self._Task(self._Lid_Seconds(temperature))
+
+    def execute_profile(self, steps, repetitions, block_max_volume = None):
+        for Repetition in range(repetitions):
+            for Step in steps:
+                self._Protocol.Add(self._Block_Seconds(Step["temperature"], Step.get("hold_time_seconds", 0) + 60 * Step.get("hold_time_minutes", 0)))
+
+    def deactivate_lid(self):
+        self.Lid = 25
+
+    def deactivate_block(self):
+        self.Block = 25
+
+    def deactivate(self):
+        self.Block = 25
+        self.Lid = 25
+
+    @property
+    def block_temperature(self):
+        return self.Block
+
+
+def Start_Run_Estimate(Protocol):
+    ## Returns the wrapped protocol context to run the protocol on. Load the pipettes and modules after this.
+    Protocol.comment("Run time estimate: nothing is moved in this run")
+    return Estimating_Protocol(Protocol)
+
+
+def Finish_Run_Estimate(Protocol):
+    ## Prints the estimated time per stage, the operator pauses and the total through the protocol context.
+    Estimate = Protocol.Estimate
+    Stages = Estimate["stages"] + [[None, Estimate["clock"]]]
+    Real = Protocol._Protocol
+    Pauses = Estimate["pauses"]
+    if Pauses and Pauses[-1][0] == Estimate["clock"] and Pauses[-1][1].startswith("STATUS:"):
+        Pauses = Pauses[:-1] ## The closing pause ("STATUS: Protocol Completed.") waits for no operator action
+    Real.comment("Run time estimate: " + _Clock(Estimate["clock"]) + " (h:mm:ss) of robot time, " + str(len(Pauses)) + " operator pause(s)")
+    for Stage, Next in zip(Stages[:-1], Stages[1:]):
+        if Next[1] > Stage[1]: ## Stages without robot time (e.g. the last status) are left out
+            Real.comment("Run time estimate: " + Stage[0] + " - starts at " + _Clock(Stage[1]) + ", takes " + _Clock(Next[1] - Stage[1]))
+    for Clock, Message in Pauses:
+        Real.comment("Run time estimate: pause at " + _Clock(Clock) + " - " + Message)
+#### End shared: run_estimator ####
+
 ##################################
 
 def add_parameters(parameters):
@@ -51,6 +953,35 @@ def add_parameters(parameters):
         default="opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap"
     )
 
+    ## Left pipette
+    parameters.add_str(
+        variable_name="dilution_pipette",
+        display_name="Left pipette",
+        description="A p20 multichannel adds the sample to dilution columns in one go (20 µL tips in slots 7, 8).",
+        choices=[{"display_name": "P10 single-channel", "value": "p10_single"},
+        {"display_name": "P20 multichannel GEN2", "value": "p20_multi_gen2"}],
+        default="p10_single"
+    )
+
+    ## Tip racks - tip inventory kept across runs
+    parameters.add_str(
+        variable_name = "tip_racks",
+        display_name = "Tip racks",
+        description = "Continue partly used racks from the tip inventory, or fresh racks (resets the inventory).",
+        choices = [{"display_name": "Continue partly used racks", "value": "inventory"},
+                   {"display_name": "All racks fresh", "value": "fresh"}],
+        default = "inventory"
+    )
+
+    ## Run time estimate
+    parameters.add_bool(
+        variable_name = "estimate_run_time",
+        display_name = "Estimate run time only",
+        description = "If true, nothing is moved: the run prints the estimated time per stage and of each pause.",
+        default = False
+    )
+
+
 
 
 
@@ -67,8 +998,24 @@ metadata = {
 def run(protocol: protocol_api.ProtocolContext):
 
     parsed_data = protocol.params.PoolSheet.parse_as_csv()
-    user_data = pd.DataFrame(parsed_data[1:], columns = parsed_data[0])
-    DilutionWell = 0
+    user_data = CSV_Records(parsed_data)
+    Dilute = protocol.params.dilutionchoice
+    Multichannel = protocol.params.dilution_pipette == "p20_multi_gen2"
+
+    ## Pool volumes and dilution factors (0 = undiluted) per sample, in CSV order
+    Pool_Volumes = [float(Volume) for Volume in user_data['SampleVolume']]
+    Factors = [Dilution_Factor(Value) for Value in user_data['Dilution']]
+    if any(Factors) and Dilute == False:
+        raise ValueError("The pooling sheet has dilution factors, but the Dilution setting is off")
+
+    ## All dilutions are planned before pipetting: water and sample volume per dilution well (same position as the sample).
+    Dilutions = Plan_Dilutions([(user_data['WellPosition'][i], Factors[i], Pool_Volumes[i]) for i in range(len(user_data)) if Factors[i] > 0])
+
+    #### Run time estimate ####
+    ## Dry run: nothing is moved, the run prints its estimated time per stage and when the operator pauses come.
+    if protocol.params.estimate_run_time == True:
+        protocol = Start_Run_Estimate(protocol)
+
 
     #### LABWARE SETUP ####
     ## Labware here ##
@@ -81,70 +1028,136 @@ def run(protocol: protocol_api.ProtocolContext):
     SamplePlate = protocol.load_labware(protocol.params.input_plate_type,1)
 
     ## Dilution plate
-    if protocol.params.dilutionchoice is True:
+    if Dilute == True:
         DilutionPlate = protocol.load_labware('opentrons_96_aluminumblock_generic_pcr_strip_200ul',2)
         DilutionWater = RackType.wells_by_name()["A2"]
+        Water_Needed = sum(Dilution["water_ul"] for Dilution in Dilutions.values())
+        if Water_Needed > DilutionWater.max_volume - 50:
+            raise ValueError("The dilutions need " + str(round(Water_Needed, 1)) + " µL water, more than the water tube (A2) holds with 50 µL dead volume")
 
-    ## Tip racks
-    tiprack_10_1 = protocol.load_labware('opentrons_96_filtertiprack_10ul',4)
-    tiprack_10_2 = protocol.load_labware('opentrons_96_filtertiprack_10ul',7)
-    tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',5)
-    tiprack_200_2 = protocol.load_labware('opentrons_96_filtertiprack_200ul',8)
+    ## Tip racks. The back nozzles of the multichannel reach into the slot behind when its front nozzle works alone, so with
+    ## the multichannel slots 4-6 (behind the plates and tubes) and 10-11 (behind its 20 µL tips) stay empty.
+    if Multichannel:
+        tiprack_10_1 = protocol.load_labware('opentrons_96_filtertiprack_20ul',7)
+        tiprack_10_2 = protocol.load_labware('opentrons_96_filtertiprack_20ul',8)
+        tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',9)
+        Large_Tip_Racks = [tiprack_200_1]
+    else:
+        tiprack_10_1 = protocol.load_labware('opentrons_96_filtertiprack_10ul',4)
+        tiprack_10_2 = protocol.load_labware('opentrons_96_filtertiprack_10ul',7)
+        tiprack_200_1 = protocol.load_labware('opentrons_96_filtertiprack_200ul',5)
+        tiprack_200_2 = protocol.load_labware('opentrons_96_filtertiprack_200ul',8)
+        Large_Tip_Racks = [tiprack_200_1,tiprack_200_2]
 
 
     #### PIPETTE SETUP ####
-    ## Loading pipettes
-    p10 = protocol.load_instrument('p10_single', mount='left', tip_racks=[tiprack_10_1])
-    p50 = protocol.load_instrument('p50_single', mount='right', tip_racks=[tiprack_200_1])
+    ## Loading pipettes. Left: p10 single-channel, or a p20 multichannel that works on single wells with one nozzle and on
+    ## dilution columns with all (or the front) nozzles.
+    p10 = protocol.load_instrument(protocol.params.dilution_pipette, mount='left', tip_racks=[tiprack_10_1,tiprack_10_2])
+    p50 = protocol.load_instrument('p50_single', mount='right', tip_racks=Large_Tip_Racks)
+
+    ## Tip inventory - the multichannel uses partial nozzle layouts, so its racks start fresh
+    if Multichannel:
+        Tip_Inventory = Start_Tip_Inventory(protocol, "PoolCombiner", [p50], Fresh_Pipettes = [p10], Mode = protocol.params.tip_racks)
+    else:
+        Tip_Inventory = Start_Tip_Inventory(protocol, "PoolCombiner", [p10, p50], Mode = protocol.params.tip_racks)
+    if Multichannel:
+        Configure_Column_Nozzles(p10, 1)
+
+    ## Transfer of up to 10 µL into a single well, with a new tip.
+    def Single_Transfer(Volume, Source, Dest, Mix = None):
+        if Multichannel:
+            Pick_Up_Column_Tips(p10, 1)
+            p10.transfer(volume = Volume, source = Source, dest = Dest, new_tip = 'never', mix_after = Mix)
+            p10.drop_tip() ## Tips cannot be returned to the rack with a partial nozzle layout
+        else:
+            p10.transfer(volume = Volume, source = Source, dest = Dest, new_tip = 'always', trash = False, mix_after = Mix)
 
     ############################### Lab Work Protocol ###############################
     ## The instructions for the robot to execute.
-    protocol.comment("STATUS: Covaris Setup Begun")
+    protocol.comment("STATUS: Pool Combiner Begun")
     protocol.set_rail_lights(True)
 
+    ## Run report for LIMS import - one record per sample, written at the end of the run.
+    Report = New_Run_Report("PoolCombiner")
+    Dilution_Tips = {}
+    Tips = New_Tip_Tracker([p10, p50])
+
+    #### Dilutions ####
+    if len(Dilutions) > 0:
+        protocol.comment("STATUS: Preparing " + str(len(Dilutions)) + " dilutions (" + str(round(Water_Needed, 1)) + " µL water)")
+        Dilution_Wells = sorted(Dilutions, key = lambda Well_Name: (Split_Well_Name(Well_Name)[1], Plate_Rows.index(Well_Name[0])))
+
+        ## Water into all dilution wells in one pass
+        p50.distribute(volume = [Dilutions[Well_Name]["water_ul"] for Well_Name in Dilution_Wells], source = DilutionWater,
+            dest = [DilutionPlate.wells_by_name()[Well_Name] for Well_Name in Dilution_Wells], new_tip = 'once', trash = False)
+        Used_Tips(Tips) ## the water tip is not a sample's
+
+        ## Sample into the dilution wells. Columns sharing factor and sample volume go with the multichannel.
+        if Multichannel:
+            Column_Transfers, Single_Dilutions = Plan_Column_Transfers(Dilution_Keys(Dilutions))
+            for Transfer in Column_Transfers:
+                if Transfer["key"][1] > p10.max_volume:
+                    Single_Dilutions += [(Transfer["key"], Well_Name) for Well_Name in Transfer["wells"]]
+                    continue
+                Factor, Sample_ul = Transfer["key"]
+                Configure_Column_Nozzles(p10, Transfer["rows"])
+                Pick_Up_Column_Tips(p10, Transfer["rows"])
+                p10.transfer(volume = Sample_ul, source = Column_Target(SamplePlate, Transfer["column"], Transfer["rows"]), dest = Column_Target(DilutionPlate, Transfer["column"], Transfer["rows"]),
+                    new_tip = 'never', mix_after = (3, min(p10.max_volume, 0.8*Factor*Sample_ul)))
+                if Transfer["rows"] == 8:
+                    p10.return_tip()
+                else:
+                    p10.drop_tip() ## Tips cannot be returned to the rack with a partial nozzle layout
+                for Well_Name, Tip in zip(Transfer["wells"], Used_Tips(Tips).split()): ## One tip per row, top to bottom
+                    Dilution_Tips[Well_Name] = Tip
+            Configure_Column_Nozzles(p10, 1)
+        else:
+            Single_Dilutions = [(None, Well_Name) for Well_Name in Dilution_Wells]
+
+        for Key, Well_Name in Single_Dilutions:
+            Dilution = Dilutions[Well_Name]
+            Mix = (3, 0.8*(Dilution["sample_ul"] + Dilution["water_ul"]))
+            if Dilution["sample_ul"] > 10:
+                p50.transfer(volume = Dilution["sample_ul"], source = SamplePlate.wells_by_name()[Well_Name], dest = DilutionPlate.wells_by_name()[Well_Name], new_tip = 'always', trash = False, mix_after = (Mix[0], min(p50.max_volume, Mix[1])))
+            else:
+                Single_Transfer(Dilution["sample_ul"], SamplePlate.wells_by_name()[Well_Name], DilutionPlate.wells_by_name()[Well_Name], Mix = (Mix[0], min(p10.max_volume, Mix[1])))
+            Dilution_Tips[Well_Name] = Used_Tips(Tips)
+
+    #### Pooling - diluted samples from the dilution plate ####
+    protocol.comment("STATUS: Pooling Begun")
     for i in range(len(user_data)):
 
         ## Load CSV data
         WellPosition = user_data['WellPosition'][i]
-        SampleVolume = user_data['SampleVolume'][i]
-        
-        ## Load Dilution dater
-        if user_data['Dilution'][i] is bool:
-            DilutionFactor = user_data['Dilution'][i]
-            DilutionVolume = 1
-            H2O_Input = 1*(DilutionFactor-1)
-
-
-        ## For diluted samples
-        if user_data['Dilution'][i] > 0:
-            ## Select next available dultion tube.
-            DilutionWell = DilutionWell + 1 
-            
-            
-            ## Prepare Dilution. Transfer first dilution water, then sample material to first available pcr tube.
-            p10.pick_up_tip()
-            p10.transfer(volume = H2O_Input, source = DilutionWater, dest = DilutionPlate.wells_by_name()[WellPosition], new_tip = 'never', trash = False)
-            p10.transfer(volume = DilutionVolume, source = SamplePlate.wells_by_name()[WellPosition], dest = DilutionPlate.wells_by_name()[WellPosition], new_tip = 'never', trash = False)
-            
-            ## Mix diluted sample     
-            p10.mix(repetitions = 3, volume = (DilutionVolume+H2O_Input)*0.8, location = DilutionPlate.wells_by_name()[WellPosition])
-            
-            ## Transfer diluted sampe
-            p10.transfer(volume = SampleVolume, source = DilutionPlate.wells_by_name()[WellPosition], dest = PoolTube, new_tip = 'never', trash = False)
-            p10.return_tip
-
-        ## For non diluted samples
+        SampleVolume = Pool_Volumes[i]
+        if Factors[i] > 0:
+            Source = DilutionPlate.wells_by_name()[WellPosition]
         else:
-            ## Transfer volume for more than 10 µL pooling
-            if SampleVolume > 10:
-                ## Transfer to pool
-                p50.transfer(volume = SampleVolume, source = SamplePlate.wells_by_name()[WellPosition], dest = PoolTube, new_tip = 'always', trash = False )
+            Source = SamplePlate.wells_by_name()[WellPosition]
+
+        ## Transfer volume for more than 10 µL pooling
+        if SampleVolume > 10:
+            p50.transfer(volume = SampleVolume, source = Source, dest = PoolTube, new_tip = 'always', trash = False)
 
-            ## Transfer volume for 10 or less µL pooling    
-            if SampleVolume <= 10:
-                p10.transfer(volume = SampleVolume, source = SamplePlate.wells_by_name()[WellPosition], dest = PoolTube, new_tip = 'always', trash = False)
+        ## Transfer volume for 10 or less µL pooling
+        elif SampleVolume > 0:
+            Single_Transfer(SampleVolume, Source, PoolTube)
+
+        ## Sample record
+        Dilution_Fields = {}
+        if Factors[i] > 0:
+            Dilution_Fields = {"Dilution_Well": Well_Label(Source), "Dilution_Sample_ul": Dilutions[WellPosition]["sample_ul"],
+                "Dilution_Water_ul": Dilutions[WellPosition]["water_ul"], "Dilution_Tips": Dilution_Tips[WellPosition]}
+        Record_Sample(Report, Sample_ID = user_data['SampleID'][i] if 'SampleID' in user_data else "", Source_Well = Well_Label(SamplePlate.wells_by_name()[WellPosition]),
+            Destination_Well = Well_Label(PoolTube), Pool_ul = SampleVolume, Dilution = Factors[i], Tips = Used_Tips(Tips), **Dilution_Fields)
 
 
     ## Protocol end
+    Write_Run_Report(protocol, Report)
+    Finish_Tip_Inventory(protocol, Tip_Inventory)
     protocol.set_rail_lights(False)
-    protocol.comment("STATUS: Protocol Completed.")
\ No newline at end of file
+    protocol.comment("STATUS: Protocol Completed.")
+
+    if protocol.params.estimate_run_time == True:
+        Finish_Run_Estimate(protocol)
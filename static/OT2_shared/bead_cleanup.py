@@ -0,0 +1,322 @@
+#####################
+### Bead clean-up ###
+#####################
+
+## The magnetic bead clean-up of the DREX extraction and the BEST and Index PCR purifications: bead addition, binding,
+## supernatant removal, two ethanol washes, drying, elution and the eluate transfer, written once and configured per
+## workflow by a clean-up profile (Cleanup_Profiles). The protocols keep their deck layout, tip racks and runtime
+## parameters: they describe the deck with New_Cleanup and call the steps in order. Needs the liquid_classes,
+## magnet_calibration and heater_shaker blocks, and multi_dispense for the ethanol multi-dispense.
+##
+## Places in a well are (reference, z): ("bottom", z) and ("top", z) are mm above the well bottom or top; None is the
+## well itself (the pipette's default clearance).
+## Supernatant passes: (µL, z above the waste top, flick) per aspiration; the passes go to the first wastes in order and
+## the two ethanol washes to the next two. A flick moves the tip sideways over the waste to shed the last drop.
+## Wash mix: (repetitions, µL, aspiration z, dispense z) - the beads are resuspended in the ethanol by pipetting, each
+## column with its own tips; without it the ethanol goes onto the beads on the magnet, all columns from one set of tips.
+## Liquids: the liquid class per step; "ebt" adds the elution buffer from above the wells (Heater-Shaker mode), "ebt_mix"
+## mixes it into the beads by pipetting.
+## Liquid overrides: the validated rates and motions of each workflow where they differ from the shared liquid classes.
+## Drying: seconds after the last ethanol removal, less the credit per column (the first columns dry while the others
+## are emptied).
+
+Cleanup_Profiles = {
+    ## DREX nucleic acid extraction: lysate and 200 µL beads in a 1.3 mL deepwell plate, resuspension washes. The EBT that
+    ## is mixed into the beads by pipetting goes in without the dispense delay and slow exit of the EBT liquid class.
+    "DREX": {
+        "liquids": {"beads": "Lysate_Beads", "supernatant": "Lysate_Supernatant", "ethanol": "Ethanol", "ethanol_removal": "Ethanol_Supernatant",
+                    "ethanol_residual": "Ethanol_Supernatant", "ebt": "EBT", "ebt_mix": "EBT", "eluate": "Deepwell_Eluate"},
+        "liquid_overrides": {"ethanol_removal": {"aspirate_rate": 0.4, "dispense_rate": 0.7, "withdraw_speed": None, "air_gap_height": None},
+                             "ebt_mix": {"dispense_delay": 0, "exit_speed": None}},
+        "bead_volume": 200, "beads_follow_level": True, "bead_mix": (5, 125), "bead_dispense": ("bottom", 4.0),
+        "bead_dispense_mix": (5, 180), "bead_dispense_mix_at": ("bottom", 6.0), "binding_volume": 400,
+        "incubation_conditions": "10 C, 1500 rpm",
+        "magnet_height": 12, "settle": {"beads": 180, "ethanol": 120, "eluate": 180},
+        "supernatant_passes": [(200, 1, True), (200, 0, False)], "supernatant_z": 3.4,
+        "wash_mix": (5, 180, 4.0, 6.0), "wash_shake_minutes": 1, "ethanol_dispense": ("bottom", 5.5),
+        "ethanol_premix": None, "ethanol_aspirate_mix": None, "ethanol_removal_extra": 10, "ethanol_removal_z": 3.4,
+        "residual_removal": None, "dry_seconds": 300, "dry_column_credit": 0,
+        "ebt_dispense": ("bottom", 3.4), "ebt_mix": (5, 35), "elution_minutes": 5, "elution_temperature": None,
+        "elution_conditions": "25*C, 1500 rpm", "eluate_extra": 5, "eluate_z": 3.4, "shake_speed": 1500,
+        "plate_name": "Extraction plate", "eluate_name": "Eluted Extracted Samples"},
+    ## BEST library purification: library and 75 µL beads in the Covaris tubes or a PCR plate, washes on the magnet.
+    "BEST": {
+        "liquids": {"beads": "Beads", "supernatant": "Supernatant", "ethanol": "Ethanol", "ethanol_removal": "Ethanol_Supernatant",
+                    "ethanol_residual": "Ethanol_Supernatant", "ebt": "EBT", "ebt_mix": "EBT", "eluate": "Eluate"},
+        "liquid_overrides": {"ethanol": {"mix_rate": 1.0}, "ethanol_residual": {"aspirate_rate": 0.6, "withdraw_speed": None}},
+        "bead_volume": 75, "beads_follow_level": False, "bead_mix": (5, 75), "bead_dispense": None,
+        "bead_dispense_mix": (6, 90), "bead_dispense_mix_at": None, "binding_volume": 125,
+        "incubation_conditions": None,
+        "magnet_height": 10, "settle": {"beads": 300, "ethanol": 300, "eluate": 300},
+        "supernatant_passes": [(150, 0, False)], "supernatant_z": 1.2,
+        "wash_mix": None, "wash_shake_minutes": 1, "ethanol_dispense": ("top", 1.2),
+        "ethanol_premix": (3, 200), "ethanol_aspirate_mix": None, "ethanol_removal_extra": 0, "ethanol_removal_z": 1.2,
+        "residual_removal": (10, 0.8), "dry_seconds": 295, "dry_column_credit": 23,
+        "ebt_dispense": None, "ebt_mix": (5, 20), "elution_minutes": 10, "elution_temperature": 37,
+        "elution_conditions": "37*C", "eluate_extra": 0, "eluate_z": 1.0, "shake_speed": 1000,
+        "plate_name": "Library plate", "eluate_name": "Purified Library"},
+    ## Index PCR purification: 50 µL PCR and 60 µL beads in a PCR plate or strips; lower and slower removals (not verified yet).
+    "IndexPCR": {
+        "liquids": {"beads": "Beads", "supernatant": "Supernatant", "ethanol": "Ethanol", "ethanol_removal": "Ethanol_Supernatant",
+                    "ethanol_residual": "Ethanol_Supernatant", "ebt": "EBT", "ebt_mix": "EBT", "eluate": "Eluate"},
+        "liquid_overrides": {"ethanol": {"mix_rate": 1.0}, "ethanol_removal": {"aspirate_rate": 0.2}, "ethanol_residual": {"aspirate_rate": 0.6, "withdraw_speed": None},
+                             "eluate": {"aspirate_rate": 0.4, "dispense_rate": 0.4}},
+        "bead_volume": 60, "beads_follow_level": False, "bead_mix": (5, 75), "bead_dispense": None,
+        "bead_dispense_mix": (6, 90), "bead_dispense_mix_at": None, "binding_volume": 110,
+        "incubation_conditions": None,
+        "magnet_height": 14, "settle": {"beads": 300, "ethanol": 300, "eluate": 300},
+        "supernatant_passes": [(150, 0, False)], "supernatant_z": 0.3,
+        "wash_mix": None, "wash_shake_minutes": 1, "ethanol_dispense": ("top", 1.2),
+        "ethanol_premix": None, "ethanol_aspirate_mix": (2, 200), "ethanol_removal_extra": 0, "ethanol_removal_z": 0.35,
+        "residual_removal": (10, 0.1), "dry_seconds": 295, "dry_column_credit": 23,
+        "ebt_dispense": None, "ebt_mix": (5, 20), "elution_minutes": 10, "elution_temperature": 37,
+        "elution_conditions": "37*C", "eluate_extra": 0, "eluate_z": 0.2, "shake_speed": 1000,
+        "plate_name": "Index PCR plate", "eluate_name": "Index PCR product"},
+}
+
+
+#### Profile lookup ####
+def Cleanup_Profile(Name, **Overrides):
+    ## Returns a copy of the named clean-up profile, with its liquid classes. Overrides are for documented exceptions only.
+    if Name not in Cleanup_Profiles:
+        raise KeyError("Unknown clean-up profile '" + str(Name) + "'. Known profiles: " + ", ".join(sorted(Cleanup_Profiles)))
+    Profile = dict(Cleanup_Profiles[Name])
+    for Key in Overrides:
+        if Key not in Profile:
+            raise KeyError("Unknown clean-up setting '" + str(Key) + "' for clean-up profile '" + str(Name) + "'")
+    Profile.update(Overrides)
+    Profile["name"] = Name
+    Profile["classes"] = {Step: Liquid_Class(Liquid, **Profile["liquid_overrides"].get(Step, {})) for Step, Liquid in Profile["liquids"].items()}
+    return Profile
+
+
+def New_Cleanup(Profile, Pipette, Plate, Magnet, Columns, Beads, Ethanol, EBT, Wastes, Output, Reservoir_Heights, **Deck):
+    ## The deck of one clean-up. Ethanol: the two wash wells. Wastes: the supernatant wastes, then the two wash wastes.
+    ## Reservoir_Heights: aspiration height per column for reservoir wells drawn down column by column.
+    ## Deck (optional): heater_shaker and hs_location (Heater-Shaker mode), bead_tips (a rack whose tips add the beads to
+    ## the column of the well and remove its supernatant), ethanol_tips (a rack per wash whose tips add the ethanol from
+    ## column 1 and remove it from the column of the well), multi_dispense_tips (300 µL rack, column 1 and 2 for the
+    ## washes), ebt_tips (the tip that adds the elution buffer in Heater-Shaker mode), residual_pipette (the last ethanol
+    ## removal), name (prefix of the status messages) and offset (columns of the tip racks and output plate used by the
+    ## plate).
+    Cleanup = {"profile": Profile, "pipette": Pipette, "plate": Plate, "magnet": Magnet, "columns": Columns, "beads": Beads,
+               "ethanol": Ethanol, "ebt": EBT, "wastes": Wastes, "output": Output, "heights": Reservoir_Heights,
+               "heater_shaker": None, "hs_location": None, "bead_tips": None, "ethanol_tips": None, "multi_dispense_tips": None, "ebt_tips": None,
+               "residual_pipette": Pipette, "name": "", "offset": 0}
+    for Key in Deck:
+        if Key not in Cleanup:
+            raise KeyError("Unknown clean-up deck setting '" + str(Key) + "'")
+    Cleanup.update(Deck)
+    return Cleanup
+
+
+def _Place(Well, Place):
+    if Place is None:
+        return Well
+    if Place[0] == "top":
+        return Well.top(z = Place[1])
+    return Well.bottom(z = Place[1])
+
+
+def _Engage(Protocol, Cleanup, Liquid, Volume):
+    Profile = Cleanup["profile"]
+    Engage_Magnet(Protocol, Cleanup["magnet"], Cleanup["plate"], Profile["name"], Liquid, Volume, Default = (Profile["magnet_height"], Profile["settle"][Liquid]))
+
+
+def _To_Heater_Shaker(Protocol, Cleanup):
+    Move_Plate(Protocol, Cleanup["heater_shaker"], Cleanup["plate"], Cleanup["hs_location"])
+
+
+def _To_Magnet(Protocol, Cleanup):
+    Move_Plate(Protocol, Cleanup["heater_shaker"], Cleanup["plate"], Cleanup["magnet"])
+
+
+#### Clean-up steps ####
+def Add_Beads(Protocol, Cleanup):
+    ## Beads into every column, mixed in by pipetting (or on the Heater-Shaker, in Incubate_Beads).
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Class = Profile["classes"]["beads"]
+    Bead_Tips = Cleanup["bead_tips"]
+    Tip_Offset = Cleanup["offset"]*8
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Beads Transfer Begun")
+    for i in range(Cleanup["columns"]):
+        Well = Cleanup["plate"].wells()[i*8]
+        Pipette.pick_up_tip(Bead_Tips.wells()[Tip_Offset + i*8] if Bead_Tips is not None else None)
+        Source = Cleanup["beads"].bottom(z = Cleanup["heights"][i]) if Profile["beads_follow_level"] == True else Cleanup["beads"].bottom()
+        Aspirate_Liquid(Protocol, Pipette, Profile["bead_volume"], Source, Class, Mix = Profile["bead_mix"])
+        if Cleanup["heater_shaker"] is not None:
+            Dispense_Liquid(Protocol, Pipette, Profile["bead_volume"], _Place(Well, Profile["bead_dispense"]), Class)
+        else:
+            Dispense_Liquid(Protocol, Pipette, Profile["bead_volume"], _Place(Well, Profile["bead_dispense"]), Class,
+                            Mix = Profile["bead_dispense_mix"], Mix_Location = None if Profile["bead_dispense_mix_at"] is None else _Place(Well, Profile["bead_dispense_mix_at"]))
+        Pipette.return_tip()
+
+
+def Incubate_Beads(Protocol, Cleanup, Minutes, On_Deck = True):
+    ## Binding: shaking on the Heater-Shaker (at least a minute) and back to the magnet, waiting on deck, or off deck.
+    Profile = Cleanup["profile"]
+    if Cleanup["heater_shaker"] is not None:
+        Protocol.comment("STATUS: Heater-Shaker Beads Incubation begun. Plate is shaking for " + str(max(1, Minutes)) + " mins.")
+        Shake_Plate(Protocol, Cleanup["heater_shaker"], Profile["shake_speed"], max(1, Minutes))
+        _To_Magnet(Protocol, Cleanup)
+    elif On_Deck == True:
+        Protocol.comment("STATUS: " + Cleanup["name"] + "On-Deck Beads Incubation begun. Plate is incubating for " + str(Minutes) + " mins.")
+        Protocol.delay(minutes = Minutes)
+    else:
+        Protocol.pause("ACTION: Seal the " + Profile["plate_name"] + ". Spin it down. Incubate it for " + str(Minutes) + " mins"
+                       + (", " + Profile["incubation_conditions"] if Profile["incubation_conditions"] is not None else "")
+                       + ". Spin it down. Press RESUME, when the " + Profile["plate_name"] + " has been returned (without seal) to the magnet module.")
+
+
+def Remove_Supernatant(Protocol, Cleanup):
+    ## Engages the magnet for the binding volume and discards the supernatant of every column in one or more passes, with
+    ## the tips that added the beads when they come from a bead rack.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Class = Profile["classes"]["supernatant"]
+    Bead_Tips = Cleanup["bead_tips"]
+    Tip_Offset = Cleanup["offset"]*8
+    _Engage(Protocol, Cleanup, "beads", Profile["binding_volume"])
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Discarding Supernatant")
+    for i in range(Cleanup["columns"]):
+        Well = Cleanup["plate"].wells()[i*8]
+        Pipette.pick_up_tip(Bead_Tips.wells()[Tip_Offset + i*8] if Bead_Tips is not None else None)
+        for Waste, (Volume, Waste_Z, Flick) in zip(Cleanup["wastes"], Profile["supernatant_passes"]):
+            Aspirate_Liquid(Protocol, Pipette, Volume, Well.bottom(z = Profile["supernatant_z"]), Class)
+            Dispense_Liquid(Protocol, Pipette, Volume, Waste.top(z = Waste_Z), Class)
+            if Flick == True:
+                Pipette.move_to(location = Waste.top().move(types.Point(x = 0, y = -5, z = 2)))
+        Air_Gap(Pipette, Class)
+        Pipette.return_tip()
+
+
+def Wash_Beads(Protocol, Cleanup, Volume):
+    ## Two ethanol washes, the last ethanol removal and the drying of the beads.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Plate = Cleanup["plate"]
+    Columns = Cleanup["columns"]
+    Heights = Cleanup["heights"]
+    Ethanol_Class = Profile["classes"]["ethanol"]
+    Removal_Class = Profile["classes"]["ethanol_removal"]
+    Shaken = Cleanup["heater_shaker"] is not None and Profile["wash_mix"] is not None ## Resuspended on the Heater-Shaker
+    Tip_Offset = Cleanup["offset"]*8
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Ethanol Wash Begun")
+    for k in range(2):
+        Protocol.comment("STATUS: " + Cleanup["name"] + ("First" if k == 0 else "Second") + " Wash Begun")
+        Ethanol = Cleanup["ethanol"][k]
+        Waste = Cleanup["wastes"][len(Profile["supernatant_passes"]) + k]
+        Ethanol_Tips = Cleanup["ethanol_tips"][k] if Cleanup["ethanol_tips"] is not None else None
+        Dispense_Place = ("top", -2) if Shaken else Profile["ethanol_dispense"]
+
+        ## Adding ethanol - resuspended by pipetting with tips per column, or from one set of tips
+        if Profile["wash_mix"] is not None:
+            Cleanup["magnet"].disengage()
+        if Profile["wash_mix"] is not None and not Shaken:
+            Reps, Mix_Volume, Mix_Aspirate, Mix_Dispense = Profile["wash_mix"]
+            for i in range(Columns):
+                Well = Plate.wells()[i*8]
+                Pipette.pick_up_tip()
+                Aspirate_Liquid(Protocol, Pipette, Volume, Ethanol.bottom(z = Heights[i]), Ethanol_Class, Mix = Profile["ethanol_aspirate_mix"])
+                Dispense_Liquid(Protocol, Pipette, Volume, _Place(Well, Dispense_Place), Ethanol_Class)
+                for Rep in range(Reps):
+                    Pipette.aspirate(volume = Mix_Volume, location = Well.bottom(z = Mix_Aspirate), rate = Ethanol_Class["mix_rate"])
+                    Pipette.dispense(volume = Mix_Volume, location = Well.bottom(z = Mix_Dispense), rate = Ethanol_Class["mix_rate"])
+                Pipette.return_tip()
+        else:
+            if Shaken:
+                _To_Heater_Shaker(Protocol, Cleanup)
+            if Cleanup["multi_dispense_tips"] is not None:
+                Pipette.pick_up_tip(Cleanup["multi_dispense_tips"].columns()[k][0])
+            else:
+                Pipette.pick_up_tip(Ethanol_Tips.wells()[Tip_Offset] if Ethanol_Tips is not None else None)
+            if Profile["ethanol_premix"] is not None:
+                Pipette.mix(repetitions = Profile["ethanol_premix"][0], volume = Profile["ethanol_premix"][1], location = Ethanol.bottom(z = Heights[len(Heights)-2]), rate = Ethanol_Class["mix_rate"])
+            if Cleanup["multi_dispense_tips"] is not None:
+                ## Several columns per aspiration from 300 µL tips; the disposal volume is blown out into the waste below.
+                Sources = [Ethanol.bottom(z = Heights[i]) for i in range(Columns)]
+                Destinations = [_Place(Plate.wells()[i*8], Dispense_Place) for i in range(Columns)]
+                Aspirations = Multi_Dispense(Protocol, Pipette, Volume, Sources, Destinations, Ethanol_Class, Capacity = Tip_Capacity(Pipette, Cleanup["multi_dispense_tips"]), Mix = Profile["ethanol_aspirate_mix"])
+                Protocol.comment("Ethanol added to " + str(Columns) + " columns with " + str(Aspirations) + " aspirations")
+            else:
+                for i in range(Columns):
+                    Aspirate_Liquid(Protocol, Pipette, Volume, Ethanol.bottom(z = Heights[i]), Ethanol_Class, Mix = Profile["ethanol_aspirate_mix"])
+                    Dispense_Liquid(Protocol, Pipette, Volume, _Place(Plate.wells()[i*8], Dispense_Place), Ethanol_Class)
+            Pipette.blow_out(location = Waste) ## Blow out to remove potential droplets before returning.
+            Pipette.return_tip()
+            if Shaken:
+                Shake_Plate(Protocol, Cleanup["heater_shaker"], Profile["shake_speed"], Profile["wash_shake_minutes"])
+                _To_Magnet(Protocol, Cleanup)
+        if Profile["wash_mix"] is not None:
+            _Engage(Protocol, Cleanup, "ethanol", Volume)
+
+        ## Removing ethanol - with the tips that added it when they come from a wash rack
+        for i in range(Columns):
+            Well = Plate.wells()[i*8]
+            Pipette.pick_up_tip(Ethanol_Tips.wells()[Tip_Offset + i*8] if Ethanol_Tips is not None else None)
+            Aspirate_Liquid(Protocol, Pipette, Volume + Profile["ethanol_removal_extra"], Well.bottom(z = Profile["ethanol_removal_z"]), Removal_Class)
+            Dispense_Liquid(Protocol, Pipette, Volume + Profile["ethanol_removal_extra"], Waste.top(), Removal_Class)
+            Air_Gap(Pipette, Removal_Class) ## Takes in excess, outside droplets to limit cross-contamination.
+            Pipette.return_tip()
+
+    ## Extra ethanol removal step to remove leftover ethanol before drying beads.
+    if Profile["residual_removal"] is not None:
+        for i in range(Columns):
+            Cleanup["residual_pipette"].pick_up_tip()
+            Aspirate_Liquid(Protocol, Cleanup["residual_pipette"], Profile["residual_removal"][0], Plate.wells()[i*8].bottom(z = Profile["residual_removal"][1]), Profile["classes"]["ethanol_residual"])
+            Cleanup["residual_pipette"].return_tip()
+
+    ## Drying beads
+    Seconds = Profile["dry_seconds"] - Profile["dry_column_credit"]*(Columns - 1)
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Drying Beads - " + str(Seconds) + " s")
+    Protocol.delay(seconds = Seconds)
+
+
+def Add_Elution_Buffer(Protocol, Cleanup, Volume, Pause = True):
+    ## Elution buffer onto the beads, off the magnet. Heater-Shaker mode: from above the wells with one set of tips, then
+    ## the incubation on the Heater-Shaker and back to the magnet. Otherwise mixed in per column and incubated off deck:
+    ## the run pauses for it, or with Pause False (the plate scheduler) only says so.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Plate = Cleanup["plate"]
+    Cleanup["magnet"].disengage()
+    Protocol.comment("STATUS: " + Cleanup["name"] + "EBT Buffer Transfer begun")
+    if Cleanup["heater_shaker"] is not None:
+        _To_Heater_Shaker(Protocol, Cleanup)
+        Class = Profile["classes"]["ebt"]
+        Pipette.pick_up_tip(Cleanup["ebt_tips"])
+        for i in range(Cleanup["columns"]):
+            Aspirate_Liquid(Protocol, Pipette, Volume, Cleanup["ebt"].bottom(z = 1), Class)
+            Dispense_Liquid(Protocol, Pipette, Volume, Plate.wells()[i*8].top(z = -2), Class)
+        Pipette.return_tip()
+        Shake_Plate(Protocol, Cleanup["heater_shaker"], Profile["shake_speed"], Profile["elution_minutes"], Temperature = Profile["elution_temperature"])
+        _To_Magnet(Protocol, Cleanup)
+        return
+    Class = Profile["classes"]["ebt_mix"]
+    for i in range(Cleanup["columns"]):
+        Pipette.pick_up_tip()
+        Aspirate_Liquid(Protocol, Pipette, Volume, Cleanup["ebt"].bottom(z = 1), Class)
+        Dispense_Liquid(Protocol, Pipette, Volume, _Place(Plate.wells()[i*8], Profile["ebt_dispense"]), Class, Mix = Profile["ebt_mix"])
+        Pipette.return_tip()
+    Incubation = "Incubate it for " + str(Profile["elution_minutes"]) + " min at " + Profile["elution_conditions"]
+    if Pause == True:
+        Protocol.pause("ACTION: Seal the " + Profile["plate_name"] + " and spin it down shortly. " + Incubation + ". Press RESUME, when the "
+                       + Profile["plate_name"] + " has been returned (without seal) to the magnet module.")
+    else:
+        Protocol.comment("ACTION: " + Cleanup["name"] + "Seal the plate and spin it down shortly. " + Incubation + ", and return it (without seal) to the magnet module when asked.")
+
+
+def Transfer_Eluate(Protocol, Cleanup, Volume):
+    ## Engages the magnet and transfers the eluate of every column to the output plate, each with a fresh tip. Disengages
+    ## the magnet.
+    Profile = Cleanup["profile"]
+    Pipette = Cleanup["pipette"]
+    Plate = Cleanup["plate"]
+    _Engage(Protocol, Cleanup, "eluate", Volume)
+    Protocol.comment("STATUS: " + Cleanup["name"] + "Transfer of " + Profile["eluate_name"])
+    for i in range(Cleanup["columns"]):
+        Source = Plate.wells()[i*8].bottom(z = Profile["eluate_z"])
+        Destination = Cleanup["output"].wells()[Cleanup["offset"]*8 + i*8]
+        Pipette.transfer(volume = Volume + Profile["eluate_extra"], source = Source, dest = Destination, new_tip = 'always', trash = False, rate = Profile["classes"]["eluate"]["aspirate_rate"])
+    Cleanup["magnet"].disengage()
@@ -0,0 +1,89 @@
+######################
+### Column planner ###
+######################
+
+## Groups per-well work into column transfers for an 8-channel pipette. A column is done with the multichannel when all
+## its wells share the same key (e.g. adaptor concentration) and sit in consecutive rows from row A - a full column, or a
+## partial column picked up with the front nozzles. The remaining wells (mixed columns) are left for single-channel transfers.
+
+Plate_Rows = "ABCDEFGH"
+
+
+def Split_Well_Name(Well_Name):
+    ## "B12" -> ("B", 12)
+    return Well_Name[0].upper(), int(Well_Name[1:])
+
+
+def Plan_Column_Transfers(Well_Keys):
+    ## Well_Keys: {well name: key}. Returns (Column_Transfers, Single_Transfers), both sorted by key and then plate position,
+    ## so the source only changes once per key.
+    ## Column_Transfers: [{"key": key, "column": 1-12, "rows": number of rows from row A, "wells": [well names]}]
+    ## Single_Transfers: [(key, well name)]
+    Columns = {}
+    for Well_Name, Key in Well_Keys.items():
+        Row, Column = Split_Well_Name(Well_Name)
+        Columns.setdefault(Column, {})[Row] = Key
+
+    Column_Transfers = []
+    Single_Transfers = []
+    for Column in sorted(Columns):
+        Rows = Columns[Column]
+        Row_Count = len(Rows)
+        From_Row_A = all(Plate_Rows[i] in Rows for i in range(Row_Count))
+        if Row_Count > 1 and len(set(Rows.values())) == 1 and From_Row_A:
+            Column_Transfers.append({"key": Rows["A"], "column": Column, "rows": Row_Count,
+                                     "wells": [Plate_Rows[i] + str(Column) for i in range(Row_Count)]})
+        else:
+            for Row in sorted(Rows, key = Plate_Rows.index):
+                Single_Transfers.append((Rows[Row], Row + str(Column)))
+
+    Column_Transfers.sort(key = lambda Transfer: (Transfer["key"], Transfer["column"]))
+    Single_Transfers.sort(key = lambda Transfer: (Transfer[0], Split_Well_Name(Transfer[1])[1], Plate_Rows.index(Transfer[1][0])))
+    return Column_Transfers, Single_Transfers
+
+
+def Column_Target(Labware, Column, Rows):
+    ## Well to target with the primary nozzle: A1 for a full column, otherwise the front nozzle (H1) goes to the last row,
+    ## so that the used nozzles cover row A to the last row.
+    if Rows == 8:
+        return Labware.wells_by_name()["A" + str(Column)]
+    return Labware.wells_by_name()[Plate_Rows[Rows-1] + str(Column)]
+
+
+def Configure_Column_Nozzles(Pipette, Rows):
+    ## Full column: all nozzles. Partial column: the front nozzles H1 and up (OT-2 8-channels support 2-7 nozzles from H1).
+    ## One row: the front nozzle H1 alone, for single-well transfers with the multichannel.
+    ## configure_nozzle_layout replaces the pipette's tip racks, so they are passed on again.
+    from opentrons.protocol_api import ALL, PARTIAL_COLUMN, SINGLE
+    if Rows == 8:
+        Pipette.configure_nozzle_layout(style = ALL, tip_racks = Pipette.tip_racks)
+    elif Rows == 1:
+        Pipette.configure_nozzle_layout(style = SINGLE, start = "H1", tip_racks = Pipette.tip_racks)
+    else:
+        Pipette.configure_nozzle_layout(style = PARTIAL_COLUMN, start = "H1", end = Plate_Rows[8-Rows] + "1", tip_racks = Pipette.tip_racks)
+
+
+def Pick_Up_Column_Tips(Pipette, Rows):
+    ## The OT-2 has no automatic tip tracking for partial column layouts, so the tips are chosen here. The front nozzles take
+    ## tips from the bottom of a tip column, leaving the top rows for the next partial pick-up. Columns that are already
+    ## started are used first, so full columns stay available for the full-column steps. Has_Tip comes from the
+    ## run_estimator block.
+    if Rows == 8:
+        Pipette.pick_up_tip()
+        return
+    Started = []
+    Full = []
+    for Rack in Pipette.tip_racks:
+        for Column in Rack.columns():
+            Available = 0
+            while Available < 8 and Has_Tip(Pipette, Column[Available]):
+                Available += 1
+            if Available < Rows or any(Has_Tip(Pipette, Well) for Well in Column[Available:]):
+                continue
+            if Available == 8:
+                Full.append(Column[7])
+            else:
+                Started.append(Column[Available-1])
+    if not Started and not Full:
+        raise RuntimeError("No tip column with " + str(Rows) + " tips left for " + str(Pipette))
+    Pipette.pick_up_tip((Started + Full)[0])
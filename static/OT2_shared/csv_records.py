@@ -0,0 +1,58 @@
+###################
+### CSV records ###
+###################
+
+## Column access to the CSV input of a protocol without pandas, so the robot does not import pandas and numpy to run a
+## protocol (several seconds and most of the memory of a protocol run on the OT-2). Built from the rows of
+## parse_as_csv(): the first row is the header (without the byte order mark of Excel exports), fully blank rows are
+## dropped. Columns are lists of strings in CSV order: Records['WellPosition'][i], len(Records) rows, 'SampleID' in Records.
+## Float and Integer return typed arrays of a column, with Default for empty cells.
+
+class CSV_Records:
+    def __init__(self, Rows):
+        Rows = [Row for Row in Rows if any(str(Value).strip() for Value in Row)]
+        if not Rows:
+            raise ValueError("The CSV file is empty")
+        self.Columns = [str(Name).lstrip("\ufeff").strip() for Name in Rows[0]]
+        self.Data = {Name: [Row[Index] if Index < len(Row) else "" for Row in Rows[1:]] for Index, Name in enumerate(self.Columns)}
+        self.Rows = len(Rows) - 1
+
+    def __len__(self):
+        return self.Rows
+
+    def __contains__(self, Name):
+        return Name in self.Data
+
+    def __getitem__(self, Name):
+        if Name not in self.Data:
+            raise KeyError("The CSV file has no column " + str(Name) + " (columns: " + ", ".join(self.Columns) + ")")
+        return self.Data[Name]
+
+    def __setitem__(self, Name, Values):
+        Values = list(Values)
+        if len(Values) != self.Rows:
+            raise ValueError("Column " + str(Name) + " has " + str(len(Values)) + " values for " + str(self.Rows) + " rows")
+        if Name not in self.Data:
+            self.Columns.append(Name)
+        self.Data[Name] = Values
+
+    def Typed(self, Name, Type, Code, Default = None):
+        ## Column as an array of Code ("d" float, "q" integer). Empty cells become Default; without a Default they are an error.
+        from array import array
+        Values = array(Code)
+        for Row, Value in enumerate(self[Name]):
+            Value = str(Value).strip()
+            if Value == "" and Default is not None:
+                Values.append(Default)
+                continue
+            try:
+                Values.append(Type(Value))
+            except ValueError:
+                raise ValueError("Column " + str(Name) + " has " + repr(Value) + " in data row " + str(Row + 1) + " of the CSV file (header not counted) - expected a number")
+        return Values
+
+    def Float(self, Name, Default = None):
+        return self.Typed(Name, float, "d", Default)
+
+    def Integer(self, Name, Default = None):
+        return self.Typed(Name, lambda Value: int(float(Value)), "q", Default)
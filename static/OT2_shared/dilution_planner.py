@@ -0,0 +1,49 @@
+########################
+### Dilution planner ###
+########################
+
+## Plans all dilutions of a run up front, so the water can go into every dilution well in one distribute pass and the
+## sample can be added per column with a multichannel where the wells of a column share a dilution. A dilution is made in
+## the dilution plate well with the same position as the sample: Sample µL of sample + (Factor - 1) x Sample µL of water.
+## The sample volume is the smallest that gives enough diluted volume to pool from (plus a residual left in the well),
+## keeps the water pipettable, and is shared by the wells with the same factor in a column.
+
+def Dilution_Factor(Value):
+    ## Dilution column of the CSV input: "", 0 and 1 mean undiluted. Returns the factor as a float (0 for undiluted).
+    Factor = float(Value or 0)
+    if Factor in (0, 1):
+        return 0
+    if Factor < 1:
+        raise ValueError("Dilution factor " + str(Value) + " is not valid - use 0 (undiluted) or a factor above 1, e.g. 10 for 1:10")
+    return Factor
+
+
+def Plan_Dilutions(Samples, Minimum_Sample = 1, Minimum_Water = 5, Residual = 5, Well_Volume = 200, Step = 0.5):
+    ## Samples: [(well name, dilution factor, µL to pool from the dilution)] for the diluted samples.
+    ## Returns {well name: {"factor", "sample_ul", "water_ul", "pool_ul"}}. Sample volumes are rounded up to Step µL.
+    from math import ceil
+    Plan = {}
+    for Well_Name, Factor, Pool_Volume in Samples:
+        Sample = max(Minimum_Sample, (Pool_Volume + Residual) / Factor, Minimum_Water / (Factor - 1))
+        Plan[Well_Name] = {"factor": Factor, "sample_ul": ceil(Sample / Step) * Step, "pool_ul": Pool_Volume}
+
+    ## Wells with the same factor in a column share the largest sample volume, so they can be done as one column transfer.
+    Groups = {}
+    for Well_Name, Dilution in Plan.items():
+        Groups.setdefault((Well_Name[1:], Dilution["factor"]), []).append(Dilution)
+    for Group in Groups.values():
+        Sample = max(Dilution["sample_ul"] for Dilution in Group)
+        for Dilution in Group:
+            Dilution["sample_ul"] = Sample
+
+    for Well_Name, Dilution in Plan.items():
+        Dilution["water_ul"] = round(Dilution["sample_ul"] * (Dilution["factor"] - 1), 2)
+        if Dilution["sample_ul"] + Dilution["water_ul"] > Well_Volume:
+            raise ValueError("The 1:" + str(Dilution["factor"]) + " dilution for " + Well_Name + " needs "
+                             + str(Dilution["sample_ul"] + Dilution["water_ul"]) + " µL, more than the dilution wells hold (" + str(Well_Volume) + " µL)")
+    return Plan
+
+
+def Dilution_Keys(Plan):
+    ## {well name: (factor, sample µL)} for Plan_Column_Transfers - wells with the same key can share a column transfer.
+    return {Well_Name: (Dilution["factor"], Dilution["sample_ul"]) for Well_Name, Dilution in Plan.items()}
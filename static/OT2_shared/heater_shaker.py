@@ -0,0 +1,47 @@
+#####################
+### Heater-Shaker ###
+#####################
+
+## Mixing and incubating a whole plate on a Heater-Shaker instead of mixing column by column with the pipette. The plate
+## sits on the Heater-Shaker (on the adapter for its plate type) for mixing and incubations, and on the magnet for the bead
+## separations. The OT-2 has no gripper: plate moves are manual, and the run pauses for the operator to move the plate.
+## On the OT-2 an 8-channel pipette cannot go to the slots left and right of the Heater-Shaker, and only to tip racks in the
+## slots in front of and behind it. The Heater-Shaker heats (37-95 °C) but cannot cool.
+
+## Only plates seated in an adapter are shaken. Other plate types are refused: the Covaris AFA-TUBE plate, PCR strips in the
+## aluminium block and the Nunc 1.3 mL deepwell plate, which no Opentrons adapter definition can stack.
+Heater_Shaker_Adapters = {
+    "biorad_96_wellplate_200ul_pcr": "opentrons_96_pcr_adapter",
+}
+
+
+def Load_Heater_Shaker(Protocol, Slot, Plate_Type):
+    ## Returns (Heater-Shaker, plate location) - the adapter for the plate type. Load the plate on, and move it back to, the
+    ## plate location. The latch is closed, so the pipettes can reach the plate.
+    if Plate_Type not in Heater_Shaker_Adapters:
+        raise ValueError("The Heater-Shaker has no adapter for " + str(Plate_Type) + " - use one of: " + ", ".join(sorted(Heater_Shaker_Adapters))
+                         + ", or run without the Heater-Shaker")
+    Heater_Shaker = Protocol.load_module("heaterShakerModuleV1", Slot)
+    Location = Heater_Shaker.load_adapter(Heater_Shaker_Adapters[Plate_Type])
+    Heater_Shaker.close_labware_latch()
+    return Heater_Shaker, Location
+
+
+def Shake_Plate(Protocol, Heater_Shaker, Speed, Minutes, Temperature = None):
+    ## Shakes the plate at Speed rpm for Minutes, at Temperature °C (reached before shaking starts) if given.
+    Heater_Shaker.close_labware_latch()
+    if Temperature is not None:
+        Heater_Shaker.set_and_wait_for_temperature(Temperature)
+    Heater_Shaker.set_and_wait_for_shake_speed(Speed)
+    Protocol.delay(minutes = Minutes, msg = "Shaking at " + str(Speed) + " rpm for " + str(Minutes) + " min" + (" at " + str(Temperature) + " °C" if Temperature is not None else ""))
+    Heater_Shaker.deactivate_shaker()
+    if Temperature is not None:
+        Heater_Shaker.deactivate_heater()
+
+
+def Move_Plate(Protocol, Heater_Shaker, Plate, Location):
+    ## Manual plate move (e.g. to the magnet module or to the Heater-Shaker adapter): the run pauses until the operator has
+    ## moved the plate. The latch is open during the move and closed again afterwards.
+    Heater_Shaker.open_labware_latch()
+    Protocol.move_labware(Plate, Location, use_gripper = False)
+    Heater_Shaker.close_labware_latch()
@@ -0,0 +1,56 @@
+#####################
+### Index mapping ###
+#####################
+
+## Primer transfers from a sample -> index well sheet, so the index set of several index plates can be used in any order
+## without re-racking primers. Each index well holds a unique dual-index primer pair. Sample columns whose wells all take
+## their primers from the same rows of one index column are done as (partial) column transfers with the 8-channel; the
+## remapped wells are done one by one. Needs the column_planner block.
+## Sheet columns: WellPosition (sample well), IndexPlate (1, 2, ...), IndexWell, and optionally i7 and i5 (index names
+## or sequences), which are checked for combinations that occur twice in the pool.
+
+def Index_Map(Records, Index_Plates):
+    ## {sample well: (index plate, index well)} from the CSV records. Fails for repeated sample wells, index wells used for
+    ## two samples, index plates that are not loaded and i7 + i5 combinations that are not unique in the pool.
+    Map = {}
+    Used = {}
+    Combinations = {}
+    for i in range(len(Records)):
+        Sample_Well = str(Records['WellPosition'][i]).strip().upper()
+        Plate = int(Records['IndexPlate'][i] or 1)
+        Index_Well = str(Records['IndexWell'][i]).strip().upper()
+        for Well_Name in (Sample_Well, Index_Well):
+            if len(Well_Name) < 2 or Well_Name[0] not in Plate_Rows or not Well_Name[1:].isdigit() or not 1 <= int(Well_Name[1:]) <= 12:
+                raise ValueError("Well " + repr(Well_Name) + " in the index sheet is not a 96 well plate position")
+        if Sample_Well in Map:
+            raise ValueError("Sample well " + Sample_Well + " is in the index sheet twice")
+        if not 1 <= Plate <= Index_Plates:
+            raise ValueError("Index plate " + str(Plate) + " for " + Sample_Well + " is not loaded (" + str(Index_Plates) + " index plate(s))")
+        if (Plate, Index_Well) in Used:
+            raise ValueError("Index plate " + str(Plate) + " well " + Index_Well + " is used for both " + Used[(Plate, Index_Well)] + " and " + Sample_Well)
+        if 'i7' in Records and 'i5' in Records and (Records['i7'][i] or Records['i5'][i]):
+            Combination = (str(Records['i7'][i]).strip().upper(), str(Records['i5'][i]).strip().upper())
+            if Combination in Combinations:
+                raise ValueError("The index combination " + "+".join(Combination) + " of " + Sample_Well + " is also used for " + Combinations[Combination])
+            Combinations[Combination] = Sample_Well
+        Map[Sample_Well] = (Plate, Index_Well)
+        Used[(Plate, Index_Well)] = Sample_Well
+    return Map
+
+
+def Plan_Primer_Transfers(Map):
+    ## (Column_Transfers, Single_Transfers):
+    ## Column_Transfers: [{"plate", "index_column", "column", "rows"}] - rows A and down of the index column to the same rows.
+    ## Single_Transfers: [{"plate", "index_well", "well"}]
+    Keys = {}
+    for Sample_Well, (Plate, Index_Well) in Map.items():
+        Index_Row, Index_Column = Split_Well_Name(Index_Well)
+        Aligned = Index_Row == Split_Well_Name(Sample_Well)[0]
+        Keys[Sample_Well] = (Plate, Index_Column) if Aligned else (Plate, Index_Column, Index_Row, Sample_Well) ## Remapped wells never share a key
+    Columns, Singles = Plan_Column_Transfers(Keys)
+    ## Full columns first, so they still find full tip columns after the partial pick-ups.
+    Column_Transfers = [{"plate": Transfer["key"][0], "index_column": Transfer["key"][1], "column": Transfer["column"], "rows": Transfer["rows"]}
+                        for Transfer in sorted(Columns, key = lambda Transfer: (-Transfer["rows"], Transfer["key"], Transfer["column"]))]
+    Single_Transfers = sorted(({"plate": Map[Well][0], "index_well": Map[Well][1], "well": Well} for Key, Well in Singles),
+                              key = lambda Transfer: Transfer["plate"])
+    return Column_Transfers, Single_Transfers
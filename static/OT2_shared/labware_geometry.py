@@ -0,0 +1,111 @@
+########################
+### Labware geometry ###
+########################
+
+## Liquid height from volume (and back) for the wells the protocols aspirate from. The labware definitions describe a
+## well as a plain cylinder or box (depth and diameter or length and width); the shape of the bottom, which holds the
+## last and most critical microlitres, is added here per labware (Well_Bottoms, from the manufacturer drawings in
+## static/custom_labware). The first query for a labware builds its table once - the volume held below every 0.1 mm of
+## well height - and later queries are a binary search and a linear interpolation in that table.
+## Minimum_Height is the lowest aspiration height (mm above the well bottom) the tip can reach in the bottom shape.
+## Labware without an entry get no table: Geometry_Of returns None and the callers keep their own estimate.
+
+Well_Bottoms = {
+    ## Covaris AFA-TUBE TPX plate: 5.2 mm tubes, tapering to a conical tip over the lowest 6 mm
+    "96afatubetpxplate_96_wellplate_200ul": {"shape": "cone", "depth": 6.0, "tip": 1.5, "minimum_height": 1.0},
+    ## LVL XSX 200 and LX 1000 tubes: round bottoms
+    "LVLXSX200_wellplate_200ul": {"shape": "round", "depth": 3.25, "minimum_height": 0.5},
+    "LVLLX1000_wellplate_1000ul": {"shape": "round", "depth": 3.275, "minimum_height": 0.5},
+    ## PCR strips (0.2 mL tubes) in the aluminium blocks
+    "bioplastics_96_aluminumblock_100ul": {"shape": "cone", "depth": 9.0, "tip": 1.5, "minimum_height": 1.0},
+    "opentrons_96_aluminumblock_generic_pcr_strip_200ul": {"shape": "cone", "depth": 11.0, "tip": 1.5, "minimum_height": 1.0},
+    ## Eppendorf 5.0 mL tubes: 13.3 mm, conical over the lowest 21.3 mm to a 3.3 mm tip
+    "opentronsrack_15_tuberack_5000ul": {"shape": "cone", "depth": 21.28, "tip": 3.3, "minimum_height": 1.5},
+    ## Eppendorf Safe-Lock 2.0 mL tubes: round bottoms
+    "opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap": {"shape": "round", "depth": 4.4, "minimum_height": 1.0},
+    ## 12 channel deep well reservoir: V-shaped troughs across the channel width
+    "deepwellreservoir_12channel_21000ul": {"shape": "v", "depth": 3.0, "minimum_height": 0.7},
+}
+
+Table_Step = 0.1 ## mm between the heights of a table
+_Geometries = {} ## Load name: Well_Geometry, built on first use
+
+
+class Well_Geometry:
+    def __init__(self, Depth, Bottom, Diameter = None, Length = None, Width = None):
+        ## Circular wells have a Diameter, rectangular wells a Length (x) and Width (y); a "v" bottom narrows across the Length.
+        from array import array
+        from math import pi
+        self.Depth = Depth
+        self.Minimum_Height = Bottom.get("minimum_height", 1.0)
+        Steps = int(Depth / Table_Step) + 1
+        Areas = array("d", [0.0]) * (Steps + 1)
+        for Step in range(Steps + 1):
+            Height = min(Depth, Step * Table_Step)
+            Inside = Height < Bottom["depth"] ## In the bottom shape
+            if Diameter is not None:
+                Radius = Diameter / 2
+                if Inside and Bottom["shape"] == "cone":
+                    Radius = Bottom["tip"] / 2 + (Radius - Bottom["tip"] / 2) * Height / Bottom["depth"]
+                elif Inside and Bottom["shape"] == "round":
+                    Radius = max(0.0, Radius ** 2 - (Bottom["depth"] - Height) ** 2) ** 0.5
+                Areas[Step] = pi * Radius ** 2
+            else:
+                Across = Length * Height / Bottom["depth"] if Inside and Bottom["shape"] == "v" else Length
+                Areas[Step] = Across * Width
+        ## Volumes[i]: µL (mm³) held below height i * Table_Step, from the cross sections (trapezoid rule)
+        self.Volumes = array("d", [0.0]) * (Steps + 1)
+        for Step in range(1, Steps + 1):
+            self.Volumes[Step] = self.Volumes[Step - 1] + (Areas[Step - 1] + Areas[Step]) / 2 * Table_Step
+
+    def Height(self, Volume):
+        ## Liquid height (mm above the well bottom) of Volume µL; the well depth when it is fuller than the well.
+        from bisect import bisect_left
+        if Volume <= 0:
+            return 0.0
+        Step = bisect_left(self.Volumes, Volume)
+        if Step >= len(self.Volumes):
+            return self.Depth
+        Below = self.Volumes[Step - 1]
+        return min(self.Depth, (Step - 1 + (Volume - Below) / (self.Volumes[Step] - Below)) * Table_Step)
+
+    def Volume(self, Height):
+        ## µL held below Height mm.
+        Position = max(0.0, min(Height, self.Depth)) / Table_Step
+        Step = min(int(Position), len(self.Volumes) - 2)
+        return self.Volumes[Step] + (self.Volumes[Step + 1] - self.Volumes[Step]) * (Position - Step)
+
+    def Heights(self, Volumes):
+        return [self.Height(Volume) for Volume in Volumes]
+
+
+def Geometry_Of(Well):
+    ## The geometry table of the well's labware, or None for labware without a bottom shape in Well_Bottoms.
+    Load_Name = Well.parent.load_name
+    if Load_Name not in _Geometries:
+        Bottom = Well_Bottoms.get(Load_Name)
+        if Bottom is None:
+            _Geometries[Load_Name] = None
+        elif Well.diameter is not None:
+            _Geometries[Load_Name] = Well_Geometry(Well.depth, Bottom, Diameter = Well.diameter)
+        else:
+            _Geometries[Load_Name] = Well_Geometry(Well.depth, Bottom, Length = Well.length, Width = Well.width)
+    return _Geometries[Load_Name]
+
+
+def Aspiration_Height(Well, Volume, Immersion = 2, Minimum_Height = 0):
+    ## Height (mm above the bottom) to aspirate from a well that holds Volume µL after the aspiration: Immersion mm below
+    ## the liquid, but not below the labware's minimum height or Minimum_Height. None for labware without a geometry.
+    Geometry = Geometry_Of(Well)
+    if Geometry is None:
+        return None
+    return max(Minimum_Height, Geometry.Minimum_Height, Geometry.Height(Volume) - Immersion)
+
+
+def Draw_Heights(Well, Start_Volume, Volumes, Immersion = 2, Minimum_Height = 0):
+    ## Aspiration heights for successive draws of Volumes µL from a well that starts with Start_Volume µL.
+    Heights = []
+    for Volume in Volumes:
+        Start_Volume -= Volume
+        Heights.append(Aspiration_Height(Well, max(0, Start_Volume), Immersion, Minimum_Height))
+    return Heights
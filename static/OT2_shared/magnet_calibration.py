@@ -0,0 +1,58 @@
+##########################
+### Magnet calibration ###
+##########################
+
+## Engage height and settle time of the magnetic module per workflow, labware, liquid and volume in the well. The table is
+## keyed by workflow (the clean-up profile, static/OT2_shared/bead_cleanup.py) first, as the same labware is engaged at
+## different heights in different clean-ups (the Bio-Rad PCR plate: 10 mm in BEST, 14 mm in Index PCR purification).
+## Engage heights are in mm from the labware base (height_from_base). Settle times are the shortest wait (seconds) after
+## which the supernatant was clear, for wells holding up to the given volume (µL) of the liquid:
+##   "beads": sample + bead buffer (binding), "ethanol": ethanol wash, "eluate": beads in elution buffer.
+## A point measured for a larger volume is also safe for smaller volumes, so the smallest point at or above the volume in
+## the well is used. The table is written by tools/fit_magnet_calibration.py from bench measurements.
+## The first entries are the heights and waits the protocols were validated with.
+
+#### Calibration table ####
+Magnet_Calibration = {
+    "BEST": {
+        "96afatubetpxplate_96_wellplate_200ul": {"height": 10, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}},
+        "biorad_96_wellplate_200ul_pcr": {"height": 10, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}}},
+    "DREX": {
+        "thermoscientificnunc_96_wellplate_1300ul": {"height": 12, "settle": {
+            "beads": [(400, 180)],
+            "ethanol": [(180, 120)],
+            "eluate": [(100, 180)]}}},
+    "IndexPCR": {
+        "biorad_96_wellplate_200ul_pcr": {"height": 14, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}},
+        "opentrons_96_aluminumblock_generic_pcr_strip_200ul": {"height": 14, "settle": {
+            "beads": [(125, 300)],
+            "eluate": [(100, 300)]}}},
+}
+#### End calibration table ####
+
+
+def Magnet_Settings(Workflow, Labware_Name, Liquid, Volume, Default):
+    ## (engage height, settle seconds) for a plate holding Volume µL of Liquid in a workflow. Default (height, seconds) is used
+    ## for workflows, labware or liquids without calibration; above the calibrated volumes the wait is the longest of the
+    ## calibrated and default wait.
+    Entry = Magnet_Calibration.get(Workflow, {}).get(Labware_Name)
+    if Entry is None or Liquid not in Entry["settle"]:
+        return Default
+    Points = sorted(Entry["settle"][Liquid])
+    for Point_Volume, Seconds in Points:
+        if Volume <= Point_Volume:
+            return Entry["height"], Seconds
+    return Entry["height"], max(Default[1], Points[-1][1])
+
+
+def Engage_Magnet(Protocol, Magnet, Labware, Workflow, Liquid, Volume, Default):
+    ## Engages the magnet at the calibrated height for the plate in the workflow and waits the calibrated settle time.
+    Height, Seconds = Magnet_Settings(Workflow, Labware.load_name, Liquid, Volume, Default)
+    Magnet.engage(height_from_base = Height)
+    Protocol.delay(seconds = Seconds, msg = "Magnet engaged at " + str(Height) + " mm - " + str(Seconds) + " s for the beads to settle")
@@ -0,0 +1,34 @@
+######################
+### Multi-dispense ###
+######################
+
+## One aspiration serving several columns, e.g. ethanol added from the top of the wells without contact. The columns are
+## grouped up front from the tip capacity: each aspiration takes the volume for its group plus a disposal volume that
+## stays in the tip (the last dispense of a group is as accurate as the first) and is blown out when the step is done.
+## When only one column fits, the transfers are the same single aspirate-dispense cycles as without multi-dispense.
+## Uses Aspirate_Liquid and Dispense_Liquid, so the protocol needs the liquid_classes block as well.
+
+def Dispense_Groups(Count, Volume, Capacity, Disposal_Volume = 20):
+    ## Splits Count destinations (in run order) into lists of indices that share one aspiration.
+    Per_Aspiration = max(1, int((Capacity - Disposal_Volume) // Volume))
+    return [list(range(Start, min(Count, Start + Per_Aspiration))) for Start in range(0, Count, Per_Aspiration)]
+
+
+def Tip_Capacity(Pipette, Tip_Rack):
+    ## Largest volume the pipette can hold with tips from the rack (µL).
+    return min(Pipette.max_volume, Tip_Rack.wells()[0].max_volume)
+
+
+def Multi_Dispense(Protocol, Pipette, Volume, Sources, Destinations, Profile, Capacity, Disposal_Volume = 20, Mix = None):
+    ## Dispenses Volume µL to every destination with the tip already on the pipette. Sources holds the aspiration location
+    ## for each destination (e.g. following the reservoir level); a group aspirates at the source of its last destination.
+    ## The disposal volume is left in the tip - blow it out (e.g. into the waste) before returning the tip.
+    ## Returns the number of aspirations.
+    Groups = Dispense_Groups(len(Destinations), Volume, Capacity, Disposal_Volume)
+    Disposal = Disposal_Volume if max(len(Group) for Group in Groups) > 1 else 0
+    for Group in Groups:
+        Aspirate_Volume = len(Group) * Volume + Disposal - Pipette.current_volume
+        Aspirate_Liquid(Protocol, Pipette, Aspirate_Volume, Sources[Group[-1]], Profile, Mix = Mix)
+        for Index in Group:
+            Dispense_Liquid(Protocol, Pipette, Volume, Destinations[Index], Profile)
+    return len(Groups)
@@ -0,0 +1,49 @@
+#####################
+### Normalisation ###
+#####################
+
+## DNA and water volumes that bring every sample to the same mass in the same volume, computed for the whole plate at once
+## from the DNA concentrations of the CSV input. Volumes are rounded to 0.1 µL and kept pipettable: DNA volumes are clamped
+## between the pipette minimum and the target volume, and water volumes below the pipette minimum are added as DNA instead.
+## Samples that cannot reach the target mass (too dilute) or that would need less than the pipette minimum (too
+## concentrated) are flagged, and get the closest volumes that can be pipetted. Samples whose water is added as DNA get
+## more than the target mass, and are flagged too.
+
+Too_Dilute = "too dilute"
+Too_Concentrated = "too concentrated"
+Above_Target = "above target mass"
+
+
+def Normalise(Concentrations, Target_Mass, Target_Volume, Minimum_Volume = 1, Maximum_Volume = None):
+    ## Concentrations: ng/µL per sample, in CSV order. Returns {"DNAul", "Waterul", "DNAng" (the mass that is transferred),
+    ## "Flag" ("", Too_Dilute, Too_Concentrated or Above_Target)}, each a list in the same order.
+    if Maximum_Volume is not None and Target_Volume > Maximum_Volume:
+        raise ValueError("Target volume " + str(Target_Volume) + " µL is more than the destination wells hold (" + str(Maximum_Volume) + " µL)")
+    Concentration = []
+    Invalid = []
+    for Row, Value in enumerate(Concentrations):
+        try:
+            Value = float(Value)
+        except (TypeError, ValueError):
+            Value = float("nan")
+        if not Value >= 0: ## Also true for NaN
+            Invalid.append(Row)
+        Concentration.append(Value)
+    if Invalid:
+        raise ValueError("DNAconc is missing or not a valid concentration for the samples in data rows "
+                         + ", ".join(str(Row + 1) for Row in Invalid) + " of the CSV file (header not counted)")
+
+    Normalised = {"DNAul": [], "Waterul": [], "DNAng": [], "Flag": []}
+    for Value in Concentration:
+        Needed = Target_Mass / Value if Value > 0 else float("inf") ## µL DNA for the target mass
+        DNA = round(min(max(Needed, Minimum_Volume), Target_Volume), 1)
+        Water = round(Target_Volume - DNA, 1)
+        Raised = 0 < Water < Minimum_Volume ## The water cannot be pipetted: the DNA fills up to the target volume
+        if Water < Minimum_Volume:
+            DNA, Water = Target_Volume, 0.0
+        Normalised["DNAul"].append(DNA)
+        Normalised["Waterul"].append(Water)
+        Normalised["DNAng"].append(round(DNA * Value, 1))
+        Normalised["Flag"].append(Too_Dilute if Needed > Target_Volume else Too_Concentrated if Needed < Minimum_Volume
+                                  else Above_Target if Raised else "")
+    return Normalised
@@ -0,0 +1,93 @@
+#######################
+### Plate scheduler ###
+#######################
+
+## Interleaves the stages of several plates on one robot with one magnetic module. The stages of a plate run in their own
+## order; a stage takes the robot for its estimated time and may be followed by a wait (bead incubation, off-deck elution
+## incubation) in which the robot works on the other plates. The next stage is picked when the previous one is done, on
+## the run clock: the stage that can start first, and of stages that can start now the one of the plate that has been
+## ready longest (then the plate listed first). So a plate whose wait is over goes next, and the robot only waits for the
+## time left of a wait. With one plate the stages run in their own order.
+## The magnet is never booked for two plates. A plate on the magnet keeps it until it leaves the deck after a stage with
+## Release, or gives it up after a stage with Park (the plate is moved off the deck, and back for its next stage).
+## Reservoir wells are not scheduled: the pipette is used by one stage at a time, so plates that share a reservoir only
+## need their own wells for liquids whose height is followed from column to column (e.g. ethanol) and for waste.
+
+def Plate_Stage(Plate, Name, Seconds, Wait = 0, Magnet = False, Park = False, Release = False):
+    ## Plate: index of the plate. Seconds: estimated robot time. Wait: seconds the plate waits after the stage.
+    ## Magnet: the plate is on the magnet for the stage. Park: after the stage the plate can be moved off the magnet for
+    ## another plate. Release: the plate leaves the magnet (and the deck) after the stage.
+    return {"plate": Plate, "name": Name, "seconds": Seconds, "wait": Wait, "magnet": Magnet, "park": Park, "release": Release}
+
+
+def New_Plate_Schedule(Protocol, Stages):
+    ## Stages of all plates, each plate's stages in run order. Ready: run clock at which each plate can go on, Holder: the
+    ## plate on the magnet. A simulation takes no time, so it runs on the modelled
+    ## clock of the stage estimates.
+    Plates = []
+    for Stage in Stages:
+        if Stage["plate"] not in Plates:
+            Plates.append(Stage["plate"])
+    return {"protocol": Protocol, "plates": Plates, "queues": {Plate: [Stage for Stage in Stages if Stage["plate"] == Plate] for Plate in Plates},
+            "ready": {Plate: 0.0 for Plate in Plates}, "holder": None, "parkable": False, "model": 0.0, "start": None}
+
+
+def Run_Clock(Schedule):
+    ## Seconds on the run clock: the modelled clock of a run time estimate or of the stages in a simulation, otherwise the
+    ## robot's own clock.
+    import time
+    Protocol = Schedule["protocol"]
+    if hasattr(Protocol, "Estimate"):
+        return Protocol.Estimate["clock"]
+    if Protocol.is_simulating():
+        return Schedule["model"]
+    if Schedule["start"] is None:
+        Schedule["start"] = time.monotonic()
+    return time.monotonic() - Schedule["start"]
+
+
+def _Pick_Stage(Schedule, Clock):
+    Holder = Schedule["holder"]
+    Candidates = []
+    for Index, Plate in enumerate(Schedule["plates"]):
+        Queue = Schedule["queues"][Plate]
+        if not Queue:
+            continue
+        Stage = Queue[0]
+        Start = max(Clock, Schedule["ready"][Plate])
+        if Stage["magnet"] and Holder not in (None, Plate) and not Schedule["parkable"]:
+            continue
+        Candidates.append((Start, Schedule["ready"][Plate], Index, Plate))
+    if not Candidates:
+        raise ValueError("The plate stages cannot be scheduled: plate " + str(Holder) + " keeps the magnet, as none of its stages releases it")
+    Start, Ready, Index, Plate = min(Candidates)
+    return dict(Schedule["queues"][Plate].pop(0), start = Start)
+
+
+def Next_Plate_Stage(Schedule):
+    ## The next stage to run, or None when all stages are done. Waits for the time left of the plate's wait. The stage's
+    ## "move_off" is the plate to move off the magnet first (the plate on it, at a Park), or None.
+    if not any(Schedule["queues"].values()):
+        return None
+    Clock = Run_Clock(Schedule)
+    Stage = _Pick_Stage(Schedule, Clock)
+    Remaining = Stage["start"] - Clock
+    if Remaining >= 1:
+        Schedule["protocol"].delay(seconds = round(Remaining), msg = "Waiting for the incubation of the plate to finish")
+    Schedule["model"] = Stage["start"]
+    Stage["move_off"] = None
+    if Stage["magnet"] and Schedule["holder"] not in (None, Stage["plate"]):
+        Stage["move_off"] = Schedule["holder"]
+    if Stage["magnet"]:
+        Schedule["holder"] = Stage["plate"]
+    return Stage
+
+
+def Finish_Plate_Stage(Schedule, Stage):
+    ## Starts the wait after a stage and frees the magnet at a Park or Release.
+    Schedule["model"] = Stage["start"] + Stage["seconds"]
+    Schedule["ready"][Stage["plate"]] = Run_Clock(Schedule) + Stage["wait"]
+    if Schedule["holder"] == Stage["plate"]:
+        Schedule["parkable"] = Stage["park"]
+    if Stage["release"]:
+        Schedule["holder"] = None
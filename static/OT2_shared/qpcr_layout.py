@@ -0,0 +1,51 @@
+###################
+### qPCR layout ###
+###################
+
+## Places the sample columns (and a standards column) of up to four input plates, with technical replicates, on a 96 or
+## 384 well qPCR plate for column transfers with an 8-channel. The channels are 9 mm apart, so on a 384 well plate a column
+## transfer fills every other row of a column: one column of one of the four interleaved 96 well quadrants
+## (A1, A2, B1 and B2 are the first wells of quadrants 1-4). Slots (quadrant, column) are filled column by column through
+## the four quadrants, so the replicates of a sample end up in neighbouring wells, and every column of a quadrant can be
+## served from one aspiration of master mix.
+
+Quadrant_Offsets = [(0, 0), (0, 1), (1, 0), (1, 1)] ## (row, column) offset of the first well of quadrants 1-4
+
+
+def Layout_Slots(Output_Wells):
+    ## Destination slots in fill order: [(quadrant 1-4, column 1-12)]. A 96 well plate has one quadrant.
+    Quadrants = 4 if Output_Wells == 384 else 1
+    return [(Quadrant, Column) for Column in range(1, 13) for Quadrant in range(1, Quadrants + 1)]
+
+
+def Plan_qPCR_Layout(Sample_Columns, Replicates, Output_Wells, Standards = False):
+    ## Sample_Columns: [(plate number, column)] in run order. With Standards the standards column comes first, as source
+    ## ("standards", 1). Returns [{"source": (plate, column), "replicate": 1-Replicates, "quadrant": 1-4, "column": 1-12}].
+    Sources = ([("standards", 1)] if Standards else []) + list(Sample_Columns)
+    Slots = Layout_Slots(Output_Wells)
+    if len(Sources) * Replicates > len(Slots):
+        raise ValueError(str(len(Sources)) + " columns (samples" + (" and standards" if Standards else "") + ") in " + str(Replicates)
+                         + " replicate(s) need " + str(len(Sources) * Replicates) + " columns, but the " + str(Output_Wells)
+                         + " well qPCR plate has " + str(len(Slots)) + ". Use fewer samples or replicates, or the 384 well plate.")
+    Layout = []
+    for Source in Sources:
+        for Replicate in range(1, Replicates + 1):
+            Quadrant, Column = Slots[len(Layout)]
+            Layout.append({"source": Source, "replicate": Replicate, "quadrant": Quadrant, "column": Column})
+    return Layout
+
+
+def Slot_Target(Plate, Quadrant, Column):
+    ## Well the back nozzle (A1) goes to for a slot.
+    Row_Offset, Column_Offset = Quadrant_Offsets[Quadrant - 1]
+    if len(Plate.columns()) == 12:
+        return Plate.columns()[Column - 1][0]
+    return Plate.columns()[2 * (Column - 1) + Column_Offset][Row_Offset]
+
+
+def Slot_Wells(Plate, Quadrant, Column):
+    ## The eight wells of the plate filled by a column transfer to the slot.
+    Row_Offset, Column_Offset = Quadrant_Offsets[Quadrant - 1]
+    if len(Plate.columns()) == 12:
+        return Plate.columns()[Column - 1]
+    return Plate.columns()[2 * (Column - 1) + Column_Offset][Row_Offset::2]
@@ -0,0 +1,81 @@
+##################
+### Run report ###
+##################
+
+## Per-sample provenance for LIMS import. The protocol adds one record per sample while it runs (kept in memory) and writes
+## the whole report once at the end, as a CSV and a JSON file in the robot's user storage - no file I/O per step.
+## Records hold the source and destination, the volumes pipetted, the tips used and the time.
+
+Report_Directory = "/data/user_storage/run_reports" ## Persistent storage on the OT-2
+
+
+def New_Run_Report(Protocol_Name):
+    from datetime import datetime
+    return {"protocol": Protocol_Name, "started": datetime.now().isoformat(timespec = "seconds"), "records": []}
+
+
+def _Slot(Labware):
+    ## Deck slot of labware, also when it sits on a module or an adapter.
+    Parent = Labware.parent
+    while Parent is not None and not isinstance(Parent, str):
+        Parent = Parent.parent
+    return Parent or "off-deck"
+
+
+def _Tip_Order(Tip):
+    Slot, Well_Name = Tip.split(":")
+    return Slot, int(Well_Name[1:]), Well_Name[0]
+
+
+def New_Tip_Tracker(Pipettes):
+    ## The tips left in the racks of the pipettes, collected once at the start. Used_Tips then finds the tips each step
+    ## used. Has_Tip comes from the run_estimator block.
+    return {"left": {_Slot(Rack) + ":" + Well.well_name: (Pipette, Well) for Pipette in Pipettes for Rack in Pipette.tip_racks
+                     for Well in Rack.wells() if Has_Tip(Pipette, Well)}}
+
+
+def Used_Tips(Tracker):
+    ## "slot:well" of the tips picked up since the last call, e.g. "4:A1 4:B1". Only the tips still left are checked, and
+    ## the used ones are dropped from the tracker.
+    Used = [Tip for Tip, (Pipette, Well) in Tracker["left"].items() if not Has_Tip(Pipette, Well)]
+    for Tip in Used:
+        del Tracker["left"][Tip]
+    return " ".join(sorted(Used, key = _Tip_Order))
+
+
+def Record_Sample(Report, **Fields):
+    ## Adds a record with the given fields (e.g. Sample_ID, Source_Well, Destination_Well, DNA_ul, Tips) and the time.
+    from datetime import datetime
+    Record = dict(Fields)
+    Record["Time"] = datetime.now().isoformat(timespec = "seconds")
+    Report["records"].append(Record)
+
+
+def Well_Label(Well):
+    ## Slot and well of a well, e.g. "3:B5".
+    return _Slot(Well.parent) + ":" + Well.well_name
+
+
+def Write_Run_Report(Protocol, Report, Directory = Report_Directory):
+    ## Writes <protocol>_<start time>.csv and .json. Nothing is written when the protocol is simulated or analysed.
+    import csv
+    import json
+    import os
+    if Protocol.is_simulating():
+        Protocol.comment("Run report: " + str(len(Report["records"])) + " sample records (not written in simulation)")
+        return None
+    os.makedirs(Directory, exist_ok = True)
+    Base = os.path.join(Directory, Report["protocol"] + "_" + Report["started"].replace(":", "").replace("-", ""))
+    Columns = []
+    for Record in Report["records"]:
+        for Key in Record:
+            if Key not in Columns:
+                Columns.append(Key)
+    with open(Base + ".csv", "w", newline = "", encoding = "utf-8") as Handle:
+        Writer = csv.DictWriter(Handle, fieldnames = Columns, delimiter = ";")
+        Writer.writeheader()
+        Writer.writerows(Report["records"])
+    with open(Base + ".json", "w", encoding = "utf-8") as Handle:
+        json.dump(Report, Handle, indent = 1)
+    Protocol.comment("Run report: " + str(len(Report["records"])) + " sample records written to " + Base + ".csv/.json")
+    return Base
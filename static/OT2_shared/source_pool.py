@@ -0,0 +1,50 @@
+###################
+### Source pool ###
+###################
+
+## Volume bookkeeping for a reagent (e.g. water) drawn from several tubes or reservoir wells. The whole run is planned up
+## front from the CSV input, so a run that needs more than the loaded sources fails before any pipetting, and a transfer is
+## never split over two sources - a source is skipped when the next transfer would take it below its dead volume.
+## Aspiration heights follow the remaining volume, so the tip only goes as deep as needed. Needs the labware_geometry block.
+
+def Plan_Sources(Sources, Volumes, Dead_Volume = 50):
+    ## Sources: [(Well, start volume in µL)] in the order they are used. Volumes: µL per transfer in run order.
+    ## Returns one entry per transfer - {"source": Well, "index": source number, "remaining": µL left after the aspiration}
+    ## - or None for transfers of 0 µL.
+    Plan = []
+    Index = 0
+    Remaining = [Volume for Well, Volume in Sources]
+    for Transfer, Volume in enumerate(Volumes):
+        if Volume <= 0:
+            Plan.append(None)
+            continue
+        while Index < len(Sources) and Remaining[Index] - Volume < Dead_Volume:
+            Index += 1
+        if Index == len(Sources):
+            Needed = sum(Volume for Volume in Volumes if Volume > 0)
+            Usable = sum(Volume - Dead_Volume for Well, Volume in Sources)
+            raise ValueError("Not enough volume in the " + str(len(Sources)) + " source(s) for transfer " + str(Transfer + 1) + ": "
+                             + str(round(Needed, 1)) + " µL needed in total, " + str(round(Usable, 1)) + " µL usable. Add more sources.")
+        Remaining[Index] -= Volume
+        Plan.append({"source": Sources[Index][0], "index": Index, "remaining": Remaining[Index]})
+    return Plan
+
+
+def Source_Usage(Sources, Plan):
+    ## µL drawn from each source according to the plan (for the liquid setup and the run log).
+    Usage = [0] * len(Sources)
+    for Entry in Plan:
+        if Entry is not None:
+            Usage[Entry["index"]] = Sources[Entry["index"]][1] - Entry["remaining"]
+    return Usage
+
+
+def Source_Location(Entry, Immersion = 2, Minimum_Height = 2):
+    ## Aspiration location for a planned transfer: Immersion mm below the liquid level that remains after the aspiration.
+    ## The level comes from the well shape (labware_geometry); for labware without one it is estimated linearly from the
+    ## well depth and maximum volume.
+    Well = Entry["source"]
+    Height = Aspiration_Height(Well, Entry["remaining"], Immersion, Minimum_Height)
+    if Height is None:
+        Height = max(Minimum_Height, Well.depth * Entry["remaining"] / Well.max_volume - Immersion)
+    return Well.bottom(z = Height)
@@ -0,0 +1,43 @@
+#####################
+### Thermal model ###
+#####################
+
+## Ramp time estimates for the thermocycler, so the lid pre-heat and the block cool-down can run while the robot pipettes.
+## Rates are conservative averages (°C/s) per module model; block cooling slows down below ambient temperature, where
+## the Peltier elements pump heat against the room. The estimates only time the waits of simulations and run time
+## estimates: on the robot the block temperature is polled until it is reached. Starting module tasks (start_set_...) needs API level 2.27.
+
+Thermal_Rates = {
+    "thermocyclerModuleV1": {"block_heating": 1.5, "block_cooling": 0.8, "block_cooling_below_ambient": 0.15, "lid_heating": 0.25, "ambient": 25},
+    "thermocyclerModuleV2": {"block_heating": 2.0, "block_cooling": 1.0, "block_cooling_below_ambient": 0.2, "lid_heating": 0.3, "ambient": 25},
+}
+
+
+def Block_Ramp_Seconds(Model, Start, End):
+    ## Estimated seconds for the block to go from Start to End °C.
+    Rates = Thermal_Rates[Model]
+    if End >= Start:
+        return (End - Start) / Rates["block_heating"]
+    Above = max(0, Start - max(End, Rates["ambient"]))
+    Below = max(0, min(Start, Rates["ambient"]) - End)
+    return Above / Rates["block_cooling"] + Below / Rates["block_cooling_below_ambient"]
+
+
+def Lid_Ramp_Seconds(Model, Start, End):
+    ## Estimated seconds for the lid to heat from Start to End °C.
+    return max(0, End - Start) / Thermal_Rates[Model]["lid_heating"]
+
+
+def Cool_Block(Protocol, Thermocycler, Target, Threshold, Start, Block_Max_Volume):
+    ## Starts cooling the block to Target and returns (without waiting for Target) once the block is at or below Threshold,
+    ## e.g. to open the lid and pipette while the block keeps cooling. Start is the block temperature (°C) at the call.
+    ## Returns the cooling task - pass it to Protocol.wait_for_tasks before the next thermocycler step.
+    Task = Thermocycler.start_set_block_temperature(Target, block_max_volume = Block_Max_Volume)
+    if Protocol.is_simulating() or Thermocycler.block_temperature is None:
+        Seconds = round(Block_Ramp_Seconds(Thermocycler.model, Start, Threshold))
+        Protocol.delay(seconds = Seconds, msg = "Block cooling from " + str(Start) + " to " + str(Threshold) + " °C (estimated " + str(Seconds) + " s)")
+        return Task
+    Protocol.comment("Block cooling from " + str(Start) + " to " + str(Threshold) + " °C")
+    while Thermocycler.block_temperature is not None and Thermocycler.block_temperature > Threshold:
+        Protocol.delay(seconds = 5)
+    return Task
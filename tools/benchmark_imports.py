@@ -0,0 +1,115 @@
+########################
+### Import benchmark ###
+########################
+
+## Measures what loading and running a protocol costs on top of the opentrons API: the time to execute the protocol file
+## (its imports and shared blocks, as the robot does when a protocol is loaded), the peak memory (RSS) of the process and
+## whether pandas ended up imported. Every measurement runs in a fresh Python process, so earlier imports do not hide the
+## cost of later ones; the opentrons API is imported before the clock starts, as it is already loaded on the robot.
+## --against runs the same measurements on the protocol from another git revision (e.g. before a change), and the
+## import of pandas itself is measured as a reference.
+## Usage: python tools/benchmark_imports.py <protocol> [name=value ...] [name=@file.csv ...] [--against REV] [--repeat N]
+## Example: python tools/benchmark_imports.py static/OT2_protocols/ProtocolV2_PoolCombiner_OT2.py PoolSheet=@sheet.csv --against HEAD~1
+
+#### Package loading ####
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from simulate_protocol import Parse_Parameter
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Tools_Dir = os.path.dirname(os.path.abspath(__file__))
+
+
+## Runs in the fresh process. Modes: "pandas" (import pandas), "load" (execute the protocol file) and "run" (simulate it).
+Child_Code = """
+import json, resource, sys, time
+Args = json.loads(sys.argv[1])
+sys.path.insert(0, Args["tools"])
+import opentrons.protocol_api
+if Args["mode"] == "run":
+    from simulate_protocol import Simulate
+Scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+Before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / Scale
+Start = time.perf_counter()
+if Args["mode"] == "pandas":
+    import pandas
+elif Args["mode"] == "load":
+    with open(Args["protocol"], encoding = "utf-8") as Handle:
+        exec(compile(Handle.read(), Args["protocol"], "exec"), {"__name__": "protocol"})
+else:
+    Simulate(Args["protocol"], Args["values"], Args["files"])
+Seconds = time.perf_counter() - Start
+Peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / Scale
+print(json.dumps({"seconds": Seconds, "peak_mb": Peak, "added_mb": Peak - Before, "pandas": "pandas" in sys.modules}))
+"""
+
+
+def Measure(Mode, Protocol_Path = None, Values = None, Files = None):
+    ## One measurement in a fresh process: {"seconds", "peak_mb", "added_mb" (peak RSS above the opentrons API), "pandas"}.
+    Args = {"mode": Mode, "protocol": Protocol_Path, "values": Values or {}, "files": Files or {}, "tools": Tools_Dir}
+    Result = subprocess.run([sys.executable, "-c", Child_Code, json.dumps(Args)], capture_output = True, text = True)
+    if Result.returncode != 0:
+        raise RuntimeError(Mode + " measurement failed:\n" + Result.stderr.strip())
+    return json.loads(Result.stdout.strip().splitlines()[-1])
+
+
+def Measure_Repeated(Repeat, Mode, Protocol_Path = None, Values = None, Files = None):
+    ## Median time and memory of Repeat measurements.
+    Results = [Measure(Mode, Protocol_Path, Values, Files) for _ in range(Repeat)]
+    Summary = {Key: statistics.median(Result[Key] for Result in Results) for Key in ("seconds", "peak_mb", "added_mb")}
+    Summary["pandas"] = any(Result["pandas"] for Result in Results)
+    return Summary
+
+
+def Revision_Protocol(Revision, Protocol_Path, Folder):
+    ## Writes the protocol as it is in a git revision to Folder and returns its path.
+    Relative = os.path.relpath(os.path.abspath(Protocol_Path), Repo_Dir).replace(os.sep, "/")
+    Source = subprocess.run(["git", "-C", Repo_Dir, "show", Revision + ":" + Relative], capture_output = True, check = True).stdout
+    Path = os.path.join(Folder, os.path.basename(Protocol_Path))
+    with open(Path, "wb") as Handle:
+        Handle.write(Source)
+    return Path
+
+
+def Format_Row(Label, Step, Summary):
+    return (Label.ljust(14) + Step.ljust(8) + (str(round(Summary["seconds"], 2)) + " s").rjust(10)
+            + (str(round(Summary["peak_mb"], 1)) + " MB").rjust(12) + (str(round(Summary["added_mb"], 1)) + " MB").rjust(12)
+            + ("yes" if Summary["pandas"] else "no").rjust(8))
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Measure the import time and peak memory of loading and simulating a protocol.")
+    Parser.add_argument("protocol", help = "Protocol file.")
+    Parser.add_argument("parameters", nargs = "*", type = Parse_Parameter, help = "Runtime parameters: name=value or name=@file.csv.")
+    Parser.add_argument("--against", help = "Also measure the protocol from this git revision, e.g. HEAD~1.")
+    Parser.add_argument("--repeat", type = int, default = 3, help = "Measurements per step (the median is reported).")
+    Args = Parser.parse_args(argv)
+
+    Values = {Name: Value for Name, Value, Path in Args.parameters if Path is None}
+    Files = {Name: os.path.abspath(Path) for Name, Value, Path in Args.parameters if Path is not None}
+    print("".ljust(14) + "Step".ljust(8) + "Time".rjust(10) + "Peak RSS".rjust(12) + "Added".rjust(12) + "pandas".rjust(8))
+    print(Format_Row("import pandas", "", Measure_Repeated(Args.repeat, "pandas")))
+    with tempfile.TemporaryDirectory() as Folder:
+        Protocols = [("working tree", Args.protocol)]
+        if Args.against:
+            Protocols.append((Args.against, Revision_Protocol(Args.against, Args.protocol, Folder)))
+        for Label, Protocol_Path in Protocols:
+            print(Format_Row(Label, "load", Measure_Repeated(Args.repeat, "load", Protocol_Path)))
+            try:
+                print(Format_Row(Label, "run", Measure_Repeated(Args.repeat, "run", Protocol_Path, Values, Files)))
+            except RuntimeError as Error:
+                print(Label + ": " + str(Error))
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
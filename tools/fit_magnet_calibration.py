@@ -0,0 +1,131 @@
+##############################
+### Magnet calibration fit ###
+##############################
+
+## Turns bench measurements of bead settling into the calibration table in static/OT2_shared/magnet_calibration.py.
+## Measurements CSV (semicolon separated, one row per replicate):
+##     workflow;labware;liquid;volume_ul;height_mm;clear_seconds
+## workflow is the clean-up profile the measurement was made for (DREX, BEST or IndexPCR). clear_seconds is the time after
+## engaging at which the supernatant was clear. Per workflow and labware, the engage height with the shortest waits
+## (measured for all liquids and volumes of that labware) is chosen. The settle time of a point is the
+## slowest replicate times a safety factor, rounded up; a larger volume never gets a shorter wait than a smaller one.
+## Usage: python tools/fit_magnet_calibration.py measurements.csv [--safety 1.25] [--write]
+## --write replaces the measured labware of the measured workflows in the table (other entries are kept); run tools/sync_shared_blocks.py afterwards.
+
+#### Package loading ####
+import argparse
+import csv
+import math
+import os
+import re
+import sys
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Shared_Dir = os.path.join(Repo_Dir, "static", "OT2_shared")
+Calibration_Path = os.path.join(Shared_Dir, "magnet_calibration.py")
+
+Table_Pattern = re.compile(r"^#### Calibration table ####\n.*?^#### End calibration table ####\n", re.MULTILINE | re.DOTALL)
+Columns = ["workflow", "labware", "liquid", "volume_ul", "height_mm", "clear_seconds"]
+
+
+def Read_Measurements(Path):
+    ## {(workflow, labware): {height: {(liquid, volume): [clear seconds]}}}
+    Measurements = {}
+    with open(Path, encoding = "utf-8-sig", newline = "") as Handle:
+        Reader = csv.DictReader(Handle, delimiter = ";")
+        Missing = [Column for Column in Columns if Column not in (Reader.fieldnames or [])]
+        if Missing:
+            raise SystemExit("Missing columns in " + Path + ": " + ", ".join(Missing))
+        for Row in Reader:
+            Height = float(Row["height_mm"])
+            Height = int(Height) if Height.is_integer() else Height
+            Point = (Row["liquid"], float(Row["volume_ul"]))
+            Measurements.setdefault((Row["workflow"], Row["labware"]), {}).setdefault(Height, {}).setdefault(Point, []).append(float(Row["clear_seconds"]))
+    return Measurements
+
+
+def Safe_Seconds(Clear_Seconds, Safety, Round_To, Minimum):
+    return max(Minimum, int(math.ceil(max(Clear_Seconds) * Safety / Round_To) * Round_To))
+
+
+def Fit_Labware(Heights, Safety, Round_To, Minimum):
+    ## Returns the table entry {"height": h, "settle": {liquid: [(volume, seconds)]}} for one labware.
+    Points = set()
+    for Groups in Heights.values():
+        Points.update(Groups)
+    Best = None
+    for Height, Groups in sorted(Heights.items()):
+        if set(Groups) != Points:
+            continue ## Only heights measured for every liquid and volume are compared
+        Settle = {}
+        for Liquid, Volume in sorted(Points):
+            Settle.setdefault(Liquid, []).append((Volume, Safe_Seconds(Groups[(Liquid, Volume)], Safety, Round_To, Minimum)))
+        for Liquid in Settle:
+            Longest = 0
+            for i, (Volume, Seconds) in enumerate(Settle[Liquid]):
+                Longest = max(Longest, Seconds)
+                Settle[Liquid][i] = (int(Volume) if Volume.is_integer() else Volume, Longest)
+        Total = sum(Seconds for Liquid_Points in Settle.values() for Volume, Seconds in Liquid_Points)
+        if Best is None or Total < Best[0]:
+            Best = (Total, {"height": Height, "settle": Settle})
+    if Best is None:
+        raise SystemExit("No engage height was measured for all liquids and volumes: " + ", ".join(str(Height) for Height in sorted(Heights)))
+    return Best[1]
+
+
+def Render_Table(Table):
+    Lines = ["#### Calibration table ####", "Magnet_Calibration = {"]
+    for Workflow in sorted(Table):
+        Lines.append("    " + repr(Workflow) + ": {")
+        Labwares = sorted(Table[Workflow])
+        for j, Labware in enumerate(Labwares):
+            Entry = Table[Workflow][Labware]
+            Lines.append("        " + repr(Labware) + ": {\"height\": " + repr(Entry["height"]) + ", \"settle\": {")
+            Liquids = list(Entry["settle"])
+            for i, Liquid in enumerate(Liquids):
+                End = "," if i < len(Liquids) - 1 else "}}}," if j == len(Labwares) - 1 else "}},"
+                Lines.append("            " + repr(Liquid) + ": " + repr(sorted(Entry["settle"][Liquid])) + End)
+    Lines += ["}", "#### End calibration table ####"]
+    return "\n".join(Lines).replace("'", "\"") + "\n"
+
+
+def Current_Table():
+    sys.path.insert(0, Shared_Dir)
+    from magnet_calibration import Magnet_Calibration
+    return {Workflow: dict(Entries) for Workflow, Entries in Magnet_Calibration.items()}
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Fit the magnet calibration table from bench measurements.")
+    Parser.add_argument("measurements", help = "CSV with workflow;labware;liquid;volume_ul;height_mm;clear_seconds.")
+    Parser.add_argument("--safety", type = float, default = 1.25, help = "Factor on the slowest replicate (default 1.25).")
+    Parser.add_argument("--round-to", type = int, default = 15, help = "Round settle times up to this many seconds.")
+    Parser.add_argument("--minimum", type = int, default = 60, help = "Shortest settle time in seconds.")
+    Parser.add_argument("--write", action = "store_true", help = "Update static/OT2_shared/magnet_calibration.py.")
+    Args = Parser.parse_args(argv)
+
+    Fitted = {Key: Fit_Labware(Heights, Args.safety, Args.round_to, Args.minimum) for Key, Heights in Read_Measurements(Args.measurements).items()}
+    Table = Current_Table()
+    for Workflow, Labware in sorted(Fitted):
+        Old = Table.get(Workflow, {}).get(Labware)
+        print(Workflow + ", " + Labware + ": height " + str(Fitted[(Workflow, Labware)]["height"]) + " mm" + ("" if Old is None else " (was " + str(Old["height"]) + " mm)"))
+        for Liquid, Points in Fitted[(Workflow, Labware)]["settle"].items():
+            Was = "" if Old is None or Liquid not in Old["settle"] else " (was " + str(sorted(Old["settle"][Liquid])) + ")"
+            print("  " + Liquid + ": " + ", ".join(str(Volume) + " uL -> " + str(Seconds) + " s" for Volume, Seconds in Points) + Was)
+        Table.setdefault(Workflow, {})[Labware] = Fitted[(Workflow, Labware)]
+
+    if Args.write:
+        with open(Calibration_Path, encoding = "utf-8", newline = "") as Handle:
+            Text = Handle.read()
+        Newline = "\r\n" if "\r\n" in Text else "\n"
+        Text = Table_Pattern.sub(lambda Match: Render_Table(Table), Text.replace("\r\n", "\n"))
+        with open(Calibration_Path, "w", encoding = "utf-8", newline = Newline) as Handle:
+            Handle.write(Text)
+        print("Updated " + Calibration_Path + " - run tools/sync_shared_blocks.py to copy it into the protocols.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+####################
+### Fleet deploy ###
+####################
+
+## Uploads protocols (with the custom labware they use) to several OT-2s at once and starts and follows runs on them,
+## through the robot HTTP API (port 31950). The robots are worked on concurrently with asyncio; each robot has a small
+## pool of keep-alive connections, so the requests to a robot reuse the same sockets instead of connecting per request.
+## Stdlib only: the blocking http.client requests run in worker threads.
+## Usage:
+##     python tools/fleet_deploy.py --robot HOST[:PORT] [--robot ...] health
+##     python tools/fleet_deploy.py --robot ... deploy [protocol.py ...]      (default: every protocol in static/OT2_protocols)
+##     python tools/fleet_deploy.py --robot ... run protocol.py [name=value ...] [name=@file.csv ...] [--wait]
+## run uploads the protocol and CSV files, creates the run with the runtime parameters and starts it; --wait follows the
+## runs until they end. Try it against tools/mock_robot_server.py: --robot localhost:31950.
+
+#### Package loading ####
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import sys
+import time
+import uuid
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Protocol_Dir = os.path.join(Repo_Dir, "static", "OT2_protocols")
+Custom_Labware_Dir = os.path.join(Repo_Dir, "static", "custom_labware")
+
+Robot_Port = 31950
+Final_Run_Statuses = ["succeeded", "failed", "stopped"]
+
+
+class Robot_Error(RuntimeError):
+    ## Raised for requests the robot cannot be reached for or refuses.
+    pass
+
+
+class Robot:
+    def __init__(self, Address, Connections = 2, Timeout = 60):
+        Host, Colon, Port = Address.partition(":")
+        self.Name = Address
+        self.Host = Host
+        self.Port = int(Port) if Colon else Robot_Port
+        self.Timeout = Timeout
+        self.Connections = Connections
+        self.Opened = 0 ## Connections opened so far
+        self.Pool = None
+
+    def _Connect(self):
+        self.Opened += 1
+        return http.client.HTTPConnection(self.Host, self.Port, timeout = self.Timeout)
+
+    async def _Acquire(self):
+        ## An idle connection of the pool, a new one while the pool is not full, or the next one to be released.
+        if self.Pool is None:
+            self.Pool = asyncio.Queue()
+        if self.Pool.empty() and self.Opened < self.Connections:
+            return self._Connect()
+        return await self.Pool.get()
+
+    def _Send(self, Connection, Method, Path, Body, Content_Type):
+        Headers = {"Opentrons-Version": "*"}
+        if Body is not None:
+            Headers["Content-Type"] = Content_Type
+        Connection.request(Method, Path, body = Body, headers = Headers)
+        Response = Connection.getresponse()
+        Raw = Response.read()
+        return Response.status, json.loads(Raw) if Raw else {}
+
+    async def Request(self, Method, Path, Body = None, Content_Type = "application/json"):
+        ## The JSON response. Body: a dict (sent as JSON) or bytes with their Content_Type.
+        if isinstance(Body, dict):
+            Body = json.dumps(Body).encode("utf-8")
+        Connection = await self._Acquire()
+        try:
+            try:
+                Status, Data = await asyncio.to_thread(self._Send, Connection, Method, Path, Body, Content_Type)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                ## The robot closed an idle keep-alive connection: the request is sent again on a new one.
+                Connection.close()
+                Status, Data = await asyncio.to_thread(self._Send, Connection, Method, Path, Body, Content_Type)
+        except (OSError, http.client.HTTPException, ValueError) as Error:
+            Connection.close()
+            raise Robot_Error(Method + " " + Path + " failed: " + str(Error))
+        finally:
+            self.Pool.put_nowait(Connection)
+        if Status >= 400:
+            raise Robot_Error(Method + " " + Path + " -> " + str(Status) + " " + Error_Text(Data))
+        return Data
+
+    def Close(self):
+        while self.Pool is not None and not self.Pool.empty():
+            self.Pool.get_nowait().close()
+
+
+def Error_Text(Data):
+    ## The error messages of an API error response.
+    Errors = Data.get("errors", []) if isinstance(Data, dict) else []
+    return "; ".join(str(Error.get("detail") or Error.get("title") or Error) for Error in Errors) or json.dumps(Data)[:200]
+
+
+def Multipart(Files, Field):
+    ## (body, content type) for uploading Files ([path]) as the form field Field.
+    Boundary = uuid.uuid4().hex
+    Body = b""
+    for Path in Files:
+        with open(Path, "rb") as Handle:
+            Content = Handle.read()
+        Body += ("--" + Boundary + "\r\nContent-Disposition: form-data; name=\"" + Field + "\"; filename=\"" + os.path.basename(Path)
+                 + "\"\r\nContent-Type: application/octet-stream\r\n\r\n").encode("utf-8") + Content + b"\r\n"
+    Body += ("--" + Boundary + "--\r\n").encode("utf-8")
+    return Body, "multipart/form-data; boundary=" + Boundary
+
+
+def Protocol_Labware(Protocol_Path, Labware_Dir = Custom_Labware_Dir):
+    ## The custom labware definitions whose load name is in the protocol.
+    with open(Protocol_Path, encoding = "utf-8") as Handle:
+        Source = Handle.read()
+    Files = []
+    for File_Name in sorted(os.listdir(Labware_Dir)):
+        if File_Name.endswith(".json"):
+            with open(os.path.join(Labware_Dir, File_Name), encoding = "utf-8") as Handle:
+                Load_Name = json.load(Handle)["parameters"]["loadName"]
+            if "'" + Load_Name + "'" in Source or '"' + Load_Name + '"' in Source:
+                Files.append(os.path.join(Labware_Dir, File_Name))
+    return Files
+
+
+#### Robot actions ####
+async def Health(Robot):
+    Data = await Robot.Request("GET", "/health")
+    return Data.get("name", "?") + " (robot software " + str(Data.get("api_version", "?")) + ")"
+
+
+async def Upload_Protocol(Robot, Protocol_Path, Poll = 1.0):
+    ## Uploads the protocol with its custom labware and waits for the robot's analysis. Returns the protocol id. The robot
+    ## keeps one copy of identical uploads. Protocols with CSV parameters are analysed when a run gets the files.
+    Body, Content_Type = Multipart([Protocol_Path] + Protocol_Labware(Protocol_Path), "files")
+    Data = (await Robot.Request("POST", "/protocols", Body, Content_Type))["data"]
+    while True:
+        Analyses = (await Robot.Request("GET", "/protocols/" + Data["id"] + "/analyses"))["data"]
+        if Analyses and Analyses[-1]["status"] == "completed":
+            break
+        await asyncio.sleep(Poll)
+    Analysis = Analyses[-1]
+    if Analysis.get("result") not in ["ok", "parameter-value-required"]:
+        raise Robot_Error("the analysis of " + os.path.basename(Protocol_Path) + " failed: "
+                          + "; ".join(str(Error.get("detail", Error)) for Error in Analysis.get("errors", [])))
+    return Data["id"]
+
+
+async def Upload_Data_File(Robot, Path):
+    Body, Content_Type = Multipart([Path], "file")
+    return (await Robot.Request("POST", "/dataFiles", Body, Content_Type))["data"]["id"]
+
+
+async def Start_Run(Robot, Protocol_Path, Values, Files):
+    ## Uploads the protocol and CSV files, creates the run with the runtime parameters and starts it. Returns the run id.
+    Protocol_Id = await Upload_Protocol(Robot, Protocol_Path)
+    File_Ids = {}
+    for Name, Path in Files.items():
+        File_Ids[Name] = await Upload_Data_File(Robot, Path)
+    Run = (await Robot.Request("POST", "/runs", {"data": {"protocolId": Protocol_Id, "runTimeParameterValues": Values, "runTimeParameterFiles": File_Ids}}))["data"]
+    await Robot.Request("POST", "/runs/" + Run["id"] + "/actions", {"data": {"actionType": "play"}})
+    return Run["id"]
+
+
+async def Follow_Run(Robot, Run_Id, Poll = 5.0):
+    ## Reports the status changes of a run until it ends. Returns the final status.
+    Status = None
+    while Status not in Final_Run_Statuses:
+        Run = (await Robot.Request("GET", "/runs/" + Run_Id))["data"]
+        if Run["status"] != Status:
+            Status = Run["status"]
+            print(Robot.Name + ": run " + Run_Id + " " + Status + (" - " + Error_Text(Run) if Run.get("errors") else ""))
+        if Status not in Final_Run_Statuses:
+            await asyncio.sleep(Poll)
+    return Status
+
+
+#### Fleet ####
+async def On_Fleet(Robots, Action):
+    ## Runs Action(robot) on all robots at once. Returns {robot name: result or Robot_Error}.
+    async def Guarded(Robot):
+        try:
+            return await Action(Robot)
+        except Robot_Error as Error:
+            return Error
+        finally:
+            Robot.Close()
+    Results = await asyncio.gather(*[Guarded(Robot) for Robot in Robots])
+    return {Robot.Name: Result for Robot, Result in zip(Robots, Results)}
+
+
+def Report(Results, Start):
+    ## Prints the result per robot; returns the exit code (1 when a robot failed).
+    for Name, Result in Results.items():
+        print(Name + ": " + ("FAILED - " + str(Result) if isinstance(Result, Robot_Error) else str(Result)))
+    print(str(len(Results)) + " robot(s) in " + str(round(time.perf_counter() - Start, 1)) + " s")
+    return 1 if any(isinstance(Result, Robot_Error) for Result in Results.values()) else 0
+
+
+def main(argv = None):
+    from simulate_protocol import Parse_Parameter
+    Parser = argparse.ArgumentParser(description = "Upload protocols to, and start runs on, several OT-2s at once.")
+    Parser.add_argument("--robot", dest = "robots", action = "append", required = True, help = "Robot address, HOST or HOST:PORT (repeat for more robots).")
+    Parser.add_argument("--connections", type = int, default = 2, help = "Pooled connections per robot.")
+    Commands = Parser.add_subparsers(dest = "command", required = True)
+    Commands.add_parser("health", help = "Robot name and software version.")
+    Deploy_Parser = Commands.add_parser("deploy", help = "Upload protocols with their custom labware.")
+    Deploy_Parser.add_argument("protocols", nargs = "*", help = "Protocol files (default: all protocols in static/OT2_protocols).")
+    Run_Parser = Commands.add_parser("run", help = "Upload a protocol and start a run with runtime parameters and CSV files.")
+    Run_Parser.add_argument("protocol", help = "Protocol file.")
+    Run_Parser.add_argument("parameters", nargs = "*", type = Parse_Parameter, help = "Runtime parameters: name=value or name=@file.csv.")
+    Run_Parser.add_argument("--wait", action = "store_true", help = "Follow the runs until they end.")
+    Args = Parser.parse_args(argv)
+
+    Robots = [Robot(Address, Connections = Args.connections) for Address in Args.robots]
+    Start = time.perf_counter()
+    if Args.command == "health":
+        return Report(asyncio.run(On_Fleet(Robots, Health)), Start)
+
+    if Args.command == "deploy":
+        Protocols = Args.protocols or [os.path.join(Protocol_Dir, File_Name) for File_Name in sorted(os.listdir(Protocol_Dir)) if File_Name.endswith(".py")]
+
+        async def Deploy(Robot):
+            Ids = await asyncio.gather(*[Upload_Protocol(Robot, Path) for Path in Protocols])
+            return str(len(Ids)) + " protocol(s) uploaded"
+        return Report(asyncio.run(On_Fleet(Robots, Deploy)), Start)
+
+    Values = {Name: Value for Name, Value, Path in Args.parameters if Path is None}
+    Files = {Name: Path for Name, Value, Path in Args.parameters if Path is not None}
+
+    async def Run(Robot):
+        Run_Id = await Start_Run(Robot, Args.protocol, Values, Files)
+        if Args.wait:
+            Status = await Follow_Run(Robot, Run_Id)
+            if Status != "succeeded":
+                raise Robot_Error("run " + Run_Id + " " + Status)
+            return "run " + Run_Id + " succeeded"
+        return "run " + Run_Id + " started"
+    return Report(asyncio.run(On_Fleet(Robots, Run)), Start)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
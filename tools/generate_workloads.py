@@ -0,0 +1,192 @@
+##########################
+### Workload generator ###
+##########################
+
+## Writes seeded, synthetic input sheets for the cherry-pick protocols, for benchmarking and stress-testing them in the
+## simulator. The sheets use the same semicolon separated schema (and UTF-8 BOM / CRLF) as the templates in
+## static/other_templates, with realistic value distributions:
+##   - library sheets (CovarisSetup, BEST-Library): log-normal DNA concentrations, so most samples need the full 25 µL of
+##     DNA and no water, with a long tail of concentrated samples that are diluted with water; 10/20 mM adaptors by input.
+##   - pool sheets (PoolCombiner): log-normal pooling volumes and a fraction of samples to dilute.
+## Sample counts above 96 are split over several plates (one sheet per plate). Sparse layouts pick random wells.
+## --edge-cases adds adversarial sheets: zero volumes, the 5 µL (library) and 10 µL (pool) pipette boundaries,
+## water above the capacity of the water tubes and adaptor concentrations alternating within every column.
+## --simulate runs every sheet through the matching protocols with tools/simulate_protocol.py.
+## Usage: python tools/generate_workloads.py --kind library --samples 384 --seed 1 --layout sparse --edge-cases --out workloads
+
+#### Package loading ####
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Protocol_Dir = os.path.join(Repo_Dir, "static", "OT2_protocols")
+
+
+#### Sheet schemas ####
+Library_Columns = ["SampleNumber", "WellPosition", "EXBarcode", "SampleID", "DNAconc", "DNAul", "Waterul", "Adaptor", "Notes"]
+Pool_Columns = ["SampleNumber", "WellPosition", "SampleID", "SampleVolume", "Dilution", "Notes"]
+
+## Protocols and CSV parameter per sheet kind
+Sheet_Protocols = {
+    "library": [("ProtocolV2_CovarisSetup_OT2.py", "DNAnormalisingwells"), ("ProtocolV2_BEST-Library_OT2.py", "AdaptorConc")],
+    "pool": [("ProtocolV2_PoolCombiner_OT2.py", "PoolSheet")],
+}
+
+Plate_Wells = [Row + str(Column) for Column in range(1, 13) for Row in "ABCDEFGH"] ## Column-wise, as in the templates
+Library_Volume = 25 ## µL of DNA + water in the Covaris tube
+Library_Input = 200 ## ng DNA aimed for in the library
+Adaptor_20mM_Input = 100 ## ng DNA from which the 20 mM adaptor is used
+
+
+#### Well layouts ####
+def Plate_Sizes(Samples):
+    ## Sample counts per plate, e.g. 200 -> [96, 96, 8].
+    if Samples < 1 or Samples > 384:
+        raise SystemExit("Sample count must be between 1 and 384, got " + str(Samples))
+    Sizes = [96] * (Samples // 96)
+    if Samples % 96:
+        Sizes.append(Samples % 96)
+    return Sizes
+
+def Plate_Layout(Rng, Samples, Layout):
+    ## Dense: the first wells column by column. Sparse: random wells, kept in column-wise order.
+    if Layout == "dense":
+        return Plate_Wells[:Samples]
+    Picked = sorted(Rng.choice(len(Plate_Wells), size = Samples, replace = False))
+    return [Plate_Wells[i] for i in Picked]
+
+
+#### Sheets ####
+def Library_Sheet(Rng, Plate, Wells):
+    Concentration = np.clip(np.round(Rng.lognormal(mean = np.log(8), sigma = 1.0, size = len(Wells)), 2), 0.05, 200)
+    DNA = np.round(np.minimum(Library_Volume, Library_Input / Concentration), 2)
+    Water = np.round(Library_Volume - DNA, 2)
+    Adaptor = np.where(DNA * Concentration >= Adaptor_20mM_Input, 20, 10)
+    return pd.DataFrame({
+        "SampleNumber": range(1, len(Wells) + 1),
+        "WellPosition": Wells,
+        "EXBarcode": ["EX" + str(Number).zfill(5) for Number in Rng.choice(100000, size = len(Wells), replace = False)],
+        "SampleID": ["P" + str(Plate) + "S" + str(i + 1).zfill(2) for i in range(len(Wells))],
+        "DNAconc": Concentration,
+        "DNAul": DNA,
+        "Waterul": Water,
+        "Adaptor": Adaptor,
+        "Notes": ""}, columns = Library_Columns)
+
+def Pool_Sheet(Rng, Plate, Wells, Dilution_Fraction):
+    Volume = np.clip(np.round(Rng.lognormal(mean = np.log(5), sigma = 0.8, size = len(Wells)), 1), 0.5, 50)
+    Dilution = np.where(Rng.random(len(Wells)) < Dilution_Fraction, Rng.choice([2, 5, 10], size = len(Wells)), 0)
+    return pd.DataFrame({
+        "SampleNumber": range(1, len(Wells) + 1),
+        "WellPosition": Wells,
+        "SampleID": ["P" + str(Plate) + "S" + str(i + 1).zfill(2) for i in range(len(Wells))],
+        "SampleVolume": Volume,
+        "Dilution": Dilution,
+        "Notes": ""}, columns = Pool_Columns)
+
+
+#### Edge cases ####
+def Library_Edge_Cases():
+    Sheets = {}
+    ## Zero volumes: no water, no DNA (empty well) and both.
+    Rows = []
+    for i, (DNA, Water) in enumerate([(25, 0), (0, 25), (0, 0), (5, 0), (0, 5), (25, 0), (0, 0), (10, 15)]):
+        Rows.append([i + 1, Plate_Wells[i], "", "EDGE" + str(i + 1), 10, DNA, Water, 10, "zero volumes"])
+    Sheets["zero_volumes"] = pd.DataFrame(Rows, columns = Library_Columns)
+    ## The 5 µL boundary between the p10 and the p50 transfers, for both DNA and water.
+    Rows = []
+    for i, (DNA, Water) in enumerate([(DNA, Water) for DNA in (4.99, 5.0, 5.01) for Water in (4.99, 5.0, 5.01)]):
+        Rows.append([i + 1, Plate_Wells[i], "", "EDGE" + str(i + 1), 10, DNA, Water, 10, "5 uL boundary"])
+    Sheets["boundaries"] = pd.DataFrame(Rows, columns = Library_Columns)
+    ## 96 x 45 µL water is more than the two 2 mL water tubes hold.
+    Rows = [[i + 1, Plate_Wells[i], "", "EDGE" + str(i + 1), 40, 5, 45, 20, "water over capacity"] for i in range(96)]
+    Sheets["water_overcapacity"] = pd.DataFrame(Rows, columns = Library_Columns)
+    ## Adaptor concentration alternating by row - no column can be done with the multichannel.
+    Rows = [[i + 1, Plate_Wells[i], "", "EDGE" + str(i + 1), 10, 20, 5, (10, 20)[i % 2], "mixed adaptors"] for i in range(96)]
+    Sheets["mixed_adaptors"] = pd.DataFrame(Rows, columns = Library_Columns)
+    return Sheets
+
+def Pool_Edge_Cases():
+    Sheets = {}
+    Rows = [[i + 1, Plate_Wells[i], "EDGE" + str(i + 1), Volume, 0, "zero volumes"] for i, Volume in enumerate([0, 5, 0, 20])]
+    Sheets["zero_volumes"] = pd.DataFrame(Rows, columns = Pool_Columns)
+    ## The 10 µL boundary between the p10 and the p50 transfers.
+    Rows = [[i + 1, Plate_Wells[i], "EDGE" + str(i + 1), Volume, 0, "10 uL boundary"] for i, Volume in enumerate([9.99, 10, 10.01])]
+    Sheets["boundaries"] = pd.DataFrame(Rows, columns = Pool_Columns)
+    Rows = [[i + 1, Plate_Wells[i], "EDGE" + str(i + 1), 2, 10, "all diluted"] for i in range(96)]
+    Sheets["all_diluted"] = pd.DataFrame(Rows, columns = Pool_Columns)
+    return Sheets
+
+
+#### Writing and simulating ####
+def Write_Sheet(Sheet, Path):
+    ## Same format as the templates: semicolons, UTF-8 with BOM, CRLF.
+    Sheet.to_csv(Path, sep = ";", index = False, encoding = "utf-8-sig", lineterminator = "\r\n")
+
+def Simulate_Sheets(Kind, Paths):
+    ## Runs every sheet through its protocols. Returns the number of failed simulations of the generated (non edge case) sheets.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from simulate_protocol import Simulate, Simulation_Error
+
+    Failed = 0
+    for Path in Paths:
+        for Protocol_File, Parameter in Sheet_Protocols[Kind]:
+            Start = time.perf_counter()
+            try:
+                Commands = Simulate(os.path.join(Protocol_Dir, Protocol_File), Files = {Parameter: Path})
+                Status = "ok, " + str(len(Commands)) + " commands"
+            except Simulation_Error as Error:
+                Status = "failed: " + Error.Details[0]
+                if not os.path.basename(Path).startswith("edge_"):
+                    Failed += 1
+            print(os.path.basename(Path) + " | " + Protocol_File + " | " + str(round(time.perf_counter() - Start, 1)) + " s | " + Status)
+    return Failed
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Write seeded synthetic input sheets for the cherry-pick protocols.")
+    Parser.add_argument("--kind", choices = sorted(Sheet_Protocols), default = "library", help = "Sheet type.")
+    Parser.add_argument("--samples", type = int, default = 96, help = "Number of samples (1-384), 96 per plate.")
+    Parser.add_argument("--seed", type = int, default = 1, help = "Random seed; the same seed gives the same sheets.")
+    Parser.add_argument("--layout", choices = ["dense", "sparse"], default = "dense", help = "Dense (from A1) or random wells.")
+    Parser.add_argument("--dilution-fraction", type = float, default = 0.2, help = "Fraction of pool samples to dilute.")
+    Parser.add_argument("--edge-cases", action = "store_true", help = "Also write the adversarial edge case sheets.")
+    Parser.add_argument("--out", default = "workloads", help = "Output folder.")
+    Parser.add_argument("--simulate", action = "store_true", help = "Simulate the protocols with every sheet.")
+    Args = Parser.parse_args(argv)
+
+    Rng = np.random.default_rng(Args.seed)
+    os.makedirs(Args.out, exist_ok = True)
+    Sheets = {}
+    for Plate, Samples in enumerate(Plate_Sizes(Args.samples), start = 1):
+        Wells = Plate_Layout(Rng, Samples, Args.layout)
+        Name = Args.kind + "_seed" + str(Args.seed) + "_plate" + str(Plate)
+        if Args.kind == "library":
+            Sheets[Name] = Library_Sheet(Rng, Plate, Wells)
+        else:
+            Sheets[Name] = Pool_Sheet(Rng, Plate, Wells, Args.dilution_fraction)
+    if Args.edge_cases:
+        for Name, Sheet in (Library_Edge_Cases() if Args.kind == "library" else Pool_Edge_Cases()).items():
+            Sheets["edge_" + Args.kind + "_" + Name] = Sheet
+
+    Paths = []
+    for Name, Sheet in Sheets.items():
+        Path = os.path.join(Args.out, Name + ".csv")
+        Write_Sheet(Sheet, Path)
+        Paths.append(Path)
+        print("Wrote " + Path + " (" + str(len(Sheet)) + " samples)")
+
+    if Args.simulate and Simulate_Sheets(Args.kind, Paths):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
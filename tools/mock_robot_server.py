@@ -0,0 +1,175 @@
+#########################
+### Mock robot server ###
+#########################
+
+## A stand-in for the OT-2 HTTP API, to try tools/fleet_deploy.py without robots. Serves the endpoints the fleet client
+## uses (health, protocol and data file uploads, analyses, runs and run actions) with keep-alive connections. Uploaded
+## protocols are checked for syntax and their runtime parameter names (a protocol with a syntax error fails its analysis,
+## and a run with an unknown parameter or file is refused); nothing is run - a started run succeeds after --run-seconds.
+## Each new connection is logged, to see the connection reuse of the client.
+## Usage: python tools/mock_robot_server.py [--port 31950] [--name mock-ot2] [--run-seconds 3]
+## Several robots: start one server per port and use --robot localhost:PORT per server with the fleet client.
+
+#### Package loading ####
+import argparse
+import ast
+import email.parser
+import email.policy
+import hashlib
+import http.server
+import json
+import sys
+import threading
+import time
+import uuid
+
+
+class Mock_Robot:
+    ## The robot state, shared by the request handler threads.
+    def __init__(self, Name, Run_Seconds):
+        self.Name = Name
+        self.Run_Seconds = Run_Seconds
+        self.Lock = threading.Lock()
+        self.Protocols = {} ## id: {"key", "files", "parameters", "analysis"}
+        self.Data_Files = {} ## id: file name
+        self.Runs = {} ## id: {"protocolId", "status", "started"}
+        self.Connections = 0
+
+    def Run_Status(self, Run):
+        if Run["status"] == "running" and time.monotonic() - Run["started"] >= self.Run_Seconds:
+            Run["status"] = "succeeded"
+        return Run["status"]
+
+
+def Parameter_Names(Source):
+    ## Runtime parameter names of a protocol; SyntaxError for protocols that do not parse.
+    Names = []
+    for Node in ast.walk(ast.parse(Source)):
+        if isinstance(Node, ast.Call) and isinstance(Node.func, ast.Attribute) and Node.func.attr.startswith("add_"):
+            for Keyword in Node.keywords:
+                if Keyword.arg == "variable_name" and isinstance(Keyword.value, ast.Constant):
+                    Names.append(Keyword.value.value)
+    return Names
+
+
+def Form_Files(Content_Type, Body):
+    ## [(field, file name, content)] of a multipart/form-data body.
+    Message = email.parser.BytesParser(policy = email.policy.default).parsebytes(b"Content-Type: " + Content_Type.encode("utf-8") + b"\r\n\r\n" + Body)
+    return [(Part.get_param("name", header = "content-disposition"), Part.get_filename(), Part.get_payload(decode = True)) for Part in Message.iter_parts()]
+
+
+def Handler_For(Robot):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" ## Keep-alive
+
+        def setup(self):
+            super().setup()
+            with Robot.Lock:
+                Robot.Connections += 1
+                print("Connection " + str(Robot.Connections) + " from " + self.client_address[0] + ":" + str(self.client_address[1]), flush = True)
+
+        def log_message(self, Format, *Arguments):
+            pass
+
+        def Reply(self, Status, Data):
+            Body = json.dumps(Data).encode("utf-8")
+            self.send_response(Status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(Body)))
+            self.end_headers()
+            self.wfile.write(Body)
+
+        def Error(self, Status, Detail):
+            self.Reply(Status, {"errors": [{"id": "MockError", "title": http.server.BaseHTTPRequestHandler.responses[Status][0], "detail": Detail}]})
+
+        def Body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            Parts = self.path.strip("/").split("/")
+            with Robot.Lock:
+                if Parts == ["health"]:
+                    return self.Reply(200, {"name": Robot.Name, "api_version": "8.0.0", "robot_model": "OT-2 Standard"})
+                if len(Parts) == 3 and Parts[0] == "protocols" and Parts[2] == "analyses" and Parts[1] in Robot.Protocols:
+                    return self.Reply(200, {"data": [Robot.Protocols[Parts[1]]["analysis"]]})
+                if len(Parts) == 2 and Parts[0] == "runs" and Parts[1] in Robot.Runs:
+                    Run = Robot.Runs[Parts[1]]
+                    return self.Reply(200, {"data": {"id": Parts[1], "protocolId": Run["protocolId"], "status": Robot.Run_Status(Run), "errors": []}})
+            self.Error(404, "Not found: " + self.path)
+
+        def do_POST(self):
+            Parts = self.path.strip("/").split("/")
+            Body = self.Body()
+            with Robot.Lock:
+                if Parts == ["protocols"]:
+                    Files = Form_Files(self.headers.get("Content-Type", ""), Body)
+                    Key = hashlib.sha256(b"".join(Name.encode("utf-8") + Content for Field, Name, Content in Files)).hexdigest()
+                    for Protocol_Id, Protocol in Robot.Protocols.items():
+                        if Protocol["key"] == Key: ## Identical uploads are kept once
+                            return self.Reply(200, {"data": {"id": Protocol_Id, "files": Protocol["files"]}})
+                    Sources = [Content for Field, Name, Content in Files if Name.endswith(".py")]
+                    if len(Sources) != 1:
+                        return self.Error(422, "Upload exactly one protocol file (.py), with labware definitions (.json)")
+                    Protocol_Id = str(uuid.uuid4())
+                    Analysis = {"id": str(uuid.uuid4()), "status": "completed", "result": "ok", "errors": []}
+                    try:
+                        Parameters = Parameter_Names(Sources[0].decode("utf-8"))
+                    except SyntaxError as Error:
+                        Parameters = []
+                        Analysis.update(result = "not-ok", errors = [{"errorType": "SyntaxError", "detail": str(Error)}])
+                    Robot.Protocols[Protocol_Id] = {"key": Key, "files": [{"name": Name} for Field, Name, Content in Files], "parameters": Parameters, "analysis": Analysis}
+                    return self.Reply(201, {"data": {"id": Protocol_Id, "files": Robot.Protocols[Protocol_Id]["files"], "analysisSummaries": [{"id": Analysis["id"], "status": "completed"}]}})
+                if Parts == ["dataFiles"]:
+                    Files = Form_Files(self.headers.get("Content-Type", ""), Body)
+                    File_Id = str(uuid.uuid4())
+                    Robot.Data_Files[File_Id] = Files[0][1]
+                    return self.Reply(201, {"data": {"id": File_Id, "name": Files[0][1]}})
+                if Parts == ["runs"]:
+                    Data = json.loads(Body)["data"]
+                    Protocol = Robot.Protocols.get(Data.get("protocolId"))
+                    if Protocol is None:
+                        return self.Error(404, "Protocol " + str(Data.get("protocolId")) + " not found")
+                    if any(Robot.Run_Status(Run) in ["idle", "running"] for Run in Robot.Runs.values()):
+                        return self.Error(409, "Another run is active")
+                    Unknown = [Name for Name in list(Data.get("runTimeParameterValues", {})) + list(Data.get("runTimeParameterFiles", {})) if Name not in Protocol["parameters"]]
+                    Missing_Files = [File_Id for File_Id in Data.get("runTimeParameterFiles", {}).values() if File_Id not in Robot.Data_Files]
+                    if Unknown:
+                        return self.Error(422, "Unknown runtime parameters: " + ", ".join(Unknown))
+                    if Missing_Files:
+                        return self.Error(422, "Unknown data files: " + ", ".join(Missing_Files))
+                    Run_Id = str(uuid.uuid4())
+                    Robot.Runs[Run_Id] = {"protocolId": Data["protocolId"], "status": "idle", "started": None}
+                    return self.Reply(201, {"data": {"id": Run_Id, "protocolId": Data["protocolId"], "status": "idle"}})
+                if len(Parts) == 3 and Parts[0] == "runs" and Parts[2] == "actions" and Parts[1] in Robot.Runs:
+                    Action = json.loads(Body)["data"]["actionType"]
+                    Run = Robot.Runs[Parts[1]]
+                    if Action == "play" and Run["status"] == "idle":
+                        Run.update(status = "running", started = time.monotonic())
+                    elif Action == "stop" and Robot.Run_Status(Run) in ["idle", "running"]:
+                        Run["status"] = "stopped"
+                    else:
+                        return self.Error(409, "Cannot " + Action + " a run that is " + Run["status"])
+                    return self.Reply(201, {"data": {"id": str(uuid.uuid4()), "actionType": Action}})
+            self.Error(404, "Not found: " + self.path)
+
+    return Handler
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Mock OT-2 HTTP API for trying the fleet client.")
+    Parser.add_argument("--port", type = int, default = 31950, help = "Port to listen on.")
+    Parser.add_argument("--name", default = "mock-ot2", help = "Robot name.")
+    Parser.add_argument("--run-seconds", type = float, default = 3, help = "Seconds a started run takes to succeed.")
+    Args = Parser.parse_args(argv)
+
+    Server = http.server.ThreadingHTTPServer(("127.0.0.1", Args.port), Handler_For(Mock_Robot(Args.name, Args.run_seconds)))
+    print(Args.name + " listening on 127.0.0.1:" + str(Args.port), flush = True)
+    try:
+        Server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
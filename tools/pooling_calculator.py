@@ -0,0 +1,276 @@
+##########################
+### Pooling calculator ###
+##########################
+
+## Makes the PoolCombiner pooling sheets (SampleVolume and Dilution per sample) from the qPCR results of a run of
+## ProtocolV2_qPCR_OT2.py, so the libraries go into the pool in equimolar amounts. The qPCR wells are matched to the
+## samples with the plate layout of the qPCR run (static/OT2_shared/qpcr_layout.py), so give the same sample count,
+## replicates, standards and plate size as the run. Concentrations come from a standard curve: fitted to the standards
+## column when the run had standards (--standard-concentrations, per row A-H, 0 for an NTC), or given as --curve SLOPE
+## INTERCEPT (Cq = SLOPE x log10(concentration) + INTERCEPT).
+## Volumes: every sample gets the same amount (concentration x µL). The amount is the largest that keeps every sample
+## within --available µL and the whole pool within the pool tube (--pooltube-type, as in the PoolCombiner run). Volumes
+## are rounded to 0.1 µL; the smallest pooling volume is 1 µL (the p10 and p20 minimum - volumes above 10 µL go with
+## the p50, above its 5 µL minimum). Samples that need less are diluted 1:2 to 1:100 on the robot (the PoolCombiner
+## Dilution setting). With --no-dilution the most concentrated sample is pooled at 1 µL; samples that would then need
+## more than --available are capped and noted as under-represented.
+## Samples without a Cq, or below --exclude-below, are left out of the pool (volume 0) and noted.
+## qPCR exports: CSV or tab separated text with a well column (Well, Well Position or Pos; A1 or A01) and a Cq column
+## (Cq, Ct, CT or Cp); lines before the header row (instrument metadata) are skipped. "Undetermined" counts as no Cq.
+## Writes one pooling sheet per sample plate (pool_plate1.csv, ...), in the template format.
+## Usage: python tools/pooling_calculator.py export.csv --samples 192 --replicates 2 --standards --output-wells 384 [--sheet plate1.csv ...] [--out pooling]
+## --sheet: the library sheet of each plate (WellPosition and SampleID), to carry the sample IDs into the pooling sheets.
+
+#### Package loading ####
+import argparse
+import io
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Shared_Dir = os.path.join(Repo_Dir, "static", "OT2_shared")
+sys.path.insert(0, Shared_Dir)
+
+from dilution_planner import Plan_Dilutions
+from qpcr_layout import Plan_qPCR_Layout, Quadrant_Offsets
+from generate_workloads import Pool_Columns, Write_Sheet
+
+
+#### Settings ####
+Pool_Tube_Volumes = { ## µL, per pooltube_type of the PoolCombiner
+    "opentrons_24_tuberack_eppendorf_1.5ml_safelock_snapcap": 1500,
+    "opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap": 2000,
+    "opentronsrack_15_tuberack_5000ul": 5000,
+}
+Water_Dead_Volume = 50 ## µL left in the PoolCombiner water tube (A2)
+Minimum_Volume = 1.0 ## µL, the smallest pooling volume (p10 single-channel and p20 multichannel)
+Dilution_Steps = np.array([2, 5, 10, 20, 50, 100])
+Standard_Concentrations = "20,2,0.2,0.02,0.002,0.0002,0,0" ## pM: the six library quantification standards and two NTCs
+
+## Column names of the qPCR exports (lower case)
+Well_Headers = ["well", "well position", "pos"]
+Cq_Headers = ["cq", "ct", "cp", "crt"]
+Target_Headers = ["target", "target name"]
+
+
+#### qPCR export ####
+def Header_Match(Columns, Names):
+    ## The first column whose lower case name is in Names, or None.
+    for Column in Columns:
+        if str(Column).strip().lower() in Names:
+            return Column
+    return None
+
+def Read_Export(Path, Target = None):
+    ## DataFrame of qPCR well (A1 style) and Cq (NaN for no Cq).
+    with open(Path, encoding = "utf-8-sig", errors = "replace") as Handle:
+        Lines = Handle.read().splitlines()
+    for Index, Line in enumerate(Lines):
+        Fields = [Field.strip().strip('"').lower() for Field in re.split("[,;\t]", Line)]
+        if any(Name in Fields for Name in Well_Headers) and any(Name in Fields for Name in Cq_Headers):
+            break
+    else:
+        raise SystemExit(Path + ": no header row with a well column (" + ", ".join(Well_Headers) + ") and a Cq column (" + ", ".join(Cq_Headers) + ")")
+    Export = pd.read_csv(io.StringIO("\n".join(Lines[Index:])), sep = None, engine = "python")
+    Well_Column = Header_Match(Export.columns, Well_Headers)
+    Cq_Column = Header_Match(Export.columns, Cq_Headers)
+    Target_Column = Header_Match(Export.columns, Target_Headers)
+    if Target is not None:
+        if Target_Column is None:
+            raise SystemExit(Path + ": --target given, but the export has no target column")
+        Export = Export[Export[Target_Column].astype(str).str.strip() == Target]
+
+    Parts = Export[Well_Column].astype(str).str.strip().str.upper().str.extract(r"^([A-P])0*(\d{1,2})$")
+    if Parts.isna().any(axis = None):
+        Bad = Export[Well_Column][Parts[0].isna()].astype(str).tolist()
+        raise SystemExit(Path + ": wells that are not A1-P24: " + ", ".join(Bad[:5]))
+    Wells = pd.DataFrame({"qpcr_well": Parts[0] + Parts[1], "cq": pd.to_numeric(Export[Cq_Column], errors = "coerce")})
+    if Wells["qpcr_well"].duplicated().any():
+        raise SystemExit(Path + ": several results per well - select one assay with --target (targets: "
+                         + (", ".join(sorted(Export[Target_Column].astype(str).unique())) if Target_Column is not None else "no target column") + ")")
+    return Wells
+
+
+#### Plate layout ####
+def Slot_Well_Names(Quadrant, Column, Output_Wells):
+    ## The eight qPCR plate wells of a layout slot, top to bottom (as Slot_Wells in qpcr_layout).
+    if Output_Wells == 96:
+        return [Row + str(Column) for Row in "ABCDEFGH"]
+    Row_Offset, Column_Offset = Quadrant_Offsets[Quadrant - 1]
+    return [Row + str(2 * (Column - 1) + Column_Offset + 1) for Row in "ABCDEFGHIJKLMNOP"[Row_Offset::2]]
+
+def Layout_Wells(Samples, Replicates, Output_Wells, Standards):
+    ## DataFrame with a row per used qPCR well: the sample plate and well it holds, or the standards row.
+    Plate_Count = -(-Samples // 96)
+    Sample_Columns = [(Plate, Column) for Plate in range(1, Plate_Count + 1) for Column in range(1, -(-min(96, Samples - (Plate - 1) * 96) // 8) + 1)]
+    try:
+        Layout = Plan_qPCR_Layout(Sample_Columns, Replicates, Output_Wells, Standards = Standards)
+    except ValueError as Error:
+        raise SystemExit(str(Error))
+    Rows = []
+    for Entry in Layout:
+        Plate, Column = Entry["source"]
+        for Row, qPCR_Well in enumerate(Slot_Well_Names(Entry["quadrant"], Entry["column"], Output_Wells)):
+            if Plate == "standards":
+                Rows.append((qPCR_Well, 0, "ABCDEFGH"[Row], Row))
+            elif (Plate - 1) * 96 + (Column - 1) * 8 + Row < Samples:
+                Rows.append((qPCR_Well, Plate, "ABCDEFGH"[Row] + str(Column), (Plate - 1) * 96 + (Column - 1) * 8 + Row))
+    return pd.DataFrame(Rows, columns = ["qpcr_well", "plate", "well", "index"])
+
+
+#### Standard curve ####
+def Fit_Curve(Standards, Concentrations):
+    ## (slope, intercept, R²) of Cq against log10(concentration) over the standard wells with a Cq; NTC rows are skipped.
+    Known = np.asarray(Concentrations, dtype = float)[Standards["index"].to_numpy()]
+    Use = (Known > 0) & Standards["cq"].notna().to_numpy()
+    if len(np.unique(Known[Use])) < 2:
+        raise SystemExit("The standards have fewer than two concentrations with a Cq - give the curve with --curve SLOPE INTERCEPT")
+    X = np.log10(Known[Use])
+    Y = Standards["cq"].to_numpy()[Use]
+    Slope, Intercept = np.polyfit(X, Y, 1)
+    R2 = 1 - np.sum((Y - (Slope * X + Intercept)) ** 2) / np.sum((Y - Y.mean()) ** 2)
+    NTC = Standards["cq"].to_numpy()[(Known == 0) & Standards["cq"].notna().to_numpy()]
+    if len(NTC) and NTC.min() < Y.max():
+        print("Warning: an NTC has a Cq (" + str(round(NTC.min(), 2)) + ") within the standard curve")
+    return Slope, Intercept, R2
+
+
+#### Pooling volumes ####
+def Pool_Volumes(Concentration, Available, Capacity, Dilute, Exclude_Below = 0):
+    ## Equimolar pooling volumes for all samples at once. Returns {"volume": pooled µL, "dilution": factor (0 undiluted),
+    ## "pooled", "raised" (pooled at the minimum, over-represented), "capped" (at Available, under-represented)} arrays.
+    ## Excluded samples (no concentration or below Exclude_Below) get 0 µL.
+    Pooled = np.isfinite(Concentration) & (Concentration > max(Exclude_Below, 0))
+    if not Pooled.any():
+        raise SystemExit("No sample has a concentration to pool from")
+    Conc = np.where(Pooled, Concentration, np.inf)
+    ## The least concentrated sample takes all it has. Without dilutions the most concentrated sample is pooled at the
+    ## minimum volume instead, when that needs more, and the samples that would need more than they have are capped.
+    Amount = Available * Conc[Pooled].min()
+    if not Dilute:
+        Amount = max(Amount, Minimum_Volume * Conc[Pooled].max())
+    for Attempt in range(20):
+        Volume = np.where(Pooled, Amount / Conc, 0.0)
+        Capped = Pooled & (Volume > Available)
+        Volume = np.minimum(Volume, Available)
+        Factor = np.zeros(len(Volume), dtype = int)
+        if Dilute:
+            Need = np.where(Pooled, Minimum_Volume / np.maximum(Volume, 1e-12), 1.0)
+            Factor = np.where(Need > 1, Dilution_Steps[np.minimum(np.searchsorted(Dilution_Steps, Need), len(Dilution_Steps) - 1)], 0)
+        Pool = np.round(Volume * np.maximum(Factor, 1), 1)
+        Raised = Pooled & (Pool < Minimum_Volume)
+        Pool = np.where(Raised, Minimum_Volume, Pool)
+        if Pool.sum() <= Capacity:
+            return {"volume": Pool, "dilution": Factor, "pooled": Pooled, "raised": Raised, "capped": Capped}
+        Amount *= Capacity / Pool.sum() * 0.999
+    raise SystemExit("The pool does not fit the pool tube (" + str(Capacity) + " µL) even at the smallest volumes - use a larger pool tube or fewer samples")
+
+
+def Pooling_Sheets(Samples, Sample_IDs, Concentration, Cq, Cq_SD, Plan, Units):
+    ## One PoolCombiner sheet per plate.
+    Notes = np.array(["Cq " + str(round(Mean, 2)) + (" (SD " + str(round(SD, 2)) + ")" if np.isfinite(SD) else "") + ", " + str(float("%.4g" % Conc)) + " " + Units
+                      if np.isfinite(Mean) else "no Cq" for Mean, SD, Conc in zip(Cq, Cq_SD, Concentration)], dtype = object)
+    Notes = np.where(np.isfinite(Cq) & ~Plan["pooled"], Notes + ", excluded", Notes)
+    Notes = np.where(Plan["raised"], Notes + ", raised to " + str(Minimum_Volume) + " µL (over-represented)", Notes)
+    Notes = np.where(Plan["capped"], Notes + ", capped at the available volume (under-represented)", Notes)
+    Frame = pd.DataFrame({"plate": Samples["plate"], "WellPosition": Samples["well"], "SampleID": Sample_IDs,
+                          "SampleVolume": Plan["volume"], "Dilution": Plan["dilution"], "Notes": Notes})
+    Sheets = {}
+    for Plate, Sheet in Frame.groupby("plate"):
+        Sheet = Sheet.drop(columns = "plate").reset_index(drop = True)
+        Sheet.insert(0, "SampleNumber", range(1, len(Sheet) + 1))
+        Sheets[Plate] = Sheet[Pool_Columns]
+    return Sheets
+
+
+def Read_Sample_IDs(Paths, Samples):
+    ## Sample IDs per sample from the library sheets (one per plate, in plate order); "" without sheets.
+    IDs = pd.Series([""] * len(Samples), index = Samples.index, dtype = object)
+    for Plate, Path in enumerate(Paths, start = 1):
+        Sheet = pd.read_csv(Path, sep = ";", encoding = "utf-8-sig", dtype = str).fillna("")
+        if "WellPosition" not in Sheet or "SampleID" not in Sheet:
+            raise SystemExit(Path + ": the sheet needs WellPosition and SampleID columns")
+        On_Plate = (Samples["plate"] == Plate).to_numpy()
+        IDs[On_Plate] = Samples.loc[On_Plate, "well"].map(dict(zip(Sheet["WellPosition"].str.strip(), Sheet["SampleID"]))).fillna("").to_numpy()
+    return IDs.to_numpy()
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Equimolar PoolCombiner pooling sheets from qPCR results.")
+    Parser.add_argument("export", help = "qPCR export (CSV or tab separated) with well and Cq columns.")
+    Parser.add_argument("--samples", type = int, required = True, help = "Sample count of the qPCR run (1-384).")
+    Parser.add_argument("--replicates", type = int, default = 1, help = "Technical replicates of the qPCR run.")
+    Parser.add_argument("--standards", action = "store_true", help = "The qPCR run had the standards column (placed first).")
+    Parser.add_argument("--output-wells", type = int, choices = [96, 384], default = 96, help = "Wells of the qPCR plate.")
+    Parser.add_argument("--standard-concentrations", default = Standard_Concentrations, help = "Standard concentrations of rows A-H, 0 for an NTC.")
+    Parser.add_argument("--curve", nargs = 2, type = float, metavar = ("SLOPE", "INTERCEPT"), help = "Standard curve, instead of fitting the standards.")
+    Parser.add_argument("--units", default = "pM", help = "Concentration units of the standards, for the notes.")
+    Parser.add_argument("--target", help = "Assay (target name) to use from an export with several.")
+    Parser.add_argument("--available", type = float, default = 20, help = "µL of library per sample that can go into the pool.")
+    Parser.add_argument("--pooltube-type", choices = sorted(Pool_Tube_Volumes), default = "opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap", help = "Pool tube of the PoolCombiner run.")
+    Parser.add_argument("--no-dilution", action = "store_true", help = "No dilutions on the robot: samples below 1 µL are pooled at 1 µL.")
+    Parser.add_argument("--exclude-below", type = float, default = 0, help = "Leave samples below this concentration out of the pool.")
+    Parser.add_argument("--sheet", action = "append", default = [], help = "Library sheet of a plate, for the sample IDs (repeat per plate).")
+    Parser.add_argument("--out", default = "pooling", help = "Output folder.")
+    Args = Parser.parse_args(argv)
+
+    if Args.samples < 1 or Args.samples > 384:
+        raise SystemExit("Sample count must be between 1 and 384, got " + str(Args.samples))
+    Wells = Layout_Wells(Args.samples, Args.replicates, Args.output_wells, Args.standards).merge(Read_Export(Args.export, Args.target), on = "qpcr_well", how = "left")
+    Missing = Wells["qpcr_well"][Wells["cq"].isna()].tolist()
+    if len(Missing) == len(Wells):
+        raise SystemExit("None of the qPCR wells of the layout has a Cq - check --samples, --replicates, --standards and --output-wells")
+    if Missing:
+        print(str(len(Missing)) + " qPCR well(s) without a Cq: " + ", ".join(Missing[:12]) + (" ..." if len(Missing) > 12 else ""))
+
+    ## Standard curve
+    if Args.curve is not None:
+        Slope, Intercept = Args.curve
+        print("Standard curve: Cq = " + str(Slope) + " x log10(c) + " + str(Intercept))
+    elif Args.standards:
+        Concentrations = [float(Value) for Value in Args.standard_concentrations.split(",")]
+        if len(Concentrations) != 8:
+            raise SystemExit("--standard-concentrations needs 8 values (rows A-H), got " + str(len(Concentrations)))
+        Slope, Intercept, R2 = Fit_Curve(Wells[Wells["plate"] == 0], Concentrations)
+        print("Standard curve: Cq = " + str(round(Slope, 3)) + " x log10(c) + " + str(round(Intercept, 3)) + ", efficiency "
+              + str(round(100 * (10 ** (-1 / Slope) - 1), 1)) + " %, R² " + str(round(R2, 4)))
+    else:
+        raise SystemExit("No standard curve: use --standards (the run had standards) or --curve SLOPE INTERCEPT")
+
+    ## Concentration per sample from the mean Cq of its replicates
+    Samples = Wells[Wells["plate"] > 0].groupby(["index", "plate", "well"], sort = True)["cq"].agg(["mean", "std"]).reset_index()
+    Concentration = 10 ** ((Samples["mean"].to_numpy() - Intercept) / Slope)
+    Capacity = Pool_Tube_Volumes[Args.pooltube_type]
+    Plan = Pool_Volumes(Concentration, Args.available, Capacity, not Args.no_dilution, Args.exclude_below)
+    Sheets = Pooling_Sheets(Samples, Read_Sample_IDs(Args.sheet, Samples), Concentration, Samples["mean"].to_numpy(), Samples["std"].to_numpy(),
+                            Plan, Args.units)
+
+    ## The dilutions are planned as the PoolCombiner plans them, so a sheet the robot cannot dilute fails here
+    os.makedirs(Args.out, exist_ok = True)
+    for Plate, Sheet in Sheets.items():
+        Diluted = Sheet[Sheet["Dilution"] > 0]
+        try:
+            Dilutions = Plan_Dilutions(list(zip(Diluted["WellPosition"], Diluted["Dilution"].astype(float), Diluted["SampleVolume"])))
+        except ValueError as Error:
+            raise SystemExit("Plate " + str(Plate) + ": " + str(Error))
+        Water = sum(Dilution["water_ul"] for Dilution in Dilutions.values())
+        if Water > Capacity - Water_Dead_Volume:
+            raise SystemExit("Plate " + str(Plate) + ": the dilutions need " + str(round(Water, 1)) + " µL water, more than the water tube holds")
+        Path = os.path.join(Args.out, "pool_plate" + str(Plate) + ".csv")
+        Write_Sheet(Sheet, Path)
+        print("Wrote " + Path + " (" + str(len(Sheet)) + " samples, " + str(len(Diluted)) + " diluted, " + str(round(Sheet["SampleVolume"].sum(), 1))
+              + " µL to pool" + (", run with Dilution on" if len(Diluted) else "") + ")")
+    print("Pool: " + str(int(Plan["pooled"].sum())) + " of " + str(len(Samples)) + " samples, " + str(round(Plan["volume"].sum(), 1)) + " µL in the "
+          + str(Capacity) + " µL pool tube" + ("; " + str(int(Plan["raised"].sum())) + " sample(s) raised to " + str(Minimum_Volume) + " µL" if Plan["raised"].any() else "")
+          + ("; " + str(int(Plan["capped"].sum())) + " sample(s) capped at " + str(Args.available) + " µL" if Plan["capped"].any() else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
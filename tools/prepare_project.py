@@ -0,0 +1,459 @@
+###################################
+### Library prep project set-up ###
+###################################
+
+## Prepares the eight protocols of a project from one sample sheet: DREX extraction, Covaris setup, BEST library build and
+## purification, index PCR and purification, qPCR and pooling. Each protocol is written to the project folder with its
+## runtime parameter defaults set for the project (the app then opens it ready to run), together with the CSV inputs made
+## from the sample sheet and a run sheet with the order of the runs, the settings and the plates that go from run to run.
+## The plate type a run puts its output in is passed on as the input plate type of the run that takes that plate, and the
+## sample count covers the last column of the sheet.
+## The sample volumes are followed from run to run with the volumes the protocols take and add (plate_state.json, the
+## plate states after each run, in the format of static/OT2_shared/plate_state.py); a run that would take more than a well
+## holds stops the set-up. With --plate-state the protocols read and write plate states on the robot: copy
+## plate_state/DREX_eluate.json to /data/user_storage/plate_state on the robot before the Covaris setup.
+## Project sheet (semicolon separated, the library input template):
+##     SampleNumber;WellPosition;EXBarcode;SampleID;DNAconc;DNAul;Waterul;Adaptor;Notes
+## optionally with IndexPlate, IndexWell, i7 and i5 (index mapping for the index PCR) and SampleVolume and Dilution (the
+## pooling sheet; without them the pooling sheet is made from the qPCR results after the qPCR run, with tools/pooling_calculator.py).
+## Usage: python tools/prepare_project.py project.csv --name PROJECT [--out folder] [--set Step.parameter=value ...] [--plate-state] [--simulate]
+## Example: python tools/prepare_project.py project.csv --name EHI042 --set BEST-Purification.elution_volume=40 --set qPCR.replicates=2
+## --simulate runs every written protocol with its CSV files through tools/simulate_protocol.py (needs opentrons).
+
+#### Package loading ####
+import argparse
+import ast
+import csv
+import json
+import os
+import sys
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Protocol_Dir = os.path.join(Repo_Dir, "static", "OT2_protocols")
+Shared_Dir = os.path.join(Repo_Dir, "static", "OT2_shared")
+sys.path.insert(0, Shared_Dir)
+
+from column_planner import Plate_Rows, Split_Well_Name
+from csv_records import CSV_Records
+from dilution_planner import Dilution_Factor, Plan_Dilutions
+from normalisation import Normalise
+from plate_state import Plate_State, Plate_State_File, Well_Index
+from qpcr_layout import Plan_qPCR_Layout
+
+
+#### Runs ####
+## In run order. Source: the run whose output plate is the input of the run. Input: the parameter set to the plate type
+## of that plate. Output: the parameter with the type of the output plate, or Output_Type for a fixed type; runs that work
+## in their input plate have neither.
+Steps = [
+    {"name": "DREX", "file": "ProtocolV2_DREX-NucleicAcidExtraction_OT2.py", "output": "plate_type"},
+    {"name": "CovarisSetup", "file": "ProtocolV2_CovarisSetup_OT2.py", "source": "DREX", "input": "input_plate_type",
+     "output_type": "96afatubetpxplate_96_wellplate_200ul", "csv": "DNAnormalisingwells"},
+    {"name": "BEST-Library", "file": "ProtocolV2_BEST-Library_OT2.py", "source": "CovarisSetup", "input": "input_plate_type", "csv": "AdaptorConc"},
+    {"name": "BEST-Purification", "file": "ProtocolV2_BEST-Purification_OT2.py", "source": "BEST-Library", "input": "input_plate_type", "output": "output_plate_type"},
+    {"name": "IndexPCR", "file": "ProtocolV2_IndexPCR_OT2.py", "source": "BEST-Purification", "input": "input_plate_type", "output": "output_plate_type", "csv": "IndexSheet"},
+    {"name": "IndexPCR-Purification", "file": "ProtocolV2_IndexPCR_Purfication_OT2.py", "source": "IndexPCR", "input": "input_plate_type", "output": "output_plate_type"},
+    {"name": "qPCR", "file": "ProtocolV2_qPCR_OT2.py", "source": "IndexPCR-Purification", "input": "input_plate_type", "output": "output_plate_type"},
+    {"name": "PoolCombiner", "file": "ProtocolV2_PoolCombiner_OT2.py", "source": "IndexPCR-Purification", "input": "input_plate_type", "csv": "PoolSheet"},
+]
+
+## Parameters set from the project sheet and the chain; they cannot be set with --set.
+Project_Parameters = ["sample_count", "input_plate_type", "index_mapping", "index_plates", "dilutionchoice"]
+
+## Volumes of the protocols (µL per sample well)
+Library_Additions = 5.85 + 1.5 + 6 + 7.5 ## BEST-Library: end repair mix, adaptor, ligation mix and fill-in mix
+iPCR_Sample = 10 ## IndexPCR: library taken into the index PCR
+iPCR_Volume = 38 + 2 + iPCR_Sample ## IndexPCR: master mix, primers and library
+qPCR_Sample = 2 ## qPCR: per replicate
+qPCR_Volume = 23 + qPCR_Sample ## qPCR: master mix and sample
+Covaris_Well_Volume = 200
+
+Library_Columns = ["SampleNumber", "WellPosition", "EXBarcode", "SampleID", "DNAconc", "DNAul", "Waterul", "Adaptor", "Notes"]
+Index_Columns = ["SampleNumber", "WellPosition", "SampleID", "IndexPlate", "IndexWell", "i7", "i5", "Notes"]
+Pool_Columns = ["SampleNumber", "WellPosition", "SampleID", "SampleVolume", "Dilution", "Notes"]
+
+
+#### Project sheet ####
+def Read_Project(Path):
+    with open(Path, encoding = "utf-8-sig", newline = "") as Handle:
+        Records = CSV_Records(list(csv.reader(Handle, delimiter = ";")))
+    for Column in ["WellPosition", "SampleID", "DNAconc", "DNAul", "Waterul", "Adaptor"]:
+        Records[Column] ## Raises for missing columns
+    Wells = []
+    for i in range(len(Records)):
+        Well_Name = str(Records["WellPosition"][i]).strip().upper()
+        if len(Well_Name) < 2 or Well_Name[0] not in Plate_Rows or not Well_Name[1:].isdigit() or not 1 <= int(Well_Name[1:]) <= 12:
+            raise SystemExit("WellPosition " + repr(Well_Name) + " in data row " + str(i + 1) + " of " + Path + " is not a 96 well plate position")
+        if Well_Name in Wells:
+            raise SystemExit("WellPosition " + Well_Name + " is in " + Path + " twice")
+        Wells.append(Well_Name)
+        Records["WellPosition"][i] = Well_Name
+    return Records
+
+
+def Has_Values(Records, Column):
+    return Column in Records and any(str(Value).strip() for Value in Records[Column])
+
+
+def Sheet_Rows(Records, Columns):
+    ## CSV rows with the columns (empty for columns the project sheet does not have), header first.
+    return [Columns] + [[Records[Column][i] if Column in Records else "" for Column in Columns] for i in range(len(Records))]
+
+
+def Write_CSV(Path, Rows):
+    with open(Path, "w", encoding = "utf-8-sig", newline = "") as Handle:
+        csv.writer(Handle, delimiter = ";", lineterminator = "\r\n").writerows(Rows)
+
+
+#### Protocol parameters ####
+def Parameter_Calls(Tree):
+    ## {variable name: add_* call node} of the runtime parameters of a protocol.
+    Calls = {}
+    for Node in ast.walk(Tree):
+        if isinstance(Node, ast.Call) and isinstance(Node.func, ast.Attribute) and Node.func.attr.startswith("add_"):
+            Keywords = {Keyword.arg: Keyword.value for Keyword in Node.keywords}
+            if "variable_name" in Keywords:
+                Calls[ast.literal_eval(Keywords["variable_name"])] = Node
+    return Calls
+
+
+def Parameter_Info(Call):
+    ## {"kind" (str, int, float, bool or csv_file), "default", "choices", "minimum", "maximum"}
+    Keywords = {Keyword.arg: Keyword.value for Keyword in Call.keywords}
+    Info = {"kind": Call.func.attr[len("add_"):], "choices": None, "minimum": None, "maximum": None, "default": None}
+    for Name in ["default", "minimum", "maximum"]:
+        if Name in Keywords:
+            Info[Name] = ast.literal_eval(Keywords[Name])
+    if "choices" in Keywords:
+        Info["choices"] = [ast.literal_eval(Choice)["value"] for Choice in Keywords["choices"].elts]
+    return Info
+
+
+def Check_Value(Step, Name, Info, Value):
+    ## The value as the parameter type, or SystemExit when the app would not accept it.
+    Label = Step + "." + Name
+    if Info["kind"] == "csv_file":
+        raise SystemExit(Label + " is a CSV file - it is written from the project sheet")
+    Types = {"str": str, "int": int, "float": (int, float), "bool": bool}
+    if not isinstance(Value, Types[Info["kind"]]) or (Info["kind"] != "bool" and isinstance(Value, bool)):
+        raise SystemExit(Label + " takes a " + Info["kind"] + " value, not " + json.dumps(Value))
+    if Info["kind"] == "float":
+        Value = float(Value)
+    if Info["choices"] is not None and Value not in Info["choices"]:
+        raise SystemExit(Label + " cannot be " + json.dumps(Value) + " (choices: " + ", ".join(json.dumps(Choice) for Choice in Info["choices"]) + ")")
+    if Info["minimum"] is not None and not Info["minimum"] <= Value <= Info["maximum"]:
+        raise SystemExit(Label + " = " + str(Value) + " is outside " + str(Info["minimum"]) + "-" + str(Info["maximum"]))
+    return Value
+
+
+def Source_Literal(Value):
+    if isinstance(Value, str):
+        return json.dumps(Value, ensure_ascii = False)
+    return repr(Value)
+
+
+def Rewrite_Protocol(Source, Tree, Calls, Values, Project_Name):
+    ## The protocol source with the defaults of Values ({parameter: value}) and the project name in the protocol name.
+    ## Only the replaced values change; the rest of the file (line endings included) is kept as it is.
+    Lines = Source.splitlines(keepends = True)
+    Line_Starts = [0]
+    for Line in Lines:
+        Line_Starts.append(Line_Starts[-1] + len(Line))
+
+    def Offset(Line, Column):
+        ## ast columns are UTF-8 byte offsets
+        return Line_Starts[Line - 1] + len(Lines[Line - 1].encode("utf-8")[:Column].decode("utf-8"))
+
+    Edits = []
+    for Name, Value in Values.items():
+        Node = [Keyword.value for Keyword in Calls[Name].keywords if Keyword.arg == "default"][0]
+        Edits.append((Offset(Node.lineno, Node.col_offset), Offset(Node.end_lineno, Node.end_col_offset), Source_Literal(Value)))
+    for Node in Tree.body:
+        if isinstance(Node, ast.Assign) and [Target.id for Target in Node.targets if isinstance(Target, ast.Name)] == ["metadata"]:
+            for Key, Item in zip(Node.value.keys, Node.value.values):
+                if ast.literal_eval(Key) == "protocolName":
+                    Edits.append((Offset(Item.lineno, Item.col_offset), Offset(Item.end_lineno, Item.end_col_offset),
+                                  repr(ast.literal_eval(Item).strip() + " - " + Project_Name)))
+    for Start, End, Text in sorted(Edits, reverse = True):
+        Source = Source[:Start] + Text + Source[End:]
+    return Source
+
+
+#### Plate state ####
+## {plate name: Plate_State} - the plate states the protocols read and write with plate states on (plate_state block).
+def New_Plate(State, Name, Plate_Type, Project, Volumes, Concentrations = None):
+    State[Name] = Plate_State(Name, Plate_Type, Project["name"])
+    for Well_Name, Volume in Volumes.items():
+        State[Name].Set(Well_Name, Project["samples"][Well_Name], Volume, (Concentrations or {}).get(Well_Name, 0))
+
+
+def Take(State, Name, Well_Name, Volume, Step, Problems):
+    ## Takes Volume from a well; a well that holds less is a problem (and is left empty).
+    try:
+        State[Name].Take(Well_Name, Volume)
+    except ValueError as Error:
+        Problems.append(Step + ": " + str(Error))
+        State[Name].Volume[Well_Index(Well_Name)] = 0
+
+
+def Empty_Plate(State, Name):
+    ## The samples have gone to the output plate of a purification.
+    for Well_Name in State[Name].Wells():
+        State[Name].Volume[Well_Index(Well_Name)] = 0
+
+
+#### Run plans ####
+## Each sets the project values of its run (Values), writes its CSV input and updates the plates. Returns notes for the run sheet.
+def Plan_DREX(Project, Values, State, Files, Problems):
+    Records = Project["records"]
+    Concentrations = Records.Float("DNAconc", 0)
+    New_Plate(State, "DREX eluate", Values["plate_type"], Project, {Well_Name: Values["elution_volume"] for Well_Name in Project["wells"]},
+              {Well_Name: Concentrations[i] for i, Well_Name in enumerate(Project["wells"])})
+    return ["Samples in the lysate plate wells of the project sheet; the eluate plate goes to the Covaris setup."]
+
+
+def Plan_CovarisSetup(Project, Values, State, Files, Problems):
+    Records = Project["records"]
+    DNA = [float(Value) for Value in Records["DNAul"]]
+    Water = [float(Value) for Value in Records["Waterul"]]
+    Notes = []
+    if Values["normalise"] == True:
+        Normalised = Normalise(Records["DNAconc"], Values["target_mass"], Values["target_volume"], Minimum_Volume = 1, Maximum_Volume = Covaris_Well_Volume)
+        DNA, Water = Normalised["DNAul"], Normalised["Waterul"]
+        Flagged = [Records["SampleID"][i] + " (" + Flag + ")" for i, Flag in enumerate(Normalised["Flag"]) if Flag]
+        if Flagged:
+            Notes.append("Normalisation: " + ", ".join(Flagged))
+    Files["DNAnormalisingwells"] = Sheet_Rows(Records, Library_Columns)
+    Concentrations = Records.Float("DNAconc", 0)
+    for i, Well_Name in enumerate(Project["wells"]):
+        Take(State, "DREX eluate", Well_Name, DNA[i], "CovarisSetup", Problems)
+    New_Plate(State, "Covaris plate", Steps_By_Name["CovarisSetup"]["output_type"], Project,
+              {Well_Name: DNA[i] + Water[i] for i, Well_Name in enumerate(Project["wells"])},
+              {Well_Name: DNA[i] * Concentrations[i] / (DNA[i] + Water[i]) if DNA[i] + Water[i] > 0 else 0 for i, Well_Name in enumerate(Project["wells"])})
+    return Notes + ["Shear the Covaris plate, then build the libraries in it."]
+
+
+def Plan_BEST_Library(Project, Values, State, Files, Problems):
+    Records = Project["records"]
+    Missing = [Records["SampleID"][i] for i in range(len(Records)) if not str(Records["Adaptor"][i]).strip()]
+    if Missing:
+        raise SystemExit("No Adaptor concentration for " + ", ".join(Missing) + " in the project sheet")
+    Files["AdaptorConc"] = Sheet_Rows(Records, Library_Columns)
+    Plate = State["Covaris plate"]
+    for Well_Name in Plate.Wells():
+        Index = Well_Index(Well_Name)
+        Plate.Concentration[Index] = round(Plate.Concentration[Index] * Plate.Volume[Index] / (Plate.Volume[Index] + Library_Additions), 3)
+        Plate.Volume[Index] = round(Plate.Volume[Index] + Library_Additions, 2)
+    return []
+
+
+def Plan_BEST_Purification(Project, Values, State, Files, Problems):
+    Empty_Plate(State, "Covaris plate")
+    New_Plate(State, "Purified library", Values["output_plate_type"], Project, {Well_Name: Values["elution_volume"] for Well_Name in Project["wells"]})
+    return []
+
+
+def Plan_IndexPCR(Project, Values, State, Files, Problems):
+    Records = Project["records"]
+    Notes = []
+    if Has_Values(Records, "IndexWell"):
+        Values["index_mapping"] = True
+        Values["index_plates"] = max(int(Value or 1) for Value in Records["IndexPlate"]) if "IndexPlate" in Records else 1
+        Files["IndexSheet"] = Sheet_Rows(Records, Index_Columns)
+    else:
+        Notes.append("No index wells in the project sheet: the primers are taken column for column from the primer plate.")
+    for Well_Name in Project["wells"]:
+        Take(State, "Purified library", Well_Name, iPCR_Sample, "IndexPCR", Problems)
+    New_Plate(State, "Index PCR plate", Values["output_plate_type"], Project, {Well_Name: iPCR_Volume for Well_Name in Project["wells"]})
+    return Notes
+
+
+def Plan_IndexPCR_Purification(Project, Values, State, Files, Problems):
+    Empty_Plate(State, "Index PCR plate")
+    New_Plate(State, "Indexed library", Values["output_plate_type"], Project, {Well_Name: Values["elution_volume"] for Well_Name in Project["wells"]})
+    return []
+
+
+def Plan_qPCR(Project, Values, State, Files, Problems):
+    ## The qPCR plate is the end of its branch (and may have 384 wells), so it has no plate state.
+    Output_Wells = 384 if Values["output_plate_type"] == "biorad_384_wellplate_50ul" else 96
+    try:
+        Layout = Plan_qPCR_Layout([(1, Column) for Column in range(1, Project["columns"] + 1)], Values["replicates"], Output_Wells, Values["standards"])
+    except ValueError as Error:
+        raise SystemExit("qPCR: " + str(Error))
+    for Well_Name in Project["wells"]:
+        Take(State, "Indexed library", Well_Name, qPCR_Sample * Values["replicates"], "qPCR", Problems)
+    return ["qPCR plate: " + str(len(Layout)) + " column(s) of " + str(qPCR_Volume) + " µL reactions"
+            + (", standards in column 1" if Values["standards"] == True else "")]
+
+
+def Plan_PoolCombiner(Project, Values, State, Files, Problems):
+    Records = Project["records"]
+    if not Has_Values(Records, "SampleVolume"):
+        return ["No SampleVolume in the project sheet: make the pooling sheet (" + ";".join(Pool_Columns) + ") from the qPCR results with tools/pooling_calculator.py and select it for this run."]
+    Files["PoolSheet"] = Sheet_Rows(Records, Pool_Columns)
+    Pool_Volumes = [float(Value) for Value in Records["SampleVolume"]]
+    try:
+        Factors = [Dilution_Factor(Value) for Value in Records["Dilution"]] if "Dilution" in Records else [0] * len(Records)
+        Values["dilutionchoice"] = any(Factors)
+        Dilutions = Plan_Dilutions([(Project["wells"][i], Factors[i], Pool_Volumes[i]) for i in range(len(Records)) if Factors[i] > 0])
+    except ValueError as Error:
+        raise SystemExit("PoolCombiner: " + str(Error))
+    for i, Well_Name in enumerate(Project["wells"]):
+        Take(State, "Indexed library", Well_Name, Dilutions[Well_Name]["sample_ul"] if Well_Name in Dilutions else Pool_Volumes[i], "PoolCombiner", Problems)
+    State["Pool"] = Plate_State("Pool", Values["pooltube_type"], Project["name"])
+    State["Pool"].Set("A1", "Pool", sum(Pool_Volumes))
+    return []
+
+
+Step_Plans = {"DREX": Plan_DREX, "CovarisSetup": Plan_CovarisSetup, "BEST-Library": Plan_BEST_Library, "BEST-Purification": Plan_BEST_Purification,
+              "IndexPCR": Plan_IndexPCR, "IndexPCR-Purification": Plan_IndexPCR_Purification, "qPCR": Plan_qPCR, "PoolCombiner": Plan_PoolCombiner}
+Steps_By_Name = {Step["name"]: Step for Step in Steps}
+
+
+#### Project ####
+def Prepare_Project(Sheet_Path, Project_Name, Out_Dir, Settings, Plate_States = False):
+    ## Settings: {run: {parameter: value}}. Plate_States: plate states on in the protocols that have them. Writes the protocols, CSV files, plate_state.json and run_sheet.txt to Out_Dir.
+    ## Returns the runs as [{"name", "protocol" (path), "values" (set defaults), "files" ({CSV parameter: path}), "notes"}].
+    Records = Read_Project(Sheet_Path)
+    Project = {"name": Project_Name, "records": Records, "wells": list(Records["WellPosition"]),
+               "samples": {Records["WellPosition"][i]: str(Records["SampleID"][i]).strip() for i in range(len(Records))}}
+    Project["columns"] = max(Split_Well_Name(Well_Name)[1] for Well_Name in Project["wells"])
+    for Step, Values in Settings.items():
+        if Step not in Steps_By_Name:
+            raise SystemExit("Unknown run " + Step + " (runs: " + ", ".join(Steps_By_Name) + ")")
+        for Name in Values:
+            if Name in Project_Parameters:
+                raise SystemExit(Step + "." + Name + " is set from the project sheet and the other runs")
+
+    os.makedirs(Out_Dir, exist_ok = True)
+    State = {}
+    Problems = []
+    Snapshots = []
+    Runs = []
+    Output_Types = {}
+    for Number, Step in enumerate(Steps, start = 1):
+        with open(os.path.join(Protocol_Dir, Step["file"]), encoding = "utf-8", newline = "") as Handle:
+            Source = Handle.read()
+        Tree = ast.parse(Source)
+        Calls = Parameter_Calls(Tree)
+        Info = {Name: Parameter_Info(Call) for Name, Call in Calls.items()}
+        Values = {Name: Item["default"] for Name, Item in Info.items() if Item["kind"] != "csv_file"}
+        if Plate_States == True and "plate_state" in Values:
+            Values["plate_state"] = True
+        for Name, Value in Settings.get(Step["name"], {}).items():
+            if Name not in Info:
+                raise SystemExit(Step["name"] + " has no parameter " + Name + " (parameters: " + ", ".join(Info) + ")")
+            Values[Name] = Check_Value(Step["name"], Name, Info[Name], Value)
+        if "sample_count" in Values:
+            Values["sample_count"] = Check_Value(Step["name"], "sample_count", Info["sample_count"], 8 * Project["columns"])
+        if "source" in Step:
+            Values[Step["input"]] = Output_Types[Step["source"]]
+            if Values[Step["input"]] not in Info[Step["input"]]["choices"]:
+                raise SystemExit(Step["name"] + " cannot take its input in " + Values[Step["input"]] + " from " + Step["source"]
+                                 + " - set " + Step["source"] + "." + Steps_By_Name[Step["source"]].get("output", "") + " to one of: " + ", ".join(Info[Step["input"]]["choices"]))
+        Output_Types[Step["name"]] = Step["output_type"] if "output_type" in Step else Values[Step["output"]] if "output" in Step else Values[Step["input"]]
+
+        Prefix = os.path.join(Out_Dir, str(Number).zfill(2) + "_" + Step["name"])
+        Files = {}
+        Notes = Step_Plans[Step["name"]](Project, Values, State, Files, Problems)
+        Values = {Name: Check_Value(Step["name"], Name, Info[Name], Value) for Name, Value in Values.items()}
+        File_Paths = {}
+        for Name, Rows in Files.items():
+            File_Paths[Name] = Prefix + "_" + Name + ".csv"
+            Write_CSV(File_Paths[Name], Rows)
+        Changed = {Name: Value for Name, Value in Values.items() if Value != Info[Name]["default"]}
+        with open(Prefix + ".py", "w", encoding = "utf-8", newline = "") as Handle:
+            Handle.write(Rewrite_Protocol(Source, Tree, Calls, Changed, Project_Name))
+        Runs.append({"name": Step["name"], "protocol": Prefix + ".py", "values": Changed, "files": File_Paths, "notes": Notes})
+        Snapshots.append({"run": Step["name"], "protocol": os.path.basename(Prefix + ".py"), "plates": {Name: Plate.Data() for Name, Plate in State.items()}})
+        if Step["name"] == "DREX":
+            ## The DREX protocol does not write plate states: the eluate state is written here, to copy to the robot.
+            os.makedirs(os.path.join(Out_Dir, "plate_state"), exist_ok = True)
+            with open(Plate_State_File("DREX eluate", os.path.join(Out_Dir, "plate_state")), "w", encoding = "utf-8") as Handle:
+                json.dump(State["DREX eluate"].Data(), Handle, separators = (",", ":"))
+
+    with open(os.path.join(Out_Dir, "plate_state.json"), "w", encoding = "utf-8") as Handle:
+        json.dump({"project": Project_Name, "sheet": os.path.basename(Sheet_Path), "runs": Snapshots}, Handle, indent = 1, ensure_ascii = False)
+    with open(os.path.join(Out_Dir, "run_sheet.txt"), "w", encoding = "utf-8") as Handle:
+        Handle.write(Run_Sheet(Project_Name, Project, Runs, Snapshots))
+    if Problems:
+        raise SystemExit("The sample volumes do not last through the runs:\n  " + "\n  ".join(Problems))
+    return Runs
+
+
+def Run_Sheet(Project_Name, Project, Runs, Snapshots):
+    Lines = ["Project " + Project_Name + ": " + str(len(Project["wells"])) + " samples, " + str(Project["columns"]) + " column(s)", ""]
+    for Number, (Run, Snapshot) in enumerate(zip(Runs, Snapshots), start = 1):
+        Lines.append(str(Number) + ". " + Run["name"] + " - " + os.path.basename(Run["protocol"]))
+        Lines.append("   Settings: " + (", ".join(Name + " = " + json.dumps(Value) for Name, Value in Run["values"].items()) or "protocol defaults"))
+        for Name, Path in Run["files"].items():
+            Lines.append("   CSV " + Name + ": " + os.path.basename(Path))
+        for Note in Run["notes"]:
+            Lines.append("   " + Note)
+        Plates = []
+        for Name, Plate in Snapshot["plates"].items():
+            Volumes = [Volume for Volume, Occupied in zip(Plate["volume"], Plate["occupied"]) if Occupied]
+            if Volumes and max(Volumes) > 0:
+                Plates.append(Name + " (" + Plate["plate_type"] + ", " + str(len(Volumes)) + " wells, " + str(min(Volumes))
+                              + ("-" + str(max(Volumes)) if max(Volumes) != min(Volumes) else "") + " µL)")
+        Lines.append("   Plates after the run: " + "; ".join(Plates))
+        Lines.append("")
+    return "\r\n".join(Lines)
+
+
+def Parse_Setting(Argument):
+    ## "Step.parameter=value" -> (step, parameter, value)
+    from simulate_protocol import Parse_Parameter
+    Name, Value, Path = Parse_Parameter(Argument)
+    if "." not in Name or Path is not None:
+        raise argparse.ArgumentTypeError("Settings are given as Step.parameter=value: " + Argument)
+    Step, Name = Name.split(".", 1)
+    return Step, Name, Value
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Prepare the protocols, CSV files and run sheet of a library prep project.")
+    Parser.add_argument("sheet", help = "Project sample sheet (library input template).")
+    Parser.add_argument("--name", required = True, help = "Project name, added to the protocol names.")
+    Parser.add_argument("--out", help = "Output folder (default: the project name).")
+    Parser.add_argument("--set", dest = "settings", action = "append", default = [], type = Parse_Setting, help = "Run setting: Step.parameter=value.")
+    Parser.add_argument("--plate-state", action = "store_true", help = "Turn plate states on in the protocols that have them.")
+    Parser.add_argument("--simulate", action = "store_true", help = "Simulate the written protocols with their CSV files.")
+    Args = Parser.parse_args(argv)
+
+    Settings = {}
+    for Step, Name, Value in Args.settings:
+        Settings.setdefault(Step, {})[Name] = Value
+    Out_Dir = Args.out or Args.name
+    Runs = Prepare_Project(Args.sheet, Args.name, Out_Dir, Settings, Args.plate_state)
+    with open(os.path.join(Out_Dir, "run_sheet.txt"), encoding = "utf-8") as Handle:
+        print(Handle.read())
+
+    if Args.simulate:
+        from simulate_protocol import Simulate, Simulation_Error
+        Failed = 0
+        for Run in Runs:
+            Missing = [Name for Name, Call in Parameter_Calls(ast.parse(open(Run["protocol"], encoding = "utf-8").read())).items()
+                       if Call.func.attr == "add_csv_file" and Name not in Run["files"]]
+            if Missing:
+                print(Run["name"] + ": not simulated (no " + ", ".join(Missing) + " yet)")
+                continue
+            ## The plate states are read on the robot, so the simulation runs with them off.
+            Values = {"plate_state": False} if Run["values"].get("plate_state") == True else None
+            try:
+                Commands = Simulate(Run["protocol"], Values, Run["files"])
+                print(Run["name"] + ": " + str(len(Commands)) + " commands" + (" (plate states off)" if Values else ""))
+            except Simulation_Error as Error:
+                Failed += 1
+                print(Run["name"] + ": simulation failed")
+                for Detail in Error.Details:
+                    print("  " + Detail)
+        return 1 if Failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
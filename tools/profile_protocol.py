@@ -0,0 +1,322 @@
+#########################
+### Protocol profiler ###
+#########################
+
+## Shows where the robot time of a protocol goes. The protocol is simulated (tools/simulate_protocol.py) and the command
+## trace of the protocol engine is read back: every command with the deck coordinates the pipette moved to, its labware,
+## well, slot and pipette, and the stage it belongs to (the "STATUS:" comments). Each command gets a modelled time with the
+## timing model of the run time estimate (static/OT2_shared/run_estimator.py): the moves from the distance between the
+## coordinates, pipetting from the volumes and flow rates, tip handling, delays and module steps (temperatures ramp as in
+## static/OT2_shared/thermal_model.py). Operator pauses are not counted.
+## Prints the travel (mm) and modelled time per stage, per labware and per pipette, a deck heatmap of the time spent in each
+## slot, and the move patterns (trips between two slots by a pipette) ranked by the time they take.
+## Usage: python tools/profile_protocol.py <protocol> [name=value ...] [name=@file.csv ...] [--top 10] [--trace trace.csv]
+## Example: python tools/profile_protocol.py static/OT2_protocols/ProtocolV2_CovarisSetup_OT2.py DNAnormalisingwells=@sheet.csv
+## --trace writes the full command trace (one row per command) for a closer look, e.g. in a spreadsheet.
+
+#### Package loading ####
+import argparse
+import csv
+import os
+import sys
+
+from simulate_protocol import Parse_Parameter, Simulate, Simulation_Error
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Shared_Dir = os.path.join(Repo_Dir, "static", "OT2_shared")
+sys.path.insert(0, Shared_Dir)
+
+from run_estimator import Temperature_Module_Rates, Timing
+from thermal_model import Block_Ramp_Seconds, Lid_Ramp_Seconds
+
+
+#### Deck ####
+Slot_Pitch = (132.5, 90.5) ## mm between the slot origins of the OT-2 deck (slot 1 at 0, 0)
+Deck_Rows = [[10, 11, 12], [7, 8, 9], [4, 5, 6], [1, 2, 3]]
+Heat_Shades = " .:-=+*#%@"
+
+## Commands with a fixed time in the model; pipetting, moves, delays and temperatures are worked out per command
+Fixed_Seconds = {
+    "pickUpTip": Timing["pick_up_tip"],
+    "dropTip": Timing["eject"],
+    "dropTipInPlace": Timing["eject"],
+    "blowout": Timing["blow_out"],
+    "blowOutInPlace": Timing["blow_out"],
+    "touchTip": Timing["touch_tip"],
+    "airGapInPlace": Timing["air_gap"],
+    "home": Timing["home"],
+    "magneticModule/engage": Timing["magnet"],
+    "magneticModule/disengage": Timing["magnet"],
+    "thermocycler/openLid": Timing["lid"],
+    "thermocycler/closeLid": Timing["lid"],
+    "heaterShaker/openLabwareLatch": Timing["latch"],
+    "heaterShaker/closeLabwareLatch": Timing["latch"],
+    "heaterShaker/setAndWaitForShakeSpeed": Timing["shake_ramp"],
+    "heaterShaker/deactivateShaker": Timing["shake_ramp"],
+}
+
+
+## Module commands that start a temperature change, and the commands that wait for it
+Target_Commands = ["temperatureModule/setTargetTemperature", "heaterShaker/setTargetTemperature", "thermocycler/setTargetBlockTemperature", "thermocycler/setTargetLidTemperature"]
+Wait_Commands = ["temperatureModule/waitForTemperature", "heaterShaker/waitForTemperature", "thermocycler/waitForBlockTemperature", "thermocycler/waitForLidTemperature"]
+
+
+def Ramp_Seconds(Model, Part, Start, End):
+    if Model.startswith("thermocycler"):
+        return (Lid_Ramp_Seconds if Part == "lid" else Block_Ramp_Seconds)(Model, Start, End)
+    return abs(End - Start) / Temperature_Module_Rates["heating" if End >= Start else "cooling"]
+
+
+def Slot_At(X, Y):
+    ## The deck slot (1-12) below a point; slot 12 is the fixed trash.
+    Column = min(2, max(0, int(X // Slot_Pitch[0])))
+    Row = min(3, max(0, int(Y // Slot_Pitch[1])))
+    return Row * 3 + Column + 1
+
+
+def Clock(Seconds):
+    Seconds = int(round(Seconds))
+    return str(Seconds // 3600) + ":" + str(Seconds // 60 % 60).zfill(2) + ":" + str(Seconds % 60).zfill(2)
+
+
+def _Value(Value):
+    ## Enum parameters (e.g. the pipette name) as their plain value.
+    return str(getattr(Value, "value", Value))
+
+
+#### Command trace ####
+def Engine_Trace(Engine):
+    ## One record per engine command: {"index", "command", "stage", "pipette", "labware", "well", "slot", "x", "y", "z",
+    ## "volume", "travel", "move_seconds", "seconds"}. travel (mm) and move_seconds are the move to the command's position; seconds
+    ## is the modelled time of the command, the move included. Commands without a position happen where the pipette is.
+    Commands = Engine.state_view.commands.get_all()
+    Module_Slots = {}
+    Module_Models = {}
+    Labware_Names = {}
+    Pipette_Names = {}
+    Temperatures = {} ## (module id, "block"/"lid"): modelled target °C
+    Ready = {} ## (module id, "block"/"lid"): modelled time the module reaches its target (and ends its hold)
+    Tasks = {} ## task id: modelled time the task ends
+    Clock_Seconds = 0.0
+    Positions = {} ## pipette id: last point, None after a home
+    Places = {} ## pipette id: (labware, well, slot) of the last point
+    Stage = "Setup"
+    Trace = []
+    for Index, Command in enumerate(Commands):
+        Type = Command.commandType
+        Params = Command.params
+        Result = Command.result
+        Pipette_Id = getattr(Params, "pipetteId", None)
+        Record = {"index": Index, "command": Type, "stage": Stage, "pipette": Pipette_Names.get(Pipette_Id, ""), "labware": "",
+                  "well": "", "slot": "", "x": "", "y": "", "z": "", "volume": getattr(Params, "volume", None) or "", "travel": 0.0, "move_seconds": 0.0, "seconds": 0.0}
+
+        if Type == "loadModule":
+            Module_Slots[Result.moduleId] = _Value(Params.location.slotName)
+            Module_Models[Result.moduleId] = _Value(Params.model)
+        elif Type == "loadLabware":
+            Location = Params.location
+            Slot = getattr(Location, "slotName", None) or Module_Slots.get(getattr(Location, "moduleId", None), "")
+            Labware_Names[Result.labwareId] = Params.loadName + (" in slot " + _Value(Slot) if Slot else "")
+        elif Type == "loadPipette":
+            Pipette_Names[Result.pipetteId] = _Value(Params.pipetteName) + " (" + _Value(Params.mount) + ")"
+        elif Type == "comment" and str(Params.message).startswith("STATUS:"):
+            Stage = str(Params.message)[7:].strip()
+            Record["stage"] = Stage
+
+        Point = getattr(Result, "position", None)
+        if Point is not None and Pipette_Id is not None:
+            Labware_Id = getattr(Params, "labwareId", None)
+            Labware = Labware_Names.get(Labware_Id, Labware_Id) if Labware_Id else getattr(Params, "addressableAreaName", "")
+            Slot = Slot_At(Point.x, Point.y)
+            Places[Pipette_Id] = (Labware, getattr(Params, "wellName", ""), Slot)
+            Last = Positions.get(Pipette_Id)
+            if Last is None:
+                Record["move_seconds"] = Timing["move"]
+            else:
+                Across = ((Point.x - Last.x) ** 2 + (Point.y - Last.y) ** 2) ** 0.5
+                Down = abs(Point.z - Last.z)
+                Record["travel"] = Across + Down
+                if getattr(Params, "speed", None):
+                    Record["move_seconds"] = (Across + Down) / Params.speed
+                elif Across < 1:
+                    Record["move_seconds"] = Down / Timing["z_speed"]
+                else:
+                    Record["move_seconds"] = Timing["arc"] + Across / Timing["gantry_speed"]
+            Positions[Pipette_Id] = Point
+            Record.update(x = round(Point.x, 2), y = round(Point.y, 2), z = round(Point.z, 2))
+        elif Type == "home":
+            Positions = {}
+        if Pipette_Id in Places:
+            Record["labware"], Record["well"], Record["slot"] = Places[Pipette_Id]
+
+        Seconds = Fixed_Seconds.get(Type, 0.0)
+        if getattr(Params, "volume", None) and getattr(Params, "flowRate", None):
+            Seconds += Params.volume / Params.flowRate
+        if Type == "waitForDuration":
+            Seconds += Params.seconds
+        Module_Id = getattr(Params, "moduleId", None)
+        Part = "lid" if "Lid" in Type else "block"
+        Now = Clock_Seconds + Record["move_seconds"]
+        if Type in Target_Commands:
+            ## The module ramps (and holds) while the protocol goes on; a wait for it takes what is left.
+            Ramp = Ramp_Seconds(Module_Models[Module_Id], Part, Temperatures.get((Module_Id, Part), 25), Params.celsius)
+            Temperatures[(Module_Id, Part)] = Params.celsius
+            Ready[(Module_Id, Part)] = Now + Ramp + (getattr(Params, "holdTimeSeconds", None) or 0)
+            if getattr(Result, "taskId", None):
+                Tasks[Result.taskId] = Ready[(Module_Id, Part)]
+        elif Type in Wait_Commands:
+            Seconds += max(0, Ready.get((Module_Id, Part), 0) - Now)
+        elif Type == "waitForTasks":
+            Seconds += max([0] + [Tasks.get(Task_Id, 0) - Now for Task_Id in Params.task_ids])
+        elif Type in ["thermocycler/runProfile", "thermocycler/runExtendedProfile"]:
+            Steps = Params.profile if Type == "thermocycler/runProfile" else []
+            for Element in getattr(Params, "profileElements", []):
+                Steps += list(Element.steps) * Element.repetitions if hasattr(Element, "steps") else [Element]
+            for Step in Steps:
+                Seconds += Ramp_Seconds(Module_Models[Module_Id], "block", Temperatures.get((Module_Id, "block"), 25), Step.celsius) + Step.holdSeconds
+                Temperatures[(Module_Id, "block")] = Step.celsius
+            Ready[(Module_Id, "block")] = Now + Seconds
+        elif Type.startswith(("temperatureModule/deactivate", "heaterShaker/deactivateHeater", "thermocycler/deactivate")):
+            for Part in (["block", "lid"] if Type == "thermocycler/deactivate" else [Part]):
+                Temperatures[(Module_Id, Part)] = 25
+                Ready[(Module_Id, Part)] = Now
+        Record["seconds"] = Seconds + Record["move_seconds"]
+        Clock_Seconds += Record["seconds"]
+        Trace.append(Record)
+    return Trace
+
+
+def Command_Trace(Protocol_Path, Values = None, Files = None):
+    ## Simulates the protocol and returns its command trace (see Engine_Trace).
+    Trace = []
+    Simulate(Protocol_Path, Values, Files, Inspect = lambda Engine: Trace.extend(Engine_Trace(Engine)))
+    return Trace
+
+
+#### Profile ####
+def Totals(Trace, Key):
+    ## {key value: {"commands", "travel", "move_seconds", "seconds"}} in the order the key values first come up.
+    Groups = {}
+    for Record in Trace:
+        if Record[Key] == "":
+            continue
+        Group = Groups.setdefault(Record[Key], {"commands": 0, "travel": 0.0, "move_seconds": 0.0, "seconds": 0.0})
+        Group["commands"] += 1
+        Group["travel"] += Record["travel"]
+        Group["move_seconds"] += Record["move_seconds"]
+        Group["seconds"] += Record["seconds"]
+    return Groups
+
+
+def Move_Patterns(Trace):
+    ## Moves of a pipette between two slots (either way) and within a slot, ranked by the modelled time they take.
+    ## Returns [(pipette, slot pair, {"moves", "travel", "seconds", "labware"})]; moves within a well are left out.
+    Patterns = {}
+    Last_Slots = {}
+    for Record in Trace:
+        if Record["x"] == "" or Record["pipette"] == "":
+            continue
+        Last = Last_Slots.get(Record["pipette"])
+        Last_Slots[Record["pipette"]] = (Record["slot"], Record["labware"])
+        if Last is None or Record["travel"] < 1 and Record["move_seconds"] < Timing["arc"]:
+            continue
+        Slots = tuple(sorted([Last[0], Record["slot"]]))
+        Pattern = Patterns.setdefault((Record["pipette"], Slots), {"moves": 0, "travel": 0.0, "seconds": 0.0, "labware": set()})
+        Pattern["moves"] += 1
+        Pattern["travel"] += Record["travel"]
+        Pattern["seconds"] += Record["move_seconds"]
+        Pattern["labware"].update([Last[1], Record["labware"]])
+    return sorted(((Pipette, Slots, Pattern) for (Pipette, Slots), Pattern in Patterns.items()), key = lambda Item: -Item[2]["seconds"])
+
+
+def Deck_Heatmap(Trace):
+    ## Text map of the deck: per slot the modelled time spent there (moves to the slot and the work in it), shaded by its
+    ## share of the busiest slot.
+    Slot_Seconds = {Slot: Group["seconds"] for Slot, Group in Totals(Trace, "slot").items()}
+    Visits = {Slot: Group["commands"] for Slot, Group in Totals(Trace, "slot").items()}
+    Busiest = max(Slot_Seconds.values(), default = 0) or 1
+    Width = 16
+    Lines = ["+" + ("-" * Width + "+") * 3]
+    for Row in Deck_Rows:
+        Cells = [[], [], []]
+        for Position, Slot in enumerate(Row):
+            Seconds = Slot_Seconds.get(Slot, 0.0)
+            Shade = Heat_Shades[min(len(Heat_Shades) - 1, int(Seconds / Busiest * (len(Heat_Shades) - 1) + 0.5))] if Seconds else " "
+            Cells[0].append(" " + str(Slot).ljust(3) + (Shade * 12))
+            Cells[1].append(" " + Clock(Seconds).rjust(8) + " " * 7 if Seconds else " " * Width)
+            Cells[2].append(" " + (str(Visits[Slot]) + " cmds").rjust(8) + " " * 7 if Slot in Visits else " " * Width)
+        for Cell_Line in Cells:
+            Lines.append("|" + "|".join(Cell.ljust(Width)[:Width] for Cell in Cell_Line) + "|")
+        Lines.append("+" + ("-" * Width + "+") * 3)
+    Lines.append("Shading: share of the busiest slot (" + Clock(Busiest) + "), from '" + Heat_Shades[1] + "' to '" + Heat_Shades[-1] + "'")
+    return Lines
+
+
+def Table(Title, Groups, Total_Seconds, Limit = None):
+    Lines = [Title, "  " + "".ljust(50) + "commands".rjust(9) + "travel m".rjust(10) + "moves".rjust(10) + "total".rjust(10) + "share".rjust(7)]
+    Items = sorted(Groups.items(), key = lambda Item: -Item[1]["seconds"]) if Limit else list(Groups.items())
+    for Name, Group in Items[:Limit]:
+        Lines.append("  " + str(Name)[:50].ljust(50) + str(Group["commands"]).rjust(9) + str(round(Group["travel"] / 1000, 1)).rjust(10)
+                     + Clock(Group["move_seconds"]).rjust(10) + Clock(Group["seconds"]).rjust(10)
+                     + (str(round(100 * Group["seconds"] / Total_Seconds)) + "%").rjust(7))
+    return Lines
+
+
+def Profile_Report(Trace, Top = 10):
+    Total_Seconds = sum(Record["seconds"] for Record in Trace) or 1
+    Travel = sum(Record["travel"] for Record in Trace)
+    Move_Seconds = sum(Record["move_seconds"] for Record in Trace)
+    Lines = [str(len(Trace)) + " commands, modelled robot time " + Clock(Total_Seconds) + " (h:mm:ss), of which moves " + Clock(Move_Seconds)
+             + " over " + str(round(Travel / 1000, 1)) + " m of travel", ""]
+    Lines += Table("Per stage:", Totals(Trace, "stage"), Total_Seconds) + [""]
+    Lines += Table("Per labware (top " + str(Top) + "):", Totals(Trace, "labware"), Total_Seconds, Top) + [""]
+    Lines += Table("Per pipette:", Totals(Trace, "pipette"), Total_Seconds) + [""]
+    Lines += ["Deck heatmap (modelled time per slot):"] + Deck_Heatmap(Trace) + [""]
+    Lines.append("Most expensive move patterns (top " + str(Top) + "):")
+    for Pipette, Slots, Pattern in Move_Patterns(Trace)[:Top]:
+        Trip = "within slot " + str(Slots[0]) if Slots[0] == Slots[1] else "slot " + str(Slots[0]) + " <-> slot " + str(Slots[1])
+        Lines.append("  " + (Trip + ", " + Pipette).ljust(50) + (str(Pattern["moves"]) + " moves").rjust(11)
+                     + (str(round(Pattern["travel"] / Pattern["moves"])) + " mm each").rjust(14) + Clock(Pattern["seconds"]).rjust(10)
+                     + (str(round(100 * Pattern["seconds"] / Total_Seconds)) + "%").rjust(7))
+        Lines.append("      " + ", ".join(sorted(Name for Name in Pattern["labware"] if Name)))
+    return Lines
+
+
+def Write_Trace(Trace, Path):
+    with open(Path, "w", newline = "", encoding = "utf-8") as Handle:
+        Writer = csv.DictWriter(Handle, fieldnames = list(Trace[0]))
+        Writer.writeheader()
+        for Record in Trace:
+            Writer.writerow(dict(Record, travel = round(Record["travel"], 2), move_seconds = round(Record["move_seconds"], 2), seconds = round(Record["seconds"], 2)))
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Profile the moves and modelled time of an OT-2 protocol from its simulated command trace.")
+    Parser.add_argument("protocol", help = "Protocol file.")
+    Parser.add_argument("parameters", nargs = "*", type = Parse_Parameter, help = "Runtime parameters: name=value or name=@file.csv.")
+    Parser.add_argument("--top", type = int, default = 10, help = "Number of labware and move patterns listed.")
+    Parser.add_argument("--trace", help = "Write the command trace to this CSV file.")
+    Args = Parser.parse_args(argv)
+
+    Values = {Name: Value for Name, Value, Path in Args.parameters if Path is None}
+    Files = {Name: Path for Name, Value, Path in Args.parameters if Path is not None}
+    try:
+        Trace = Command_Trace(Args.protocol, Values, Files)
+    except Simulation_Error as Error:
+        print("Simulation failed:")
+        for Detail in Error.Details:
+            print("  " + Detail)
+        return 1
+
+    for Line in Profile_Report(Trace, Args.top):
+        print(Line)
+    if Args.trace:
+        Write_Trace(Trace, Args.trace)
+        print("Command trace written to " + Args.trace)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+##########################
+### Protocol simulator ###
+##########################
+
+## Simulates a protocol with runtime parameter values and CSV files, the way the OT-2 app runs it. opentrons_simulate
+## cannot set runtime parameters, so the protocols with a CSV input (CovarisSetup, BEST-Library, PoolCombiner) cannot be
+## simulated with it. Needs opentrons >= 8.0 (the protocols use API level 2.22; BEST-Library uses 2.27 and needs a release
+## that supports it).
+## Usage: python tools/simulate_protocol.py <protocol> [name=value ...] [name=@file.csv ...]
+## Example: python tools/simulate_protocol.py static/OT2_protocols/ProtocolV2_BEST-Library_OT2.py AdaptorConc=@sheet.csv
+
+#### Package loading ####
+import argparse
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Custom_Labware_Dir = os.path.join(Repo_Dir, "static", "custom_labware")
+
+
+class Simulation_Error(RuntimeError):
+    ## Raised when the protocol fails in the simulation. Details holds the error messages from the protocol engine.
+    def __init__(self, Details):
+        super().__init__("; ".join(Details))
+        self.Details = Details
+
+
+def Valid_Labware_Files(Labware_Dir):
+    ## Custom labware definitions that pass the schema validation of the installed opentrons version. Definitions that fail
+    ## (e.g. upper case load names) are skipped, so protocols that do not use them can still be simulated.
+    from opentrons_shared_data.labware.labware_definition import labware_definition_type_adapter
+    Files = []
+    for Path in sorted(pathlib.Path(Labware_Dir).glob("*.json")):
+        try:
+            with open(Path, encoding = "utf-8") as Handle:
+                labware_definition_type_adapter.validate_python(json.load(Handle))
+        except Exception:
+            continue
+        Files.append(Path)
+    return Files
+
+
+def Error_Details(Errors):
+    ## Flattens the (nested) engine errors to their messages.
+    Details = []
+    for Error in Errors:
+        if Error.detail not in Details:
+            Details.append(Error.detail)
+        for Detail in Error_Details(Error.wrappedErrors):
+            if Detail not in Details:
+                Details.append(Detail)
+    return Details
+
+
+def Simulate(Protocol_Path, Values = None, Files = None, Labware_Dir = Custom_Labware_Dir, Inspect = None):
+    ## Runs the protocol in a simulated OT-2. Values: {parameter: value}. Files: {CSV parameter: path}.
+    ## Returns the run log as a list of {"text", "level"} (level is the nesting, e.g. the aspirations within a transfer).
+    ## Inspect, when given, is called with the protocol engine after a successful run (e.g. to read the engine commands).
+    from opentrons.protocol_engine import error_recovery_policy
+    from opentrons.protocol_engine.create_protocol_engine import create_protocol_engine
+    from opentrons.protocol_engine.resources.camera_provider import CameraProvider
+    from opentrons.protocol_engine.types import EngineStatus
+    from opentrons.protocol_reader import ProtocolReader
+    from opentrons.protocol_runner import RunOrchestrator
+    from opentrons.protocol_runner.protocol_runner import LiveRunner, create_protocol_runner
+    from opentrons.protocol_runner.run_orchestrator import ParseMode
+    from opentrons.simulate import _CommandScraper, _get_protocol_engine_config, _make_hardware_simulator_cm, should_load_fixed_trash
+
+    ## Protocol errors are reported through Simulation_Error; the engine would also log their full traceback.
+    logging.getLogger("opentrons").setLevel(logging.CRITICAL)
+
+    async def Run():
+        Source = await ProtocolReader().read_saved(files = [pathlib.Path(Protocol_Path)] + Valid_Labware_Files(Labware_Dir), directory = None)
+        with _make_hardware_simulator_cm(config_file_path = None, robot_type = "OT-2 Standard") as Hardware:
+            Hardware_Api = Hardware.wrapped()
+            Engine = await create_protocol_engine(
+                hardware_api = Hardware_Api,
+                config = _get_protocol_engine_config("OT-2 Standard", use_pe_virtual_hardware = True),
+                error_recovery_policy = error_recovery_policy.never_recover,
+                load_fixed_trash = should_load_fixed_trash(Source.config))
+            Runner = create_protocol_runner(protocol_config = Source.config, protocol_engine = Engine, hardware_api = Hardware_Api)
+            Orchestrator = RunOrchestrator(
+                hardware_api = Hardware_Api, protocol_engine = Engine, json_or_python_protocol_runner = Runner,
+                fixit_runner = LiveRunner(protocol_engine = Engine, hardware_api = Hardware_Api),
+                setup_runner = LiveRunner(protocol_engine = Engine, hardware_api = Hardware_Api),
+                protocol_live_runner = LiveRunner(protocol_engine = Engine, hardware_api = Hardware_Api),
+                camera_provider = CameraProvider())
+            await Hardware_Api.home()
+            await Orchestrator.load(
+                protocol_source = Source,
+                run_time_param_values = Values or {},
+                run_time_param_paths = {Name: pathlib.Path(Path) for Name, Path in (Files or {}).items()},
+                parse_mode = ParseMode.NORMAL)
+            Scraper = _CommandScraper(logging.getLogger("simulate_protocol"), "warning", Runner.broker)
+            with Scraper.scrape():
+                Result = await Orchestrator.run(deck_configuration = [])
+            if Result.state_summary.status != EngineStatus.SUCCEEDED:
+                raise Simulation_Error(Error_Details(Result.state_summary.errors))
+            if Inspect is not None:
+                Inspect(Engine)
+            return [{"text": Command["payload"].get("text", ""), "level": Command["level"]} for Command in Scraper.commands]
+
+    return asyncio.run(Run())
+
+
+def Parse_Parameter(Argument):
+    ## "name=value" (JSON values, e.g. 96, true or 2.5; anything else is a string) or "name=@file.csv" for CSV parameters.
+    if "=" not in Argument:
+        raise argparse.ArgumentTypeError("Runtime parameters are given as name=value or name=@file.csv: " + Argument)
+    Name, Value = Argument.split("=", 1)
+    if Value.startswith("@"):
+        return Name, None, Value[1:]
+    try:
+        return Name, json.loads(Value), None
+    except ValueError:
+        return Name, Value, None
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Simulate an OT-2 protocol with runtime parameters and CSV files.")
+    Parser.add_argument("protocol", help = "Protocol file.")
+    Parser.add_argument("parameters", nargs = "*", type = Parse_Parameter, help = "Runtime parameters: name=value or name=@file.csv.")
+    Parser.add_argument("--summary", action = "store_true", help = "Only print the number of commands and the simulation time.")
+    Args = Parser.parse_args(argv)
+
+    Values = {Name: Value for Name, Value, Path in Args.parameters if Path is None}
+    Files = {Name: Path for Name, Value, Path in Args.parameters if Path is not None}
+    Start = time.perf_counter()
+    try:
+        Commands = Simulate(Args.protocol, Values, Files)
+    except Simulation_Error as Error:
+        print("Simulation failed:")
+        for Detail in Error.Details:
+            print("  " + Detail)
+        return 1
+
+    if Args.summary:
+        print(str(len(Commands)) + " commands, simulated in " + str(round(time.perf_counter() - Start, 1)) + " s")
+    else:
+        for Command in Commands:
+            print("\t" * Command["level"] + Command["text"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+###########################
+### Shared block syncer ###
+###########################
+
+## The OT-2 only accepts single-file protocols, so shared code (static/OT2_shared) is copied into every protocol that uses it.
+## A protocol opts in to a shared module by placing an (initially empty) block:
+##
+##     #### Shared: liquid_classes ####
+##     #### End shared: liquid_classes ####
+##
+## Running this script replaces the content of every block with the current shared module.
+## Usage: python tools/sync_shared_blocks.py [--check]
+## --check only reports out-of-date protocols (exit code 1), without writing anything.
+
+#### Package loading ####
+import argparse
+import os
+import re
+import sys
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Shared_Dir = os.path.join(Repo_Dir, "static", "OT2_shared")
+Protocol_Dir = os.path.join(Repo_Dir, "static", "OT2_protocols")
+
+Block_Pattern = re.compile(r"^#### Shared: (\w+) ####\n.*?^#### End shared: \1 ####\n", re.MULTILINE | re.DOTALL)
+
+
+def Shared_Source(Name):
+    Path = os.path.join(Shared_Dir, Name + ".py")
+    if not os.path.isfile(Path):
+        raise SystemExit("Shared module not found for block '" + Name + "': " + Path)
+    with open(Path, encoding = "utf-8") as Handle:
+        return Handle.read().rstrip("\n") + "\n"
+
+
+def Render_Block(Name):
+    return ("#### Shared: " + Name + " ####\n"
+            "## Copied from static/OT2_shared/" + Name + ".py by tools/sync_shared_blocks.py - edit the shared file, not this block.\n"
+            + Shared_Source(Name)
+            + "#### End shared: " + Name + " ####\n")
+
+
+def Line_Ending(Path):
+    ## The protocols are kept with their original (CRLF) line endings.
+    with open(Path, "rb") as Handle:
+        return "\r\n" if b"\r\n" in Handle.read() else "\n"
+
+
+def Sync_Protocol(Path):
+    ## Returns the current and the synced protocol text (newline-normalised) and the names of the blocks in it.
+    with open(Path, encoding = "utf-8") as Handle:
+        Text = Handle.read()
+    Names = []
+    def Replace(Match):
+        Names.append(Match.group(1))
+        return Render_Block(Match.group(1))
+    return Text, Block_Pattern.sub(Replace, Text), Names
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Copy static/OT2_shared modules into the protocols that use them.")
+    Parser.add_argument("--check", action = "store_true", help = "Only check that all protocols are in sync.")
+    Args = Parser.parse_args(argv)
+
+    Outdated = []
+    for File_Name in sorted(os.listdir(Protocol_Dir)):
+        if not File_Name.endswith(".py"):
+            continue
+        Path = os.path.join(Protocol_Dir, File_Name)
+        Old_Text, New_Text, Names = Sync_Protocol(Path)
+        if Old_Text == New_Text:
+            continue
+        Outdated.append(File_Name)
+        if not Args.check:
+            Newline = Line_Ending(Path)
+            with open(Path, "w", encoding = "utf-8", newline = Newline) as Handle:
+                Handle.write(New_Text)
+            print("Synced " + File_Name + ": " + ", ".join(Names))
+
+    if Args.check and Outdated:
+        print("Out of sync with static/OT2_shared: " + ", ".join(Outdated))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
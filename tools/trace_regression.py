@@ -0,0 +1,221 @@
+#################################
+### Command trace regressions ###
+#################################
+
+## Catches protocol changes that make runs longer, longer-winded or hungrier for tips before they reach a robot. Every
+## protocol is simulated over a matrix of runtime parameters and input sheets (Cases below, sheets in
+## tools/golden_traces/inputs) and its command trace (tools/profile_protocol.py) is compared with the golden trace stored
+## in tools/golden_traces: the command count, the modelled robot time and the tip pick-ups may not grow by more than the
+## thresholds. The command sequences are diffed too (command, pipette, labware, well, volume and height per command), so
+## an intended change shows where it lands; sequence changes alone do not fail the check.
+## After an intended change, write the new goldens with --update and commit them with the protocol change.
+## Usage: python tools/trace_regression.py [--case NAME ...] [--update] [--max-commands 1] [--max-time 1] [--max-tips 0] [--jobs N]
+## Exit code 1 when a case regressed or failed to simulate. Needs opentrons (see tools/simulate_protocol.py).
+
+#### Package loading ####
+import argparse
+import concurrent.futures
+import difflib
+import gzip
+import json
+import os
+import sys
+import time
+
+from profile_protocol import Clock, Command_Trace
+from simulate_protocol import Simulation_Error
+
+
+#### Paths ####
+Repo_Dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Protocol_Dir = os.path.join(Repo_Dir, "static", "OT2_protocols")
+Golden_Dir = os.path.join(Repo_Dir, "tools", "golden_traces")
+Input_Dir = os.path.join(Golden_Dir, "inputs")
+
+
+#### Parameter matrix ####
+## name, protocol file, runtime parameter values, CSV parameters (files in tools/golden_traces/inputs)
+Cases = [
+    ("DREX-8", "ProtocolV2_DREX-NucleicAcidExtraction_OT2.py", {"sample_count": 8}, {}),
+    ("DREX-96", "ProtocolV2_DREX-NucleicAcidExtraction_OT2.py", {"sample_count": 96}, {}),
+    ("CovarisSetup-96", "ProtocolV2_CovarisSetup_OT2.py", {}, {"DNAnormalisingwells": "library_96.csv"}),
+    ("CovarisSetup-sparse-40", "ProtocolV2_CovarisSetup_OT2.py", {}, {"DNAnormalisingwells": "library_sparse_40.csv"}),
+    ("CovarisSetup-normalise-8", "ProtocolV2_CovarisSetup_OT2.py", {"normalise": True}, {"DNAnormalisingwells": "library_normalise_8.csv"}),
+    ("BEST-Library-96", "ProtocolV2_BEST-Library_OT2.py", {}, {"AdaptorConc": "library_96.csv"}),
+    ("BEST-Library-sparse-40", "ProtocolV2_BEST-Library_OT2.py", {}, {"AdaptorConc": "library_sparse_40.csv"}),
+    ("BEST-Purification-24", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 24}, {}),
+    ("BEST-Purification-96", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 96}, {}),
+    ("BEST-Purification-96-heater-shaker", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 96, "heater_shaker": True, "input_plate_type": "biorad_96_wellplate_200ul_pcr"}, {}),
+    ("BEST-Purification-two-plates-8-incubation-0", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 8, "two_plates": True, "incubation_time": 0}, {}),
+    ("BEST-Purification-two-plates-8-incubation-60", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 8, "two_plates": True, "incubation_time": 60}, {}),
+    ("BEST-Purification-two-plates-48-incubation-5", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 48, "two_plates": True, "incubation_time": 5}, {}),
+    ("BEST-Purification-two-plates-48-incubation-60", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 48, "two_plates": True, "incubation_time": 60}, {}),
+    ("BEST-Purification-96-multi-dispense", "ProtocolV2_BEST-Purification_OT2.py", {"sample_count": 96, "ethanol_multi_dispense": True}, {}),
+    ("IndexPCR-24", "ProtocolV2_IndexPCR_OT2.py", {"sample_count": 24}, {}),
+    ("IndexPCR-96", "ProtocolV2_IndexPCR_OT2.py", {"sample_count": 96}, {}),
+    ("IndexPCR-96-index-sheet", "ProtocolV2_IndexPCR_OT2.py", {"sample_count": 96, "index_mapping": True, "index_plates": 3}, {"IndexSheet": "index_mixed.csv"}),
+    ("IndexPCR-Purification-24", "ProtocolV2_IndexPCR_Purfication_OT2.py", {"sample_count": 24}, {}),
+    ("IndexPCR-Purification-96", "ProtocolV2_IndexPCR_Purfication_OT2.py", {"sample_count": 96}, {}),
+    ("IndexPCR-Purification-96-multi-dispense", "ProtocolV2_IndexPCR_Purfication_OT2.py", {"sample_count": 96, "ethanol_multi_dispense": True}, {}),
+    ("qPCR-24", "ProtocolV2_qPCR_OT2.py", {"sample_count": 24}, {}),
+    ("qPCR-96", "ProtocolV2_qPCR_OT2.py", {"sample_count": 96}, {}),
+    ("PoolCombiner-96", "ProtocolV2_PoolCombiner_OT2.py", {}, {"PoolSheet": "pool_96.csv"}),
+    ("PoolCombiner-all-diluted", "ProtocolV2_PoolCombiner_OT2.py", {"dilutionchoice": True}, {"PoolSheet": "pool_all_diluted.csv"}),
+]
+
+
+def Command_Line(Record):
+    ## The part of a command the sequence diff compares: what is done, by which pipette, where and with how much.
+    return " | ".join([Record["command"], Record["pipette"], Record["labware"], Record["well"],
+                       "" if Record["volume"] == "" else str(round(Record["volume"], 2)) + " uL",
+                       "" if Record["z"] == "" else "z " + str(round(Record["z"], 1))]).rstrip(" |")
+
+
+def Summary(Trace):
+    return {"commands": len(Trace), "seconds": round(sum(Record["seconds"] for Record in Trace), 1),
+            "tips": sum(1 for Record in Trace if Record["command"] == "pickUpTip"),
+            "travel": round(sum(Record["travel"] for Record in Trace) / 1000, 2)}
+
+
+def Run_Case(Case):
+    ## Simulates a case (in a worker process). Returns (name, {"summary", "commands"}) or (name, error text).
+    Name, Protocol_File, Values, Files = Case
+    try:
+        Trace = Command_Trace(os.path.join(Protocol_Dir, Protocol_File), Values, {Parameter: os.path.join(Input_Dir, File_Name) for Parameter, File_Name in Files.items()})
+    except Simulation_Error as Error:
+        return Name, "simulation failed: " + str(Error)
+    return Name, {"summary": Summary(Trace), "commands": [Command_Line(Record) for Record in Trace]}
+
+
+def Golden_Path(Name):
+    return os.path.join(Golden_Dir, Name + ".json.gz")
+
+
+def Read_Golden(Name):
+    if not os.path.exists(Golden_Path(Name)):
+        return None
+    with gzip.open(Golden_Path(Name), "rt", encoding = "utf-8") as Handle:
+        return json.load(Handle)
+
+
+def Write_Golden(Name, Case, Result):
+    ## mtime 0 keeps the file the same when the trace is, so unchanged goldens do not show up in git.
+    Protocol_File, Values, Files = Case[1:]
+    Data = {"case": Name, "protocol": Protocol_File, "values": Values, "files": Files, "summary": Result["summary"], "commands": Result["commands"]}
+    with open(Golden_Path(Name), "wb") as Raw:
+        with gzip.GzipFile(fileobj = Raw, mode = "wb", mtime = 0) as Handle:
+            Handle.write(json.dumps(Data, indent = 0).encode("utf-8"))
+
+
+def Sequence_Diff(Old, New, Context = 2, Limit = 3):
+    ## Changed commands between two command sequences: (number of commands changed, lines of the first Limit hunks).
+    ## The common start and end are skipped before the diff, so a local change in a long trace is diffed only where it is.
+    Start = 0
+    while Start < min(len(Old), len(New)) and Old[Start] == New[Start]:
+        Start += 1
+    End = 0
+    while End < min(len(Old), len(New)) - Start and Old[len(Old) - 1 - End] == New[len(New) - 1 - End]:
+        End += 1
+    Old_Middle = Old[Start:len(Old) - End]
+    New_Middle = New[Start:len(New) - End]
+    if not Old_Middle and not New_Middle:
+        return 0, []
+    Changed = 0
+    Lines = []
+    Hunks = 0
+    for Tag, Old_Start, Old_End, New_Start, New_End in difflib.SequenceMatcher(None, Old_Middle, New_Middle, autojunk = False).get_opcodes():
+        if Tag == "equal":
+            continue
+        Changed += max(Old_End - Old_Start, New_End - New_Start)
+        Hunks += 1
+        if Hunks > Limit:
+            continue
+        Lines.append("@@ command " + str(Start + Old_Start + 1) + " (golden) / " + str(Start + New_Start + 1) + " (now): " + Tag)
+        for Line in Old_Middle[Old_Start:Old_End][:Context + 3]:
+            Lines.append("- " + Line)
+        for Line in New_Middle[New_Start:New_End][:Context + 3]:
+            Lines.append("+ " + Line)
+    if Hunks > Limit:
+        Lines.append("... " + str(Hunks - Limit) + " more change(s)")
+    return Changed, Lines
+
+
+def Growth(Old, New):
+    return 100.0 * (New - Old) / Old if Old else (0.0 if New == Old else 100.0)
+
+
+def Compare(Golden, Result, Thresholds):
+    ## (regressions, report lines) of a case against its golden trace.
+    Old = Golden["summary"]
+    New = Result["summary"]
+    Regressions = []
+    if Growth(Old["commands"], New["commands"]) > Thresholds["commands"]:
+        Regressions.append("commands " + str(Old["commands"]) + " -> " + str(New["commands"]) + " (+" + str(round(Growth(Old["commands"], New["commands"]), 1)) + "%)")
+    if Growth(Old["seconds"], New["seconds"]) > Thresholds["time"]:
+        Regressions.append("modelled time " + Clock(Old["seconds"]) + " -> " + Clock(New["seconds"]) + " (+" + str(round(Growth(Old["seconds"], New["seconds"]), 1)) + "%)")
+    if New["tips"] - Old["tips"] > Thresholds["tips"]:
+        Regressions.append("tip pick-ups " + str(Old["tips"]) + " -> " + str(New["tips"]))
+    Changed, Lines = Sequence_Diff(Golden["commands"], Result["commands"])
+    Report = ["  commands " + str(Old["commands"]) + " -> " + str(New["commands"]) + ", modelled time " + Clock(Old["seconds"]) + " -> " + Clock(New["seconds"])
+              + ", tip pick-ups " + str(Old["tips"]) + " -> " + str(New["tips"]) + ", travel " + str(Old["travel"]) + " -> " + str(New["travel"]) + " m"]
+    if Changed:
+        Report.append("  " + str(Changed) + " command(s) differ from the golden trace:")
+        Report += ["    " + Line for Line in Lines]
+    return Regressions, Report
+
+
+def main(argv = None):
+    Parser = argparse.ArgumentParser(description = "Compare simulated command traces of the protocols with their golden traces.")
+    Parser.add_argument("--case", dest = "cases", action = "append", help = "Only this case (repeat for more); see --list.")
+    Parser.add_argument("--list", action = "store_true", help = "List the cases.")
+    Parser.add_argument("--update", action = "store_true", help = "Write the current traces as the golden traces.")
+    Parser.add_argument("--max-commands", type = float, default = 1.0, help = "Allowed growth of the command count (%%).")
+    Parser.add_argument("--max-time", type = float, default = 1.0, help = "Allowed growth of the modelled robot time (%%).")
+    Parser.add_argument("--max-tips", type = int, default = 0, help = "Allowed extra tip pick-ups.")
+    Parser.add_argument("--jobs", type = int, default = os.cpu_count(), help = "Cases simulated at the same time.")
+    Args = Parser.parse_args(argv)
+
+    if Args.list:
+        for Name, Protocol_File, Values, Files in Cases:
+            print(Name + ": " + Protocol_File + " " + " ".join([Parameter + "=" + json.dumps(Value) for Parameter, Value in Values.items()]
+                                                              + [Parameter + "=@" + File_Name for Parameter, File_Name in Files.items()]))
+        return 0
+    Unknown = sorted(set(Args.cases or []) - set(Case[0] for Case in Cases))
+    if Unknown:
+        raise SystemExit("Unknown case(s): " + ", ".join(Unknown) + " (see --list)")
+    Selected = [Case for Case in Cases if not Args.cases or Case[0] in Args.cases]
+    Thresholds = {"commands": Args.max_commands, "time": Args.max_time, "tips": Args.max_tips}
+
+    Start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers = max(1, Args.jobs)) as Pool:
+        Results = dict(Pool.map(Run_Case, Selected))
+    Failed = []
+    for Case in Selected:
+        Name = Case[0]
+        Result = Results[Name]
+        if isinstance(Result, str):
+            print(Name + ": FAILED - " + Result)
+            Failed.append(Name)
+            continue
+        if Args.update:
+            Write_Golden(Name, Case, Result)
+            print(Name + ": golden trace written (" + str(Result["summary"]["commands"]) + " commands, " + Clock(Result["summary"]["seconds"]) + ")")
+            continue
+        Golden = Read_Golden(Name)
+        if Golden is None:
+            print(Name + ": FAILED - no golden trace, write it with --update")
+            Failed.append(Name)
+            continue
+        Regressions, Report = Compare(Golden, Result, Thresholds)
+        print(Name + ": " + ("REGRESSED - " + "; ".join(Regressions) if Regressions else "ok"))
+        if Regressions or len(Report) > 1:
+            for Line in Report:
+                print(Line)
+        if Regressions:
+            Failed.append(Name)
+    print(str(len(Selected)) + " case(s) in " + str(round(time.perf_counter() - Start, 1)) + " s" + (", " + str(len(Failed)) + " failed" if Failed else ""))
+    return 1 if Failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())